@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; websocket connections to ``/ws/quotes/`` go to the quote
+stream (market_data.websocket).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +15,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from market_data.websocket import quote_stream  # noqa: E402 (needs the app registry)
+
+WEBSOCKET_ROUTES = {
+    '/ws/quotes/': quote_stream,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'websocket':
+        return await django_application(scope, receive, send)
+    app = WEBSOCKET_ROUTES.get(scope['path'])
+    if app is None:
+        await receive()
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    return await app(scope, receive, send)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import json
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
 
     #API Apps
     'rest_framework',
+    'rest_framework.authtoken',
     
     # Custom Apps
     'users',
@@ -48,7 +50,7 @@ INSTALLED_APPS = [
     'ml_pipelines',
 ]
 
-AUTH_USER_MODEL = 'users.Trader'
+AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -64,6 +66,8 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'users.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
 ROOT_URLCONF = 'config.urls'
@@ -107,6 +111,48 @@ DATABASES = {
 }
 
 ALV_API_KEY = os.getenv('ALV_API_KEY')
+FRED_API_KEY = os.getenv('FRED_API_KEY')
+
+# Market data vendor definitions (URL templates, rate limits)
+VENDORS_FILE = Path(os.getenv('VENDORS_FILE', BASE_DIR.parent / 'vendors.json'))
+
+# Local Parquet cache of historical bars (market_data.cache)
+BAR_CACHE_DIR = Path(os.getenv('BAR_CACHE_DIR', BASE_DIR / 'var' / 'bar_cache'))
+
+# In-process cache of recent bars per (symbol, interval, window) (market_data.quotes)
+HOT_BAR_CACHE_SIZE = int(os.getenv('HOT_BAR_CACHE_SIZE', 4096))
+HOT_BAR_CACHE_TTL = float(os.getenv('HOT_BAR_CACHE_TTL', 60))
+
+# Client addresses allowed to scrape /market-data/metrics/ (comma-separated).
+# Behind a proxy this is the proxy's address, so expose metrics on an internal
+# port rather than through the public one.
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip]
+
+# Memory-mapped bar matrices shared with backtest sweep workers (trades.sweeps)
+SWEEP_DATA_DIR = Path(os.getenv('SWEEP_DATA_DIR', BASE_DIR / 'var' / 'sweeps'))
+
+# Parquet store of precomputed indicator features (ml_pipelines.features)
+FEATURE_STORE_DIR = Path(os.getenv('FEATURE_STORE_DIR', BASE_DIR / 'var' / 'features'))
+
+# Serialized estimators and prediction micro-batching (ml_pipelines.inference)
+MODEL_DIR = Path(os.getenv('MODEL_DIR', BASE_DIR / 'var' / 'models'))
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 256))
+INFERENCE_MAX_WAIT = float(os.getenv('INFERENCE_MAX_WAIT', 0.005))
+
+# Vendor precedence for the consolidated bar series (market_data.consolidation):
+# vendors.json keys, highest priority first, with optional per-field overrides
+# as JSON, e.g. {"volume": ["quant_quote", "alpha_vantage"]}
+BAR_VENDOR_PRIORITY = [
+    key for key in os.getenv(
+        'BAR_VENDOR_PRIORITY', 'alpha_vantage,eod_data,quant_quote,yahoo_finance,google_finance,quandl'
+    ).split(',') if key
+]
+BAR_FIELD_PRIORITY = json.loads(os.getenv('BAR_FIELD_PRIORITY', '{}'))
+# Seconds after which another vendor's later revision of a bar outranks priority (unset: never)
+BAR_REVISION_WINDOW = float(os.environ['BAR_REVISION_WINDOW']) if os.getenv('BAR_REVISION_WINDOW') else None
+
+# Exchange time zone used to assign intraday bars to trading dates
+MARKET_TIME_ZONE = os.getenv('MARKET_TIME_ZONE', 'America/New_York')
 
 
 # Password validation
@@ -149,3 +195,6 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Runs the tests with the stores under var/ redirected to a temporary directory
+TEST_RUNNER = 'config.test_runner.TestRunner'
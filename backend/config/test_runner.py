@@ -0,0 +1,30 @@
+"""
+Test runner that keeps the suite out of the on-disk stores under var/.
+
+Bar commits invalidate and refill the Parquet bar cache through
+market_data.cache's on_bars_committed hook, so any test that stores bars
+would otherwise write into, and read back from, a developer's real cache.
+Every store directory is pointed at a temporary directory for the whole run;
+tests that need an isolated store of their own still override the setting.
+"""
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+STORE_SETTINGS = ('BAR_CACHE_DIR', 'SWEEP_DATA_DIR', 'FEATURE_STORE_DIR', 'MODEL_DIR')
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.store_root = tempfile.TemporaryDirectory(prefix='backend-tests-')
+        root = Path(self.store_root.name)
+        self.store_settings = override_settings(**{name: root / name.lower() for name in STORE_SETTINGS})
+        self.store_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.store_settings.disable()
+        self.store_root.cleanup()
+        super().teardown_test_environment(**kwargs)
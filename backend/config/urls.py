@@ -20,4 +20,7 @@ from django.urls import path, include
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),  # Include the users app URLs
+    path('market-data/', include('market_data.urls')),
+    path('trades/', include('trades.urls')),
+    path('ml/', include('ml_pipelines.urls')),
 ]
\ No newline at end of file
@@ -1,3 +1,54 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import (
+    CorporateAction, EconomicSeries, IngestionMark, QuarantinedBar, Security, SecurityIdentifier, VendorBar,
+)
+
+
+@admin.register(Security)
+class SecurityAdmin(admin.ModelAdmin):
+    list_display = ('symbol', 'exchange', 'name', 'asset_class', 'currency', 'is_active')
+    list_filter = ('asset_class', 'exchange', 'is_active')
+    search_fields = ('symbol', 'name')
+
+
+@admin.register(IngestionMark)
+class IngestionMarkAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'security', 'interval', 'last_ts', 'updated_at')
+    list_filter = ('vendor', 'interval')
+    search_fields = ('security__symbol',)
+
+
+@admin.register(CorporateAction)
+class CorporateActionAdmin(admin.ModelAdmin):
+    list_display = ('security', 'action_type', 'ex_date', 'ratio', 'amount', 'factor')
+    list_filter = ('action_type',)
+    search_fields = ('security__symbol',)
+
+
+@admin.register(QuarantinedBar)
+class QuarantinedBarAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'security', 'interval', 'ts', 'close', 'volume', 'rules', 'created_at')
+    list_filter = ('vendor', 'interval')
+    search_fields = ('security__symbol',)
+
+
+@admin.register(VendorBar)
+class VendorBarAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'security', 'interval', 'ts', 'close', 'volume', 'received_at')
+    list_filter = ('vendor', 'interval')
+    search_fields = ('security__symbol',)
+
+
+@admin.register(SecurityIdentifier)
+class SecurityIdentifierAdmin(admin.ModelAdmin):
+    list_display = ('security', 'id_type', 'namespace', 'value', 'valid_during')
+    list_filter = ('id_type', 'namespace')
+    search_fields = ('value', 'security__symbol')
+
+
+@admin.register(EconomicSeries)
+class EconomicSeriesAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'code', 'title', 'frequency', 'units', 'updated_at')
+    list_filter = ('vendor', 'frequency')
+    search_fields = ('code', 'title')
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class MarketDataConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'market_data'
+
+    def ready(self):
+        from prometheus_client import REGISTRY
+
+        from .quotes import HotBarCacheCollector, hot_bars
+        from .validation import ValidationStatsCollector, validation_stats
+        REGISTRY.register(HotBarCacheCollector(hot_bars))
+        REGISTRY.register(ValidationStatsCollector(validation_stats))
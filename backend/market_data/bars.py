@@ -0,0 +1,79 @@
+"""
+Set-based writes to the partitioned market_data_bar table.
+
+Bars are passed around as DataFrames with BAR_COLUMNS and written with one
+INSERT ... SELECT FROM unnest(...) ON CONFLICT per chunk, after making sure
+the monthly partitions they fall into exist.
+"""
+import pandas as pd
+from django.db import connection, transaction as db_transaction
+
+from .derived import on_bars_committed
+from .models import Bar
+from .partitions import ensure_partitions
+
+BAR_KEY = ['security_id', 'interval', 'ts']
+BAR_VALUES = ['open', 'high', 'low', 'close', 'volume']
+BAR_COLUMNS = BAR_KEY + BAR_VALUES
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Reports the (security, interval, year) partitions it actually changed so the
+# Parquet cache can drop them
+_UPSERT_SQL = """
+WITH written AS (
+    INSERT INTO {table} AS b (security_id, "interval", ts, open, high, low, close, volume)
+    SELECT * FROM unnest(
+        %s::bigint[], %s::varchar[], %s::timestamptz[],
+        %s::float8[], %s::float8[], %s::float8[], %s::float8[], %s::bigint[]
+    )
+    ON CONFLICT (security_id, "interval", ts) DO UPDATE
+       SET open = EXCLUDED.open,
+           high = EXCLUDED.high,
+           low = EXCLUDED.low,
+           close = EXCLUDED.close,
+           volume = EXCLUDED.volume
+     WHERE (b.open, b.high, b.low, b.close, b.volume)
+           IS DISTINCT FROM (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.volume)
+    RETURNING b.security_id, b."interval", b.ts
+)
+SELECT security_id, "interval", EXTRACT(YEAR FROM ts AT TIME ZONE 'UTC')::int, COUNT(*)
+  FROM written
+ GROUP BY 1, 2, 3
+"""
+
+
+def empty_frame():
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in (
+        ('security_id', 'int64'), ('interval', 'object'), ('ts', 'datetime64[ns, UTC]'),
+        ('open', 'float64'), ('high', 'float64'), ('low', 'float64'), ('close', 'float64'),
+        ('volume', 'int64'),
+    )})
+
+
+def _column_lists(frame):
+    # Timestamps come out as pd.Timestamp, a datetime subclass psycopg adapts
+    return [frame[column].tolist() for column in BAR_COLUMNS]
+
+
+def upsert_bars(frame, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Insert or update bars keyed on (security_id, interval, ts); returns rows actually written."""
+    if frame.empty:
+        return 0
+    frame = frame[BAR_COLUMNS].drop_duplicates(BAR_KEY, keep='last')
+    frame = frame.assign(ts=pd.to_datetime(frame['ts'], utc=True))
+
+    written = 0
+    changed = set()
+    sql = _UPSERT_SQL.format(table=Bar._meta.db_table)
+    with db_transaction.atomic():
+        ensure_partitions(frame['ts'].min(), frame['ts'].max())
+        with connection.cursor() as cursor:
+            for start in range(0, len(frame), chunk_size):
+                cursor.execute(sql, _column_lists(frame.iloc[start:start + chunk_size]))
+                for security_id, interval, year, count in cursor.fetchall():
+                    changed.add((security_id, interval, year))
+                    written += count
+        if changed:
+            on_bars_committed(changed, frame)
+    return written
@@ -0,0 +1,187 @@
+"""
+Local Parquet cache of historical bars.
+
+Bars are cached per (interval, security, year) as zstd-compressed Parquet files
+under ``settings.BAR_CACHE_DIR``::
+
+    <interval>/<security_id>/<year>.parquet
+
+Partitions are keyed on security_id rather than the ticker, which can change.
+A partition is read from PostgreSQL the first time it is needed and from the
+file afterwards; files are opened memory-mapped and decoded straight into
+pandas blocks (``split_blocks``/``self_destruct``) without a consolidation copy.
+
+market_data.bars.upsert_bars invalidates the partitions it actually changed
+once the writing transaction commits. Invalidation also touches a marker file,
+and a partition populated from a read that started before the marker is
+returned but not written, so a correction racing a cache fill cannot leave
+stale data on disk.
+"""
+import os
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import connection
+
+from .models import Bar
+
+COMPRESSION = 'zstd'
+
+SCHEMA = pa.schema([
+    ('ts', pa.timestamp('us', tz='UTC')),
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('volume', pa.int64()),
+])
+
+_PARTITION_SQL = """
+SELECT ts, open, high, low, close, volume
+  FROM {table}
+ WHERE security_id = %s AND "interval" = %s AND ts >= %s AND ts < %s
+ ORDER BY ts
+"""
+
+
+def _year_bounds(year):
+    return (
+        datetime(year, 1, 1, tzinfo=dt_timezone.utc),
+        datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc),
+    )
+
+
+def to_utc(value):
+    """pd.Timestamp in UTC; naive values are taken to be UTC"""
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')
+
+
+def _to_frame(table):
+    frame = table.to_pandas(split_blocks=True, self_destruct=True)
+    return frame.set_index('ts')
+
+
+class BarCache:
+    def __init__(self, root=None):
+        self.root = Path(root or settings.BAR_CACHE_DIR)
+
+    def path(self, security_id, interval, year):
+        return self.root / interval / str(security_id) / f'{year}.parquet'
+
+    def _marker(self, path):
+        return path.with_suffix('.invalidated')
+
+    def _query(self, security_id, interval, year):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _PARTITION_SQL.format(table=Bar._meta.db_table),
+                [security_id, interval, *_year_bounds(year)],
+            )
+            rows = cursor.fetchall()
+        columns = list(zip(*rows)) if rows else [[] for _ in SCHEMA.names]
+        return pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, SCHEMA)],
+            schema=SCHEMA,
+        )
+
+    def _write(self, path, table, started):
+        marker = self._marker(path)
+        if marker.exists() and marker.stat().st_mtime >= started:
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        pq.write_table(table, tmp, compression=COMPRESSION)
+        os.replace(tmp, path)
+        return True
+
+    def load_partition(self, security_id, interval, year, loader=None):
+        """
+        One (security, interval, year) partition as an Arrow table.
+
+        ``loader(security_id, year)`` builds a missing partition; by default it
+        is read from market_data_bar.
+        """
+        path = self.path(security_id, interval, year)
+        try:
+            return pq.read_table(path, memory_map=True)
+        except FileNotFoundError:
+            pass
+        started = time.time()
+        if loader is None:
+            table = self._query(security_id, interval, year)
+        else:
+            table = loader(security_id, year)
+        self._write(path, table, started)
+        return table
+
+    def read(self, security_id, interval, start, end, loader=None):
+        """
+        Bars for one security with ``start <= ts < end`` as a DataFrame indexed by ts.
+
+        ``start``/``end`` are aware datetimes or anything pd.Timestamp accepts.
+        """
+        start, end = to_utc(start), to_utc(end)
+        # ``end`` is exclusive, so a range ending on 1 January stops at the year before
+        last_year = (end - pd.Timedelta(microseconds=1)).year
+        tables = [
+            self.load_partition(security_id, interval, year, loader)
+            for year in range(start.year, last_year + 1)
+        ]
+        if not tables:
+            return _to_frame(SCHEMA.empty_table())
+        table = pa.concat_tables(tables)
+        ts_type = SCHEMA.field('ts').type
+        mask = pc.and_(
+            pc.greater_equal(table['ts'], pa.scalar(start.to_pydatetime(), type=ts_type)),
+            pc.less(table['ts'], pa.scalar(end.to_pydatetime(), type=ts_type)),
+        )
+        return _to_frame(table.filter(mask))
+
+    def _drop(self, security_id, interval, year):
+        path = self.path(security_id, interval, year)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._marker(path).touch()
+        try:
+            path.unlink()
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def invalidate(self, partitions):
+        """
+        Drop cached (security_id, interval, year) partitions.
+
+        Series derived from ``interval`` (cached as ``<target>@<interval>``, see
+        market_data.derived) are dropped for the neighbouring years too, since
+        their buckets may straddle a year boundary.
+        """
+        count = 0
+        derived = {}
+        for security_id, interval, year in partitions:
+            count += self._drop(security_id, interval, year)
+            if interval not in derived:
+                derived[interval] = [path.name for path in self.root.glob(f'*@{interval}') if path.is_dir()]
+            for name in derived[interval]:
+                for derived_year in (year - 1, year, year + 1):
+                    count += self._drop(security_id, name, derived_year)
+        return count
+
+    def clear(self, interval=None, security_id=None):
+        """Remove every cached partition, optionally only for one interval/security"""
+        pattern = f"{interval or '*'}/{security_id if security_id is not None else '*'}/*.parquet"
+        count = 0
+        for path in self.root.glob(pattern):
+            path.unlink(missing_ok=True)
+            count += 1
+        return count
+
+
+def get_cache():
+    return BarCache()
@@ -0,0 +1,292 @@
+"""
+Exchange trading calendars as precomputed session tables.
+
+A calendar expands its rules (weekmask, holiday rules, ad hoc closures, early
+closes, time zone) once into sorted int64 arrays of session dates and UTC
+open/close nanoseconds for SESSION_YEARS. Every question after that is a
+binary search over those arrays: whether the market is open, the next open,
+the previous close, how many bars a range should hold and where a bar sits in
+the calendar's bar sequence.
+
+Bar conventions follow market_data.derived: bars are keyed on their start,
+intraday buckets are aligned to UTC, so a session contributes every bucket
+that overlaps it (09:30-16:00 New York holds seven 60min bars starting on the
+hour), and daily bars are keyed at midnight UTC of the session date.
+
+Holiday rules reproduce NYSE closures from 1990 on; rules extrapolate into the
+future, so dates the exchange has not announced yet are the rules' best guess.
+"""
+from datetime import time
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import MO
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMemorialDay, USPresidentsDay,
+    USThanksgivingDay, nearest_workday, sunday_to_monday,
+)
+from pandas.tseries.offsets import DateOffset
+
+from .cache import to_utc
+from .derived import INTRADAY_FREQUENCIES
+
+SESSION_YEARS = (1990, 2040)
+
+DAY_NS = 86400 * 10 ** 9
+
+
+class NYSEHolidays(AbstractHolidayCalendar):
+    rules = [
+        # Saturday New Year's Days are not observed on the Friday before
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        Holiday('Martin Luther King Jr. Day', month=1, day=1, offset=DateOffset(weekday=MO(3)),
+                start_date='1998-01-01'),
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, observance=nearest_workday, start_date='2022-01-01'),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas Day', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+# Unscheduled closures: national days of mourning, 9/11, Hurricane Sandy
+NYSE_CLOSURES = [
+    '1994-04-27', '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14', '2004-06-11',
+    '2007-01-02', '2012-10-29', '2012-10-30', '2018-12-05', '2025-01-09',
+]
+
+
+def nyse_early_closes(dates):
+    """13:00 closes: July 3rd and Christmas Eve from Monday to Thursday, the day after Thanksgiving"""
+    weekday = dates.dayofweek
+    july_3 = (dates.month == 7) & (dates.day == 3) & (weekday < 4)
+    christmas_eve = (dates.month == 12) & (dates.day == 24) & (weekday < 4)
+    black_friday = (dates.month == 11) & (weekday == 4) & (dates.day >= 23) & (dates.day <= 29)
+    return july_3 | christmas_eve | black_friday
+
+
+def _ns(values):
+    """int64 UTC nanoseconds of a timestamp or an array of them, and whether the input was a scalar"""
+    if isinstance(values, (pd.DatetimeIndex, pd.Series, np.ndarray, list, tuple)):
+        index = pd.DatetimeIndex(values)
+        index = index.tz_localize('UTC') if index.tz is None else index.tz_convert('UTC')
+        return index.asi8, False
+    return np.array([to_utc(values).value]), True
+
+
+def _timestamps(ns, scalar):
+    index = pd.DatetimeIndex(ns.astype('datetime64[ns]')).tz_localize('UTC')
+    return index[0] if scalar else index
+
+
+class ExchangeCalendar:
+    def __init__(self, name, tz, open_time, close_time, holidays=None, closures=(), early_close=None,
+                 early_close_time=None, weekmask='1111100', years=SESSION_YEARS):
+        self.name = name
+        self.tz = tz
+        self.open_time = open_time
+        self.close_time = close_time
+        self.holidays = holidays
+        self.closures = closures
+        self.early_close = early_close
+        self.early_close_time = early_close_time
+        self.weekmask = weekmask
+        self.years = years
+        self._grids = {}
+
+    def __repr__(self):
+        return f'<ExchangeCalendar {self.name}>'
+
+    @cached_property
+    def _sessions(self):
+        start, end = f'{self.years[0]}-01-01', f'{self.years[1]}-12-31'
+        holidays = list(pd.DatetimeIndex(self.closures))
+        if self.holidays is not None:
+            holidays += list(self.holidays().holidays(start, end))
+        dates = pd.bdate_range(start, end, freq='C', weekmask=self.weekmask, holidays=holidays)
+        closes = pd.Series(self.close_time, index=dates)
+        if self.early_close is not None:
+            closes[self.early_close(dates)] = self.early_close_time
+        opens = self._utc(dates, [self.open_time] * len(dates))
+        closes = self._utc(dates, closes.tolist())
+        # A close at midnight ends the session at the start of the next day
+        closes = np.where(closes <= opens, closes + DAY_NS, closes)
+        return dates.asi8 // DAY_NS, opens, closes
+
+    def _utc(self, dates, times):
+        local = dates + pd.to_timedelta([t.hour * 3600 + t.minute * 60 for t in times], unit='s')
+        return local.tz_localize(self.tz).tz_convert('UTC').asi8
+
+    @property
+    def days(self):
+        """Session dates as days since the epoch"""
+        return self._sessions[0]
+
+    @property
+    def opens(self):
+        return self._sessions[1]
+
+    @property
+    def closes(self):
+        return self._sessions[2]
+
+    def _out_of_range(self):
+        return ValueError(f"{self.name} sessions are computed for {self.years[0]}-{self.years[1]}")
+
+    def _check(self, ns):
+        if len(ns) and (ns.min() < self.opens[0] - DAY_NS or ns.max() > self.closes[-1] + DAY_NS):
+            raise self._out_of_range()
+
+    def sessions(self, start, end):
+        """Sessions with a date in ``[start, end]`` as a DataFrame of UTC opens and closes, indexed by date"""
+        first, last = np.searchsorted(self.days, [to_utc(start).value // DAY_NS, to_utc(end).value // DAY_NS + 1])
+        days = slice(first, last)
+        return pd.DataFrame(
+            {'open': _timestamps(self.opens[days], False), 'close': _timestamps(self.closes[days], False)},
+            index=pd.DatetimeIndex(self.days[days].astype('datetime64[D]'), name='date'),
+        )
+
+    def is_session(self, day):
+        day = to_utc(day).value // DAY_NS
+        i = np.searchsorted(self.days, day)
+        return bool(i < len(self.days) and self.days[i] == day)
+
+    def is_open(self, ts):
+        """Whether the market is open at ``ts`` (a timestamp or an array of them)"""
+        ns, scalar = _ns(ts)
+        self._check(ns)
+        i = np.searchsorted(self.opens, ns, side='right') - 1
+        open_ = (i >= 0) & (ns < self.closes[np.maximum(i, 0)])
+        return bool(open_[0]) if scalar else open_
+
+    def next_open(self, ts):
+        """First session open after ``ts``"""
+        ns, scalar = _ns(ts)
+        self._check(ns)
+        i = np.searchsorted(self.opens, ns, side='right')
+        # Past the last open, which _check's slack lets through
+        if len(i) and i.max() >= len(self.opens):
+            raise self._out_of_range()
+        return _timestamps(self.opens[i], scalar)
+
+    def previous_close(self, ts):
+        """Last session close before ``ts``"""
+        ns, scalar = _ns(ts)
+        self._check(ns)
+        i = np.searchsorted(self.closes, ns, side='left') - 1
+        # Before the first close, which _check's slack lets through
+        if len(i) and i.min() < 0:
+            raise self._out_of_range()
+        return _timestamps(self.closes[i], scalar)
+
+    def _grid(self, interval):
+        """
+        (first bar start, bar count, bars before the session) per session for
+        ``interval``, computed once per interval.
+        """
+        grid = self._grids.get(interval)
+        if grid is None:
+            if interval == '1d':
+                starts, counts, step = self.days * DAY_NS, np.ones(len(self.days), dtype=np.int64), DAY_NS
+            elif interval in INTRADAY_FREQUENCIES:
+                step = pd.Timedelta(INTRADAY_FREQUENCIES[interval]).value
+                starts = self.opens // step * step
+                counts = -(-self.closes // step) - self.opens // step
+            else:
+                raise ValueError(f"Calendar bars are defined for intraday and daily intervals, not {interval!r}")
+            before = np.concatenate([[0], np.cumsum(counts)])
+            grid = self._grids[interval] = (starts, counts, before, step)
+        return grid
+
+    def _position(self, ns, interval):
+        starts, counts, before, step = self._grid(interval)
+        i = np.searchsorted(starts, ns, side='right') - 1
+        session = np.maximum(i, 0)
+        within = np.clip(-(-(ns - starts[session]) // step), 0, counts[session])
+        return np.where(i >= 0, before[session] + within, 0)
+
+    def bars_before(self, ts, interval):
+        """
+        Number of the calendar's ``interval`` bars starting before ``ts``: the
+        ordinal of the first bar at or after it
+        """
+        ns, scalar = _ns(ts)
+        self._check(ns)
+        position = self._position(ns, interval)
+        return int(position[0]) if scalar else position
+
+    def expected_bars(self, start, end, interval):
+        """Bars of ``interval`` the calendar expects with ``start <= ts < end``"""
+        ns, _ = _ns([to_utc(start), to_utc(end)])
+        self._check(ns)
+        first, last = self._position(ns, interval)
+        return int(max(last - first, 0))
+
+    def bar_ordinals(self, ts, interval):
+        """
+        Position of each bar timestamp in the calendar's sequence of
+        ``interval`` bars; -1 for timestamps that are not a session's bar.
+        Consecutive bars have consecutive ordinals, so gaps show up as jumps.
+        """
+        ns, scalar = _ns(ts)
+        self._check(ns)
+        starts, counts, before, step = self._grid(interval)
+        i = np.searchsorted(starts, ns, side='right') - 1
+        session = np.maximum(i, 0)
+        offset, remainder = np.divmod(ns - starts[session], step)
+        valid = (i >= 0) & (remainder == 0) & (offset < counts[session])
+        ordinals = np.where(valid, before[session] + offset, -1)
+        return int(ordinals[0]) if scalar else ordinals
+
+    def bar_timestamps(self, ordinals, interval):
+        """Bar start of each ordinal, the inverse of bar_ordinals()"""
+        starts, counts, before, step = self._grid(interval)
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        session = np.searchsorted(before, ordinals, side='right') - 1
+        return _timestamps(starts[session] + (ordinals - before[session]) * step, False)
+
+    def expected_timestamps(self, start, end, interval):
+        """Bar starts the calendar expects with ``start <= ts < end``"""
+        ns, _ = _ns([to_utc(start), to_utc(end)])
+        self._check(ns)
+        first, last = self._position(ns, interval)
+        return self.bar_timestamps(np.arange(first, max(first, last)), interval)
+
+
+CALENDARS = {
+    'XNYS': ExchangeCalendar(
+        'XNYS', 'America/New_York', time(9, 30), time(16), holidays=NYSEHolidays, closures=NYSE_CLOSURES,
+        early_close=nyse_early_closes, early_close_time=time(13),
+    ),
+    # Markets that trade around the clock, every day
+    'ALWAYS': ExchangeCalendar('ALWAYS', 'UTC', time(0), time(0), weekmask='1111111'),
+}
+
+# Security.exchange values (and MIC codes) per calendar; unknown exchanges use DEFAULT_CALENDAR
+EXCHANGE_CALENDARS = {
+    'NYSE': 'XNYS', 'NASDAQ': 'XNYS', 'XNAS': 'XNYS', 'ARCA': 'XNYS', 'NYSEARCA': 'XNYS', 'AMEX': 'XNYS',
+    'BATS': 'XNYS', 'CBOE': 'XNYS',
+}
+ASSET_CLASS_CALENDARS = {
+    'crypto': 'ALWAYS',
+}
+DEFAULT_CALENDAR = 'XNYS'
+
+
+def get_calendar(name):
+    """A calendar by name or by exchange"""
+    name = EXCHANGE_CALENDARS.get(name, name)
+    try:
+        return CALENDARS[name]
+    except KeyError:
+        raise LookupError(f"No trading calendar {name!r}")
+
+
+def calendar_for(exchange='', asset_class='equity'):
+    """The calendar a security trades on"""
+    name = ASSET_CLASS_CALENDARS.get(asset_class) or EXCHANGE_CALENDARS.get(exchange, exchange)
+    return CALENDARS.get(name) or CALENDARS[DEFAULT_CALENDAR]
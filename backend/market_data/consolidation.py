@@ -0,0 +1,178 @@
+"""
+Consolidation of per-vendor bars into the golden market_data_bar series.
+
+Every vendor's bars are kept in VendorBar. consolidate() rebuilds the golden
+bars of a set of securities over a time range with one SQL statement: the
+vendor rows of each (security, interval, ts) are grouped, and each field
+takes the value of the highest-priority vendor that has the bar
+(``settings.BAR_VENDOR_PRIORITY``, overridable per field with
+``settings.BAR_FIELD_PRIORITY``). Vendors missing from a priority list rank
+after the listed ones, ties go to the most recent revision.
+
+Freshness: with ``settings.BAR_REVISION_WINDOW`` set, a vendor's value is
+only eligible while no other vendor revised the same bar more than that many
+seconds later, so a correction published by one vendor is not masked forever
+by a higher-priority vendor that never re-sent the bar.
+
+Fields from different vendors can disagree, so high and low are widened to
+cover the chosen open and close. Golden rows are upserted with the
+changed-only ON CONFLICT update of market_data.bars, and the rows actually
+changed go through the same cache invalidation and streaming hooks.
+"""
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+
+from .bars import BAR_COLUMNS, BAR_KEY, BAR_VALUES, DEFAULT_CHUNK_SIZE, _column_lists
+from .derived import on_bars_committed
+from .models import Bar, Security, VendorBar
+from .partitions import ensure_partitions
+
+DEFAULT_BATCH_SIZE = 500
+
+_UPSERT_VENDOR_SQL = """
+INSERT INTO {table} AS v (vendor, security_id, "interval", ts, open, high, low, close, volume, received_at)
+SELECT %s, u.*, now()
+  FROM unnest(
+        %s::bigint[], %s::varchar[], %s::timestamptz[],
+        %s::float8[], %s::float8[], %s::float8[], %s::float8[], %s::bigint[]
+       ) AS u
+ON CONFLICT (security_id, "interval", ts, vendor) DO UPDATE
+   SET open = EXCLUDED.open,
+       high = EXCLUDED.high,
+       low = EXCLUDED.low,
+       close = EXCLUDED.close,
+       volume = EXCLUDED.volume,
+       received_at = EXCLUDED.received_at
+ WHERE (v.open, v.high, v.low, v.close, v.volume)
+       IS DISTINCT FROM (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.volume)
+"""
+
+_RANGE_FILTER = """
+ WHERE v.security_id = ANY(%(security_ids)s) AND v."interval" = %(interval)s
+   AND (%(start)s::timestamptz IS NULL OR v.ts >= %(start)s)
+   AND (%(end)s::timestamptz IS NULL OR v.ts < %(end)s)
+"""
+
+_SPAN_SQL = "SELECT min(v.ts), max(v.ts) FROM {vendor_table} v" + _RANGE_FILTER
+
+_FIELD_SQL = (
+    "(array_agg({field} ORDER BY array_position(%({field})s::varchar[], vendor), received_at DESC, vendor))[1]"
+)
+
+_CONSOLIDATE_SQL = """
+WITH candidates AS (
+    SELECT v.*, max(v.received_at) OVER (PARTITION BY v.security_id, v."interval", v.ts) AS newest
+      FROM {vendor_table} v
+""" + _RANGE_FILTER + """
+),
+golden AS (
+    SELECT security_id, "interval", ts, {fields}
+      FROM candidates
+     WHERE %(window)s::interval IS NULL OR received_at >= newest - %(window)s::interval
+     GROUP BY security_id, "interval", ts
+),
+written AS (
+    INSERT INTO {bar_table} AS b (security_id, "interval", ts, open, high, low, close, volume)
+    SELECT security_id, "interval", ts, open, GREATEST(high, open, close), LEAST(low, open, close), close, volume
+      FROM golden
+    ON CONFLICT (security_id, "interval", ts) DO UPDATE
+       SET open = EXCLUDED.open,
+           high = EXCLUDED.high,
+           low = EXCLUDED.low,
+           close = EXCLUDED.close,
+           volume = EXCLUDED.volume
+     WHERE (b.open, b.high, b.low, b.close, b.volume)
+           IS DISTINCT FROM (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.volume)
+    RETURNING b.security_id, b."interval", b.ts, b.open, b.high, b.low, b.close, b.volume
+)
+SELECT * FROM written
+"""
+
+
+def field_priorities(priority=None, field_priority=None):
+    """Vendor order per bar field"""
+    priority = list(settings.BAR_VENDOR_PRIORITY if priority is None else priority)
+    overrides = settings.BAR_FIELD_PRIORITY if field_priority is None else field_priority
+    unknown = set(overrides) - set(BAR_VALUES)
+    if unknown:
+        raise ValueError(f"Unknown bar fields in vendor priority: {', '.join(sorted(unknown))}")
+    return {field: list(overrides.get(field, priority)) for field in BAR_VALUES}
+
+
+def upsert_vendor_bars(frame, vendor, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Insert or update one vendor's bars; returns the rows whose values changed"""
+    if frame.empty:
+        return 0
+    frame = frame[BAR_COLUMNS].drop_duplicates(BAR_KEY, keep='last')
+    frame = frame.assign(ts=pd.to_datetime(frame['ts'], utc=True))
+
+    written = 0
+    sql = _UPSERT_VENDOR_SQL.format(table=VendorBar._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(frame), chunk_size):
+            cursor.execute(sql, [vendor, *_column_lists(frame.iloc[start:start + chunk_size])])
+            written += cursor.rowcount
+    return written
+
+
+def consolidate(security_ids, interval, start=None, end=None, priority=None, field_priority=None,
+                revision_window=None):
+    """
+    Rebuild the golden bars of ``security_ids`` with ``start <= ts < end``
+    (open-ended where None) from their vendor bars. Returns the golden rows
+    that changed.
+    """
+    if revision_window is None and settings.BAR_REVISION_WINDOW is not None:
+        revision_window = timedelta(seconds=settings.BAR_REVISION_WINDOW)
+    params = {
+        'security_ids': [int(security_id) for security_id in security_ids],
+        'interval': interval,
+        'start': start,
+        'end': end,
+        'window': revision_window,
+        **field_priorities(priority, field_priority),
+    }
+    tables = {'vendor_table': VendorBar._meta.db_table, 'bar_table': Bar._meta.db_table}
+    fields = ',\n           '.join(f'{_FIELD_SQL.format(field=field)} AS {field}' for field in BAR_VALUES)
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(_SPAN_SQL.format(**tables), params)
+        first, last = cursor.fetchone()
+        if first is None:
+            return 0
+        ensure_partitions(first, last)
+        cursor.execute(_CONSOLIDATE_SQL.format(fields=fields, **tables), params)
+        frame = pd.DataFrame(cursor.fetchall(), columns=BAR_COLUMNS)
+        if not frame.empty:
+            frame['ts'] = pd.to_datetime(frame['ts'], utc=True)
+            changed = set(zip(frame['security_id'].tolist(), frame['interval'], frame['ts'].dt.year.tolist()))
+            on_bars_committed(changed, frame)
+    return len(frame)
+
+
+def consolidate_frame(frame):
+    """consolidate() the securities of a bar frame over its time span, per interval"""
+    changed = 0
+    for interval, bars in frame.groupby('interval'):
+        ts = pd.to_datetime(bars['ts'], utc=True)
+        changed += consolidate(
+            bars['security_id'].unique().tolist(), interval, ts.min(), ts.max() + pd.Timedelta(microseconds=1),
+        )
+    return changed
+
+
+def consolidate_universe(interval, start=None, end=None, security_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    consolidate() over all active securities (or ``security_ids``), one
+    transaction per batch of ``batch_size`` securities. Returns the golden rows
+    that changed.
+    """
+    if security_ids is None:
+        security_ids = Security.objects.filter(is_active=True).values_list('security_id', flat=True)
+    security_ids = sorted(security_ids)
+    return sum(
+        consolidate(security_ids[offset:offset + batch_size], interval, start, end)
+        for offset in range(0, len(security_ids), batch_size)
+    )
@@ -0,0 +1,245 @@
+"""
+Resampled and corporate-action adjusted bar series.
+
+Higher intervals are aggregated from stored base bars with NumPy reductions
+over contiguous buckets (bars are already sorted by ts), one cached year at a
+time: the result is kept in the Parquet cache as ``<target>@<base>`` and is
+dropped together with the base partitions it was built from (see
+market_data.cache.BarCache.invalidate).
+
+Adjustment is applied at read time: each corporate action carries a price
+factor, and prices of a bar are multiplied by the product of the factors of all
+actions with a later ex-date. That is one searchsorted and one multiply over the
+requested range, so a new action or a corrected bar never forces the
+aggregated history to be rebuilt. An ex-date can fall inside a resampled
+bucket, so adjusted resampled bars are aggregated from adjusted base bars of
+the requested range rather than taken from the memoised partitions.
+
+Bucket conventions: bars are keyed on their start. Intraday buckets are aligned
+to UTC; daily buckets follow the local date in ``settings.MARKET_TIME_ZONE`` and
+are keyed at midnight UTC of that date, like vendor daily bars; weeks start on
+Monday and months on the 1st.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from .cache import SCHEMA, get_cache, to_utc
+from .models import Bar, CorporateAction
+from .quotes import hot_bars
+from .streaming import publish_bars
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# target interval -> default base interval
+RESAMPLE_BASES = {
+    '5min': '1min',
+    '15min': '1min',
+    '30min': '1min',
+    '60min': '1min',
+    '1d': '1min',
+    '1wk': '1d',
+    '1mo': '1d',
+}
+
+INTRADAY_FREQUENCIES = {
+    '1min': '1min',
+    '5min': '5min',
+    '15min': '15min',
+    '30min': '30min',
+    '60min': '60min',
+}
+
+INTERVAL_ORDER = [choice for choice, _ in Bar.INTERVALS]
+
+# Base data read beyond a range so that buckets straddling its edges are
+# complete: one bucket plus a day for the market time zone offset
+BUCKET_PADS = {
+    '5min': timedelta(days=1),
+    '15min': timedelta(days=1),
+    '30min': timedelta(days=1),
+    '60min': timedelta(days=1),
+    '1d': timedelta(days=2),
+    '1wk': timedelta(days=8),
+    '1mo': timedelta(days=32),
+}
+
+
+def bucket_keys(ts, interval):
+    """Bucket start for each timestamp of a UTC DatetimeIndex"""
+    if interval in INTRADAY_FREQUENCIES:
+        return ts.floor(INTRADAY_FREQUENCIES[interval])
+    if interval == '1d':
+        local = ts.tz_convert(settings.MARKET_TIME_ZONE).tz_localize(None).normalize()
+        return local.tz_localize('UTC')
+    days = ts.normalize()
+    if interval == '1wk':
+        return days - pd.to_timedelta(days.dayofweek, unit='D')
+    if interval == '1mo':
+        return days - pd.to_timedelta(days.day - 1, unit='D')
+    raise ValueError(f"Cannot resample to {interval!r}")
+
+
+def aggregate(frame, interval):
+    """
+    OHLCV bars of ``interval`` from a ts-indexed, ts-sorted base frame.
+
+    Buckets are contiguous runs of equal keys, so every column reduces with a
+    single ``ufunc.reduceat`` over the run starts.
+    """
+    if frame.empty:
+        return frame.iloc[:0]
+    buckets = bucket_keys(frame.index, interval)
+    keys = buckets.asi8
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return pd.DataFrame(
+        {
+            'open': frame['open'].to_numpy()[starts],
+            'high': np.maximum.reduceat(frame['high'].to_numpy(), starts),
+            'low': np.minimum.reduceat(frame['low'].to_numpy(), starts),
+            'close': frame['close'].to_numpy()[ends],
+            'volume': np.add.reduceat(frame['volume'].to_numpy(), starts),
+        },
+        index=buckets[starts].rename('ts'),
+    )
+
+
+def _year_range(year):
+    return (
+        datetime(year, 1, 1, tzinfo=dt_timezone.utc),
+        datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc),
+    )
+
+
+def _resample_range(security_id, interval, base, start, end, factors=None):
+    """Aggregate the buckets starting in ``start``..``end`` from base bars around them"""
+    start, end = to_utc(start), to_utc(end)
+    pad = BUCKET_PADS[interval]
+    source = get_cache().read(security_id, base, start - pad, end + pad)
+    if factors is not None:
+        source = adjust(source, base, factors)
+    bars = aggregate(source, interval)
+    return bars[(bars.index >= start) & (bars.index < end)]
+
+
+def _resample_loader(interval, base):
+    def load(security_id, year):
+        bars = _resample_range(security_id, interval, base, *_year_range(year))
+        return pa.Table.from_pandas(bars.reset_index(), schema=SCHEMA, preserve_index=False)
+    return load
+
+
+def _check_resample(interval, base):
+    base = base or RESAMPLE_BASES.get(interval)
+    if interval not in BUCKET_PADS or base is None or INTERVAL_ORDER.index(base) >= INTERVAL_ORDER.index(interval):
+        raise ValueError(f"Cannot resample {base!r} bars to {interval!r}")
+    return base
+
+
+def resample(security_id, interval, start, end, base=None):
+    """``interval`` bars aggregated from stored ``base`` bars, memoised per year"""
+    base = _check_resample(interval, base)
+    return get_cache().read(
+        security_id, f'{interval}@{base}', start, end, loader=_resample_loader(interval, base)
+    )
+
+
+def _previous_close(action):
+    ex_ts = datetime.combine(action.ex_date, time.min, tzinfo=dt_timezone.utc)
+    return (
+        Bar.objects.filter(security_id=action.security_id, interval='1d', ts__lt=ex_ts)
+        .order_by('-ts').values_list('close', flat=True).first()
+    )
+
+
+def adjustment_factors(security_id):
+    """
+    (ex_dates, price factors, volume factors) ordered by ex-date.
+
+    Dividend factors missing since the action was recorded or its bars were
+    corrected are computed from the previous daily close and saved.
+    """
+    actions = list(CorporateAction.objects.filter(security_id=security_id).order_by('ex_date'))
+    ex_dates, price, volume = [], [], []
+    for action in actions:
+        if action.factor is None and action.action_type == 'dividend' and action.amount:
+            close = _previous_close(action)
+            if close:
+                action.factor = 1 - float(action.amount) / close
+                action.save(update_fields=['factor', 'updated_at'])
+        if action.factor is None:
+            continue
+        ex_dates.append(action.ex_date)
+        price.append(action.factor)
+        volume.append(float(action.ratio) if action.action_type == 'split' else 1.0)
+    return np.array(ex_dates, dtype='datetime64[D]'), np.array(price), np.array(volume)
+
+
+def adjust(frame, interval, factors):
+    """Back-adjust a ts-indexed frame for the given adjustment_factors()"""
+    ex_dates, price, volume = factors
+    if frame.empty or not len(ex_dates):
+        return frame
+    if interval in INTRADAY_FREQUENCIES:
+        dates = frame.index.tz_convert(settings.MARKET_TIME_ZONE).tz_localize(None)
+    else:
+        dates = frame.index.tz_localize(None)
+    dates = dates.to_numpy().astype('datetime64[D]')
+
+    # Suffix products: the multiplier for a bar covers every action after it
+    price_after = np.r_[np.cumprod(price[::-1])[::-1], 1.0]
+    volume_after = np.r_[np.cumprod(volume[::-1])[::-1], 1.0]
+    position = np.searchsorted(ex_dates, dates, side='right')
+
+    adjusted = frame.copy()
+    adjusted[PRICE_COLUMNS] = frame[PRICE_COLUMNS].to_numpy() * price_after[position][:, None]
+    adjusted['volume'] = np.rint(frame['volume'].to_numpy() * volume_after[position]).astype('int64')
+    return adjusted
+
+
+def get_bars(security_id, interval, start, end, base=None, adjusted=False):
+    """
+    Bars for one security with ``start <= ts < end``.
+
+    With ``base`` the bars are resampled from that stored interval, otherwise
+    the stored ``interval`` bars are read. ``adjusted`` back-adjusts them for
+    splits and dividends.
+    """
+    if base is None:
+        frame = get_cache().read(security_id, interval, start, end)
+        if adjusted:
+            frame = adjust(frame, interval, adjustment_factors(security_id))
+        return frame
+    if adjusted:
+        base = _check_resample(interval, base)
+        return _resample_range(security_id, interval, base, start, end, adjustment_factors(security_id))
+    return resample(security_id, interval, start, end, base=base)
+
+
+def bars_changed(changed, frame=None):
+    """
+    React to committed bar writes: ``changed`` holds (security_id, interval, year).
+
+    Drops cached base and derived partitions, clears dividend factors whose
+    previous close may have moved, writes ``frame`` through to the hot bar
+    cache and publishes its newest bars to websocket subscribers.
+    """
+    get_cache().invalidate(changed)
+    for security_id, interval, year in changed:
+        if interval == '1d':
+            CorporateAction.objects.filter(
+                security_id=security_id, action_type='dividend',
+                ex_date__year__in=[year, year + 1],
+            ).update(factor=None)
+    if frame is not None:
+        hot_bars.write_through(frame)
+        publish_bars(frame)
+
+
+def on_bars_committed(changed, frame=None):
+    db_transaction.on_commit(lambda: bars_changed(changed, frame))
@@ -0,0 +1,418 @@
+"""
+Concurrent vendor ingestion for OHLCV bars.
+
+An IngestionEngine fans a list of (symbol, dataset, interval) jobs out over one
+pooled httpx.AsyncClient per vendor. Requests are paced by a token bucket built
+from the vendor's ``rate_limit`` in vendors.json, and throttled or failed
+requests are retried with exponential backoff and jitter. Parsed bars are
+queued to a single writer that batches them into the vendor's VendorBar rows
+and consolidates the golden bars they touch (market_data.consolidation), so
+the database sees a few large statements instead of one per request. Each
+batch first goes through the vectorised rules of market_data.validation;
+rejected bars are quarantined instead of written.
+
+Runs are incremental by default (see market_data.marks): series that cannot
+have a new bar yet are not requested, recent tails are fetched in the vendor's
+compact form, and only bars past the high-water mark or in a revised overlap
+window are written.
+
+ingest() is the synchronous entry point used by the management command.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from zoneinfo import ZoneInfo
+
+import httpx
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .bars import BAR_COLUMNS
+from .consolidation import consolidate_frame, upsert_vendor_bars
+from .derived import INTRADAY_FREQUENCIES
+from .marks import DEFAULT_OVERLAP, bars_since_window, is_due, load_marks, save_marks, select_changes
+from .models import Security
+from .reference import symbol_table
+from .validation import quarantine, stored_closes, validate
+from .vendors import get_vendor
+
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 1.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_BATCH_SIZE = 20000
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class VendorError(Exception):
+    """The vendor rejected a request or returned an unusable payload"""
+
+
+class RetryableVendorError(VendorError):
+    """Throttling or a transient server error; the request may be retried"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class IngestJob:
+    symbol: str
+    dataset: str
+    interval: str = ''
+
+
+@dataclass
+class IngestionReport:
+    requests: int = 0
+    retries: int = 0
+    bars: int = 0
+    skipped: int = 0
+    unchanged: int = 0
+    quarantined: int = 0
+    # Seconds spent in each validation rule
+    rule_seconds: dict = field(default_factory=dict)
+    failures: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'skipped': self.skipped,
+            'unchanged': self.unchanged,
+            'retries': self.retries,
+            'bars': self.bars,
+            'quarantined': self.quarantined,
+            'rule_seconds': self.rule_seconds,
+            'failed': len(self.failures),
+            'failures': self.failures,
+        }
+
+
+class TokenBucket:
+    """
+    Async token bucket: ``rate`` tokens per second, holding at most ``capacity``.
+
+    acquire() waits until a token is available; waiters are served in order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AlphaVantage:
+    """Request and response handling for Alpha Vantage TIME_SERIES_* datasets"""
+    INTERVALS = {
+        'TIME_SERIES_DAILY': '1d',
+        'TIME_SERIES_DAILY_ADJUSTED': '1d',
+        'TIME_SERIES_WEEKLY': '1wk',
+        'TIME_SERIES_WEEKLY_ADJUSTED': '1wk',
+        'TIME_SERIES_MONTHLY': '1mo',
+        'TIME_SERIES_MONTHLY_ADJUSTED': '1mo',
+    }
+    # outputsize=compact returns the latest 100 bars
+    COMPACT_BARS = 100
+
+    def bar_interval(self, job):
+        """Interval of the bars a job returns; intraday datasets take the job's own"""
+        if job.dataset in self.INTERVALS:
+            return self.INTERVALS[job.dataset]
+        if job.interval not in INTRADAY_FREQUENCIES:
+            raise ValueError(
+                f"{job.dataset} needs an intraday interval ({', '.join(INTRADAY_FREQUENCIES)}), "
+                f"got {job.interval!r}"
+            )
+        return job.interval
+
+    def output_size(self, bars_needed):
+        """``bars_needed`` is None for a full history"""
+        return 'compact' if bars_needed is not None and bars_needed <= self.COMPACT_BARS else 'full'
+
+    @staticmethod
+    def _series(payload):
+        for key, value in payload.items():
+            if 'Time Series' in key and isinstance(value, dict):
+                return value
+        return None
+
+    @staticmethod
+    def _time_zone(payload):
+        for key, value in payload.get('Meta Data', {}).items():
+            if 'Time Zone' in key:
+                return ZoneInfo(value)
+        return ZoneInfo('US/Eastern')
+
+    def parse(self, payload, job, security_id):
+        """
+        Bars from a TIME_SERIES_* response.
+
+        Intraday timestamps are in the exchange time zone given in the metadata
+        and are converted to UTC; daily and longer bars are keyed at midnight UTC
+        of their date.
+        """
+        if 'Error Message' in payload:
+            raise VendorError(payload['Error Message'])
+        series = self._series(payload)
+        if series is None:
+            # Throttled responses come back as 200 with only a Note/Information message
+            message = payload.get('Note') or payload.get('Information') or 'response has no time series'
+            raise RetryableVendorError(message)
+
+        interval = self.bar_interval(job)
+        frame = pd.DataFrame.from_dict(series, orient='index')
+        if frame.empty:
+            return frame.reindex(columns=BAR_COLUMNS)
+        # '1. open', '2. high', ... '5. adjusted close', '6. volume'
+        frame.columns = [column.split('. ', 1)[-1] for column in frame.columns]
+        stamps = pd.to_datetime(frame.index)
+        if interval in self.INTERVALS.values():
+            ts = stamps.tz_localize('UTC')
+        else:
+            ts = stamps.tz_localize(
+                self._time_zone(payload), ambiguous='NaT', nonexistent='NaT'
+            ).tz_convert('UTC')
+
+        bars = pd.DataFrame({
+            'security_id': security_id,
+            'interval': interval,
+            'ts': ts,
+            'open': pd.to_numeric(frame['open']).to_numpy(),
+            'high': pd.to_numeric(frame['high']).to_numpy(),
+            'low': pd.to_numeric(frame['low']).to_numpy(),
+            'close': pd.to_numeric(frame['close']).to_numpy(),
+            'volume': pd.to_numeric(frame['volume']).astype('int64').to_numpy(),
+        })
+        return bars[bars['ts'].notna()]
+
+
+ADAPTERS = {
+    'alpha_vantage': AlphaVantage(),
+}
+
+
+def resolve_securities(symbols):
+    """Security id per symbol, creating missing securities; known symbols come from the symbol table."""
+    symbols = sorted(set(symbols))
+    security_ids = symbol_table.lookup(symbols)
+    missing = [symbol for symbol in symbols if symbol not in security_ids]
+    if missing:
+        Security.objects.bulk_create([Security(symbol=symbol) for symbol in missing], ignore_conflicts=True)
+        created = dict(
+            Security.objects.filter(symbol__in=missing, exchange='').values_list('symbol', 'security_id')
+        )
+        symbol_table.intern(created)
+        security_ids.update(created)
+    return security_ids
+
+
+class IngestionEngine:
+    def __init__(self, vendor, concurrency=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 timeout=DEFAULT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE, transport=None,
+                 incremental=True, overlap=DEFAULT_OVERLAP, rules=None):
+        if vendor.key not in ADAPTERS:
+            raise LookupError(f"No adapter for vendor {vendor.key!r}")
+        self.vendor = vendor
+        self.adapter = ADAPTERS[vendor.key]
+        self.incremental = incremental
+        self.overlap = overlap
+        self.rules = rules
+        self.concurrency = concurrency or vendor.max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.transport = transport
+
+    def _redact(self, message):
+        if self.vendor.api_key:
+            message = message.replace(self.vendor.api_key, '***')
+        return message
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        return self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+    async def _fetch_once(self, client, job, code, security_id, outputsize):
+        response = await client.get(self.vendor.url(job.dataset, code, job.interval, outputsize))
+        if response.status_code in RETRY_STATUS_CODES:
+            retry_after = response.headers.get('Retry-After')
+            raise RetryableVendorError(
+                f"HTTP {response.status_code}",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        if response.is_error:
+            raise VendorError(f"HTTP {response.status_code}")
+        return self.adapter.parse(response.json(), job, security_id)
+
+    async def _fetch(self, client, bucket, semaphore, job, code, security_id, mark, queue, report):
+        outputsize = self.adapter.output_size(
+            None if mark is None else bars_since_window(mark, mark.interval, timezone.now())
+        )
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                await bucket.acquire()
+                report.requests += 1
+                try:
+                    frame = await self._fetch_once(client, job, code, security_id, outputsize)
+                except (httpx.TransportError, RetryableVendorError) as exc:
+                    if attempt == self.retries:
+                        error = exc
+                        break
+                    report.retries += 1
+                    await asyncio.sleep(self._delay(attempt, getattr(exc, 'retry_after', None)))
+                except (httpx.HTTPError, VendorError, ValueError, KeyError) as exc:
+                    error = exc
+                    break
+                else:
+                    changed, new_mark = select_changes(frame, mark, self.vendor.key, self.overlap)
+                    if changed.empty and new_mark is None:
+                        report.unchanged += 1
+                    else:
+                        # The whole response goes to validation as context; only changed rows are written
+                        await queue.put((frame.assign(write=frame.index.isin(changed.index)), new_mark))
+                    return
+        report.failures.append({
+            'symbol': job.symbol,
+            'dataset': job.dataset,
+            'interval': job.interval,
+            'error': self._redact(f"{type(error).__name__}: {error}"),
+        })
+
+    async def _write(self, queue, report):
+        write = sync_to_async(store)
+        frames, marks, size = [], [], 0
+        while True:
+            item = await queue.get()
+            if item is not None:
+                frame, mark = item
+                if frame['write'].any():
+                    frames.append(frame)
+                    size += len(frame)
+                if mark is not None:
+                    marks.append(mark)
+            if (frames or marks) and (item is None or size >= self.batch_size):
+                batch, batch_marks = frames, marks
+                frames, marks, size = [], [], 0
+                try:
+                    written, quarantined, seconds = await write(batch, batch_marks, self.vendor.key, self.rules)
+                except Exception as exc:
+                    # Keep draining the queue so fetchers never block on a dead writer
+                    report.failures.append({
+                        'security_ids': sorted({int(f['security_id'].iloc[0]) for f in batch}
+                                               | {m.security_id for m in batch_marks}),
+                        'error': f"{type(exc).__name__}: {exc}",
+                    })
+                else:
+                    report.bars += written
+                    report.quarantined += quarantined
+                    for rule, spent in seconds.items():
+                        report.rule_seconds[rule] = report.rule_seconds.get(rule, 0.0) + spent
+            if item is None:
+                return
+
+    def plan(self, jobs, security_ids, marks, now):
+        """(job, security_id, mark) for every job that needs a request"""
+        for job in jobs:
+            security_id = security_ids[job.symbol]
+            interval = self.adapter.bar_interval(job)
+            mark = marks.get((security_id, interval)) if self.incremental else None
+            if mark is None or is_due(mark, interval, now):
+                yield job, security_id, mark
+
+    async def run(self, jobs, security_ids, marks=None, codes=None):
+        """
+        Fetch ``jobs``; ``codes`` maps security ids to the vendor's own symbol
+        where it differs from the job's.
+        """
+        codes = codes or {}
+        report = IngestionReport()
+        planned = list(self.plan(jobs, security_ids, marks or {}, timezone.now()))
+        report.skipped = len(jobs) - len(planned)
+        if not planned:
+            return report
+
+        bucket = TokenBucket(self.vendor.rate, self.vendor.requests)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout, transport=self.transport) as client:
+            writer = asyncio.create_task(self._write(queue, report))
+            try:
+                await asyncio.gather(*(
+                    self._fetch(
+                        client, bucket, semaphore, job, codes.get(security_id, job.symbol), security_id, mark,
+                        queue, report,
+                    )
+                    for job, security_id, mark in planned
+                ))
+            finally:
+                await queue.put(None)
+                await writer
+        return report
+
+
+def store(frames, marks, vendor, rules=None):
+    """
+    Validate a batch of fetched bars, write the passing rows flagged ``write``
+    as the vendor's bars and consolidate them into the golden series,
+    quarantine the failing ones and advance the marks, in one transaction.
+
+    Returns (vendor bars written, bars quarantined, seconds per validation rule).
+    """
+    written = quarantined = 0
+    seconds = {}
+    with db_transaction.atomic():
+        if frames:
+            batch = pd.concat(frames, ignore_index=True)
+            wanted = batch['write'].to_numpy()
+            reference = np.full(len(batch), np.nan)
+            reference[wanted] = stored_closes(batch[wanted], vendor)
+            result = validate(batch, reference, rules)
+            valid = result.valid[result.valid['write']]
+            written = upsert_vendor_bars(valid, vendor)
+            if written:
+                consolidate_frame(valid)
+            quarantined = quarantine(result.rejected[result.rejected['write']], vendor)
+            seconds = result.seconds
+        save_marks(marks)
+    return written, quarantined, seconds
+
+
+def ingest(jobs, vendor='alpha_vantage', **options):
+    """
+    Fetch and store bars for ``jobs``; returns an IngestionReport.
+
+    Raises ValueError if a job for an intraday dataset has no valid interval.
+    """
+    jobs = list(jobs)
+    engine = IngestionEngine(get_vendor(vendor) if isinstance(vendor, str) else vendor, **options)
+    # Reject jobs without a usable interval before anything is requested
+    for job in jobs:
+        engine.adapter.bar_interval(job)
+    security_ids = resolve_securities(job.symbol for job in jobs)
+    marks = load_marks(engine.vendor.key, security_ids.values()) if engine.incremental else {}
+    codes = symbol_table.values(security_ids.values(), 'vendor', engine.vendor.key)
+    return async_to_sync(engine.run)(jobs, security_ids, marks, codes)
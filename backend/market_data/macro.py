@@ -0,0 +1,204 @@
+"""
+Point-in-time store of macro-economic series (FRED/ALFRED).
+
+Every published vintage of an observation is kept as an EconomicObservation
+with the real-time period it was current for, so a series can be read as it
+was known on any date instead of in its latest revised form. load_series()
+pulls a series' full vintage history from the ``fred`` vendor of
+vendors.json and upserts it with one statement.
+
+as_of() answers "what was the latest value known at t" for many timestamps
+and series at once. The series' vintages are read with one query and joined
+to the timestamps with two pandas.merge_asof passes: the first finds the
+latest observation period released by t, the second the vintage of that
+period current at t. No query or Python loop per timestamp.
+
+FRED dates a vintage but not the time of day it was released, so a vintage
+is treated as known RELEASE_LAG after its realtime_start; with the default
+of a day, values published during a session are first used the day after,
+which keeps features free of look-ahead.
+"""
+from datetime import timedelta
+
+import httpx
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction as db_transaction
+
+from .ingestion import DEFAULT_TIMEOUT, VendorError
+from .models import EconomicObservation, EconomicSeries
+from .vendors import get_vendor
+
+RELEASE_LAG = timedelta(days=1)
+
+# FRED's markers for a missing value and a still-current vintage
+MISSING_VALUE = '.'
+OPEN_END = '9999-12-31'
+
+OBSERVATION_COLUMNS = ['date', 'value', 'realtime_start', 'realtime_end']
+
+_UPSERT_SQL = """
+INSERT INTO {table} AS o (series_id, date, value, realtime_start, realtime_end)
+SELECT %s, u.*
+  FROM unnest(%s::date[], %s::float8[], %s::date[], %s::date[]) AS u
+ON CONFLICT (series_id, date, realtime_start) DO UPDATE
+   SET value = EXCLUDED.value,
+       realtime_end = EXCLUDED.realtime_end
+ WHERE (o.value, o.realtime_end) IS DISTINCT FROM (EXCLUDED.value, EXCLUDED.realtime_end)
+"""
+
+_VINTAGES_SQL = """
+SELECT series_id, date, value, realtime_start, realtime_end
+  FROM {table}
+ WHERE series_id = ANY(%s) AND realtime_start <= %s
+"""
+
+
+def parse_observations(payload):
+    """Observation vintages of a fred/series/observations response as a DataFrame"""
+    if 'error_message' in payload:
+        raise VendorError(payload['error_message'])
+    frame = pd.DataFrame(payload.get('observations', []), columns=OBSERVATION_COLUMNS)
+    return pd.DataFrame({
+        'date': pd.to_datetime(frame['date']).dt.date,
+        'value': pd.to_numeric(frame['value'].replace(MISSING_VALUE, np.nan)),
+        'realtime_start': pd.to_datetime(frame['realtime_start']).dt.date,
+        'realtime_end': frame['realtime_end'].where(frame['realtime_end'] != OPEN_END).map(
+            lambda value: None if pd.isna(value) else pd.Timestamp(value).date()
+        ),
+    })
+
+
+def read_observations_csv(path):
+    """
+    Observation vintages from a CSV with OBSERVATION_COLUMNS (e.g. an ALFRED
+    export), parsed like an API response: ``9999-12-31`` and empty cells end
+    no vintage, ``.`` is a missing value.
+    """
+    frame = pd.read_csv(path, dtype=str)
+    return parse_observations({'observations': frame.to_dict('records')})
+
+
+def fetch_observations(code, vendor='fred', transport=None, timeout=DEFAULT_TIMEOUT):
+    """Every vintage of series ``code`` from the vendor"""
+    vendor = get_vendor(vendor)
+    with httpx.Client(timeout=timeout, transport=transport) as client:
+        response = client.get(vendor.url('observations', code))
+    try:
+        payload = response.json()
+    except ValueError:
+        response.raise_for_status()
+        raise VendorError(f"{vendor.key} returned a non-JSON response for {code}")
+    if response.is_error and 'error_message' not in payload:
+        response.raise_for_status()
+    return parse_observations(payload)
+
+
+def store_observations(series, frame):
+    """Upsert observation vintages of ``series``; returns the rows that changed"""
+    if frame.empty:
+        return 0
+    frame = frame[OBSERVATION_COLUMNS].drop_duplicates(['date', 'realtime_start'], keep='last')
+    values = frame.astype(object).where(frame.notna(), None)
+    with connection.cursor() as cursor:
+        cursor.execute(_UPSERT_SQL.format(table=EconomicObservation._meta.db_table), [
+            series.pk, *(values[column].tolist() for column in OBSERVATION_COLUMNS),
+        ])
+        return cursor.rowcount
+
+
+def load_series(code, vendor='fred', frame=None, transport=None, **fields):
+    """
+    Create or update series ``code`` and store its vintages, fetched from the
+    vendor unless given as ``frame``. Returns (series, rows changed).
+    """
+    if frame is None:
+        frame = fetch_observations(code, vendor, transport)
+    with db_transaction.atomic():
+        series, _ = EconomicSeries.objects.update_or_create(vendor=vendor, code=code, defaults=fields)
+        return series, store_observations(series, frame)
+
+
+def _ns(values):
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+
+def vintages(series_ids, until=None):
+    """Vintages of ``series_ids`` published by ``until`` (default: all)"""
+    until = until or pd.Timestamp.max.date()
+    with connection.cursor() as cursor:
+        cursor.execute(_VINTAGES_SQL.format(table=EconomicObservation._meta.db_table), [list(series_ids), until])
+        rows = cursor.fetchall()
+    return pd.DataFrame(rows, columns=['series_id', *OBSERVATION_COLUMNS])
+
+
+def _known(rows, lag):
+    """
+    Vintages with the UTC nanoseconds they are known from and until; periods
+    become days since the epoch, which survive merge_asof's float upcast
+    """
+    lag = pd.Timedelta(lag).value
+    day = pd.Timedelta(days=1).value
+    current = rows['realtime_end'].isna()
+    ends = _ns(rows['realtime_end'].where(~current, rows['realtime_start']))
+    return rows.assign(
+        date=_ns(rows['date']) // day,
+        known_from=_ns(rows['realtime_start']) + lag,
+        known_until=np.where(current, np.iinfo(np.int64).max, ends + day + lag),
+    )
+
+
+def as_of(series, timestamps, lag=RELEASE_LAG, vendor='fred'):
+    """
+    Value of each series known at each timestamp: the latest observation
+    released by then, as revised by then. NaN before a series' first release.
+
+    ``series`` is a list of series codes of ``vendor`` or EconomicSeries
+    objects. Returns a DataFrame indexed by ``timestamps`` in their given
+    order, one column per series code.
+    """
+    objects = [item for item in series if isinstance(item, EconomicSeries)]
+    codes = [item for item in series if not isinstance(item, EconomicSeries)]
+    found = {obj.code: obj for obj in EconomicSeries.objects.filter(vendor=vendor, code__in=codes)}
+    missing = set(codes) - set(found)
+    if missing:
+        raise LookupError(f"No {vendor} series {', '.join(sorted(missing))}")
+    series = objects + [found[code] for code in codes]
+
+    index = pd.DatetimeIndex(timestamps)
+    index = index.tz_localize('UTC') if index.tz is None else index.tz_convert('UTC')
+    result = pd.DataFrame(np.nan, index=index, columns=[obj.code for obj in series])
+    if not len(index) or not series:
+        return result
+    ts = np.unique(index.asi8)
+    until = (pd.Timestamp(ts[-1], tz='UTC') - pd.Timedelta(lag)).date()
+    rows = vintages([obj.pk for obj in series], until)
+    if rows.empty:
+        return result
+    rows = _known(rows, lag)
+
+    # Latest period released by each time: running max of the period over first releases
+    releases = rows.groupby(['series_id', 'date'], as_index=False)['known_from'].min()
+    releases = releases.sort_values(['series_id', 'known_from'])
+    releases['latest'] = releases.groupby('series_id')['date'].cummax()
+    queries = pd.DataFrame({
+        'series_id': np.repeat([obj.pk for obj in series], len(ts)),
+        'ts': np.tile(ts, len(series)),
+    }).sort_values('ts', kind='stable')
+    queries = pd.merge_asof(
+        queries, releases[['series_id', 'known_from', 'latest']].sort_values('known_from'),
+        left_on='ts', right_on='known_from', by='series_id',
+    ).dropna(subset=['latest'])
+    queries['date'] = queries['latest'].astype(np.int64)
+
+    # Vintage of that period current at each time
+    queries = pd.merge_asof(
+        queries[['series_id', 'ts', 'date']], rows.sort_values('known_from'),
+        left_on='ts', right_on='known_from', by=['series_id', 'date'],
+    )
+    values = queries['value'].where(queries['ts'] < queries['known_until'])
+
+    known = pd.DataFrame({'series_id': queries['series_id'], 'ts': queries['ts'], 'value': values})
+    wide = known.pivot(index='ts', columns='series_id', values='value')
+    wide = wide.reindex(index=index.asi8, columns=[obj.pk for obj in series])
+    return pd.DataFrame(wide.to_numpy(), index=index, columns=[obj.code for obj in series])
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from market_data.cache import get_cache
+from market_data.models import Bar, Security
+
+
+class Command(BaseCommand):
+    help = "Warm or clear the local Parquet cache of historical bars"
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help="Symbols to warm (default: all active securities)")
+        parser.add_argument('--interval', default='1d', choices=[choice for choice, _ in Bar.INTERVALS])
+        parser.add_argument('--start-year', type=int, help="First year to warm")
+        parser.add_argument('--end-year', type=int, help="Last year to warm")
+        parser.add_argument('--clear', action='store_true', help="Remove cached partitions instead of warming")
+
+    def handle(self, *args, **options):
+        cache = get_cache()
+        securities = Security.objects.filter(is_active=True)
+        if options['symbols']:
+            securities = Security.objects.filter(symbol__in=options['symbols'])
+
+        if options['clear']:
+            if options['symbols']:
+                removed = sum(
+                    cache.clear(options['interval'], security_id)
+                    for security_id in securities.values_list('security_id', flat=True)
+                )
+            else:
+                removed = cache.clear()
+            self.stdout.write(self.style.SUCCESS(f"Removed {removed} cached partitions"))
+            return
+
+        if not (options['start_year'] and options['end_year']):
+            raise CommandError("--start-year and --end-year are required to warm the cache")
+        partitions = 0
+        for security_id in securities.values_list('security_id', flat=True):
+            for year in range(options['start_year'], options['end_year'] + 1):
+                cache.load_partition(security_id, options['interval'], year)
+                partitions += 1
+        self.stdout.write(self.style.SUCCESS(f"Warmed {partitions} partitions in {cache.root}"))
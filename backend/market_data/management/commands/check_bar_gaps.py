@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from market_data.derived import INTRADAY_FREQUENCIES
+from market_data.models import Security
+from market_data.quality import DEFAULT_BATCH_SIZE, find_missing_bars
+
+
+def _timestamp(value):
+    parsed = parse_datetime(value) or parse_datetime(f'{value}T00:00:00Z')
+    if parsed is None:
+        raise ValueError(f"Invalid timestamp {value!r}")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Find bars missing from stored series according to each security's trading calendar"
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help="Symbols to check (default: all active securities)")
+        parser.add_argument('--interval', default='1d', choices=[*INTRADAY_FREQUENCIES, '1d'])
+        parser.add_argument('--start', type=_timestamp, help="Window start, ISO date or timestamp (default: 30 days ago)")
+        parser.add_argument('--end', type=_timestamp, help="Window end, exclusive (default: now)")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Securities per query")
+        parser.add_argument('--gaps', help="Write the missing runs as CSV to this file")
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.now()
+        start = options['start'] or end - timedelta(days=30)
+        if start >= end:
+            raise CommandError("--start must be before --end")
+        security_ids = None
+        if options['symbols']:
+            security_ids = list(Security.objects.filter(symbol__in=options['symbols']).values_list('pk', flat=True))
+        try:
+            report = find_missing_bars(options['interval'], start, end, security_ids, options['batch_size'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['gaps']:
+            report.gaps.to_csv(options['gaps'], index=False)
+        incomplete = report.summary[report.summary['missing'] > 0]
+        for row in incomplete.sort_values('missing', ascending=False).head(20).itertuples():
+            self.stdout.write(f"security {row.security_id}: {row.missing} of {row.expected} bars missing")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(report.summary)} securities checked, {len(incomplete)} with gaps, "
+            f"{int(report.summary['missing'].sum())} bars missing in {len(report.gaps)} runs, "
+            f"{int(report.summary['unexpected'].sum())} bars outside sessions"
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from market_data.consolidation import DEFAULT_BATCH_SIZE, consolidate_universe
+from market_data.models import Security
+
+
+def _timestamp(value):
+    parsed = parse_datetime(value) or parse_datetime(f'{value}T00:00:00Z')
+    if parsed is None:
+        raise ValueError(f"Invalid timestamp {value!r}")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Rebuild golden bars from every vendor's bars using the configured vendor priority"
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help="Symbols to consolidate (default: all active securities)")
+        parser.add_argument('--interval', default='1d')
+        parser.add_argument('--start', type=_timestamp, help="Window start, ISO date or timestamp (default: unbounded)")
+        parser.add_argument('--end', type=_timestamp, help="Window end, exclusive (default: unbounded)")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Securities per statement")
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['start'] >= options['end']:
+            raise CommandError("--start must be before --end")
+        security_ids = None
+        if options['symbols']:
+            security_ids = list(Security.objects.filter(symbol__in=options['symbols']).values_list('pk', flat=True))
+        try:
+            changed = consolidate_universe(
+                options['interval'], options['start'], options['end'], security_ids, options['batch_size'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"{changed} golden bars changed"))
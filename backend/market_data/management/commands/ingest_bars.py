@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market_data.derived import INTRADAY_FREQUENCIES
+from market_data.ingestion import DEFAULT_BATCH_SIZE, DEFAULT_RETRIES, IngestJob, ingest
+from market_data.marks import DEFAULT_OVERLAP
+from market_data.validation import RULES
+from market_data.vendors import get_vendor
+
+
+class Command(BaseCommand):
+    help = "Fetch OHLCV bars from a vendor in vendors.json and upsert them into market_data_bar"
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help="Symbols to fetch")
+        parser.add_argument('--symbols-file', help="File with one symbol per line")
+        parser.add_argument('--vendor', default='alpha_vantage')
+        parser.add_argument('--dataset', action='append', dest='datasets',
+                            help="Vendor dataset, e.g. TIME_SERIES_DAILY (repeatable)")
+        parser.add_argument('--interval', default='', choices=list(INTRADAY_FREQUENCIES),
+                            help="Bar interval, required for intraday datasets")
+        parser.add_argument('--concurrency', type=int, help="Concurrent requests (default: vendor max_connections)")
+        parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--overlap', type=int, default=DEFAULT_OVERLAP,
+                            help="Trailing bars re-checked against the high-water mark")
+        parser.add_argument('--full', action='store_true',
+                            help="Ignore high-water marks and fetch full history")
+        parser.add_argument('--rule', action='append', dest='rules', choices=list(RULES),
+                            help="Validation rule to apply (repeatable; default: all)")
+        parser.add_argument('--failures', help="Write failed requests as JSON to this file")
+
+    def handle(self, *args, **options):
+        symbols = list(options['symbols'])
+        if options['symbols_file']:
+            symbols += [line.strip() for line in Path(options['symbols_file']).read_text().splitlines() if line.strip()]
+        if not symbols:
+            raise CommandError("No symbols given")
+        try:
+            vendor = get_vendor(options['vendor'])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        datasets = options['datasets'] or ['TIME_SERIES_DAILY']
+        jobs = [IngestJob(symbol, dataset, options['interval']) for symbol in symbols for dataset in datasets]
+        try:
+            report = ingest(
+                jobs, vendor, concurrency=options['concurrency'],
+                retries=options['retries'], batch_size=options['batch_size'],
+                incremental=not options['full'], overlap=options['overlap'], rules=options['rules'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['failures'] and report.failures:
+            Path(options['failures']).write_text(json.dumps(report.failures, indent=2))
+        for failure in report.failures[:20]:
+            self.stderr.write(str(failure))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(jobs)} jobs ({report.skipped} current, {report.unchanged} unchanged), "
+            f"{report.requests} requests ({report.retries} retries), "
+            f"{report.bars} bars written, {report.quarantined} quarantined, {len(report.failures)} failed"
+        ))
+        if report.rule_seconds:
+            self.stdout.write("Validation: " + ", ".join(
+                f"{rule} {seconds * 1000:.1f}ms" for rule, seconds in report.rule_seconds.items()
+            ))
@@ -0,0 +1,28 @@
+from datetime import date
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from market_data.reference import load_instruments
+
+
+class Command(BaseCommand):
+    help = "Bulk load a securities master CSV (symbol, exchange, isin, ... and one column per vendor code)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row")
+        parser.add_argument('--as-of', type=date.fromisoformat,
+                            help="Date identifier changes take effect, YYYY-MM-DD (default: today)")
+
+    def handle(self, *args, **options):
+        try:
+            frame = pd.read_csv(options['path'], dtype=str, keep_default_na=False)
+        except (OSError, pd.errors.ParserError) as exc:
+            raise CommandError(str(exc))
+        try:
+            result = load_instruments(frame, options['as_of'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['instruments']} instruments: {result['created']} created, {result['updated']} updated"
+        ))
@@ -0,0 +1,35 @@
+import httpx
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from market_data.ingestion import VendorError
+from market_data.macro import load_series, read_observations_csv
+
+
+class Command(BaseCommand):
+    help = "Load every vintage of macro-economic series (FRED codes such as GDP or CPIAUCSL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('codes', nargs='+', help="Series codes")
+        parser.add_argument('--vendor', default='fred')
+        parser.add_argument('--file', help=(
+            "Load a single series from a CSV with date, value, realtime_start and realtime_end columns "
+            "instead of the vendor"
+        ))
+
+    def handle(self, *args, **options):
+        frame = None
+        if options['file']:
+            if len(options['codes']) != 1:
+                raise CommandError("--file loads exactly one series")
+            try:
+                frame = read_observations_csv(options['file'])
+            except (OSError, ValueError, pd.errors.ParserError) as exc:
+                raise CommandError(str(exc))
+
+        for code in options['codes']:
+            try:
+                series, changed = load_series(code, options['vendor'], frame)
+            except (LookupError, VendorError, httpx.HTTPError) as exc:
+                raise CommandError(f"{code}: {exc}")
+            self.stdout.write(self.style.SUCCESS(f"{series}: {changed} vintages written"))
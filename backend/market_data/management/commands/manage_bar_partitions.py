@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from market_data.partitions import (
+    add_months, drop_partitions_before, ensure_partitions, existing_partitions, month_start
+)
+
+
+def _parse_month(value):
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise CommandError(f"Expected YYYY-MM, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly market_data_bar partitions and optionally drop old ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First month to create (YYYY-MM, default: current month)")
+        parser.add_argument('--ahead', type=int, default=3, help="Months to create beyond the current month")
+        parser.add_argument('--drop-before', help="Detach and drop partitions before this month (YYYY-MM)")
+        parser.add_argument('--list', action='store_true', help="List attached partitions and exit")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name in existing_partitions():
+                self.stdout.write(name)
+            return
+
+        current = month_start(timezone.now())
+        start = _parse_month(options['start']) if options['start'] else current
+        created = ensure_partitions(start, add_months(current, options['ahead']))
+        for month in created:
+            self.stdout.write(f"created partition for {month:%Y-%m}")
+
+        if options['drop_before']:
+            for name in drop_partitions_before(_parse_month(options['drop_before'])):
+                self.stdout.write(f"dropped {name}")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created"))
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from market_data.streaming import QuoteBroker, fake_ticks
+from market_data.websocket import QuoteStreamApp
+
+
+class FakeClient:
+    """In-memory websocket client driving the ASGI app; reads slowly when ``delay`` is set"""
+
+    def __init__(self, symbols, delay=0.0):
+        self.symbols = symbols
+        self.delay = delay
+        self.inbox = asyncio.Queue()
+        self.received = 0
+        self.subscribed = asyncio.Event()
+        self.closed = asyncio.Event()
+
+    async def receive(self):
+        if not hasattr(self, '_connected'):
+            self._connected = True
+            return {'type': 'websocket.connect'}
+        if not hasattr(self, '_subscribed'):
+            self._subscribed = True
+            return {'type': 'websocket.receive', 'text': json.dumps({'action': 'subscribe', 'symbols': self.symbols})}
+        await self.closed.wait()
+        return {'type': 'websocket.disconnect', 'code': 1000}
+
+    async def send(self, event):
+        if event['type'] != 'websocket.send':
+            return
+        payload = json.loads(event['text'])
+        if isinstance(payload, dict):
+            self.subscribed.set()
+        else:
+            self.received += len(payload)
+            if self.delay:
+                await asyncio.sleep(self.delay)
+
+
+class Command(BaseCommand):
+    help = "Load-test quote streaming with fake ticks, in-process or against a served endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=int, default=500, help="Number of fake symbols")
+        parser.add_argument('--rate', type=int, default=5000, help="Ticks published per second")
+        parser.add_argument('--duration', type=float, default=5.0, help="Seconds to publish for")
+        parser.add_argument('--clients', type=int, default=50, help="In-process clients")
+        parser.add_argument('--per-client', type=int, default=20, help="Symbols subscribed by each client")
+        parser.add_argument('--slow', type=float, default=0.0, help="Per-batch delay of every other client (s)")
+        parser.add_argument('--serve', action='store_true',
+                            help="Serve the ASGI app with uvicorn and publish fake ticks instead")
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000)
+
+    def handle(self, *args, **options):
+        symbols = [f'SYM{i:04d}' for i in range(options['symbols'])]
+        if options['serve']:
+            asyncio.run(self._serve(symbols, options))
+        else:
+            asyncio.run(self._in_process(symbols, options))
+
+    async def _serve(self, symbols, options):
+        import uvicorn
+
+        from config.asgi import application
+        from market_data.streaming import broker
+
+        server = uvicorn.Server(uvicorn.Config(application, host=options['host'], port=options['port'], ws='wsproto'))
+        broker.bind(asyncio.get_running_loop())
+        ticks = asyncio.create_task(fake_ticks(symbols, options['rate']))
+        self.stdout.write(f"Publishing {options['rate']} ticks/s for {len(symbols)} symbols (SYM0000..)")
+        try:
+            await server.serve()
+        finally:
+            ticks.cancel()
+
+    async def _in_process(self, symbols, options):
+        broker = QuoteBroker()
+        app = QuoteStreamApp(broker=broker, authenticate=lambda scope: 0, listener=None)
+        per_client = min(options['per_client'], len(symbols))
+        clients = [
+            FakeClient(
+                [symbols[(i * per_client + j) % len(symbols)] for j in range(per_client)],
+                delay=options['slow'] if i % 2 else 0.0,
+            )
+            for i in range(options['clients'])
+        ]
+        tasks = [asyncio.create_task(app({'type': 'websocket'}, client.receive, client.send)) for client in clients]
+        await asyncio.gather(*(client.subscribed.wait() for client in clients))
+
+        started = time.perf_counter()
+        published = await fake_ticks(symbols, options['rate'], options['duration'], target=broker)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.2)
+        subscribers = set().union(*broker.subscribers.values())
+        for client in clients:
+            client.closed.set()
+        await asyncio.gather(*tasks)
+
+        received = sum(client.received for client in clients)
+        coalesced = sum(subscriber.coalesced for subscriber in subscribers)
+        self.stdout.write(
+            f"Published {published} ticks in {elapsed:.2f}s ({published / elapsed:,.0f}/s) to "
+            f"{len(clients)} clients: {received} delivered ({received / elapsed:,.0f}/s), {coalesced} coalesced"
+        )
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Bar is unmanaged: PostgreSQL range partitioning on ts and the composite
+# primary key cannot be expressed through the Django 5.1 model layer. Monthly
+# partitions are created by the manage_bar_partitions command; anything outside
+# them lands in the default partition.
+CREATE_BAR_TABLE = """
+CREATE TABLE market_data_bar (
+    security_id bigint NOT NULL
+        REFERENCES market_data_security (security_id) DEFERRABLE INITIALLY DEFERRED,
+    "interval" varchar(8) NOT NULL,
+    ts timestamp with time zone NOT NULL,
+    open double precision NOT NULL,
+    high double precision NOT NULL,
+    low double precision NOT NULL,
+    close double precision NOT NULL,
+    volume bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (security_id, "interval", ts)
+) PARTITION BY RANGE (ts);
+
+CREATE TABLE market_data_bar_default PARTITION OF market_data_bar DEFAULT;
+
+CREATE INDEX market_data_bar_ts_brin ON market_data_bar USING brin (ts) WITH (pages_per_range = 32);
+"""
+
+DROP_BAR_TABLE = "DROP TABLE IF EXISTS market_data_bar CASCADE;"
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Security',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('security_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('symbol', models.CharField(max_length=32)),
+                ('exchange', models.CharField(blank=True, default='', max_length=32)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('asset_class', models.CharField(choices=[('equity', 'Equity'), ('etf', 'ETF'), ('fx', 'Foreign Exchange'), ('crypto', 'Crypto'), ('index', 'Index'), ('future', 'Future')], default='equity', max_length=20)),
+                ('currency', models.CharField(default='USD', max_length=3)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Securities',
+                'indexes': [models.Index(fields=['asset_class'], name='market_data_asset_c_2ad3b7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('symbol', 'exchange'), name='market_data_security_symbol_exchange_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Bar',
+            fields=[
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='bars', to='market_data.security')),
+                ('interval', models.CharField(choices=[('1min', '1 Minute'), ('5min', '5 Minutes'), ('15min', '15 Minutes'), ('30min', '30 Minutes'), ('60min', '60 Minutes'), ('1d', 'Daily'), ('1wk', 'Weekly'), ('1mo', 'Monthly')], max_length=8)),
+                ('ts', models.DateTimeField(primary_key=True, serialize=False)),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('volume', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'market_data_bar',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            sql=CREATE_BAR_TABLE,
+            reverse_sql=DROP_BAR_TABLE,
+        ),
+    ]
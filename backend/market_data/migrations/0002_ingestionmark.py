@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionMark',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('mark_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vendor', models.CharField(max_length=64)),
+                ('interval', models.CharField(choices=[('1min', '1 Minute'), ('5min', '5 Minutes'), ('15min', '15 Minutes'), ('30min', '30 Minutes'), ('60min', '60 Minutes'), ('1d', 'Daily'), ('1wk', 'Weekly'), ('1mo', 'Monthly')], max_length=8)),
+                ('last_ts', models.DateTimeField()),
+                ('window_start', models.DateTimeField()),
+                ('checksum', models.CharField(max_length=64)),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingestion_marks', to='market_data.security')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'security', 'interval'), name='market_data_mark_vendor_security_interval_uniq')],
+            },
+        ),
+    ]
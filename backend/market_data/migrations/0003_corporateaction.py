@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0002_ingestionmark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorporateAction',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('action_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('action_type', models.CharField(choices=[('split', 'Split'), ('dividend', 'Cash Dividend')], max_length=10)),
+                ('ex_date', models.DateField()),
+                ('ratio', models.DecimalField(blank=True, decimal_places=6, max_digits=12, null=True)),
+                ('amount', models.DecimalField(blank=True, decimal_places=6, max_digits=14, null=True)),
+                ('factor', models.FloatField(blank=True, null=True)),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='corporate_actions', to='market_data.security')),
+            ],
+            options={
+                'ordering': ['security', 'ex_date'],
+                'constraints': [models.UniqueConstraint(fields=('security', 'action_type', 'ex_date'), name='market_data_action_security_type_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:49
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0003_corporateaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecurityIdentifier',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('identifier_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('id_type', models.CharField(choices=[('ticker', 'Ticker'), ('isin', 'ISIN'), ('cusip', 'CUSIP'), ('figi', 'FIGI'), ('vendor', 'Vendor Code')], max_length=10)),
+                ('namespace', models.CharField(blank=True, default='', max_length=64)),
+                ('value', models.CharField(max_length=64)),
+                ('valid_during', django.contrib.postgres.fields.ranges.DateRangeField()),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identifiers', to='market_data.security')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['id_type', 'namespace', 'value'], name='md_identifier_value_idx'), django.contrib.postgres.indexes.GistIndex(fields=['valid_during'], name='md_identifier_range_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('valid_during__upper_inf', True)), fields=('id_type', 'namespace', 'value'), name='market_data_identifier_current_value_uniq'), models.UniqueConstraint(condition=models.Q(('valid_during__upper_inf', True)), fields=('security', 'id_type', 'namespace'), name='market_data_identifier_current_security_uniq')],
+            },
+        ),
+    ]
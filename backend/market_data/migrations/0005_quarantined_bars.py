@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0004_security_identifiers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedBar',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quarantine_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vendor', models.CharField(max_length=64)),
+                ('interval', models.CharField(choices=[('1min', '1 Minute'), ('5min', '5 Minutes'), ('15min', '15 Minutes'), ('30min', '30 Minutes'), ('60min', '60 Minutes'), ('1d', 'Daily'), ('1wk', 'Weekly'), ('1mo', 'Monthly')], max_length=8)),
+                ('ts', models.DateTimeField()),
+                ('open', models.FloatField(null=True)),
+                ('high', models.FloatField(null=True)),
+                ('low', models.FloatField(null=True)),
+                ('close', models.FloatField(null=True)),
+                ('volume', models.BigIntegerField(null=True)),
+                ('rules', models.JSONField(default=list)),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quarantined_bars', to='market_data.security')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='market_data_created_7e8c18_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'security', 'interval', 'ts'), name='market_data_quarantine_bar_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0005_quarantined_bars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorBar',
+            fields=[
+                ('vendor_bar_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vendor', models.CharField(max_length=64)),
+                ('interval', models.CharField(choices=[('1min', '1 Minute'), ('5min', '5 Minutes'), ('15min', '15 Minutes'), ('30min', '30 Minutes'), ('60min', '60 Minutes'), ('1d', 'Daily'), ('1wk', 'Weekly'), ('1mo', 'Monthly')], max_length=8)),
+                ('ts', models.DateTimeField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('volume', models.BigIntegerField(default=0)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendor_bars', to='market_data.security')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('security', 'interval', 'ts', 'vendor'), name='market_data_vendor_bar_uniq')],
+            },
+        ),
+    ]
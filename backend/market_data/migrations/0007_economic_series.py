@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0006_vendor_bars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EconomicSeries',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('series_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vendor', models.CharField(default='fred', max_length=64)),
+                ('code', models.CharField(max_length=64)),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('frequency', models.CharField(blank=True, default='', max_length=32)),
+                ('units', models.CharField(blank=True, default='', max_length=128)),
+            ],
+            options={
+                'verbose_name_plural': 'economic series',
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'code'), name='market_data_econ_series_vendor_code_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='EconomicObservation',
+            fields=[
+                ('observation_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('value', models.FloatField(null=True)),
+                ('realtime_start', models.DateField()),
+                ('realtime_end', models.DateField(null=True)),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='observations', to='market_data.economicseries')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['series', 'realtime_start'], name='md_econ_obs_realtime_idx')],
+                'constraints': [models.UniqueConstraint(fields=('series', 'date', 'realtime_start'), name='market_data_econ_obs_vintage_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 09:12
+
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0007_economic_series'),
+    ]
+
+    operations = [
+        # GiST operator classes for the equality columns of the exclusion constraint
+        BtreeGistExtension(),
+        migrations.RemoveIndex(
+            model_name='securityidentifier',
+            name='md_identifier_range_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='securityidentifier',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('id_type', '='), ('namespace', '='), ('value', '='), ('valid_during', '&&')], name='market_data_identifier_no_overlap'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# Golden bars written before consolidation existed all came from Alpha Vantage.
+# Without vendor rows behind them, the first lower-priority vendor to send an
+# overlapping bar would replace them, and incremental ingestion never re-sends
+# unchanged Alpha Vantage history to win them back.
+BACKFILL_VENDOR_BARS = """
+INSERT INTO market_data_vendorbar (vendor, security_id, "interval", ts, open, high, low, close, volume, received_at)
+SELECT 'alpha_vantage', b.security_id, b."interval", b.ts, b.open, b.high, b.low, b.close, b.volume, now()
+  FROM market_data_bar b
+    ON CONFLICT (security_id, "interval", ts, vendor) DO NOTHING
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0008_identifier_no_overlap'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=BACKFILL_VENDOR_BARS,
+            # The backfilled rows cannot be told apart from later Alpha Vantage ingestion
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,3 +1,360 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+# Base model for common fields
+class BaseModel(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+# Security Model
+class Security(BaseModel):
+    ASSET_CLASSES = [
+        ('equity', 'Equity'),
+        ('etf', 'ETF'),
+        ('fx', 'Foreign Exchange'),
+        ('crypto', 'Crypto'),
+        ('index', 'Index'),
+        ('future', 'Future'),
+        # Add more asset classes as needed
+    ]
+
+    security_id = models.BigAutoField(primary_key=True)
+    symbol = models.CharField(max_length=32)
+    exchange = models.CharField(max_length=32, blank=True, default='')
+    name = models.CharField(max_length=255, blank=True, default='')
+    asset_class = models.CharField(max_length=20, choices=ASSET_CLASSES, default='equity')
+    currency = models.CharField(max_length=3, default='USD')
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'exchange'], name='market_data_security_symbol_exchange_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['asset_class']),
+        ]
+        verbose_name_plural = 'Securities'
+
+    def __str__(self):
+        return f"{self.symbol} ({self.exchange})" if self.exchange else self.symbol
+
+
+# Bar Model - OHLCV price bars
+class Bar(models.Model):
+    """
+    OHLCV bar, stored in ``market_data_bar``.
+
+    The table is created by migration 0001 as a PostgreSQL table range-partitioned
+    on ``ts`` into monthly partitions (see market_data.partitions), with primary
+    key (security_id, interval, ts) and a BRIN index on ``ts``. Django 5.1 has no
+    composite primary keys, so the model is unmanaged and declares ``ts`` as its
+    primary key for the ORM only: filter and read bars through querysets, and
+    write them with set-based SQL rather than ``save()``/``delete()``.
+    Range filters on ``ts`` let the planner prune to the relevant partitions.
+    """
+    INTERVALS = [
+        ('1min', '1 Minute'),
+        ('5min', '5 Minutes'),
+        ('15min', '15 Minutes'),
+        ('30min', '30 Minutes'),
+        ('60min', '60 Minutes'),
+        ('1d', 'Daily'),
+        ('1wk', 'Weekly'),
+        ('1mo', 'Monthly'),
+    ]
+
+    security = models.ForeignKey(
+        Security,
+        on_delete=models.DO_NOTHING,
+        related_name='bars'
+    )
+    interval = models.CharField(max_length=8, choices=INTERVALS)
+    ts = models.DateTimeField(primary_key=True)
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.BigIntegerField(default=0)
+
+    class Meta:
+        managed = False
+        db_table = 'market_data_bar'
+
+    def __str__(self):
+        return f"{self.security_id} {self.interval} {self.ts:%Y-%m-%d %H:%M} C={self.close}"
+
+
+# VendorBar Model - one vendor's copy of a bar, consolidated into Bar
+class VendorBar(models.Model):
+    """
+    A bar as one vendor reported it. market_data_bar holds the consolidated
+    ("golden") series built from these rows by market_data.consolidation.
+    ``received_at`` is when the vendor's values last changed.
+    """
+    vendor_bar_id = models.BigAutoField(primary_key=True)
+    vendor = models.CharField(max_length=64)
+    security = models.ForeignKey(
+        Security,
+        on_delete=models.CASCADE,
+        related_name='vendor_bars'
+    )
+    interval = models.CharField(max_length=8, choices=Bar.INTERVALS)
+    ts = models.DateTimeField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.BigIntegerField(default=0)
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Key order serves range scans of a security's bars across vendors
+            models.UniqueConstraint(
+                fields=['security', 'interval', 'ts', 'vendor'], name='market_data_vendor_bar_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor} {self.security_id} {self.interval} {self.ts:%Y-%m-%d %H:%M} C={self.close}"
+
+
+# IngestionMark Model - per (vendor, security, interval) high-water mark
+class IngestionMark(BaseModel):
+    """
+    Last bar ingested from a vendor for one security and interval.
+
+    ``checksum`` covers the bars from ``window_start`` to ``last_ts`` (the
+    overlap window re-fetched on the next run), so an unchanged tail can be
+    recognised without touching market_data_bar.
+    """
+    mark_id = models.BigAutoField(primary_key=True)
+    vendor = models.CharField(max_length=64)
+    security = models.ForeignKey(
+        Security,
+        on_delete=models.CASCADE,
+        related_name='ingestion_marks'
+    )
+    interval = models.CharField(max_length=8, choices=Bar.INTERVALS)
+    last_ts = models.DateTimeField()
+    window_start = models.DateTimeField()
+    checksum = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vendor', 'security', 'interval'], name='market_data_mark_vendor_security_interval_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor} {self.security_id} {self.interval} @ {self.last_ts:%Y-%m-%d %H:%M}"
+
+
+# CorporateAction Model - splits and cash dividends used to adjust bar history
+class CorporateAction(BaseModel):
+    """
+    A split or cash dividend taking effect on ``ex_date``.
+
+    ``factor`` multiplies prices of bars before the ex-date: ``1 / ratio`` for a
+    split, ``1 - amount / previous close`` for a dividend. Dividend factors
+    depend on stored bars and are filled in by market_data.derived.
+    """
+    ACTION_TYPES = [
+        ('split', 'Split'),
+        ('dividend', 'Cash Dividend'),
+    ]
+
+    action_id = models.BigAutoField(primary_key=True)
+    security = models.ForeignKey(
+        Security,
+        on_delete=models.CASCADE,
+        related_name='corporate_actions'
+    )
+    action_type = models.CharField(max_length=10, choices=ACTION_TYPES)
+    ex_date = models.DateField()
+    ratio = models.DecimalField(max_digits=12, decimal_places=6, null=True, blank=True)  # New shares per old share
+    amount = models.DecimalField(max_digits=14, decimal_places=6, null=True, blank=True)  # Cash per share
+    factor = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['security', 'action_type', 'ex_date'], name='market_data_action_security_type_date_uniq'
+            ),
+        ]
+        ordering = ['security', 'ex_date']
+
+    def save(self, *args, **kwargs):
+        if self.action_type == 'split' and self.ratio:
+            self.factor = 1 / float(self.ratio)
+        elif self.action_type == 'dividend' and kwargs.get('update_fields') is None:
+            # Recomputed against the previous close on next use
+            self.factor = None
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        detail = f"{self.ratio}:1" if self.action_type == 'split' else f"{self.amount}"
+        return f"{self.security_id} {self.action_type} {detail} ex {self.ex_date}"
+
+
+# QuarantinedBar Model - vendor bars rejected by validation
+class QuarantinedBar(BaseModel):
+    """
+    A bar a vendor sent that failed validation (market_data.validation) and
+    was not written to market_data_bar. ``rules`` lists the rules it failed.
+    """
+    quarantine_id = models.BigAutoField(primary_key=True)
+    vendor = models.CharField(max_length=64)
+    security = models.ForeignKey(
+        Security,
+        on_delete=models.CASCADE,
+        related_name='quarantined_bars'
+    )
+    interval = models.CharField(max_length=8, choices=Bar.INTERVALS)
+    ts = models.DateTimeField()
+    open = models.FloatField(null=True)
+    high = models.FloatField(null=True)
+    low = models.FloatField(null=True)
+    close = models.FloatField(null=True)
+    volume = models.BigIntegerField(null=True)
+    rules = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vendor', 'security', 'interval', 'ts'], name='market_data_quarantine_bar_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor} {self.security_id} {self.interval} {self.ts:%Y-%m-%d %H:%M} {', '.join(self.rules)}"
+
+
+# SecurityIdentifier Model - versioned tickers, ISINs and vendor codes
+class SecurityIdentifier(BaseModel):
+    """
+    An identifier a security carried over the dates in ``valid_during``
+    (``[from, to)``; open-ended while current).
+
+    ``namespace`` scopes the value: the exchange for tickers, the vendors.json
+    key for vendor codes, empty for global identifiers. Partial unique
+    constraints keep the current values consistent: a value names one
+    security, and a security has one value per type and namespace. An
+    exclusion constraint keeps the ranges of one value from overlapping, so a
+    value names at most one security on any date; its GiST index on
+    (id_type, namespace, value, valid_during) serves the as-of lookups of
+    market_data.reference.
+    """
+    ID_TYPES = [
+        ('ticker', 'Ticker'),
+        ('isin', 'ISIN'),
+        ('cusip', 'CUSIP'),
+        ('figi', 'FIGI'),
+        ('vendor', 'Vendor Code'),
+    ]
+
+    identifier_id = models.BigAutoField(primary_key=True)
+    security = models.ForeignKey(
+        Security,
+        on_delete=models.CASCADE,
+        related_name='identifiers'
+    )
+    id_type = models.CharField(max_length=10, choices=ID_TYPES)
+    namespace = models.CharField(max_length=64, blank=True, default='')
+    value = models.CharField(max_length=64)
+    valid_during = DateRangeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_type', 'namespace', 'value'],
+                condition=models.Q(valid_during__upper_inf=True),
+                name='market_data_identifier_current_value_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['security', 'id_type', 'namespace'],
+                condition=models.Q(valid_during__upper_inf=True),
+                name='market_data_identifier_current_security_uniq',
+            ),
+            ExclusionConstraint(
+                name='market_data_identifier_no_overlap',
+                expressions=[
+                    ('id_type', RangeOperators.EQUAL),
+                    ('namespace', RangeOperators.EQUAL),
+                    ('value', RangeOperators.EQUAL),
+                    ('valid_during', RangeOperators.OVERLAPS),
+                ],
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['id_type', 'namespace', 'value'], name='md_identifier_value_idx'),
+        ]
+
+    def __str__(self):
+        scope = f"{self.namespace}:" if self.namespace else ''
+        return f"{self.id_type} {scope}{self.value} -> {self.security_id} {self.valid_during}"
+
+
+# EconomicSeries Model - a macro time series such as FRED's GDP or CPIAUCSL
+class EconomicSeries(BaseModel):
+    series_id = models.BigAutoField(primary_key=True)
+    vendor = models.CharField(max_length=64, default='fred')
+    code = models.CharField(max_length=64)
+    title = models.CharField(max_length=255, blank=True, default='')
+    frequency = models.CharField(max_length=32, blank=True, default='')
+    units = models.CharField(max_length=128, blank=True, default='')
+
+    class Meta:
+        verbose_name_plural = 'economic series'
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'code'], name='market_data_econ_series_vendor_code_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor}:{self.code}"
+
+
+# EconomicObservation Model - one vintage of one observation
+class EconomicObservation(models.Model):
+    """
+    The value of ``series`` for the period starting ``date`` as published
+    from ``realtime_start`` through ``realtime_end`` (inclusive, NULL while it
+    is the current vintage), following FRED/ALFRED real-time periods. A
+    revision closes the previous vintage and opens a new row.
+    """
+    observation_id = models.BigAutoField(primary_key=True)
+    series = models.ForeignKey(
+        EconomicSeries,
+        on_delete=models.CASCADE,
+        related_name='observations'
+    )
+    date = models.DateField()
+    # FRED publishes missing values as '.'
+    value = models.FloatField(null=True)
+    realtime_start = models.DateField()
+    realtime_end = models.DateField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['series', 'date', 'realtime_start'], name='market_data_econ_obs_vintage_uniq'
+            ),
+        ]
+        indexes = [
+            # Point-in-time reads select a series' vintages published before a date
+            models.Index(fields=['series', 'realtime_start'], name='md_econ_obs_realtime_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.series_id} {self.date} = {self.value} [{self.realtime_start}, {self.realtime_end}]"
@@ -0,0 +1,129 @@
+"""
+Monthly range partitions for the market_data_bar table.
+
+Each partition covers one calendar month of ``ts`` and is named
+``market_data_bar_yYYYYmMM``. Rows outside every partition land in
+``market_data_bar_default``; creating a partition moves any such rows out of
+the default partition first so the ATTACH does not fail.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction as db_transaction
+
+from .models import Bar
+
+PARENT_TABLE = Bar._meta.db_table
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+
+
+def month_start(value):
+    """First day of the month containing ``value``."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(start, end):
+    """Months from ``start`` to ``end`` inclusive."""
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def _bounds(month):
+    lower = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    nxt = add_months(month, 1)
+    upper = datetime(nxt.year, nxt.month, 1, tzinfo=dt_timezone.utc)
+    return lower, upper
+
+
+def _bound_clause(lower, upper):
+    # Partition bounds are DDL and cannot be bound parameters; both values are
+    # generated from dates above, never from user input
+    return f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+
+
+def existing_partitions():
+    """Names of the partitions currently attached to the bar table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname
+              FROM pg_inherits i
+              JOIN pg_class c ON c.oid = i.inhrelid
+              JOIN pg_class p ON p.oid = i.inhparent
+             WHERE p.relname = %s
+          ORDER BY c.relname
+            """,
+            [PARENT_TABLE],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(month, existing=None):
+    """
+    Create (or no-op) the partition for ``month``; returns True if created.
+
+    ``existing`` may pass an already fetched existing_partitions() result.
+    """
+    name = partition_name(month)
+    if name in (existing if existing is not None else existing_partitions()):
+        return False
+
+    lower, upper = _bounds(month)
+    qn = connection.ops.quote_name
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} WHERE ts >= %s AND ts < %s)",
+            [lower, upper],
+        )
+        has_strays = cursor.fetchone()[0]
+        if not has_strays:
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(PARENT_TABLE)} {_bound_clause(lower, upper)}"
+            )
+            return True
+
+        # Rows for this month were written before the partition existed: build
+        # the partition standalone, move them in, then attach
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} (LIKE {qn(PARENT_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} WHERE ts >= %s AND ts < %s RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved",
+            [lower, upper],
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(PARENT_TABLE)} ATTACH PARTITION {qn(name)} {_bound_clause(lower, upper)}"
+        )
+    return True
+
+
+def ensure_partitions(start, end):
+    """Create every missing monthly partition between ``start`` and ``end``."""
+    existing = set(existing_partitions())
+    return [month for month in month_range(start, end) if create_partition(month, existing)]
+
+
+def drop_partitions_before(cutoff):
+    """Detach and drop partitions entirely before the month of ``cutoff``."""
+    cutoff_name = partition_name(month_start(cutoff))
+    qn = connection.ops.quote_name
+    dropped = []
+    for name in existing_partitions():
+        if name == DEFAULT_PARTITION or name >= cutoff_name:
+            continue
+        with db_transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {qn(PARENT_TABLE)} DETACH PARTITION {qn(name)}")
+            cursor.execute(f"DROP TABLE {qn(name)}")
+        dropped.append(name)
+    return dropped
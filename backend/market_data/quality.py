@@ -0,0 +1,118 @@
+"""
+Data-quality checks over stored bars.
+
+find_missing_bars() checks a whole universe against its trading calendars in
+one pass per batch of securities: stored bar timestamps are mapped to their
+ordinals in the calendar's bar sequence (market_data.calendars), so within a
+security a gap is any jump between consecutive ordinals and the bars a
+security should hold are a difference of two ordinals. No per-row Python.
+
+A security is checked from its first stored bar in the window, so listings
+inside the window do not count as missing history; securities without any bar
+in the window are not reported.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+
+from .cache import to_utc
+from .calendars import calendar_for
+from .models import Bar, Security
+
+DEFAULT_BATCH_SIZE = 500
+
+_BARS_SQL = """
+SELECT security_id, (EXTRACT(EPOCH FROM ts) * 1000000)::bigint
+  FROM {table}
+ WHERE security_id = ANY(%s) AND "interval" = %s AND ts >= %s AND ts < %s
+ ORDER BY security_id, ts
+"""
+
+SUMMARY_COLUMNS = ['security_id', 'calendar', 'first_ts', 'bars', 'expected', 'missing', 'unexpected']
+GAP_COLUMNS = ['security_id', 'start', 'end', 'bars']
+
+
+@dataclass
+class MissingBarsReport:
+    # One row per security with bars in the window
+    summary: pd.DataFrame
+    # One row per run of missing bars; ``end`` is the last missing bar's start
+    gaps: pd.DataFrame
+
+
+def _stored_bars(security_ids, interval, start, end):
+    with connection.cursor() as cursor:
+        cursor.execute(_BARS_SQL.format(table=Bar._meta.db_table), [list(security_ids), interval, start, end])
+        rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    return rows[:, 0], rows[:, 1] * 1000
+
+
+def _check(calendar, security_ids, ts, interval, end):
+    """Summary and gap frames of the securities of one calendar"""
+    ordinals = calendar.bar_ordinals(ts, interval)
+    unexpected = ordinals < 0
+    unexpected_counts = pd.Series(unexpected).groupby(security_ids).sum()
+    security_ids, ordinals, ts = security_ids[~unexpected], ordinals[~unexpected], ts[~unexpected]
+    if not len(ordinals):
+        return None, None
+
+    # Runs of one security; the first bar past the window ends every run
+    firsts = np.flatnonzero(np.r_[True, security_ids[1:] != security_ids[:-1]])
+    lasts = np.r_[firsts[1:], len(ordinals)] - 1
+    limit = calendar.bars_before(end, interval)
+    following = np.r_[ordinals[1:], 0]
+    following[lasts] = limit
+    jumps = np.flatnonzero(following - ordinals > 1)
+
+    run_ids = security_ids[firsts]
+    expected = limit - ordinals[firsts]
+    summary = pd.DataFrame({
+        'security_id': run_ids,
+        'calendar': calendar.name,
+        'first_ts': pd.DatetimeIndex(ts[firsts].astype('datetime64[ns]')).tz_localize('UTC'),
+        'bars': lasts - firsts + 1,
+        'expected': expected,
+        'missing': expected - (lasts - firsts + 1),
+        'unexpected': unexpected_counts.reindex(run_ids, fill_value=0).to_numpy(),
+    })
+    gaps = pd.DataFrame({
+        'security_id': security_ids[jumps],
+        'start': calendar.bar_timestamps(ordinals[jumps] + 1, interval),
+        'end': calendar.bar_timestamps(following[jumps] - 1, interval),
+        'bars': following[jumps] - ordinals[jumps] - 1,
+    })
+    return summary, gaps
+
+
+def find_missing_bars(interval, start, end, security_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Bars of ``interval`` with ``start <= ts < end`` that the securities'
+    trading calendars expect but are not stored. ``security_ids`` defaults to
+    all active securities. Returns a MissingBarsReport.
+    """
+    start, end = to_utc(start), to_utc(end)
+    securities = Security.objects.order_by('security_id')
+    if security_ids is None:
+        securities = securities.filter(is_active=True)
+    else:
+        securities = securities.filter(security_id__in=list(security_ids))
+    by_calendar = {}
+    for security_id, exchange, asset_class in securities.values_list('security_id', 'exchange', 'asset_class'):
+        by_calendar.setdefault(calendar_for(exchange, asset_class), []).append(security_id)
+
+    summaries, gaps = [], []
+    for calendar, ids in by_calendar.items():
+        for offset in range(0, len(ids), batch_size):
+            batch_ids, ts = _stored_bars(ids[offset:offset + batch_size], interval, start, end)
+            summary, batch_gaps = _check(calendar, batch_ids, ts, interval, end)
+            if summary is not None:
+                summaries.append(summary)
+                gaps.append(batch_gaps)
+    if not summaries:
+        return MissingBarsReport(pd.DataFrame(columns=SUMMARY_COLUMNS), pd.DataFrame(columns=GAP_COLUMNS))
+    return MissingBarsReport(
+        pd.concat(summaries, ignore_index=True)[SUMMARY_COLUMNS],
+        pd.concat(gaps, ignore_index=True)[GAP_COLUMNS],
+    )
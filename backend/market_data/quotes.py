@@ -0,0 +1,184 @@
+"""
+In-process cache of latest quotes and recent bars for hot symbols.
+
+Reads of the last ``window`` bars of a (symbol, interval) go through a
+size-bounded TTL cache (cachetools) keyed on (symbol, interval, window); the
+latest quote is the window of one. Bars written by this process through
+market_data.bars.upsert_bars, which includes the ingestion engine, are merged
+into every cached window of their (security, interval) once committed, so hot
+symbols stay current without a round trip. Writes made by other processes
+show up when the entry's TTL runs out.
+
+Hits, misses, evictions (size) and expirations (TTL) are counted; stats()
+returns them and HotBarCacheCollector exports them to Prometheus.
+"""
+import threading
+from collections import namedtuple
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.db import connection
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .models import Bar, Security
+
+RecentBar = namedtuple('RecentBar', ['ts', 'open', 'high', 'low', 'close', 'volume'])
+
+_RECENT_SQL = """
+SELECT s.security_id, b.ts, b.open, b.high, b.low, b.close, b.volume
+  FROM {security_table} s
+  LEFT JOIN LATERAL (
+        SELECT ts, open, high, low, close, volume
+          FROM {bar_table}
+         WHERE security_id = s.security_id AND "interval" = %s
+      ORDER BY ts DESC
+         LIMIT %s
+       ) b ON TRUE
+ WHERE s.security_id = (
+        SELECT security_id FROM {security_table} WHERE symbol = %s ORDER BY exchange LIMIT 1
+       )
+"""
+
+
+# Cached window: ``bars`` is a tuple of RecentBar, oldest first
+_Entry = namedtuple('_Entry', ['security_id', 'bars'])
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache reporting removed keys to its owner"""
+
+    def __init__(self, maxsize, ttl, on_remove):
+        super().__init__(maxsize, ttl)
+        self.on_remove = on_remove
+        self.evictions = 0
+        self.expirations = 0
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.evictions += 1
+        self.on_remove(key, value)
+        return key, value
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        for key, value in expired:
+            self.on_remove(key, value)
+        return expired
+
+
+class HotBarCache:
+    def __init__(self, maxsize, ttl):
+        self._lock = threading.Lock()
+        self._cache = _CountingTTLCache(maxsize, ttl, self._unindex)
+        # (security_id, interval) -> cached keys, for write-through
+        self._index = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _unindex(self, key, entry):
+        keys = self._index.get((entry.security_id, key[1]))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._index[(entry.security_id, key[1])]
+
+    def _store(self, key, entry):
+        self._cache[key] = entry
+        self._index.setdefault((entry.security_id, key[1]), set()).add(key)
+
+    def _query(self, symbol, interval, window):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _RECENT_SQL.format(security_table=Security._meta.db_table, bar_table=Bar._meta.db_table),
+                [interval, window, symbol],
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return None
+        bars = tuple(RecentBar(*row[1:]) for row in reversed(rows) if row[1] is not None)
+        return _Entry(rows[0][0], bars)
+
+    def recent_bars(self, symbol, interval, window):
+        """The last ``window`` bars of ``symbol``, oldest first; None for an unknown symbol"""
+        key = (symbol, interval, window)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.bars
+            self.misses += 1
+        entry = self._query(symbol, interval, window)
+        if entry is None:
+            return None
+        with self._lock:
+            self._store(key, entry)
+        return entry.bars
+
+    def latest(self, symbol, interval):
+        """Most recent bar of ``symbol`` or None"""
+        bars = self.recent_bars(symbol, interval, 1)
+        return bars[-1] if bars else None
+
+    def write_through(self, frame):
+        """Merge freshly written bars (a BAR_COLUMNS frame) into cached windows"""
+        if frame.empty or not self._index:
+            return 0
+        updated = 0
+        for (security_id, interval), group in frame.groupby(['security_id', 'interval'], sort=False):
+            with self._lock:
+                keys = [key for key in self._index.get((int(security_id), interval), ()) if key in self._cache]
+                if not keys:
+                    continue
+                columns = [group[column].tolist() for column in RecentBar._fields]
+                fresh = {
+                    bar.ts: bar
+                    for bar in (RecentBar(ts.to_pydatetime(), *values) for ts, *values in zip(*columns))
+                }
+                for key in keys:
+                    entry = self._cache[key]
+                    merged = {bar.ts: bar for bar in entry.bars}
+                    merged.update(fresh)
+                    bars = tuple(merged[ts] for ts in sorted(merged)[-key[2]:])
+                    self._store(key, _Entry(entry.security_id, bars))
+                    updated += 1
+        return updated
+
+    def clear(self):
+        with self._lock:
+            # Cache.clear() pops items one by one; those are not evictions
+            evictions = self._cache.evictions
+            self._cache.clear()
+            self._cache.evictions = evictions
+            self._index.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self._cache.evictions,
+                'expirations': self._cache.expirations,
+                'size': self._cache.currsize,
+                'maxsize': self._cache.maxsize,
+                'ttl': self._cache.ttl,
+            }
+
+
+class HotBarCacheCollector:
+    """Prometheus collector for a HotBarCache's counters"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        for name in ('hits', 'misses', 'evictions', 'expirations'):
+            yield CounterMetricFamily(
+                f'market_data_hot_bar_cache_{name}', f"Hot bar cache {name}", value=stats[name]
+            )
+        yield GaugeMetricFamily('market_data_hot_bar_cache_size', "Cached windows", value=stats['size'])
+        yield GaugeMetricFamily('market_data_hot_bar_cache_maxsize', "Cache capacity", value=stats['maxsize'])
+
+
+hot_bars = HotBarCache(settings.HOT_BAR_CACHE_SIZE, settings.HOT_BAR_CACHE_TTL)
@@ -0,0 +1,352 @@
+"""
+Securities master: bulk instrument loads, identifier interning and as-of lookups.
+
+load_instruments() COPYs an instrument list into a temporary staging table and
+merges it with a handful of set-based statements. Rows are matched to
+existing securities on their current ISIN, FIGI or CUSIP before falling back
+to (symbol, exchange), so a renamed ticker updates its security instead of
+creating a new one. Every identifier (ticker, ISIN, CUSIP, FIGI and one code
+per vendors.json entry) is versioned in SecurityIdentifier: a changed value
+closes the current range at the load date and opens a new one.
+
+SymbolTable interns current identifiers in memory, one (type, namespace)
+partition per query, so ingestion resolves thousands of symbols without a
+query per symbol. Historical lookups (security_as_of, securities_as_of) go to
+the database, where the GiST index behind the identifier table's
+non-overlap exclusion constraint serves (value, ``valid_during @> date``)
+probes.
+"""
+import csv
+import io
+import json
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+from django.db import connection, transaction as db_transaction
+from django.db.backends.postgresql.psycopg_any import DateRange
+
+from .models import Security, SecurityIdentifier
+from .vendors import vendor_keys
+
+INSTRUMENT_COLUMNS = ['symbol', 'exchange', 'name', 'asset_class', 'currency', 'isin', 'cusip', 'figi']
+# Global identifiers that pin down an instrument across ticker changes, strongest first
+MATCH_IDENTIFIERS = ['isin', 'figi', 'cusip']
+
+DEFAULT_TTL = 300
+
+_STAGE_SQL = """
+CREATE TEMPORARY TABLE instrument_stage (
+    symbol varchar(32) NOT NULL,
+    exchange varchar(32) NOT NULL,
+    name varchar(255) NOT NULL,
+    asset_class varchar(20) NOT NULL,
+    currency varchar(3) NOT NULL,
+    isin varchar(64) NOT NULL,
+    cusip varchar(64) NOT NULL,
+    figi varchar(64) NOT NULL,
+    codes jsonb NOT NULL,
+    security_id bigint
+)
+"""
+
+_MATCH_IDENTIFIER_SQL = """
+UPDATE instrument_stage s
+   SET security_id = i.security_id
+  FROM {identifier_table} i
+ WHERE s.security_id IS NULL
+   AND s.{column} <> ''
+   AND i.id_type = '{column}' AND i.namespace = '' AND i.value = s.{column}
+   AND i.valid_during @> %s::date
+"""
+
+_MATCH_SYMBOL_SQL = """
+UPDATE instrument_stage s
+   SET security_id = t.security_id
+  FROM {security_table} t
+ WHERE s.security_id IS NULL AND t.symbol = s.symbol AND t.exchange = s.exchange
+"""
+
+_INSERT_SECURITIES_SQL = """
+INSERT INTO {security_table} (symbol, exchange, name, asset_class, currency, is_active, created_at, updated_at)
+SELECT symbol, exchange, name, COALESCE(NULLIF(asset_class, ''), 'equity'), COALESCE(NULLIF(currency, ''), 'USD'),
+       TRUE, now(), now()
+  FROM instrument_stage
+ WHERE security_id IS NULL
+    ON CONFLICT (symbol, exchange) DO NOTHING
+"""
+
+_UPDATE_SECURITIES_SQL = """
+UPDATE {security_table} t
+   SET symbol = s.symbol,
+       exchange = s.exchange,
+       name = COALESCE(NULLIF(s.name, ''), t.name),
+       asset_class = COALESCE(NULLIF(s.asset_class, ''), t.asset_class),
+       currency = COALESCE(NULLIF(s.currency, ''), t.currency),
+       is_active = TRUE,
+       updated_at = now()
+  FROM instrument_stage s
+ WHERE t.security_id = s.security_id
+   AND (t.symbol, t.exchange, t.name, t.asset_class, t.currency, t.is_active) IS DISTINCT FROM
+       (s.symbol, s.exchange, COALESCE(NULLIF(s.name, ''), t.name), COALESCE(NULLIF(s.asset_class, ''), t.asset_class),
+        COALESCE(NULLIF(s.currency, ''), t.currency), TRUE)
+"""
+
+_WANTED_SQL = """
+CREATE TEMPORARY TABLE identifier_stage AS
+SELECT security_id, 'ticker'::varchar AS id_type, exchange::varchar AS namespace, symbol::varchar AS value
+  FROM instrument_stage
+ UNION ALL
+SELECT security_id, 'isin', '', isin FROM instrument_stage WHERE isin <> ''
+ UNION ALL
+SELECT security_id, 'cusip', '', cusip FROM instrument_stage WHERE cusip <> ''
+ UNION ALL
+SELECT security_id, 'figi', '', figi FROM instrument_stage WHERE figi <> ''
+ UNION ALL
+SELECT s.security_id, 'vendor', c.key, c.value FROM instrument_stage s, jsonb_each_text(s.codes) c WHERE c.value <> ''
+"""
+
+# Tickers of securities loaded before identifiers were tracked, valid until now
+_BACKFILL_SQL = """
+INSERT INTO {identifier_table} (security_id, id_type, namespace, value, valid_during, created_at, updated_at)
+SELECT t.security_id, 'ticker', t.exchange, t.symbol, daterange(NULL, NULL), now(), now()
+  FROM {security_table} t
+ WHERE t.security_id IN (SELECT security_id FROM instrument_stage)
+   AND NOT EXISTS (SELECT 1 FROM {identifier_table} i WHERE i.security_id = t.security_id AND i.id_type = 'ticker')
+"""
+
+# Current values that changed: a security's old value, or a value now held by
+# another security. Values set on the load date itself are replaced outright,
+# older ones are closed at the load date. Each case is its own statement so
+# both join on an index rather than an OR.
+_SUPERSEDED = [
+    'i.security_id = w.security_id AND i.id_type = w.id_type AND i.namespace = w.namespace AND i.value <> w.value',
+    'i.id_type = w.id_type AND i.namespace = w.namespace AND i.value = w.value AND i.security_id <> w.security_id',
+]
+
+_DELETE_SQL = """
+DELETE FROM {identifier_table} i
+ USING identifier_stage w
+ WHERE upper_inf(i.valid_during) AND lower(i.valid_during) >= %(as_of)s AND {superseded}
+"""
+
+_CLOSE_SQL = """
+UPDATE {identifier_table} i
+   SET valid_during = daterange(lower(i.valid_during), %(as_of)s), updated_at = now()
+  FROM identifier_stage w
+ WHERE upper_inf(i.valid_during) AND {superseded}
+"""
+
+_OPEN_SQL = """
+INSERT INTO {identifier_table} (security_id, id_type, namespace, value, valid_during, created_at, updated_at)
+SELECT w.security_id, w.id_type, w.namespace, w.value, daterange(%(as_of)s, NULL), now(), now()
+  FROM identifier_stage w
+ WHERE NOT EXISTS (
+       SELECT 1 FROM {identifier_table} i
+        WHERE i.security_id = w.security_id AND i.id_type = w.id_type AND i.namespace = w.namespace
+          AND i.value = w.value AND upper_inf(i.valid_during)
+       )
+"""
+
+_AS_OF_SQL = """
+SELECT v.value, i.security_id
+  FROM unnest(%s::varchar[]) AS v(value)
+  JOIN {identifier_table} i
+    ON i.id_type = %s AND i.namespace = %s AND i.value = v.value AND i.valid_during @> %s::date
+"""
+
+
+def _instrument_frame(instruments):
+    """Normalise an instrument DataFrame: INSTRUMENT_COLUMNS plus a ``codes`` JSON column"""
+    frame = pd.DataFrame(instruments).copy()
+    vendors = vendor_keys()
+    unknown = set(frame.columns) - set(INSTRUMENT_COLUMNS) - vendors
+    if unknown:
+        raise ValueError(f"Unknown instrument columns: {', '.join(sorted(unknown))}")
+    if 'symbol' not in frame.columns:
+        raise ValueError("Instruments need a symbol column")
+    for column in INSTRUMENT_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = ''
+    frame = frame.fillna('')
+    frame[INSTRUMENT_COLUMNS] = frame[INSTRUMENT_COLUMNS].astype(str).apply(lambda column: column.str.strip())
+    if (frame['symbol'] == '').any():
+        raise ValueError("Every instrument needs a symbol")
+    duplicated = frame.duplicated(['symbol', 'exchange'])
+    if duplicated.any():
+        raise ValueError(f"Duplicate instruments: {', '.join(frame.loc[duplicated, 'symbol'].head(5))}")
+    code_columns = sorted(vendors & set(frame.columns))
+    codes = frame[code_columns].astype(str).to_dict('records') if code_columns else [{}] * len(frame)
+    frame['codes'] = [json.dumps({key: value for key, value in row.items() if value}) for row in codes]
+    return frame[INSTRUMENT_COLUMNS + ['codes']]
+
+
+def _copy_stage(cursor, frame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+    with cursor.copy(f"COPY instrument_stage ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')") as copy:
+        copy.write(buffer.getvalue())
+
+
+def load_instruments(instruments, as_of=None):
+    """
+    Create or update securities and their identifiers from an instrument list.
+
+    ``instruments`` is a DataFrame (or records) with a ``symbol`` column and
+    optionally the other INSTRUMENT_COLUMNS and one column of codes per
+    vendors.json key. Identifier changes take effect on ``as_of`` (today by
+    default). Returns ``{'instruments': n, 'created': n, 'updated': n}``.
+    """
+    frame = _instrument_frame(instruments)
+    as_of = as_of or date.today()
+    tables = {
+        'security_table': Security._meta.db_table,
+        'identifier_table': SecurityIdentifier._meta.db_table,
+    }
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(_STAGE_SQL)
+        _copy_stage(cursor, frame)
+        cursor.execute('ANALYZE instrument_stage')
+        for column in MATCH_IDENTIFIERS:
+            cursor.execute(_MATCH_IDENTIFIER_SQL.format(column=column, **tables), [as_of])
+        cursor.execute(_MATCH_SYMBOL_SQL.format(**tables))
+        cursor.execute(_BACKFILL_SQL.format(**tables))
+        cursor.execute(_INSERT_SECURITIES_SQL.format(**tables))
+        created = cursor.rowcount
+        cursor.execute(_MATCH_SYMBOL_SQL.format(**tables))
+        cursor.execute(_UPDATE_SECURITIES_SQL.format(**tables))
+        updated = cursor.rowcount
+        cursor.execute(_WANTED_SQL)
+        cursor.execute('ANALYZE identifier_stage')
+        for superseded in _SUPERSEDED:
+            cursor.execute(_DELETE_SQL.format(superseded=superseded, **tables), {'as_of': as_of})
+            cursor.execute(_CLOSE_SQL.format(superseded=superseded, **tables), {'as_of': as_of})
+        cursor.execute(_OPEN_SQL.format(**tables), {'as_of': as_of})
+        # Dropped here rather than on commit, which may be an enclosing transaction's
+        cursor.execute('DROP TABLE instrument_stage, identifier_stage')
+        db_transaction.on_commit(symbol_table.clear)
+    return {'instruments': len(frame), 'created': created, 'updated': updated}
+
+
+def rename_security(security, symbol, effective, exchange=None):
+    """Change a security's ticker from ``effective`` on, keeping the old one in its history"""
+    exchange = security.exchange if exchange is None else exchange
+    with db_transaction.atomic():
+        history = SecurityIdentifier.objects.select_for_update().filter(
+            security=security, id_type='ticker', namespace=security.exchange, valid_during__upper_inf=True,
+        ).first()
+        if history is None:
+            # Tickers from before identifiers were tracked: valid until now
+            history = SecurityIdentifier(
+                security=security, id_type='ticker', namespace=security.exchange, value=security.symbol,
+                valid_during=DateRange(None, None),
+            )
+        lower = history.valid_during.lower if history.pk else None
+        if lower is not None and lower >= effective:
+            raise ValueError(f"{security.symbol} has been {history.value} since {lower}")
+        history.valid_during = DateRange(lower, effective)
+        history.save()
+        SecurityIdentifier.objects.create(
+            security=security, id_type='ticker', namespace=exchange, value=symbol,
+            valid_during=DateRange(effective, None),
+        )
+        security.symbol, security.exchange = symbol, exchange
+        security.save(update_fields=['symbol', 'exchange', 'updated_at'])
+        db_transaction.on_commit(lambda: symbol_table.invalidate('ticker'))
+    return security
+
+
+def securities_as_of(values, as_of, id_type='ticker', namespace=''):
+    """
+    Security id per identifier value on date ``as_of``, in one query.
+
+    Tickers with no recorded history resolve to the security currently
+    carrying them.
+    """
+    values = sorted(set(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _AS_OF_SQL.format(identifier_table=SecurityIdentifier._meta.db_table),
+            [values, id_type, namespace, as_of],
+        )
+        found = dict(cursor.fetchall())
+    missing = [value for value in values if value not in found]
+    if missing and id_type == 'ticker':
+        recorded = set(SecurityIdentifier.objects.filter(
+            id_type='ticker', namespace=namespace, value__in=missing,
+        ).values_list('value', flat=True))
+        found.update(Security.objects.filter(
+            exchange=namespace, symbol__in=[value for value in missing if value not in recorded],
+        ).values_list('symbol', 'security_id'))
+    return found
+
+
+def security_as_of(value, as_of, id_type='ticker', namespace=''):
+    return securities_as_of([value], as_of, id_type, namespace).get(value)
+
+
+class SymbolTable:
+    """
+    In-memory map of current identifier values to security ids.
+
+    Each (id_type, namespace) partition is loaded with one query on first use
+    and reloaded after ``ttl`` seconds, which bounds how long a change made by
+    another process goes unseen; changes made through this module clear it.
+    Tickers come from Security itself, so securities without identifier
+    history resolve too.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _load(self, id_type, namespace):
+        if id_type == 'ticker':
+            rows = Security.objects.filter(exchange=namespace).values_list('symbol', 'security_id')
+        else:
+            rows = SecurityIdentifier.objects.filter(
+                id_type=id_type, namespace=namespace, valid_during__upper_inf=True,
+            ).values_list('value', 'security_id')
+        forward = dict(rows.iterator(chunk_size=10000))
+        return {'loaded_at': time.monotonic(), 'ids': forward, 'values': {v: k for k, v in forward.items()}}
+
+    def _partition(self, id_type, namespace):
+        key = (id_type, namespace)
+        partition = self._partitions.get(key)
+        if partition is None or time.monotonic() - partition['loaded_at'] > self.ttl:
+            with self._lock:
+                partition = self._partitions.get(key)
+                if partition is None or time.monotonic() - partition['loaded_at'] > self.ttl:
+                    partition = self._partitions[key] = self._load(id_type, namespace)
+        return partition
+
+    def lookup(self, values, id_type='ticker', namespace=''):
+        """Security id per known value"""
+        ids = self._partition(id_type, namespace)['ids']
+        return {value: ids[value] for value in values if value in ids}
+
+    def values(self, security_ids, id_type='vendor', namespace=''):
+        """Current value per security id, e.g. a vendor's codes"""
+        values = self._partition(id_type, namespace)['values']
+        return {security_id: values[security_id] for security_id in security_ids if security_id in values}
+
+    def intern(self, mapping, id_type='ticker', namespace=''):
+        """Add value -> security id pairs just written by this process"""
+        partition = self._partition(id_type, namespace)
+        with self._lock:
+            partition['ids'].update(mapping)
+            partition['values'].update({v: k for k, v in mapping.items()})
+
+    def invalidate(self, id_type=None, namespace=None):
+        with self._lock:
+            for key in list(self._partitions):
+                if (id_type is None or key[0] == id_type) and (namespace is None or key[1] == namespace):
+                    del self._partitions[key]
+
+    def clear(self):
+        self.invalidate()
+
+
+symbol_table = SymbolTable()
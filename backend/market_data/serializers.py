@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from rest_framework import serializers
+from django.utils import timezone
+
+from .derived import RESAMPLE_BASES
+from .models import Bar, CorporateAction, Security, SecurityIdentifier
+
+INTERVAL_CHOICES = [choice for choice, _ in Bar.INTERVALS]
+
+
+class SecuritySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Security
+        fields = ['security_id', 'symbol', 'exchange', 'name', 'asset_class', 'currency', 'is_active']
+
+
+class CorporateActionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CorporateAction
+        fields = ['action_id', 'security', 'action_type', 'ex_date', 'ratio', 'amount', 'factor']
+        read_only_fields = ['factor']
+
+    def validate(self, attrs):
+        action_type = attrs.get('action_type', getattr(self.instance, 'action_type', None))
+        if action_type == 'split' and not attrs.get('ratio', getattr(self.instance, 'ratio', None)):
+            raise serializers.ValidationError({"ratio": "Splits need a ratio."})
+        if action_type == 'dividend' and not attrs.get('amount', getattr(self.instance, 'amount', None)):
+            raise serializers.ValidationError({"amount": "Dividends need an amount."})
+        return attrs
+
+
+class BarQuerySerializer(serializers.Serializer):
+    """Query parameters for a security's bars"""
+    interval = serializers.ChoiceField(choices=INTERVAL_CHOICES, default='1d')
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    base = serializers.ChoiceField(choices=INTERVAL_CHOICES, required=False)
+    resample = serializers.BooleanField(default=False)
+    adjusted = serializers.BooleanField(default=False)
+
+    MAX_DAYS = 3660 * 3
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.now()
+        start = attrs.get('start') or end - timedelta(days=365)
+        if start >= end:
+            raise serializers.ValidationError({"start": "Start must be before end."})
+        if (end - start).days > self.MAX_DAYS:
+            raise serializers.ValidationError({"start": f"Range must not exceed {self.MAX_DAYS} days."})
+        base = attrs.get('base')
+        if attrs['resample'] and not base:
+            base = RESAMPLE_BASES.get(attrs['interval'])
+            if base is None:
+                raise serializers.ValidationError({"interval": f"{attrs['interval']} bars cannot be resampled."})
+        if base and INTERVAL_CHOICES.index(base) >= INTERVAL_CHOICES.index(attrs['interval']):
+            raise serializers.ValidationError({"base": "Base interval must be finer than the interval."})
+        return {**attrs, 'start': start, 'end': end, 'base': base}
+
+
+class RecentBarsQuerySerializer(serializers.Serializer):
+    """Query parameters for a symbol's latest quote and recent bars"""
+    interval = serializers.ChoiceField(choices=INTERVAL_CHOICES, default='1min')
+    window = serializers.IntegerField(min_value=1, max_value=5000, default=100)
+
+
+class ResolveQuerySerializer(serializers.Serializer):
+    """Query parameters for resolving an identifier to a security, optionally as of a date"""
+    value = serializers.CharField(max_length=64)
+    id_type = serializers.ChoiceField(choices=[choice for choice, _ in SecurityIdentifier.ID_TYPES], default='ticker')
+    namespace = serializers.CharField(max_length=64, required=False, default='', allow_blank=True)
+    as_of = serializers.DateField(required=False)
@@ -0,0 +1,293 @@
+"""
+In-process fan-out of ticks and bar closes to websocket subscribers.
+
+QuoteBroker keeps, per symbol, the set of subscribers interested in it and
+lives on the ASGI server's event loop: subscriptions and publish() happen on
+that loop, and publishers on other threads hand messages over with
+publish_threadsafe().
+
+Bars are committed by the ingestion and consolidation commands, which run in
+their own processes. publish_bars() therefore also sends each bar close with
+pg_notify on NOTIFY_CHANNEL, and BarListener, started in the ASGI process when
+the first websocket connects, LISTENs on that channel and publishes what it
+receives on the broker's loop. Notifications sent while the listener is
+reconnecting are lost; subscribers catch up with the next bar close.
+
+Each Subscriber holds at most one pending message per (type, symbol, interval):
+a newer tick or bar replaces the pending one instead of queueing behind it, so a
+slow consumer receives the latest state at its own pace and its buffer is
+bounded by the number of series it subscribed to.
+"""
+import asyncio
+import json
+import logging
+import random
+from collections import defaultdict
+
+import psycopg
+from psycopg import sql
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils import timezone
+
+from .models import Security
+
+logger = logging.getLogger(__name__)
+
+MAX_SYMBOLS_PER_SUBSCRIBER = 1000
+
+NOTIFY_CHANNEL = 'market_data_bars'
+
+# PostgreSQL caps a notification payload at 8000 bytes
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+LISTEN_RETRY_DELAY = 1.0
+
+
+def _isoformat(ts):
+    return ts.isoformat().replace('+00:00', 'Z')
+
+
+def tick_message(symbol, ts, price, size=0):
+    """Normalized trade tick"""
+    return {'type': 'tick', 'symbol': symbol, 'ts': _isoformat(ts), 'price': float(price), 'size': int(size)}
+
+
+def bar_message(symbol, interval, ts, open, high, low, close, volume):
+    """Normalized bar close"""
+    return {
+        'type': 'bar', 'symbol': symbol, 'interval': interval, 'ts': _isoformat(ts),
+        'open': float(open), 'high': float(high), 'low': float(low), 'close': float(close),
+        'volume': int(volume),
+    }
+
+
+def message_key(message):
+    return message['type'], message['symbol'], message.get('interval')
+
+
+class Subscriber:
+    def __init__(self):
+        self.symbols = set()
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.delivered = 0
+        self.coalesced = 0
+
+    def offer(self, message):
+        key = message_key(message)
+        if key in self.pending:
+            self.coalesced += 1
+        self.pending[key] = message
+        self.ready.set()
+
+    async def drain(self):
+        """Wait for and take every pending message"""
+        await self.ready.wait()
+        self.ready.clear()
+        batch, self.pending = list(self.pending.values()), {}
+        self.delivered += len(batch)
+        return batch
+
+
+class QuoteBroker:
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.loop = None
+        self.published = 0
+        # True while a BarListener delivers this process's bar closes back to it
+        self.listening = False
+
+    def bind(self, loop):
+        self.loop = loop
+
+    def has_subscribers(self, symbol=None):
+        if symbol is None:
+            return bool(self.subscribers)
+        return symbol in self.subscribers
+
+    def subscribe(self, subscriber, symbols):
+        symbols = [symbol for symbol in symbols if symbol not in subscriber.symbols]
+        if len(subscriber.symbols) + len(symbols) > MAX_SYMBOLS_PER_SUBSCRIBER:
+            raise ValueError(f"At most {MAX_SYMBOLS_PER_SUBSCRIBER} symbols per connection")
+        for symbol in symbols:
+            self.subscribers[symbol].add(subscriber)
+        subscriber.symbols.update(symbols)
+
+    def unsubscribe(self, subscriber, symbols=None):
+        symbols = set(subscriber.symbols if symbols is None else symbols) & subscriber.symbols
+        for symbol in symbols:
+            subscribers = self.subscribers.get(symbol)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[symbol]
+        subscriber.symbols -= symbols
+
+    def publish(self, messages):
+        """Offer messages to their symbols' subscribers; call on the broker's loop"""
+        for message in messages:
+            self.published += 1
+            for subscriber in self.subscribers.get(message['symbol'], ()):
+                subscriber.offer(message)
+
+    def publish_threadsafe(self, messages):
+        """publish() from any thread; a no-op until a subscriber has connected"""
+        loop = self.loop
+        if loop is None or loop.is_closed() or not self.subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self.publish(messages)
+        else:
+            loop.call_soon_threadsafe(self.publish, list(messages))
+
+
+broker = QuoteBroker()
+
+
+def _notify_payloads(messages):
+    """JSON arrays of ``messages``, each within NOTIFY_PAYLOAD_LIMIT bytes"""
+    payloads, batch, size = [], [], 2
+    for message in messages:
+        encoded = json.dumps(message, separators=(',', ':'))
+        if batch and size + len(encoded) + 1 > NOTIFY_PAYLOAD_LIMIT:
+            payloads.append('[' + ','.join(batch) + ']')
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        payloads.append('[' + ','.join(batch) + ']')
+    return payloads
+
+
+def notify_bars(messages):
+    """Send bar messages to every process LISTENing on NOTIFY_CHANNEL"""
+    payloads = _notify_payloads(messages)
+    if not payloads:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+            [NOTIFY_CHANNEL, payloads],
+        )
+
+
+def publish_bars(frame):
+    """
+    Publish the newest bar of each (security, interval) in a BAR_COLUMNS frame.
+
+    The bars are sent with pg_notify for the ASGI processes' listeners and,
+    when this process has no listener of its own, published on the local
+    broker directly.
+    """
+    if frame.empty:
+        return
+    latest = frame.sort_values('ts').groupby(['security_id', 'interval'], sort=False).tail(1)
+    symbols = dict(
+        Security.objects.filter(pk__in=latest['security_id'].unique().tolist()).values_list('security_id', 'symbol')
+    )
+    messages = [
+        bar_message(symbols[row.security_id], row.interval, row.ts, row.open, row.high, row.low, row.close, row.volume)
+        for row in latest.itertuples(index=False)
+        if row.security_id in symbols
+    ]
+    notify_bars(messages)
+    if not broker.listening:
+        broker.publish_threadsafe([message for message in messages if broker.has_subscribers(message['symbol'])])
+
+
+def listen_params(alias=DEFAULT_DB_ALIAS):
+    """psycopg connection keywords for a dedicated LISTEN connection to ``alias``"""
+    settings_dict = connections[alias].settings_dict
+    params = {
+        'dbname': settings_dict['NAME'],
+        'user': settings_dict['USER'],
+        'password': settings_dict['PASSWORD'],
+        'host': settings_dict['HOST'],
+        'port': settings_dict['PORT'],
+    }
+    return {key: value for key, value in params.items() if value}
+
+
+class BarListener:
+    """
+    Publishes bar closes notified by other processes on the broker's loop.
+
+    Holds one autocommit connection LISTENing on ``channel`` and reconnects
+    after ``retry_delay`` seconds when it drops.
+    """
+
+    def __init__(self, target=broker, channel=NOTIFY_CHANNEL, retry_delay=LISTEN_RETRY_DELAY):
+        self.target = target
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self.task = None
+        self.listening = asyncio.Event()
+        self.received = 0
+
+    def ensure_started(self):
+        """Start listening on the running loop unless already listening; returns the task"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    def deliver(self, payload):
+        """Publish one notification's messages; a bad payload is logged and dropped"""
+        try:
+            messages = json.loads(payload)
+            if not isinstance(messages, list):
+                raise ValueError("expected a JSON array")
+            self.target.publish(messages)
+        except Exception:
+            logger.exception("Dropping notification on %s: %.200s", self.channel, payload)
+            return
+        self.received += len(messages)
+
+    async def run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**listen_params(), autocommit=True) as conn:
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self.target.listening = True
+                    self.listening.set()
+                    async for notify in conn.notifies():
+                        self.deliver(notify.payload)
+            except psycopg.OperationalError as exc:
+                logger.warning("Lost the LISTEN connection on %s: %s", self.channel, exc)
+            except Exception:
+                logger.exception("Bar listener on %s failed", self.channel)
+            finally:
+                self.target.listening = False
+                self.listening.clear()
+            await asyncio.sleep(self.retry_delay)
+
+
+bar_listener = BarListener()
+
+
+async def fake_ticks(symbols, rate, duration=None, target=broker, batches_per_second=100):
+    """
+    Publish random-walk ticks for ``symbols`` at about ``rate`` ticks per second.
+
+    Runs on the broker's loop until ``duration`` seconds have passed (forever
+    when None); returns the number of ticks published.
+    """
+    loop = asyncio.get_running_loop()
+    prices = {symbol: 100.0 for symbol in symbols}
+    per_batch = max(1, round(rate / batches_per_second))
+    started = loop.time()
+    published = 0
+    while duration is None or loop.time() - started < duration:
+        now = timezone.now()
+        batch = []
+        for symbol in random.choices(symbols, k=per_batch):
+            prices[symbol] *= 1 + random.gauss(0, 0.0005)
+            batch.append(tick_message(symbol, now, round(prices[symbol], 4), random.randint(1, 500)))
+        target.publish(batch)
+        published += len(batch)
+        # Sleep to the schedule rather than a fixed delay so publishing time is absorbed
+        await asyncio.sleep(max(0.0, started + published / rate - loop.time()))
+    return published
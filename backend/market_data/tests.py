@@ -1,3 +1,924 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as dj_timezone
+
+from .bars import upsert_bars
+from .cache import get_cache
+from .calendars import calendar_for, get_calendar
+from .consolidation import consolidate, upsert_vendor_bars
+from .derived import aggregate, get_bars
+from .ingestion import IngestJob, TokenBucket, VendorError, ingest
+from .macro import as_of, load_series, parse_observations
+from .models import (
+    Bar, CorporateAction, EconomicSeries, IngestionMark, QuarantinedBar, Security, SecurityIdentifier, VendorBar,
+)
+from .partitions import create_partition, existing_partitions, partition_name
+from .quality import find_missing_bars
+from .quotes import HotBarCache, hot_bars
+from .validation import validate, validation_stats
+from .reference import load_instruments, rename_security, securities_as_of, security_as_of, symbol_table
+from .streaming import (
+    NOTIFY_CHANNEL, BarListener, QuoteBroker, Subscriber, broker, publish_bars, tick_message,
+)
+from .vendors import Vendor
+from .websocket import CLOSE_UNAUTHORIZED, QuoteStreamApp
+from users.models import User
+
+
+class BarPartitionTests(TestCase):
+    """Bars land in monthly partitions and range reads prune to them"""
+
+    def setUp(self):
+        self.security = Security.objects.create(symbol='IBM', exchange='NYSE')
+
+    def insert_bar(self, ts):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {Bar._meta.db_table} (security_id, interval, ts, open, high, low, close, volume) "
+                "VALUES (%s, '1d', %s, 1, 2, 0.5, 1.5, 100)",
+                [self.security.pk, ts],
+            )
+
+    def partition_of(self, ts):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {Bar._meta.db_table} WHERE ts = %s", [ts]
+            )
+            return cursor.fetchone()[0]
+
+    def test_create_partition_moves_rows_out_of_default(self):
+        ts = datetime(2001, 3, 15, tzinfo=timezone.utc)
+        self.insert_bar(ts)
+        self.assertEqual(self.partition_of(ts), f'{Bar._meta.db_table}_default')
+
+        self.assertTrue(create_partition(date(2001, 3, 1)))
+        self.assertFalse(create_partition(date(2001, 3, 1)))
+        self.assertIn(partition_name(date(2001, 3, 1)), existing_partitions())
+        self.assertEqual(self.partition_of(ts), partition_name(date(2001, 3, 1)))
+        self.assertEqual(Bar.objects.filter(security=self.security, ts__year=2001).count(), 1)
+
+    def test_range_read_prunes_partitions(self):
+        create_partition(date(2001, 3, 1))
+        create_partition(date(2001, 4, 1))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"EXPLAIN SELECT * FROM {Bar._meta.db_table} WHERE security_id = %s AND ts >= %s AND ts < %s",
+                [self.security.pk, datetime(2001, 3, 2, tzinfo=timezone.utc), datetime(2001, 3, 9, tzinfo=timezone.utc)],
+            )
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn(partition_name(date(2001, 3, 1)), plan)
+        self.assertNotIn(partition_name(date(2001, 4, 1)), plan)
+
+
+def alpha_vantage_daily(symbol, closes):
+    return {
+        'Meta Data': {'2. Symbol': symbol, '5. Time Zone': 'US/Eastern'},
+        'Time Series (Daily)': {
+            day: {
+                '1. open': '1.0', '2. high': str(max(close, 2.0)), '3. low': '0.5', '4. close': str(close),
+                '5. volume': '100',
+            }
+            for day, close in closes.items()
+        },
+    }
+
+
+class StubVendorHandler(BaseHTTPRequestHandler):
+    """Alpha Vantage stand-in: THROTTLED symbols get a 429 on their first request"""
+    hits = {}
+    queries = []
+    closes = {'2024-01-02': 10.5, '2024-01-03': 11.0, '2024-02-01': 12.0}
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self.queries.append(query)
+        symbol = query['symbol'][0]
+        hits = self.hits[symbol] = self.hits.get(symbol, 0) + 1
+        if symbol == 'THROTTLED' and hits == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if symbol == 'MISSING':
+            body = {'Error Message': 'Invalid API call.'}
+        else:
+            body = alpha_vantage_daily(symbol, self.closes)
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class IngestionEngineTests(TestCase):
+    """The ingestion engine against a local stub vendor"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubVendorHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        symbol_table.clear()
+        self.addCleanup(symbol_table.clear)
+        StubVendorHandler.hits = {}
+        StubVendorHandler.queries = []
+        StubVendorHandler.closes = {'2024-01-02': 10.5, '2024-01-03': 11.0, '2024-02-01': 12.0}
+        host, port = self.server.server_address
+        self.vendor = Vendor(
+            key='alpha_vantage', name='Stub',
+            url_template=f'http://{host}:{port}/query?function={{DATASET}}&symbol={{SYMBOL}}'
+                         '&interval={INTERVAL}&outputsize={OUTPUTSIZE}&apikey={API_KEY}',
+            api_key='secret', requests=50, per_seconds=1, max_connections=4,
+        )
+
+    def test_ingest_upserts_bars_and_retries_throttled_requests(self):
+        jobs = [IngestJob(symbol, 'TIME_SERIES_DAILY') for symbol in ('IBM', 'MSFT', 'THROTTLED', 'MISSING')]
+        report = ingest(jobs, self.vendor, backoff=0.01)
+
+        self.assertEqual(report.bars, 9)
+        self.assertEqual(report.retries, 1)
+        self.assertEqual(StubVendorHandler.hits['THROTTLED'], 2)
+        self.assertEqual([failure['symbol'] for failure in report.failures], ['MISSING'])
+        self.assertNotIn('secret', json.dumps(report.failures))
+
+        bars = Bar.objects.filter(security__symbol='IBM', interval='1d').order_by('ts')
+        self.assertEqual([bar.close for bar in bars], [10.5, 11.0, 12.0])
+        self.assertEqual(bars[0].ts, datetime(2024, 1, 2, tzinfo=timezone.utc))
+        self.assertIn(partition_name(date(2024, 2, 1)), existing_partitions())
+
+        # A full re-ingest updates in place rather than duplicating
+        StubVendorHandler.closes = {**StubVendorHandler.closes, '2024-01-03': 11.25}
+        report = ingest(jobs[:1], self.vendor, incremental=False)
+        self.assertEqual(report.bars, 1)
+        self.assertEqual(Bar.objects.filter(security__symbol='IBM').count(), 3)
+
+    def test_incremental_run_writes_only_new_or_revised_bars(self):
+        job = IngestJob('IBM', 'TIME_SERIES_DAILY')
+        ingest([job], self.vendor)
+        mark = IngestionMark.objects.get(vendor='alpha_vantage', security__symbol='IBM', interval='1d')
+        self.assertEqual(mark.last_ts, datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        # Same payload: nothing is written, not even the mark
+        with CaptureQueriesContext(connection) as ctx:
+            report = ingest([job], self.vendor)
+        self.assertEqual((report.bars, report.unchanged), (0, 1))
+        writes = [q['sql'] for q in ctx.captured_queries if 'market_data_bar' in q['sql'] or 'UPDATE' in q['sql']]
+        self.assertEqual(writes, [])
+
+        # A new bar and a revision inside the overlap window
+        StubVendorHandler.closes = {**StubVendorHandler.closes, '2024-02-01': 12.5, '2024-02-02': 13.0}
+        report = ingest([job], self.vendor)
+        self.assertEqual(report.bars, 2)
+        mark.refresh_from_db()
+        self.assertEqual(mark.last_ts, datetime(2024, 2, 2, tzinfo=timezone.utc))
+
+    def test_vendor_codes_replace_symbols_in_requests(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            load_instruments(pd.DataFrame([{'symbol': 'IBM-US', 'alpha_vantage': 'IBM'}]), date(2024, 1, 1))
+        report = ingest([IngestJob('IBM-US', 'TIME_SERIES_DAILY')], self.vendor)
+        self.assertEqual(report.bars, 3)
+        self.assertEqual(StubVendorHandler.hits, {'IBM': 1})
+        self.assertEqual(Bar.objects.filter(security__symbol='IBM-US').count(), 3)
+
+    def test_invalid_bars_are_quarantined(self):
+        StubVendorHandler.closes = {**StubVendorHandler.closes, '2024-01-04': -1.0}
+        report = ingest([IngestJob('IBM', 'TIME_SERIES_DAILY')], self.vendor)
+        self.assertEqual((report.bars, report.quarantined), (3, 1))
+        self.assertIn('ohlc_inconsistent', report.rule_seconds)
+        quarantined = QuarantinedBar.objects.get()
+        self.assertEqual((quarantined.vendor, quarantined.close), ('alpha_vantage', -1.0))
+        self.assertEqual(quarantined.rules, ['invalid_price', 'ohlc_inconsistent'])
+
+        # A bar far from another vendor's is kept out
+        VendorBar.objects.create(
+            vendor='other', security=quarantined.security, interval='1d', ts=datetime(2024, 2, 1, tzinfo=timezone.utc),
+            open=12.0, high=12.0, low=12.0, close=12.0, volume=100,
+        )
+        StubVendorHandler.closes = {'2024-01-02': 10.5, '2024-01-03': 11.0, '2024-02-01': 15.0}
+        report = ingest([IngestJob('IBM', 'TIME_SERIES_DAILY')], self.vendor, incremental=False)
+        self.assertEqual((report.bars, report.quarantined), (0, 1))
+        self.assertEqual(QuarantinedBar.objects.get(close=15.0).rules, ['vendor_divergence'])
+        self.assertEqual(Bar.objects.get(security__symbol='IBM', ts__month=2).close, 12.0)
+
+    def test_intraday_jobs_need_an_intraday_interval(self):
+        for interval in ('', '7min', '1d'):
+            with self.assertRaisesMessage(ValueError, 'TIME_SERIES_INTRADAY needs an intraday interval'):
+                ingest([IngestJob('IBM', 'TIME_SERIES_INTRADAY', interval)], self.vendor)
+        self.assertEqual(StubVendorHandler.queries, [])
+        self.assertFalse(Security.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command('ingest_bars', 'IBM', '--dataset', 'TIME_SERIES_INTRADAY', stdout=io.StringIO())
+
+    def test_current_series_are_not_requested(self):
+        security = Security.objects.create(symbol='IBM')
+        IngestionMark.objects.create(
+            vendor='alpha_vantage', security=security, interval='1d',
+            last_ts=dj_timezone.now(), window_start=dj_timezone.now(), checksum='x',
+        )
+        report = ingest([IngestJob('IBM', 'TIME_SERIES_DAILY')], self.vendor)
+        self.assertEqual((report.skipped, report.requests), (1, 0))
+        self.assertEqual(StubVendorHandler.queries, [])
+
+    def test_token_bucket_paces_requests(self):
+        async def take(count):
+            bucket = TokenBucket(rate=100, capacity=1)
+            for _ in range(count):
+                await bucket.acquire()
+
+        started = time.monotonic()
+        asyncio.run(take(11))
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+class ReferenceDataTests(APITestCase):
+    """Bulk instrument loads, versioned identifiers and the symbol table"""
+
+    def setUp(self):
+        symbol_table.clear()
+        self.addCleanup(symbol_table.clear)
+
+    def load(self, rows, as_of):
+        with self.captureOnCommitCallbacks(execute=True):
+            return load_instruments(pd.DataFrame(rows), as_of)
+
+    def test_load_creates_updates_and_versions_identifiers(self):
+        legacy = Security.objects.create(symbol='IBM', exchange='NYSE')
+        result = self.load([
+            {'symbol': 'IBM', 'exchange': 'NYSE', 'name': 'IBM Corp', 'isin': 'US4592001014', 'alpha_vantage': 'IBM'},
+            {'symbol': 'FB', 'exchange': 'NASDAQ', 'name': 'Facebook', 'isin': 'US30303M1027', 'alpha_vantage': 'FB'},
+        ], date(2020, 1, 1))
+        self.assertEqual(result, {'instruments': 2, 'created': 1, 'updated': 1})
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.name, 'IBM Corp')
+        meta = Security.objects.get(symbol='FB')
+
+        # The ticker changes, the ISIN still identifies the same security
+        result = self.load([
+            {'symbol': 'META', 'exchange': 'NASDAQ', 'isin': 'US30303M1027', 'alpha_vantage': 'META'},
+        ], date(2022, 6, 9))
+        self.assertEqual(result, {'instruments': 1, 'created': 0, 'updated': 1})
+        meta.refresh_from_db()
+        self.assertEqual((meta.symbol, meta.name), ('META', 'Facebook'))
+        self.assertEqual(Security.objects.count(), 2)
+
+        self.assertEqual(security_as_of('FB', date(2021, 1, 4), namespace='NASDAQ'), meta.pk)
+        self.assertIsNone(security_as_of('FB', date(2023, 1, 3), namespace='NASDAQ'))
+        self.assertEqual(
+            securities_as_of(['META', 'FB'], date(2023, 1, 3), namespace='NASDAQ'), {'META': meta.pk},
+        )
+        self.assertEqual(security_as_of('US30303M1027', date(2023, 1, 3), 'isin'), meta.pk)
+        # Tickers recorded before identifiers were tracked stay valid back in time
+        self.assertEqual(security_as_of('IBM', date(1990, 1, 2), namespace='NYSE'), legacy.pk)
+
+        # Reloading the same list changes nothing
+        before = list(SecurityIdentifier.objects.order_by('pk').values_list('pk', 'valid_during'))
+        self.assertEqual(self.load([
+            {'symbol': 'META', 'exchange': 'NASDAQ', 'isin': 'US30303M1027', 'alpha_vantage': 'META'},
+        ], date(2022, 7, 1))['updated'], 0)
+        self.assertEqual(list(SecurityIdentifier.objects.order_by('pk').values_list('pk', 'valid_during')), before)
+
+        self.assertEqual(symbol_table.lookup(['META', 'FB'], namespace='NASDAQ'), {'META': meta.pk})
+        self.assertEqual(symbol_table.values([meta.pk], 'vendor', 'alpha_vantage'), {meta.pk: 'META'})
+        with self.assertNumQueries(0):
+            symbol_table.lookup(['META'], namespace='NASDAQ')
+
+    def test_identifier_ranges_cannot_overlap(self):
+        facebook = Security.objects.create(symbol='META', exchange='NASDAQ')
+        other = Security.objects.create(symbol='FBX', exchange='NASDAQ')
+
+        def identifier(security, lower, upper):
+            return SecurityIdentifier.objects.create(
+                security=security, id_type='ticker', namespace='NASDAQ', value='FB',
+                valid_during=DateRange(lower, upper),
+            )
+
+        identifier(facebook, date(2012, 5, 18), date(2022, 6, 9))
+        # The value may name another security once its range has closed
+        identifier(other, date(2022, 6, 9), None)
+        self.assertEqual(securities_as_of(['FB'], date(2022, 6, 8), namespace='NASDAQ'), {'FB': facebook.pk})
+        self.assertEqual(securities_as_of(['FB'], date(2022, 6, 9), namespace='NASDAQ'), {'FB': other.pk})
+        for lower, upper in ((date(2020, 1, 1), date(2021, 1, 1)), (None, date(2012, 5, 19)), (date(2030, 1, 1), None)):
+            with self.subTest(lower=lower, upper=upper), self.assertRaises(IntegrityError), transaction.atomic():
+                identifier(other, lower, upper)
+
+    def test_unknown_columns_and_duplicates_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, 'no_such_vendor'):
+            load_instruments(pd.DataFrame([{'symbol': 'IBM', 'no_such_vendor': 'x'}]))
+        with self.assertRaisesMessage(ValueError, 'Duplicate'):
+            load_instruments(pd.DataFrame([{'symbol': 'IBM'}, {'symbol': 'IBM'}]))
+
+    def test_rename_and_resolve_endpoint(self):
+        security = Security.objects.create(symbol='TWTR')
+        with self.captureOnCommitCallbacks(execute=True):
+            rename_security(security, 'X', date(2023, 7, 24))
+        with self.assertRaises(ValueError):
+            rename_security(security, 'Y', date(2023, 7, 1))
+
+        user = User.objects.create_user(username='quant', password='pw-not-used-1')
+        self.client.force_authenticate(user)
+        response = self.client.get('/market-data/securities/resolve/', {'value': 'TWTR', 'as_of': '2020-01-02'})
+        self.assertEqual(response.json()['symbol'], 'X')
+        self.assertEqual(self.client.get('/market-data/securities/resolve/', {'value': 'X'}).json()['security_id'],
+                         security.pk)
+        self.assertEqual(self.client.get('/market-data/securities/resolve/', {'value': 'TWTR'}).status_code, 404)
+
+
+class BarCacheTests(TestCase):
+    """Parquet partitions are filled from PostgreSQL and dropped on corrections"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(BAR_CACHE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.security = Security.objects.create(symbol='IBM')
+
+    def bars(self, closes):
+        return pd.DataFrame({
+            'security_id': self.security.pk,
+            'interval': '1d',
+            'ts': pd.to_datetime(list(closes), utc=True),
+            'open': 1.0, 'high': 2.0, 'low': 0.5,
+            'close': list(closes.values()),
+            'volume': 100,
+        })
+
+    def test_read_fills_cache_and_corrections_invalidate_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(self.bars({'2022-12-30': 9.0, '2023-01-03': 10.0, '2023-06-01': 11.0}))
+        cache = get_cache()
+
+        frame = cache.read(self.security.pk, '1d', '2022-06-01', '2024-01-01')
+        self.assertEqual(frame['close'].tolist(), [9.0, 10.0, 11.0])
+        self.assertEqual(str(frame.index.tz), 'UTC')
+        self.assertTrue(cache.path(self.security.pk, '1d', 2023).exists())
+        self.assertFalse(cache.path(self.security.pk, '1d', 2024).exists())
+
+        # Cached reads do not touch the database
+        with self.assertNumQueries(0):
+            frame = cache.read(self.security.pk, '1d', '2022-06-01', '2023-06-01')
+        self.assertEqual(frame['close'].tolist(), [9.0, 10.0])
+
+        # Re-sending unchanged bars keeps the partition; a correction drops only its year
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(self.bars({'2023-01-03': 10.0}))
+        self.assertTrue(cache.path(self.security.pk, '1d', 2023).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(self.bars({'2023-06-01': 11.5}))
+        self.assertFalse(cache.path(self.security.pk, '1d', 2023).exists())
+        self.assertTrue(cache.path(self.security.pk, '1d', 2022).exists())
+        self.assertEqual(cache.read(self.security.pk, '1d', '2023-06-01', '2023-06-02')['close'].tolist(), [11.5])
+
+
+class DerivedBarTests(APITestCase):
+    """Resampled and adjusted series match straightforward pandas computations"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(BAR_CACHE_DIR=self.tmp.name, MARKET_TIME_ZONE='America/New_York')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.security = Security.objects.create(symbol='IBM')
+
+    def store(self, interval, index, rng):
+        close = 100 + rng.standard_normal(len(index)).cumsum()
+        frame = pd.DataFrame({
+            'security_id': self.security.pk, 'interval': interval, 'ts': index,
+            'open': close + rng.standard_normal(len(index)) * 0.1,
+            'high': close + 1, 'low': close - 1, 'close': close,
+            'volume': rng.integers(1, 1000, len(index)),
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(frame)
+        return frame.set_index('ts')
+
+    def test_aggregate_matches_pandas_resample(self):
+        rng = np.random.default_rng(7)
+        # A New York session spanning the UTC year boundary
+        index = pd.date_range('2023-12-31 14:30', '2024-01-02 21:00', freq='1min', tz='UTC')
+        index = index[(index.hour >= 14) & (index.hour < 21)]
+        minutes = self.store('1min', index, rng)
+        reference = {
+            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum',
+        }
+        expected = minutes[list(reference)].resample('5min').agg(reference).dropna()
+        pd.testing.assert_frame_equal(
+            aggregate(minutes, '5min'), expected, check_freq=False, check_dtype=False, check_names=False,
+        )
+
+        daily = get_bars(self.security.pk, '1d', '2023-12-01', '2024-02-01', base='1min')
+        local_dates = minutes.index.tz_convert('America/New_York').date
+        self.assertEqual(len(daily), len(set(local_dates)))
+        self.assertEqual(daily['volume'].sum(), minutes['volume'].sum())
+        self.assertTrue(get_cache().path(self.security.pk, '1d@1min', 2024).exists())
+
+        # Correcting a base bar drops the derived partitions built from it
+        self.store('1min', index[-1:], rng)
+        self.assertFalse(get_cache().path(self.security.pk, '1d@1min', 2024).exists())
+        self.assertFalse(get_cache().path(self.security.pk, '1d@1min', 2023).exists())
+
+    def test_adjusted_daily_bars(self):
+        index = pd.date_range('2024-03-01', '2024-03-10', freq='D', tz='UTC')
+        daily = self.store('1d', index, np.random.default_rng(3))
+        CorporateAction.objects.create(security=self.security, action_type='split', ex_date='2024-03-05', ratio=2)
+        CorporateAction.objects.create(security=self.security, action_type='dividend', ex_date='2024-03-08', amount='1.5')
+
+        adjusted = get_bars(self.security.pk, '1d', '2024-03-01', '2024-03-11', adjusted=True)
+        dividend_factor = 1 - 1.5 / daily.loc['2024-03-07', 'close'].item()
+        expected = daily['close'].copy()
+        expected[expected.index < '2024-03-08'] *= dividend_factor
+        expected[expected.index < '2024-03-05'] *= 0.5
+        np.testing.assert_allclose(adjusted['close'].to_numpy(), expected.to_numpy())
+        self.assertEqual(adjusted.loc['2024-03-04', 'volume'].item(), daily.loc['2024-03-04', 'volume'].item() * 2)
+        self.assertEqual(adjusted.loc['2024-03-05', 'volume'].item(), daily.loc['2024-03-05', 'volume'].item())
+
+        user = User.objects.create_user(username='quant', password='pw-not-used-1')
+        self.client.force_authenticate(user)
+        response = self.client.get(
+            f'/market-data/securities/{self.security.pk}/bars/',
+            {'interval': '1wk', 'resample': 'true', 'adjusted': 'true',
+             'start': '2024-02-26T00:00:00Z', 'end': '2024-03-11T00:00:00Z'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bar['ts'] for bar in response.json()], ['2024-02-26T00:00:00Z', '2024-03-04T00:00:00Z'])
+        self.assertAlmostEqual(response.json()[1]['close'], expected.iloc[-1])
+
+
+class ValidationTests(TestCase):
+    """Validation rules over a whole batch"""
+
+    def frame(self, closes, **columns):
+        closes = np.asarray(closes, dtype=float)
+        return pd.DataFrame({
+            'security_id': 1, 'interval': '1d',
+            'ts': pd.date_range('2024-01-01', periods=len(closes), tz='UTC'),
+            'open': closes, 'high': closes + 1, 'low': closes - 1, 'close': closes, 'volume': 100,
+            **columns,
+        })
+
+    def test_rules(self):
+        rng = np.random.default_rng(7)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 60)))
+        closes[30] *= 1.5
+        frame = self.frame(closes)
+        frame.loc[10, 'high'] = frame.loc[10, 'close'] - 0.5
+        frame.loc[20, 'volume'] = 0
+        frame.loc[40, 'open'] = np.nan
+        frame = pd.concat([frame, frame.iloc[[50]].assign(close=frame.loc[50, 'close'] + 0.1)])
+        reference = np.full(len(frame), np.nan)
+        reference[5] = frame['close'].iloc[5] * 1.2
+
+        before = validation_stats.stats()['rows']
+        result = validate(frame, reference)
+        rejected = dict(zip(result.rejected['ts'].dt.day + 31 * (result.rejected['ts'].dt.month - 1),
+                            result.rejected['rules']))
+        self.assertEqual(rejected, {
+            6: ['vendor_divergence'], 11: ['ohlc_inconsistent'], 21: ['zero_volume'], 31: ['spike'],
+            41: ['invalid_price'], 51: ['duplicate_ts'],
+        })
+        self.assertEqual(len(result.valid), 60 - 5)
+        self.assertFalse(result.valid.duplicated(['security_id', 'interval', 'ts']).any())
+        self.assertEqual(set(result.seconds), set(result.rejected_by_rule))
+        self.assertEqual(validation_stats.stats()['rows'] - before, 61)
+
+    def test_volume_free_series_and_real_jumps_pass(self):
+        closes = np.r_[np.linspace(100, 101, 30), np.linspace(150, 151, 30)]
+        result = validate(self.frame(closes, volume=0))
+        self.assertTrue(result.rejected.empty)
+
+    def test_one_tick_moves_in_flat_series_pass(self):
+        closes = np.full(390, 100.0)
+        closes[200] = 100.01
+        self.assertTrue(validate(self.frame(closes)).rejected.empty)
+
+        closes[200] = 150.0
+        rejected = validate(self.frame(closes)).rejected
+        self.assertEqual(rejected['rules'].tolist(), [['spike']])
+        self.assertEqual(rejected.index.tolist(), [200])
+
+
+class CalendarTests(TestCase):
+    """Session tables and bar arithmetic of the exchange calendars"""
+
+    def test_sessions_follow_holidays_half_days_and_dst(self):
+        nyse = get_calendar('NASDAQ')
+        sessions = nyse.sessions('2024-07-01', '2024-07-08')
+        self.assertEqual([day.day for day in sessions.index], [1, 2, 3, 5, 8])
+        self.assertEqual(sessions.loc['2024-07-03', 'close'], pd.Timestamp('2024-07-03 17:00', tz='UTC'))
+        # 09:30 New York is 14:30 UTC before the switch to daylight saving time, 13:30 after
+        self.assertEqual(nyse.sessions('2024-03-08', '2024-03-11')['open'].dt.hour.tolist(), [14, 13])
+        self.assertFalse(nyse.is_session(date(2024, 3, 29)))
+        self.assertFalse(nyse.is_session(date(2012, 10, 29)))
+        self.assertEqual(len(nyse.sessions('2024-01-01', '2024-12-31')), 252)
+
+        self.assertTrue(nyse.is_open(pd.Timestamp('2024-07-03 16:59', tz='UTC')))
+        self.assertFalse(nyse.is_open(datetime(2024, 7, 3, 17, tzinfo=timezone.utc)))
+        self.assertEqual(nyse.next_open(pd.Timestamp('2024-07-03 18:00', tz='UTC')),
+                         pd.Timestamp('2024-07-05 13:30', tz='UTC'))
+        self.assertEqual(nyse.previous_close(pd.Timestamp('2024-07-08 12:00', tz='UTC')),
+                         pd.Timestamp('2024-07-05 20:00', tz='UTC'))
+        self.assertEqual(calendar_for('', 'crypto').expected_bars('2024-03-10', '2024-03-11', '1min'), 1440)
+
+    def test_expected_bars_and_ordinals(self):
+        nyse = get_calendar('XNYS')
+        # A full session and a half day
+        self.assertEqual(nyse.expected_bars('2024-07-02', '2024-07-04', '1min'), 390 + 210)
+        self.assertEqual(nyse.expected_bars('2024-07-01', '2024-07-08', '1d'), 4)
+        # UTC-aligned hourly buckets: 13:00-19:00 UTC for a 13:30-20:00 session
+        stamps = nyse.expected_timestamps('2024-07-05', '2024-07-06', '60min')
+        self.assertEqual(stamps.hour.tolist(), [13, 14, 15, 16, 17, 18, 19])
+
+        ordinals = nyse.bar_ordinals(stamps, '60min')
+        self.assertEqual(np.diff(ordinals).tolist(), [1] * 6)
+        self.assertTrue(nyse.bar_timestamps(ordinals, '60min').equals(stamps))
+        self.assertEqual(nyse.bar_ordinals(pd.Timestamp('2024-07-04 14:00', tz='UTC'), '60min'), -1)
+        self.assertEqual(nyse.bar_ordinals(pd.Timestamp('2024-07-08 13:00', tz='UTC'), '60min'), ordinals[-1] + 1)
+        with self.assertRaises(ValueError):
+            nyse.expected_bars('1980-01-01', '1980-02-01', '1d')
+
+
+    def test_open_and_close_lookups_stop_at_the_computed_range(self):
+        nyse = get_calendar('XNYS')
+        first_open, first_close = (pd.Timestamp(ns, tz='UTC') for ns in (nyse.opens[0], nyse.closes[0]))
+        last_open, last_close = (pd.Timestamp(ns, tz='UTC') for ns in (nyse.opens[-1], nyse.closes[-1]))
+        one_ns = pd.Timedelta(1, 'ns')
+
+        self.assertEqual(nyse.previous_close(first_close + one_ns), first_close)
+        self.assertEqual(nyse.next_open(last_open - one_ns), last_open)
+        self.assertEqual(nyse.next_open(first_open - pd.Timedelta(hours=1)), first_open)
+        self.assertEqual(nyse.previous_close(last_close + pd.Timedelta(hours=1)), last_close)
+        # Within the one-day slack of the range check, but with no session to return
+        for lookup, ts in ((nyse.previous_close, first_close), (nyse.previous_close, first_open - pd.Timedelta(hours=1)),
+                           (nyse.next_open, last_open), (nyse.next_open, last_close + pd.Timedelta(hours=1))):
+            with self.subTest(lookup=lookup.__name__, ts=ts), self.assertRaises(ValueError):
+                lookup(ts)
+        with self.assertRaises(ValueError):
+            nyse.previous_close(pd.DatetimeIndex([first_close + one_ns, first_close], tz='UTC'))
+
+class MissingBarTests(TestCase):
+
+    def store(self, security, stamps):
+        upsert_bars(pd.DataFrame({
+            'security_id': security.pk, 'interval': '1d', 'ts': pd.to_datetime(stamps, utc=True),
+            'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 10,
+        }))
+
+    def test_gaps_across_the_universe(self):
+        ibm = Security.objects.create(symbol='IBM', exchange='NYSE')
+        btc = Security.objects.create(symbol='BTC', asset_class='crypto')
+        listed = Security.objects.create(symbol='NEW', exchange='NASDAQ')
+        # 2024-07-04 is a holiday; 07-05 and 07-09 are missing, 07-06 is a Saturday
+        self.store(ibm, ['2024-07-01', '2024-07-02', '2024-07-03', '2024-07-06', '2024-07-08'])
+        self.store(btc, ['2024-07-01', '2024-07-02', '2024-07-03', '2024-07-04', '2024-07-05', '2024-07-06',
+                         '2024-07-07', '2024-07-08', '2024-07-09'])
+        self.store(listed, ['2024-07-08', '2024-07-09'])
+
+        report = find_missing_bars('1d', '2024-06-28', '2024-07-10')
+        summary = report.summary.set_index('security_id')
+        self.assertEqual(summary.loc[ibm.pk, ['bars', 'expected', 'missing', 'unexpected']].tolist(), [4, 6, 2, 1])
+        self.assertEqual(summary.loc[btc.pk, 'missing'], 0)
+        self.assertEqual(summary.loc[listed.pk, ['expected', 'missing']].tolist(), [2, 0])
+        gaps = report.gaps
+        self.assertEqual(gaps['security_id'].tolist(), [ibm.pk, ibm.pk])
+        self.assertEqual(gaps['start'].dt.day.tolist(), [5, 9])
+        self.assertEqual(gaps['bars'].tolist(), [1, 1])
+
+        report = find_missing_bars('1d', '2024-06-28', '2024-07-10', security_ids=[listed.pk], batch_size=1)
+        self.assertEqual(len(report.summary), 1)
+        self.assertTrue(report.gaps.empty)
+
+
+class ConsolidationTests(TestCase):
+    """Golden bars picked field by field from the vendors' bars"""
+
+    def setUp(self):
+        self.security = Security.objects.create(symbol='IBM', exchange='NYSE')
+
+    def store(self, vendor, close, volume=100, **prices):
+        upsert_vendor_bars(pd.DataFrame([{
+            'security_id': self.security.pk, 'interval': '1d', 'ts': pd.Timestamp('2024-07-01', tz='UTC'),
+            'open': close, 'high': close, 'low': close, 'close': close, 'volume': volume, **prices,
+        }]), vendor)
+
+    def golden(self):
+        return Bar.objects.get(security=self.security)
+
+    def test_vendor_and_field_priority(self):
+        self.store('yahoo_finance', 10.0, volume=500)
+        self.store('alpha_vantage', 10.2, volume=0, high=11.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            changed = consolidate([self.security.pk], '1d', priority=['alpha_vantage', 'yahoo_finance'],
+                                  field_priority={'volume': ['yahoo_finance']})
+        self.assertEqual(changed, 1)
+        bar = self.golden()
+        self.assertEqual((bar.open, bar.high, bar.close, bar.volume), (10.2, 11.0, 10.2, 500))
+
+        # Unchanged inputs rewrite nothing; a lower-priority revision does not win
+        self.assertEqual(consolidate([self.security.pk], '1d', priority=['alpha_vantage', 'yahoo_finance'],
+                                     field_priority={'volume': ['yahoo_finance']}), 0)
+        self.store('yahoo_finance', 9.0)
+        consolidate([self.security.pk], '1d', priority=['alpha_vantage'])
+        self.assertEqual(self.golden().close, 10.2)
+        with self.assertRaises(ValueError):
+            consolidate([self.security.pk], '1d', field_priority={'vwap': ['yahoo_finance']})
+
+    def test_revision_window_and_ohlc_consistency(self):
+        self.store('alpha_vantage', 10.0)
+        VendorBar.objects.update(received_at=dj_timezone.now() - timedelta(days=2))
+        # The later revision's open is above the preferred vendor's high
+        self.store('yahoo_finance', 10.5, open=12.0, high=12.0)
+
+        consolidate([self.security.pk], '1d', priority=['alpha_vantage', 'yahoo_finance'])
+        bar = self.golden()
+        self.assertEqual((bar.open, bar.close), (10.0, 10.0))
+
+        consolidate([self.security.pk], '1d', priority=['alpha_vantage', 'yahoo_finance'],
+                    revision_window=timedelta(hours=1))
+        bar = self.golden()
+        self.assertEqual((bar.open, bar.high, bar.low, bar.close), (12.0, 12.0, 10.5, 10.5))
+
+        consolidate([self.security.pk], '1d', priority=['alpha_vantage', 'yahoo_finance'],
+                    field_priority={'open': ['yahoo_finance']})
+        bar = self.golden()
+        self.assertEqual((bar.open, bar.high, bar.low, bar.close), (12.0, 12.0, 10.0, 10.0))
+
+
+class MacroSeriesTests(TestCase):
+    """Vintages of macro series and point-in-time reads"""
+
+    GDP = {'observations': [
+        {'date': '2024-01-01', 'value': '100.0', 'realtime_start': '2024-04-25', 'realtime_end': '2024-05-29'},
+        {'date': '2024-01-01', 'value': '101.0', 'realtime_start': '2024-05-30', 'realtime_end': '2024-06-26'},
+        {'date': '2024-01-01', 'value': '102.0', 'realtime_start': '2024-06-27', 'realtime_end': '9999-12-31'},
+        {'date': '2024-04-01', 'value': '.', 'realtime_start': '2024-07-25', 'realtime_end': '2024-08-28'},
+        {'date': '2024-04-01', 'value': '105.0', 'realtime_start': '2024-08-29', 'realtime_end': '9999-12-31'},
+    ]}
+
+    def test_parse_and_reload(self):
+        frame = parse_observations(self.GDP)
+        self.assertTrue(np.isnan(frame['value'][3]))
+        self.assertEqual(frame['realtime_end'].tolist()[1:3], [date(2024, 6, 26), None])
+
+        series, changed = load_series('GDP', frame=frame, title='Gross Domestic Product')
+        self.assertEqual(changed, 5)
+        self.assertEqual(load_series('GDP', frame=frame)[1], 0)
+        # A revision closes the current vintage and opens a new one
+        revised = parse_observations({'observations': [
+            {'date': '2024-04-01', 'value': '105.0', 'realtime_start': '2024-08-29', 'realtime_end': '2024-09-25'},
+            {'date': '2024-04-01', 'value': '106.0', 'realtime_start': '2024-09-26', 'realtime_end': '9999-12-31'},
+        ]})
+        self.assertEqual(load_series('GDP', frame=revised)[1], 2)
+        self.assertEqual(series.observations.filter(realtime_end__isnull=True).count(), 2)
+        with self.assertRaises(VendorError):
+            parse_observations({'error_code': 400, 'error_message': 'Bad Request. The series does not exist.'})
+
+    def test_load_command_reads_csv_exports(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp, 'gdp.csv')
+            path.write_text(
+                'date,value,realtime_start,realtime_end\n'
+                + ''.join(f"{row['date']},{row['value']},{row['realtime_start']},{row['realtime_end']}\n"
+                          for row in self.GDP['observations'])
+            )
+            call_command('load_macro_series', 'GDP', '--file', str(path), stdout=io.StringIO())
+            series = EconomicSeries.objects.get(code='GDP')
+            self.assertEqual(series.observations.count(), 5)
+            self.assertEqual(series.observations.filter(realtime_end__isnull=True).count(), 2)
+            self.assertEqual(series.observations.filter(value__isnull=True).count(), 1)
+
+            # A column left entirely empty parses as open-ended vintages
+            path.write_text('date,value,realtime_start,realtime_end\n2024-07-01,107.0,2024-10-30,\n')
+            call_command('load_macro_series', 'GDP', '--file', str(path), stdout=io.StringIO())
+            self.assertTrue(series.observations.get(date=date(2024, 7, 1)).realtime_end is None)
+
+            path.write_text('date,value,realtime_start,realtime_end\nnot-a-date,1,2024-10-30,\n')
+            with self.assertRaises(CommandError):
+                call_command('load_macro_series', 'GDP', '--file', str(path), stdout=io.StringIO())
+
+    def test_as_of_uses_only_values_known_at_each_time(self):
+        load_series('GDP', frame=parse_observations(self.GDP))
+        load_series('UNRATE', frame=parse_observations({'observations': [
+            {'date': '2024-05-01', 'value': '4.0', 'realtime_start': '2024-06-07', 'realtime_end': '9999-12-31'},
+        ]}))
+        stamps = pd.to_datetime([
+            '2024-09-01 00:00', '2024-07-27 00:00', '2024-07-01 00:00', '2024-06-01 00:00', '2024-04-26 00:00',
+            '2024-04-25 12:00',
+        ], utc=True)
+
+        known = as_of(['GDP', 'UNRATE'], stamps)
+        self.assertTrue(known.index.equals(stamps))
+        np.testing.assert_array_equal(known['GDP'], [105.0, np.nan, 102.0, 101.0, 100.0, np.nan])
+        np.testing.assert_array_equal(known['UNRATE'], [4.0, 4.0, 4.0, np.nan, np.nan, np.nan])
+        self.assertEqual(as_of(['GDP'], stamps[-1:], lag=timedelta(0))['GDP'].tolist(), [100.0])
+        with self.assertRaises(LookupError):
+            as_of(['CPIAUCSL'], stamps)
+
+
+class HotBarCacheTests(APITestCase):
+    """Recent bars are served from memory and kept current by writes"""
+
+    def setUp(self):
+        hot_bars.clear()
+        self.addCleanup(hot_bars.clear)
+        self.security = Security.objects.create(symbol='IBM')
+        self.store(['2024-05-01 13:30', '2024-05-01 13:31', '2024-05-01 13:32'], [10.0, 10.5, 11.0])
+
+    def store(self, stamps, closes):
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(pd.DataFrame({
+                'security_id': self.security.pk, 'interval': '1min',
+                'ts': pd.to_datetime(stamps, utc=True),
+                'open': closes, 'high': closes, 'low': closes, 'close': closes, 'volume': 10,
+            }))
+
+    def test_hits_skip_the_database_and_writes_go_through(self):
+        before = hot_bars.stats()
+        self.assertEqual([bar.close for bar in hot_bars.recent_bars('IBM', '1min', 2)], [10.5, 11.0])
+        self.assertEqual(hot_bars.latest('IBM', '1min').close, 11.0)
+        with self.assertNumQueries(0):
+            self.assertEqual(hot_bars.latest('IBM', '1min').close, 11.0)
+            self.assertEqual(len(hot_bars.recent_bars('IBM', '1min', 2)), 2)
+        self.assertIsNone(hot_bars.recent_bars('UNKNOWN', '1min', 2))
+
+        # A new bar and a correction are merged into every cached window
+        self.store(['2024-05-01 13:32', '2024-05-01 13:33'], [11.25, 12.0])
+        with self.assertNumQueries(0):
+            self.assertEqual([bar.close for bar in hot_bars.recent_bars('IBM', '1min', 2)], [11.25, 12.0])
+            self.assertEqual(hot_bars.latest('IBM', '1min').close, 12.0)
+
+        stats = hot_bars.stats()
+        self.assertEqual(stats['misses'] - before['misses'], 3)
+        self.assertEqual(stats['hits'] - before['hits'], 4)
+
+    def test_size_bound_counts_evictions(self):
+        cache = HotBarCache(maxsize=2, ttl=60)
+        for window in (1, 2, 3):
+            cache.recent_bars('IBM', '1min', window)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_quote_endpoints(self):
+        user = User.objects.create_user(username='quant', password='pw-not-used-1')
+        self.client.force_authenticate(user)
+        response = self.client.get('/market-data/quotes/IBM/', {'interval': '1min'})
+        self.assertEqual(response.json()['quote']['ts'], '2024-05-01T13:32:00Z')
+        response = self.client.get('/market-data/quotes/IBM/bars/', {'interval': '1min', 'window': 5})
+        self.assertEqual([bar['close'] for bar in response.json()], [10.0, 10.5, 11.0])
+        self.assertEqual(self.client.get('/market-data/quotes/stats/').status_code, 403)
+        self.assertIn(b'market_data_hot_bar_cache_hits_total', self.client.get('/market-data/metrics/').content)
+        self.assertEqual(self.client.get('/market-data/metrics/', REMOTE_ADDR='203.0.113.7').status_code, 403)
+
+
+class QuoteStreamTests(TestCase):
+    """Ticks and bar closes fan out to websocket subscribers without unbounded buffering"""
+
+    def test_slow_subscriber_gets_latest_per_series(self):
+        subscriber = Subscriber()
+        quotes = QuoteBroker()
+        quotes.subscribe(subscriber, ['IBM', 'MSFT'])
+        now = dj_timezone.now()
+        quotes.publish([tick_message(symbol, now, price) for price in (1, 2, 3) for symbol in ('IBM', 'MSFT', 'AAPL')])
+        batch = asyncio.run(subscriber.drain())
+        self.assertEqual(sorted((m['symbol'], m['price']) for m in batch), [('IBM', 3.0), ('MSFT', 3.0)])
+        self.assertEqual(subscriber.coalesced, 4)
+        quotes.unsubscribe(subscriber)
+        self.assertFalse(quotes.has_subscribers())
+
+    def test_websocket_subscribe_and_receive(self):
+        user = User.objects.create_user(username='quant', password='pw-not-used-1')
+        token = str(AccessToken.for_user(user))
+
+        async def session(query_string, commands):
+            quotes = QuoteBroker()
+            app = QuoteStreamApp(broker=quotes, flush_interval=0, listener=None)
+            inbox, sent = asyncio.Queue(), []
+            for event in [{'type': 'websocket.connect'}] + [
+                {'type': 'websocket.receive', 'text': json.dumps(command)} for command in commands
+            ]:
+                inbox.put_nowait(event)
+
+            async def send(event):
+                sent.append(event)
+                if event['type'] == 'websocket.send' and isinstance(json.loads(event['text']), dict):
+                    quotes.publish([tick_message('IBM', dj_timezone.now(), 101.5)])
+                elif event['type'] == 'websocket.send':
+                    inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+
+            scope = {'type': 'websocket', 'path': '/ws/quotes/', 'query_string': query_string.encode()}
+            await asyncio.wait_for(app(scope, inbox.get, send), timeout=5)
+            self.assertFalse(quotes.has_subscribers())
+            return sent
+
+        sent = asyncio.run(session('token=bad', []))
+        self.assertEqual(sent, [{'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED}])
+
+        sent = asyncio.run(session(f'token={token}', [{'action': 'subscribe', 'symbols': ['IBM']}]))
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
+        self.assertEqual(json.loads(sent[1]['text']), {'type': 'subscribed', 'symbols': ['IBM']})
+        self.assertEqual([(m['symbol'], m['price']) for m in json.loads(sent[2]['text'])], [('IBM', 101.5)])
+
+    def test_committed_bars_are_published(self):
+        security = Security.objects.create(symbol='IBM')
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscriber = Subscriber()
+        broker.bind(loop)
+        broker.subscribe(subscriber, ['IBM'])
+        self.addCleanup(broker.unsubscribe, subscriber)
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(pd.DataFrame({
+                'security_id': security.pk, 'interval': '1min',
+                'ts': pd.to_datetime(['2024-05-01 13:30', '2024-05-01 13:31'], utc=True),
+                'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': [1.5, 1.75], 'volume': 10,
+            }))
+        batch = loop.run_until_complete(subscriber.drain())
+        self.assertEqual([(m['type'], m['ts'], m['close']) for m in batch], [('bar', '2024-05-01T13:31:00Z', 1.75)])
+
+
+class BarNotificationTests(TransactionTestCase):
+    """Bar closes committed in another process reach this process's subscribers over LISTEN"""
+
+    def setUp(self):
+        security = Security.objects.create(symbol='IBM')
+        self.frame = pd.DataFrame({
+            'security_id': security.pk, 'interval': '1min',
+            'ts': pd.to_datetime(['2024-05-01 13:30', '2024-05-01 13:31'], utc=True),
+            'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': [1.5, 1.75], 'volume': 10,
+        })
+
+    def listen(self, commit_elsewhere):
+        """Messages the IBM subscriber receives while ``commit_elsewhere`` runs in another thread"""
+        def run():
+            # Stands in for the ingestion command: its own connection, no local broker
+            try:
+                commit_elsewhere()
+            finally:
+                connection.close()
+
+        async def scenario():
+            quotes = QuoteBroker()
+            quotes.bind(asyncio.get_running_loop())
+            subscriber = Subscriber()
+            quotes.subscribe(subscriber, ['IBM'])
+            listener = BarListener(target=quotes)
+            task = listener.ensure_started()
+            try:
+                await asyncio.wait_for(listener.listening.wait(), timeout=5)
+                self.assertTrue(quotes.listening)
+                await asyncio.to_thread(run)
+                return await asyncio.wait_for(subscriber.drain(), timeout=5)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        return asyncio.run(scenario())
+
+    def test_notified_bars_reach_subscribers(self):
+        batch = self.listen(lambda: publish_bars(self.frame))
+        self.assertEqual([(m['type'], m['ts'], m['close']) for m in batch], [('bar', '2024-05-01T13:31:00Z', 1.75)])
+
+    def test_malformed_notifications_are_dropped(self):
+        def commit_elsewhere():
+            with connection.cursor() as cursor:
+                for payload in ('not json', '{"symbol": "IBM"}', '[{"type": "bar"}]'):
+                    cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+            publish_bars(self.frame)
+
+        with self.assertLogs('market_data.streaming', 'ERROR') as logs:
+            batch = self.listen(commit_elsewhere)
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual([(m['type'], m['close']) for m in batch], [('bar', 1.75)])
@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import SecurityViewSet, CorporateActionViewSet, QuoteViewSet, metrics
+
+router = DefaultRouter()
+router.register(r'securities', SecurityViewSet, basename='security')
+router.register(r'corporate-actions', CorporateActionViewSet, basename='corporate_action')
+router.register(r'quotes', QuoteViewSet, basename='quote')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('metrics/', metrics, name='market-data-metrics'),
+]
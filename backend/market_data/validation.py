@@ -0,0 +1,270 @@
+"""
+Vectorised validation of vendor bars before they are stored.
+
+Each rule takes a batch of bars sorted by (security_id, interval, ts) and
+returns a boolean array of the rows it rejects, computed with whole-column
+NumPy operations; no rule loops over rows. The ingestion writer runs the
+rules over every batch it flushes (market_data.ingestion.store), writes the
+rows that pass and upserts the rejected ones into QuarantinedBar together
+with the names of the rules they failed.
+
+Rules:
+
+``duplicate_ts``       a (security, interval, ts) repeated in the batch; the last copy is kept
+``invalid_price``      a price that is not a positive finite number
+``ohlc_inconsistent``  high below max(open, close, low) or low above min(open, close)
+``zero_volume``        no volume but a price move, in a series that otherwise reports volume
+``spike``              a return with a robust z-score beyond SPIKE_THRESHOLD that the next
+                       bar reverses, in series with at least SPIKE_MIN_RETURNS returns; the
+                       scale is floored so that moves under SPIKE_MIN_MOVE never score
+``vendor_divergence``  a close more than DIVERGENCE_TOLERANCE away from the mean close other
+                       vendors reported for the same bar
+
+Time spent and rows rejected per rule are accumulated in ``validation_stats``,
+exported to Prometheus by ValidationStatsCollector.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+from prometheus_client.core import CounterMetricFamily
+
+from .bars import BAR_COLUMNS, BAR_KEY
+from .models import QuarantinedBar, VendorBar
+
+SPIKE_THRESHOLD = 10.0
+SPIKE_MIN_RETURNS = 20
+# Smallest log return that can be a spike. Series that are mostly unchanged
+# (illiquid securities, 1min bars) have a MAD of 0, which would otherwise score
+# every one-tick move that reverses as an infinite z-score.
+SPIKE_MIN_MOVE = 0.05
+DIVERGENCE_TOLERANCE = 0.05
+
+# Median absolute deviation to standard deviation for normal data
+MAD_SCALE = 1.4826
+
+_STORED_CLOSES_SQL = """
+SELECT k.position, avg(v.close)
+  FROM unnest(%s::int[], %s::bigint[], %s::varchar[], %s::timestamptz[]) AS k(position, security_id, "interval", ts)
+  JOIN {table} v ON v.security_id = k.security_id AND v."interval" = k."interval" AND v.ts = k.ts
+ WHERE v.vendor <> %s
+ GROUP BY k.position
+"""
+
+
+class Batch:
+    """Column arrays of a sorted bar batch and per-series bookkeeping shared by the rules"""
+
+    def __init__(self, frame, reference=None):
+        self.frame = frame
+        self.open, self.high, self.low, self.close = (
+            frame[column].to_numpy(dtype=float) for column in ('open', 'high', 'low', 'close')
+        )
+        self.volume = frame['volume'].to_numpy(dtype=float)
+        self.reference = reference
+        security_ids = frame['security_id'].to_numpy()
+        intervals = pd.factorize(frame['interval'])[0]
+        # Series number of each row and whether it starts its series
+        self.first = np.r_[
+            True, (security_ids[1:] != security_ids[:-1]) | (intervals[1:] != intervals[:-1])
+        ]
+        self.series = np.cumsum(self.first) - 1
+        self.last = np.r_[self.first[1:], True]
+
+    def previous(self, values):
+        """``values`` shifted one row down within each series, NaN on first rows"""
+        shifted = np.r_[np.nan, values[:-1]]
+        shifted[self.first] = np.nan
+        return shifted
+
+    def following(self, values):
+        shifted = np.r_[values[1:], np.nan]
+        shifted[self.last] = np.nan
+        return shifted
+
+
+def duplicate_ts(batch):
+    return batch.frame.duplicated(BAR_KEY, keep='last').to_numpy()
+
+
+def invalid_price(batch):
+    prices = np.column_stack([batch.open, batch.high, batch.low, batch.close])
+    return ~(np.isfinite(prices) & (prices > 0)).all(axis=1)
+
+
+def ohlc_inconsistent(batch):
+    return (
+        (batch.high < np.maximum(batch.open, batch.close))
+        | (batch.low > np.minimum(batch.open, batch.close))
+        | (batch.high < batch.low)
+    )
+
+
+def zero_volume(batch):
+    # Feeds without volume (FX, indices) report zero throughout and are left alone
+    reports_volume = np.bincount(batch.series, weights=batch.volume > 0) > 0
+    moved = batch.close != batch.previous(batch.close)
+    return (batch.volume <= 0) & reports_volume[batch.series] & moved & ~batch.first
+
+
+def spike(batch):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_close = np.log(np.where(batch.close > 0, batch.close, np.nan))
+    returns = log_close - batch.previous(log_close)
+    grouped = pd.Series(returns).groupby(batch.series)
+    median = grouped.transform('median').to_numpy()
+    deviation = np.abs(returns - median)
+    mad = pd.Series(deviation).groupby(batch.series).transform('median').to_numpy()
+    enough = grouped.transform('count').to_numpy() >= SPIKE_MIN_RETURNS
+    scale = np.maximum(MAD_SCALE * mad, SPIKE_MIN_MOVE / SPIKE_THRESHOLD)
+    z = (returns - median) / scale
+    following = batch.following(z)
+    return enough & (np.abs(z) > SPIKE_THRESHOLD) & (np.abs(following) > SPIKE_THRESHOLD) & (z * following < 0)
+
+
+def vendor_divergence(batch):
+    if batch.reference is None:
+        return np.zeros(len(batch.close), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.abs(batch.close / batch.reference - 1) > DIVERGENCE_TOLERANCE
+
+
+RULES = {
+    'duplicate_ts': duplicate_ts,
+    'invalid_price': invalid_price,
+    'ohlc_inconsistent': ohlc_inconsistent,
+    'zero_volume': zero_volume,
+    'spike': spike,
+    'vendor_divergence': vendor_divergence,
+}
+
+
+@dataclass
+class ValidationResult:
+    valid: pd.DataFrame
+    # Rejected rows with a ``rules`` column listing the rules each failed
+    rejected: pd.DataFrame
+    seconds: dict = field(default_factory=dict)
+    rejected_by_rule: dict = field(default_factory=dict)
+
+
+class ValidationStats:
+    """Cumulative per-rule time and rejections of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.seconds = dict.fromkeys(RULES, 0.0)
+        self.rejected = dict.fromkeys(RULES, 0)
+
+    def record(self, rows, result):
+        with self._lock:
+            self.rows += rows
+            for rule, seconds in result.seconds.items():
+                self.seconds[rule] += seconds
+                self.rejected[rule] += result.rejected_by_rule[rule]
+
+    def stats(self):
+        with self._lock:
+            return {'rows': self.rows, 'seconds': dict(self.seconds), 'rejected': dict(self.rejected)}
+
+
+class ValidationStatsCollector:
+    """Prometheus collector for ValidationStats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def collect(self):
+        stats = self.stats.stats()
+        yield CounterMetricFamily('market_data_validation_rows', "Bars validated", value=stats['rows'])
+        seconds = CounterMetricFamily(
+            'market_data_validation_rule_seconds', "Time spent in each validation rule", labels=['rule'],
+        )
+        rejected = CounterMetricFamily(
+            'market_data_validation_rejected', "Bars rejected by each validation rule", labels=['rule'],
+        )
+        for rule in stats['seconds']:
+            seconds.add_metric([rule], stats['seconds'][rule])
+            rejected.add_metric([rule], stats['rejected'][rule])
+        yield seconds
+        yield rejected
+
+
+validation_stats = ValidationStats()
+
+
+def validate(frame, reference=None, rules=None):
+    """
+    Split a bar frame into valid and rejected rows.
+
+    ``reference`` is an array of closes aligned with ``frame`` (NaN where there
+    is nothing to compare) for the vendor_divergence rule. ``rules`` names the
+    rules to run, all of RULES by default.
+    """
+    rules = list(RULES) if rules is None else rules
+    order = np.lexsort((
+        pd.DatetimeIndex(frame['ts']).asi8, pd.factorize(frame['interval'])[0], frame['security_id'].to_numpy(),
+    ))
+    frame = frame.iloc[order]
+    batch = Batch(frame, None if reference is None else np.asarray(reference, dtype=float)[order])
+
+    masks, seconds = [], {}
+    for rule in rules:
+        started = time.perf_counter()
+        masks.append(RULES[rule](batch))
+        seconds[rule] = time.perf_counter() - started
+    flags = np.column_stack(masks) if masks else np.zeros((len(frame), 0), dtype=bool)
+    rejected = flags.any(axis=1)
+
+    names = np.array(rules, dtype=object)
+    result = ValidationResult(
+        valid=frame[~rejected],
+        rejected=frame[rejected].assign(rules=[list(names[row]) for row in flags[rejected]]),
+        seconds=seconds,
+        rejected_by_rule=dict(zip(rules, flags.sum(axis=0).tolist())),
+    )
+    validation_stats.record(len(frame), result)
+    return result
+
+
+def stored_closes(frame, vendor):
+    """
+    Mean close other vendors reported for each row of ``frame``, NaN where no
+    other vendor has the bar: the reference for vendor_divergence.
+    """
+    reference = np.full(len(frame), np.nan)
+    if frame.empty:
+        return reference
+    with connection.cursor() as cursor:
+        cursor.execute(_STORED_CLOSES_SQL.format(table=VendorBar._meta.db_table), [
+            list(range(len(frame))), frame['security_id'].tolist(), frame['interval'].tolist(),
+            frame['ts'].tolist(), vendor,
+        ])
+        found = np.array(cursor.fetchall(), dtype=float).reshape(-1, 2)
+    reference[found[:, 0].astype(np.int64)] = found[:, 1]
+    return reference
+
+
+def quarantine(rejected, vendor):
+    """Upsert rejected bars into QuarantinedBar"""
+    if rejected.empty:
+        return 0
+    rows = rejected[BAR_COLUMNS + ['rules']].drop_duplicates(BAR_KEY, keep='last')
+    values = rows.astype(object).where(rows.notna(), None)
+    QuarantinedBar.objects.bulk_create(
+        [
+            QuarantinedBar(
+                vendor=vendor, security_id=row.security_id, interval=row.interval, ts=row.ts,
+                open=row.open, high=row.high, low=row.low, close=row.close, volume=row.volume, rules=row.rules,
+            )
+            for row in values.itertuples(index=False)
+        ],
+        update_conflicts=True,
+        unique_fields=['vendor', 'security', 'interval', 'ts'],
+        update_fields=['open', 'high', 'low', 'close', 'volume', 'rules', 'updated_at'],
+    )
+    return len(rows)
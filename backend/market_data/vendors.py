@@ -0,0 +1,78 @@
+"""
+Market data vendor definitions loaded from ``settings.VENDORS_FILE``.
+
+Each entry of vendors.json names a vendor, its ``access_point_url`` template
+(``{DATASET}``, ``{SYMBOL}``, ``{INTERVAL}``, ``{OUTPUTSIZE}``, ``{API_KEY}``
+placeholders), the setting holding its API key and its rate limit. Entries
+without a URL template are placeholders and are not loaded.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+
+DEFAULT_RATE_LIMIT = {'requests': 1, 'per_seconds': 1}
+DEFAULT_MAX_CONNECTIONS = 4
+
+
+@dataclass(frozen=True)
+class Vendor:
+    key: str
+    name: str
+    url_template: str
+    api_key: str = ''
+    requests: int = 1
+    per_seconds: float = 1.0
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+
+    @property
+    def rate(self):
+        """Sustained requests per second"""
+        return self.requests / self.per_seconds
+
+    def url(self, dataset, symbol, interval='', outputsize='full'):
+        return self.url_template.format(
+            DATASET=dataset, SYMBOL=symbol, INTERVAL=interval or '', OUTPUTSIZE=outputsize,
+            API_KEY=self.api_key or '',
+        )
+
+
+def parse_vendors(config):
+    vendors = {}
+    for key, entry in config.items():
+        if not isinstance(entry, dict) or not entry.get('access_point_url'):
+            continue
+        rate_limit = {**DEFAULT_RATE_LIMIT, **entry.get('rate_limit', {})}
+        key_setting = entry.get('api_key_setting')
+        vendors[key] = Vendor(
+            key=key,
+            name=entry.get('name') or key,
+            url_template=entry['access_point_url'],
+            api_key=getattr(settings, key_setting, '') if key_setting else '',
+            requests=int(rate_limit['requests']),
+            per_seconds=float(rate_limit['per_seconds']),
+            max_connections=int(entry.get('max_connections', DEFAULT_MAX_CONNECTIONS)),
+        )
+    return vendors
+
+
+@lru_cache(maxsize=None)
+def load_vendors(path=None):
+    with open(path or settings.VENDORS_FILE) as fh:
+        return parse_vendors(json.load(fh))
+
+
+@lru_cache(maxsize=None)
+def vendor_keys(path=None):
+    """Keys of every vendor entry, placeholders included, e.g. for vendor symbol codes"""
+    with open(path or settings.VENDORS_FILE) as fh:
+        config = json.load(fh)
+    return frozenset(key for key, entry in config.items() if isinstance(entry, dict) and 'access_point_url' in entry)
+
+
+def get_vendor(key):
+    try:
+        return load_vendors()[key]
+    except KeyError:
+        raise LookupError(f"Vendor {key!r} is not configured in {settings.VENDORS_FILE}")
@@ -1,3 +1,122 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from .derived import get_bars
+from .models import CorporateAction, Security
+from .quotes import hot_bars
+from .reference import security_as_of, symbol_table
+from .serializers import (
+    BarQuerySerializer, CorporateActionSerializer, RecentBarsQuerySerializer, ResolveQuerySerializer,
+    SecuritySerializer
+)
+
+
+def bars_to_records(frame):
+    """Bar DataFrame (indexed by ts) as a list of JSON-ready dicts"""
+    frame = frame.reset_index()
+    frame['ts'] = frame['ts'].map(lambda ts: ts.isoformat().replace('+00:00', 'Z'))
+    return frame.to_dict('records')
+
+
+def recent_bar_to_dict(bar):
+    return {**bar._asdict(), 'ts': bar.ts.isoformat().replace('+00:00', 'Z')}
+
+
+class SecurityViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Security.objects.all()
+    serializer_class = SecuritySerializer
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=True, methods=['get'])
+    def bars(self, request, pk=None):
+        """Stored, resampled (``resample``/``base``) and split/dividend ``adjusted`` bars"""
+        query = BarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        security = get_object_or_404(self.get_queryset().only('security_id'), pk=pk)
+        params = query.validated_data
+        frame = get_bars(
+            security.pk, params['interval'], params['start'], params['end'],
+            base=params['base'], adjusted=params['adjusted'],
+        )
+        return Response(bars_to_records(frame))
+
+    @action(detail=False, methods=['get'])
+    def resolve(self, request):
+        """The security an identifier ``value`` named on ``as_of`` (today by default)"""
+        query = ResolveQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        if 'as_of' in params:
+            security_id = security_as_of(params['value'], params['as_of'], params['id_type'], params['namespace'])
+        else:
+            security_id = symbol_table.lookup(
+                [params['value']], params['id_type'], params['namespace'],
+            ).get(params['value'])
+        if security_id is None:
+            raise Http404
+        security = get_object_or_404(self.get_queryset(), pk=security_id)
+        return Response(self.get_serializer(security).data)
+
+
+class CorporateActionViewSet(viewsets.ModelViewSet):
+    queryset = CorporateAction.objects.all()
+    serializer_class = CorporateActionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = self.queryset
+        security = self.request.query_params.get('security')
+        if security:
+            queryset = queryset.filter(security_id=security)
+        return queryset
+
+
+class QuoteViewSet(viewsets.ViewSet):
+    """Latest quote and recent bars per symbol, served from the hot bar cache"""
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'symbol'
+    lookup_value_regex = '[^/]+'
+
+    def retrieve(self, request, symbol=None):
+        query = RecentBarsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        bars = hot_bars.recent_bars(symbol, query.validated_data['interval'], 1)
+        if bars is None:
+            raise Http404
+        return Response({
+            'symbol': symbol,
+            'interval': query.validated_data['interval'],
+            'quote': recent_bar_to_dict(bars[-1]) if bars else None,
+        })
+
+    @action(detail=True, methods=['get'])
+    def bars(self, request, symbol=None):
+        query = RecentBarsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        bars = hot_bars.recent_bars(symbol, query.validated_data['interval'], query.validated_data['window'])
+        if bars is None:
+            raise Http404
+        return Response([recent_bar_to_dict(bar) for bar in bars])
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def stats(self, request):
+        """Hit/miss/eviction counters for sizing the cache"""
+        return Response(hot_bars.stats())
+
+
+def metrics(request):
+    """
+    Prometheus exposition of this process's metrics (hot bar cache counters).
+
+    Scrapers carry no API credentials, so access is limited to the client
+    addresses in settings.METRICS_ALLOWED_IPS.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(REGISTRY), content_type=CONTENT_TYPE_LATEST)
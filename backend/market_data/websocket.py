@@ -0,0 +1,98 @@
+"""
+Websocket endpoint streaming ticks and bar closes (mounted in config.asgi).
+
+Clients connect to ``/ws/quotes/?token=<JWT access token>`` and send JSON
+commands::
+
+    {"action": "subscribe", "symbols": ["IBM", "MSFT"]}
+    {"action": "unsubscribe", "symbols": ["MSFT"]}
+
+and receive JSON arrays of tick/bar messages (market_data.streaming). Messages
+are flushed at most every ``flush_interval`` seconds; updates arriving in
+between replace each other per series, so a slow client gets fewer, fresher
+messages rather than a growing backlog.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .streaming import Subscriber, bar_listener, broker
+
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+# Application close codes
+CLOSE_UNAUTHORIZED = 4401
+
+
+def jwt_user_id(scope):
+    """User id from the ``token`` query parameter, or None"""
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    if not token:
+        return None
+    try:
+        return AccessToken(token)[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+
+class QuoteStreamApp:
+    def __init__(self, broker=broker, authenticate=jwt_user_id, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 listener=bar_listener):
+        self.broker = broker
+        self.listener = listener
+        self.authenticate = authenticate
+        self.flush_interval = flush_interval
+
+    async def _sender(self, subscriber, send):
+        while True:
+            batch = await subscriber.drain()
+            await send({'type': 'websocket.send', 'text': json.dumps(batch)})
+            await asyncio.sleep(self.flush_interval)
+
+    def _command(self, subscriber, text):
+        try:
+            command = json.loads(text)
+            symbols = [str(symbol) for symbol in command.get('symbols', [])]
+            if command.get('action') == 'subscribe':
+                self.broker.subscribe(subscriber, symbols)
+            elif command.get('action') == 'unsubscribe':
+                self.broker.unsubscribe(subscriber, symbols)
+            else:
+                return {'type': 'error', 'error': "action must be subscribe or unsubscribe"}
+        except (ValueError, AttributeError, TypeError) as exc:
+            return {'type': 'error', 'error': str(exc)}
+        return {'type': 'subscribed', 'symbols': sorted(subscriber.symbols)}
+
+    async def __call__(self, scope, receive, send):
+        event = await receive()
+        if event['type'] != 'websocket.connect':
+            return
+        if self.authenticate(scope) is None:
+            await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+            return
+        await send({'type': 'websocket.accept'})
+        self.broker.bind(asyncio.get_running_loop())
+        if self.listener is not None:
+            # Bar closes are committed by the ingestion processes and arrive over LISTEN
+            self.listener.ensure_started()
+
+        subscriber = Subscriber()
+        sender = asyncio.create_task(self._sender(subscriber, send))
+        try:
+            while True:
+                event = await receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    reply = self._command(subscriber, event.get('text') or event.get('bytes') or '')
+                    await send({'type': 'websocket.send', 'text': json.dumps(reply)})
+        finally:
+            self.broker.unsubscribe(subscriber)
+            sender.cancel()
+
+
+quote_stream = QuoteStreamApp()
@@ -1,3 +1,24 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import FeatureSeries, FeatureSet, MLModel
+
+
+@admin.register(FeatureSet)
+class FeatureSetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'version', 'updated_at')
+    readonly_fields = ('version',)
+
+
+@admin.register(FeatureSeries)
+class FeatureSeriesAdmin(admin.ModelAdmin):
+    list_display = ('feature_set', 'version', 'security', 'interval', 'last_ts', 'rows')
+    list_filter = ('interval',)
+    search_fields = ('security__symbol',)
+    exclude = ('state',)
+
+
+@admin.register(MLModel)
+class MLModelAdmin(admin.ModelAdmin):
+    list_display = ('name', 'version', 'feature_set', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name',)
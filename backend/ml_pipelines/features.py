@@ -0,0 +1,185 @@
+"""
+Columnar store of precomputed indicator features.
+
+Features of a FeatureSet version are kept per (interval, security, year) as
+zstd-compressed Parquet files under ``settings.FEATURE_STORE_DIR``::
+
+    <version>/<interval>/<security_id>/<year>.parquet
+
+FeatureSeries records, per series, the last bar computed and the indicator
+kernels' state after it (ml_pipelines.indicators). update() reads only the
+stored bars after that bar, continues the kernels from the saved state and
+rewrites just the year partitions the new rows fall in, so keeping a series
+current costs its new bars rather than its history. Training jobs read
+features with load_features().
+
+Stored bars are taken as final, so update() only computes bars that have
+closed: the bar still forming, which later ingestion runs rewrite, is left for
+the next update. After a correction to bars that were already computed,
+rebuild the series (rebuild(), or ``build_features --rebuild``).
+"""
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from market_data.cache import to_utc
+from market_data.derived import get_bars
+from market_data.marks import INTERVAL_DURATIONS
+from market_data.models import Bar
+
+from .indicators import check_definition, compute
+from .models import FeatureSeries
+
+COMPRESSION = 'zstd'
+
+
+def completed_before(interval, now=None):
+    """Exclusive upper bound on the start of bars of ``interval`` that have closed by ``now``"""
+    now = to_utc(now if now is not None else timezone.now())
+    # Bars are keyed on their start; one starting at ``now - duration`` has just closed
+    return now - INTERVAL_DURATIONS[interval] + timedelta(microseconds=1)
+
+
+def _empty():
+    return pd.DataFrame(index=pd.DatetimeIndex([], tz='UTC', name='ts'))
+
+
+class FeatureStore:
+    def __init__(self, root=None):
+        self.root = Path(root or settings.FEATURE_STORE_DIR)
+
+    def directory(self, version, interval, security_id):
+        return self.root / version / interval / str(security_id)
+
+    def path(self, version, interval, security_id, year):
+        return self.directory(version, interval, security_id) / f'{year}.parquet'
+
+    def _read_partition(self, path):
+        try:
+            table = pq.read_table(path, memory_map=True)
+        except FileNotFoundError:
+            return None
+        return table.to_pandas(split_blocks=True, self_destruct=True).set_index('ts')
+
+    def _write_partition(self, path, frame):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        table = pa.Table.from_pandas(frame.reset_index(), preserve_index=False)
+        pq.write_table(table, tmp, compression=COMPRESSION)
+        os.replace(tmp, path)
+
+    def _append(self, version, interval, security_id, frame, after):
+        """
+        Write ``frame`` behind the stored rows up to ``after`` in each year it
+        touches; rows past ``after`` are leftovers of an update that did not commit.
+        """
+        for year, rows in frame.groupby(frame.index.year, sort=True):
+            path = self.path(version, interval, security_id, year)
+            existing = self._read_partition(path)
+            if existing is not None and after is not None:
+                rows = pd.concat([existing[existing.index <= after], rows])
+            self._write_partition(path, rows)
+
+    def _series(self, feature_set, security_id, interval):
+        return FeatureSeries.objects.filter(
+            feature_set=feature_set, version=feature_set.version, security_id=security_id, interval=interval,
+        )
+
+    def read(self, feature_set, security_id, interval, start=None, end=None):
+        """Stored features of one series with ``start <= ts < end`` as a DataFrame indexed by ts"""
+        last_ts = self._series(feature_set, security_id, interval).values_list('last_ts', flat=True).first()
+        if last_ts is None:
+            return _empty()
+        start = to_utc(start) if start is not None else None
+        end = to_utc(end) if end is not None else None
+        paths = sorted(
+            self.directory(feature_set.version, interval, security_id).glob('*.parquet'),
+            key=lambda path: int(path.stem),
+        )
+        paths = [
+            path for path in paths
+            if (start is None or int(path.stem) >= start.year) and (end is None or int(path.stem) <= end.year)
+        ]
+        if not paths:
+            return _empty()
+        frame = pa.concat_tables([pq.read_table(path, memory_map=True) for path in paths]).to_pandas(
+            split_blocks=True, self_destruct=True,
+        ).set_index('ts')
+        mask = frame.index <= last_ts
+        if start is not None:
+            mask &= frame.index >= start
+        if end is not None:
+            mask &= frame.index < end
+        return frame[mask]
+
+    def update(self, feature_set, security_id, interval, end=None):
+        """
+        Compute the features of closed stored bars before ``end`` not computed
+        yet; returns the rows added.
+        """
+        check_definition(feature_set.definition)
+        end = min(to_utc(end), completed_before(interval)) if end is not None else completed_before(interval)
+        with db_transaction.atomic():
+            # Locking the series row serialises updates of one series
+            series, _ = FeatureSeries.objects.select_for_update().get_or_create(
+                feature_set=feature_set, version=feature_set.version, security_id=security_id, interval=interval,
+            )
+            if series.last_ts is None:
+                start = (
+                    Bar.objects.filter(security_id=security_id, interval=interval)
+                    .order_by('ts').values_list('ts', flat=True).first()
+                )
+                if start is None:
+                    return 0
+            else:
+                start = series.last_ts + timedelta(microseconds=1)
+            if start >= end:
+                return 0
+            bars = get_bars(security_id, interval, start, end)
+            if bars.empty:
+                return 0
+
+            features, state = compute(feature_set.definition, bars, series.state)
+            self._append(feature_set.version, interval, security_id, features, series.last_ts)
+            series.last_ts = bars.index[-1].to_pydatetime()
+            series.rows += len(features)
+            series.state = state
+            series.save(update_fields=['last_ts', 'rows', 'state', 'updated_at'])
+        return len(features)
+
+    def rebuild(self, feature_set, security_id, interval, end=None):
+        """Drop a series' stored features and compute them again from its first bar"""
+        with db_transaction.atomic():
+            self._series(feature_set, security_id, interval).delete()
+            shutil.rmtree(self.directory(feature_set.version, interval, security_id), ignore_errors=True)
+        return self.update(feature_set, security_id, interval, end)
+
+
+def get_store():
+    return FeatureStore()
+
+
+def load_features(feature_set, security_ids, interval, start=None, end=None, update=True):
+    """
+    Features of several securities indexed by (security_id, ts).
+
+    With ``update`` each series is first brought up to date, computing only
+    bars that arrived since its last update.
+    """
+    store = get_store()
+    frames = {}
+    for security_id in security_ids:
+        if update:
+            store.update(feature_set, security_id, interval)
+        frames[security_id] = store.read(feature_set, security_id, interval, start, end)
+    if not frames:
+        return _empty()
+    return pd.concat(frames, names=['security_id', 'ts'])
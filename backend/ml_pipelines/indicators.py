@@ -0,0 +1,211 @@
+"""
+Vectorised technical indicator kernels that can be resumed.
+
+Every kernel takes a chunk of bars (a dict of NumPy arrays) and the state it
+returned for the previous chunk, and returns its columns for the chunk plus the
+new state. Computing a series in one call or chunk by chunk gives the same
+values, so the feature store (ml_pipelines.features) only ever computes bars
+it has not seen. Exponential averages run as first-order IIR filters
+(``scipy.signal.lfilter``) started from the saved state; rolling windows keep
+the tail of their input.
+
+Definitions follow pandas_ta: RSI and ATR smooth with Wilder's moving average
+(``ewm(alpha=1 / length, min_periods=length)``), MACD lines are EMAs seeded
+with the SMA of their first ``length`` values. States are JSON-serialisable,
+with None for missing values.
+"""
+import hashlib
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# Bump when a kernel's output changes, so stored features are recomputed
+KERNEL_VERSION = 1
+
+
+def _float(value):
+    return None if value is None or math.isnan(value) else float(value)
+
+
+def _nan(value):
+    return np.nan if value is None else value
+
+
+def ewm_mean(values, alpha, min_periods, state=None):
+    """
+    ``pd.Series(values).ewm(alpha=alpha, min_periods=min_periods).mean()`` for
+    values whose NaNs all come first; state is (weighted sum, observations).
+    """
+    total, count = state or (0.0, 0)
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if not len(valid):
+        return out, [total, count]
+    first = valid[0]
+    beta = 1.0 - alpha
+    # Weighted sum s_t = x_t + beta * s_(t-1); the weights add up to (1 - beta^n) / alpha
+    sums, _ = lfilter([1.0], [1.0, -beta], values[first:], zi=[beta * total])
+    counts = count + np.arange(1, len(sums) + 1)
+    means = sums * alpha / (1.0 - beta ** counts)
+    out[first:] = np.where(counts >= min_periods, means, np.nan)
+    return out, [float(sums[-1]), int(counts[-1])]
+
+
+def ema(values, length, state=None):
+    """
+    pandas_ta ``ema``: SMA of the first ``length`` values, then
+    ``ewm(span=length, adjust=False)``; leading NaNs are skipped. State is
+    (last value, observations, sum of the seeding values).
+    """
+    value, count, seed = state or (None, 0, 0.0)
+    value = _nan(value)
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    offset = valid[0] if len(valid) else len(values)
+    rest = values[offset:]
+    if count < length:
+        head = rest[:length - count]
+        seed += float(head.sum())
+        count += len(head)
+        if count < length:
+            return out, [None, count, seed]
+        value = seed / length
+        offset += len(head)
+        out[offset - 1] = value
+        rest = rest[len(head):]
+    if len(rest):
+        alpha = 2.0 / (length + 1)
+        smoothed, _ = lfilter([alpha], [1.0, alpha - 1.0], rest, zi=[(1.0 - alpha) * value])
+        out[offset:] = smoothed
+        value = smoothed[-1]
+        count += len(rest)
+    return out, [_float(value), count, seed]
+
+
+def _changes(values, previous):
+    """First differences, the first against ``previous`` (NaN when there is none)"""
+    return np.diff(values, prepend=_nan(previous))
+
+
+def rsi(bars, state=None, length=14):
+    state = state or {}
+    change = _changes(bars['close'], state.get('close'))
+    gains, gain_state = ewm_mean(np.clip(change, 0.0, None), 1.0 / length, length, state.get('gains'))
+    losses, loss_state = ewm_mean(np.clip(change, None, 0.0), 1.0 / length, length, state.get('losses'))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = 100.0 * gains / (gains + np.abs(losses))
+    return {f'RSI_{length}': values}, {
+        'close': _float(bars['close'][-1]), 'gains': gain_state, 'losses': loss_state,
+    }
+
+
+def macd(bars, state=None, fast=12, slow=26, signal=9):
+    state = state or {}
+    close = bars['close']
+    fast_ema, fast_state = ema(close, fast, state.get('fast'))
+    slow_ema, slow_state = ema(close, slow, state.get('slow'))
+    line = fast_ema - slow_ema
+    signal_line, signal_state = ema(line, signal, state.get('signal'))
+    suffix = f'{fast}_{slow}_{signal}'
+    return {
+        f'MACD_{suffix}': line,
+        f'MACDh_{suffix}': line - signal_line,
+        f'MACDs_{suffix}': signal_line,
+    }, {'fast': fast_state, 'slow': slow_state, 'signal': signal_state}
+
+
+def true_range(high, low, close, previous_close=None):
+    """max(high - low, |high - previous close|, |low - previous close|); NaN without a previous close"""
+    previous = np.r_[_nan(previous_close), close[:-1]]
+    ranges = np.stack([high - low, np.abs(high - previous), np.abs(low - previous)])
+    values = ranges.max(axis=0)
+    values[np.isnan(previous)] = np.nan
+    return values
+
+
+def atr(bars, state=None, length=14):
+    state = state or {}
+    ranges = true_range(bars['high'], bars['low'], bars['close'], state.get('close'))
+    values, range_state = ewm_mean(ranges, 1.0 / length, length, state.get('ranges'))
+    return {f'ATRr_{length}': values}, {'close': _float(bars['close'][-1]), 'ranges': range_state}
+
+
+def volatility(bars, state=None, length=20):
+    """Rolling standard deviation (ddof=1) of log close-to-close returns"""
+    tail = np.array([_nan(value) for value in (state or {}).get('tail', [])], dtype=float)
+    closes = np.r_[tail, bars['close']]
+    returns = np.diff(np.log(closes), prepend=np.nan)
+    values = np.full(len(closes), np.nan)
+    if len(returns) >= length:
+        values[length - 1:] = sliding_window_view(returns, length).std(axis=1, ddof=1)
+    return {f'VOL_{length}': values[len(tail):]}, {'tail': [_float(value) for value in closes[-length:]]}
+
+
+INDICATORS = {
+    'rsi': rsi,
+    'macd': macd,
+    'atr': atr,
+    'volatility': volatility,
+}
+
+DEFAULT_DEFINITION = [
+    {'kind': 'rsi', 'length': 14},
+    {'kind': 'macd', 'fast': 12, 'slow': 26, 'signal': 9},
+    {'kind': 'atr', 'length': 14},
+    {'kind': 'volatility', 'length': 20},
+]
+
+# One bar to validate kernel parameters against
+_EMPTY_BARS = {field: np.array([1.0]) for field in ('open', 'high', 'low', 'close', 'volume')}
+
+
+def spec_key(spec):
+    """``{'kind': 'rsi', 'length': 14}`` -> ``'rsi_14'``"""
+    parameters = [str(spec[name]) for name in sorted(spec) if name != 'kind']
+    return '_'.join([spec['kind'], *parameters])
+
+
+def check_definition(definition):
+    """Raise ValueError unless ``definition`` is a list of known indicators with valid parameters"""
+    if not isinstance(definition, list) or not definition:
+        raise ValueError("A feature definition is a non-empty list of indicators")
+    for spec in definition:
+        kind = spec.get('kind') if isinstance(spec, dict) else None
+        if kind not in INDICATORS:
+            raise ValueError(f"Unknown indicator {kind!r}")
+        parameters = {name: value for name, value in spec.items() if name != 'kind'}
+        if any(not isinstance(value, int) or value < 1 for value in parameters.values()):
+            raise ValueError(f"Indicator parameters must be positive integers: {spec}")
+        try:
+            INDICATORS[kind](_EMPTY_BARS, None, **parameters)
+        except TypeError:
+            raise ValueError(f"Invalid parameters for {kind!r}: {sorted(parameters)}")
+
+
+def definition_hash(definition):
+    """Version of a feature definition: changes whenever its indicators or the kernels do"""
+    payload = json.dumps([KERNEL_VERSION, definition], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+
+def compute(definition, bars, states=None):
+    """
+    Columns of every indicator in ``definition`` for a ts-indexed OHLCV frame.
+
+    ``states`` maps spec_key() to the state each kernel returned for the
+    previous chunk; returns (features frame, new states).
+    """
+    states = states or {}
+    arrays = {field: bars[field].to_numpy(dtype=float) for field in ('open', 'high', 'low', 'close', 'volume')}
+    columns, new_states = {}, {}
+    for spec in definition:
+        key = spec_key(spec)
+        parameters = {name: value for name, value in spec.items() if name != 'kind'}
+        values, new_states[key] = INDICATORS[spec['kind']](arrays, states.get(key), **parameters)
+        columns.update(values)
+    return pd.DataFrame(columns, index=bars.index), new_states
@@ -0,0 +1,217 @@
+"""
+Model serving with micro-batched predictions.
+
+The registry loads each registered MLModel's estimator once per process and
+pairs it with a MicroBatcher. Callers submit the rows of one request (often a
+single symbol's feature vector at a bar close); a batcher thread gathers the
+rows of concurrent requests until it has ``max_batch_size`` of them or the
+first has waited ``max_wait`` seconds, calls ``predict`` once on the stacked
+matrix and hands every request its slice of the result. Per-call overhead of
+the estimator (input validation, Python dispatch) is then paid per batch
+rather than per symbol.
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import Future
+from pathlib import Path
+
+import joblib
+import numpy as np
+from cachetools import TTLCache
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max
+
+from .models import MLModel
+
+# How long a process keeps resolving a model name to the same active version
+ACTIVE_VERSION_TTL = 30
+
+_Request = namedtuple('_Request', ['rows', 'future'])
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch_size=None, max_wait=None):
+        self._predict = predict
+        self.max_batch_size = max_batch_size or settings.INFERENCE_MAX_BATCH_SIZE
+        self.max_wait = settings.INFERENCE_MAX_WAIT if max_wait is None else max_wait
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.rows = 0
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a forked worker, which does not inherit threads
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.SimpleQueue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, rows):
+        """Queue a 2-D array of rows; returns a Future of their predictions"""
+        rows = np.asarray(rows, dtype=float)
+        if rows.ndim != 2:
+            raise ValueError("Rows must be a 2-D array")
+        future = Future()
+        self._ensure_thread()
+        self._queue.put(_Request(rows, future))
+        return future
+
+    def predict(self, rows, timeout=None):
+        return self.submit(rows).result(timeout)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        pending = self._queue
+        while True:
+            first = pending.get()
+            if first is _STOP:
+                return
+            batch, size = [first], len(first.rows)
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while size < self.max_batch_size:
+                try:
+                    request = pending.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stop = True
+                    break
+                batch.append(request)
+                size += len(request.rows)
+            self._execute(batch)
+            if stop:
+                return
+
+    def _execute(self, batch):
+        # Requests whose caller gave up (e.g. a timed-out async view) are dropped
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            rows = batch[0].rows if len(batch) == 1 else np.concatenate([request.rows for request in batch])
+            predictions = np.asarray(self._predict(rows))
+        except Exception as exc:
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+        self.batches += 1
+        self.rows += len(rows)
+        offset = 0
+        for request in batch:
+            request.future.set_result(predictions[offset:offset + len(request.rows)])
+            offset += len(request.rows)
+
+
+class LoadedModel:
+    def __init__(self, model, estimator):
+        self.model = model
+        self.estimator = estimator
+        self.batcher = MicroBatcher(estimator.predict)
+
+    def rows(self, instances):
+        """
+        Input matrix from a list of feature vectors, or of dicts keyed by the
+        model's feature names.
+        """
+        if instances and isinstance(instances[0], dict):
+            for position, instance in enumerate(instances):
+                if not isinstance(instance, dict):
+                    raise ValueError(f"Instance {position} is not an object")
+                missing = [name for name in self.model.features if name not in instance]
+                if missing:
+                    raise ValueError(f"Instance {position} is missing features: {', '.join(missing)}")
+            return np.array([[instance[name] for name in self.model.features] for instance in instances], dtype=float)
+        rows = np.array(instances, dtype=float)
+        if rows.ndim != 2 or (self.model.features and rows.shape[1] != len(self.model.features)):
+            raise ValueError(f"Expected rows of {len(self.model.features)} features")
+        return rows
+
+    def predict(self, instances, timeout=None):
+        return self.batcher.predict(self.rows(instances), timeout)
+
+
+class ModelRegistry:
+    """Per-process cache of loaded models, keyed on (name, version)"""
+
+    def __init__(self):
+        self._models = {}
+        self._active = TTLCache(maxsize=1024, ttl=ACTIVE_VERSION_TTL)
+        self._lock = threading.Lock()
+
+    def _active_version(self, name):
+        version = self._active.get(name)
+        if version is None:
+            version = (
+                MLModel.objects.filter(name=name, is_active=True)
+                .order_by('-version').values_list('version', flat=True).first()
+            )
+            if version is None:
+                raise MLModel.DoesNotExist(f"No active model named {name!r}")
+            self._active[name] = version
+        return version
+
+    def get(self, name, version=None):
+        """The loaded model ``name`` at ``version``, by default its latest active version"""
+        version = version or self._active_version(name)
+        loaded = self._models.get((name, version))
+        if loaded is None:
+            with self._lock:
+                loaded = self._models.get((name, version))
+                if loaded is None:
+                    model = MLModel.objects.get(name=name, version=version)
+                    estimator = joblib.load(Path(settings.MODEL_DIR) / model.artifact)
+                    loaded = self._models[(name, version)] = LoadedModel(model, estimator)
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            for loaded in self._models.values():
+                loaded.batcher.close()
+            self._models.clear()
+            self._active.clear()
+
+
+registry = ModelRegistry()
+
+
+def register_model(name, estimator, features, feature_set=None, description=''):
+    """Save an estimator under MODEL_DIR as the next version of ``name``"""
+    with db_transaction.atomic():
+        # Serialise version numbering per name on the existing rows
+        list(MLModel.objects.select_for_update().filter(name=name).values_list('pk', flat=True))
+        version = (MLModel.objects.filter(name=name).aggregate(latest=Max('version'))['latest'] or 0) + 1
+        artifact = f'{name}/{version}.joblib'
+        path = Path(settings.MODEL_DIR) / artifact
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # The first version of a name has no rows to lock, so two registrations
+        # can race to the same version. Each dumps to its own file and only the
+        # one whose insert passes the unique constraint moves it into place.
+        tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+        joblib.dump(estimator, tmp)
+        try:
+            model = MLModel.objects.create(
+                name=name, version=version, artifact=artifact, features=list(features),
+                feature_set=feature_set, description=description,
+            )
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        os.replace(tmp, path)
+        return model
@@ -0,0 +1,49 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market_data.models import Bar, Security
+from ml_pipelines.features import get_store
+from ml_pipelines.indicators import DEFAULT_DEFINITION, check_definition
+from ml_pipelines.models import FeatureSet
+
+
+class Command(BaseCommand):
+    help = "Bring stored indicator features up to date, computing only bars added since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help="Symbols to update (default: all active securities)")
+        parser.add_argument('--feature-set', default='default', help="Feature set name")
+        parser.add_argument('--definition', help="JSON list of indicators; creates or replaces the feature set")
+        parser.add_argument('--interval', default='1d', choices=[choice for choice, _ in Bar.INTERVALS])
+        parser.add_argument('--rebuild', action='store_true', help="Recompute the series from their first bar")
+
+    def handle(self, *args, **options):
+        feature_set = FeatureSet.objects.filter(name=options['feature_set']).first()
+        if options['definition'] or (feature_set is None and options['feature_set'] == 'default'):
+            try:
+                definition = json.loads(options['definition']) if options['definition'] else DEFAULT_DEFINITION
+                check_definition(definition)
+            except ValueError as exc:
+                raise CommandError(f"Invalid definition: {exc}")
+            feature_set, _ = FeatureSet.objects.update_or_create(
+                name=options['feature_set'], defaults={'definition': definition},
+            )
+        elif feature_set is None:
+            raise CommandError(f"Unknown feature set {options['feature_set']!r}; pass --definition to create it")
+
+        securities = Security.objects.filter(is_active=True)
+        if options['symbols']:
+            securities = Security.objects.filter(symbol__in=options['symbols'])
+        store = get_store()
+        update = store.rebuild if options['rebuild'] else store.update
+
+        started = time.perf_counter()
+        rows = series = 0
+        for security_id in securities.values_list('security_id', flat=True):
+            rows += update(feature_set, security_id, options['interval'])
+            series += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"{feature_set}: {rows} rows added to {series} series in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,112 @@
+import asyncio
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ml_pipelines.inference import MicroBatcher, register_model, registry
+from ml_pipelines.models import MLModel
+from users.models import User
+
+BENCHMARK_MODEL = 'inference-benchmark'
+
+
+def synthetic_model(features, seed=0):
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(5000, features))
+    y = (x @ rng.normal(size=features) + rng.normal(size=5000)) > 0
+    return LogisticRegression().fit(x, y)
+
+
+class Command(BaseCommand):
+    help = "Compare per-request predict() calls with micro-batched predictions from concurrent clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help="Single-row prediction requests")
+        parser.add_argument('--clients', type=int, default=64, help="Concurrent clients")
+        parser.add_argument('--features', type=int, default=16)
+        parser.add_argument('--batch-size', type=int, action='append', dest='batch_sizes',
+                            help="Max batch size to try (repeatable; default 1, 16, 64, 256)")
+        parser.add_argument('--max-wait', type=float, default=0.002, help="Max wait for a batch, in seconds")
+        parser.add_argument('--endpoint', action='store_true',
+                            help="Send the requests through the ASGI predict endpoint instead of calling the batcher")
+
+    def handle(self, *args, **options):
+        model = synthetic_model(options['features'])
+        rows = np.random.default_rng(1).normal(size=(options['requests'], 1, options['features']))
+        if options['endpoint']:
+            self.benchmark_endpoint(model, rows, options)
+        else:
+            self.benchmark_batcher(model, rows, options)
+
+    def benchmark_batcher(self, model, rows, options):
+        def run(predict):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['clients']) as pool:
+                list(pool.map(predict, rows))
+            return time.perf_counter() - started
+
+        elapsed = run(model.predict)
+        self.report('unbatched', options['requests'] / elapsed)
+        for batch_size in options['batch_sizes'] or [1, 16, 64, 256]:
+            batcher = MicroBatcher(model.predict, max_batch_size=batch_size, max_wait=options['max_wait'])
+            elapsed = run(batcher.predict)
+            batcher.close()
+            self.report(
+                f'batch <= {batch_size}', options['requests'] / elapsed,
+                f"  mean batch {batcher.rows / max(batcher.batches, 1):6.1f} rows",
+            )
+
+    def benchmark_endpoint(self, model, rows, options):
+        """
+        Concurrent HTTP requests through the full ASGI handler and middleware,
+        as under config.asgi. The model and user are committed for the run
+        (the view reads them from other threads) and deleted afterwards.
+        """
+        user = User.objects.create_user(username=f'{BENCHMARK_MODEL}-{time.monotonic_ns()}')
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        try:
+            with tempfile.TemporaryDirectory() as model_dir, override_settings(
+                MODEL_DIR=model_dir, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                register_model(BENCHMARK_MODEL, model, [f'f{i}' for i in range(options['features'])])
+                for batch_size in options['batch_sizes'] or [1, 16, 64, 256]:
+                    registry.clear()
+                    with override_settings(INFERENCE_MAX_BATCH_SIZE=batch_size, INFERENCE_MAX_WAIT=options['max_wait']):
+                        elapsed = asyncio.run(self.post_all(rows, headers, options['clients']))
+                        batcher = registry.get(BENCHMARK_MODEL).batcher
+                    self.report(
+                        f'http <= {batch_size}', options['requests'] / elapsed,
+                        f"  mean batch {batcher.rows / max(batcher.batches, 1):6.1f} rows",
+                    )
+        finally:
+            registry.clear()
+            MLModel.objects.filter(name=BENCHMARK_MODEL).delete()
+            user.delete()
+
+    async def post_all(self, rows, headers, clients):
+        client = AsyncClient(headers=headers)
+        slots = asyncio.Semaphore(clients)
+
+        async def post(row):
+            async with slots:
+                response = await client.post(
+                    f'/ml/models/{BENCHMARK_MODEL}/predict/', {'instances': row.tolist()},
+                    content_type='application/json',
+                )
+            if response.status_code != 200:
+                raise RuntimeError(f"predict returned {response.status_code}: {response.content[:200]!r}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(row) for row in rows))
+        return time.perf_counter() - started
+
+    def report(self, label, rate, extra=''):
+        self.stdout.write(f"{label:>14}: {rate:10,.0f} predictions/s{extra}")
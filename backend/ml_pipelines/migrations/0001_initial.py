@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('market_data', '0003_corporateaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureSet',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('feature_set_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('definition', models.JSONField(default=list)),
+                ('version', models.CharField(editable=False, max_length=16)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FeatureSeries',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('series_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('version', models.CharField(max_length=16)),
+                ('interval', models.CharField(max_length=8)),
+                ('last_ts', models.DateTimeField(blank=True, null=True)),
+                ('rows', models.PositiveBigIntegerField(default=0)),
+                ('state', models.JSONField(blank=True, default=dict)),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feature_series', to='market_data.security')),
+                ('feature_set', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='ml_pipelines.featureset')),
+            ],
+            options={
+                'verbose_name_plural': 'Feature series',
+                'constraints': [models.UniqueConstraint(fields=('feature_set', 'version', 'security', 'interval'), name='ml_pipelines_featureseries_uniq')],
+            },
+        ),
+    ]
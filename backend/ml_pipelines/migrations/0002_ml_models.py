@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_pipelines', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MLModel',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('version', models.PositiveIntegerField()),
+                ('artifact', models.CharField(max_length=500)),
+                ('features', models.JSONField(default=list)),
+                ('description', models.TextField(blank=True, default='')),
+                ('is_active', models.BooleanField(default=True)),
+                ('feature_set', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='models', to='ml_pipelines.featureset')),
+            ],
+            options={
+                'verbose_name': 'ML model',
+                'constraints': [models.UniqueConstraint(fields=('name', 'version'), name='ml_pipelines_mlmodel_name_version_uniq')],
+            },
+        ),
+    ]
@@ -1,3 +1,102 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 
-# Create your models here.
+from .indicators import check_definition, definition_hash
+
+
+# Base model for common fields
+class BaseModel(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+# FeatureSet Model
+class FeatureSet(BaseModel):
+    """
+    Named list of indicators (see ml_pipelines.indicators), e.g.
+    ``[{'kind': 'rsi', 'length': 14}]``. Stored features are keyed on
+    ``version``, the hash of the definition, so editing it starts new series.
+    """
+    feature_set_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100, unique=True)
+    definition = models.JSONField(default=list)
+    version = models.CharField(max_length=16, editable=False)
+
+    def clean(self):
+        try:
+            check_definition(self.definition)
+        except ValueError as exc:
+            raise ValidationError({'definition': str(exc)})
+
+    def save(self, *args, **kwargs):
+        self.version = definition_hash(self.definition)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} ({self.version})"
+
+
+# FeatureSeries Model - how far a feature set version has been computed for one series
+class FeatureSeries(BaseModel):
+    series_id = models.BigAutoField(primary_key=True)
+    feature_set = models.ForeignKey(
+        FeatureSet,
+        on_delete=models.CASCADE,
+        related_name='series'
+    )
+    version = models.CharField(max_length=16)
+    security = models.ForeignKey(
+        'market_data.Security',
+        on_delete=models.CASCADE,
+        related_name='feature_series'
+    )
+    interval = models.CharField(max_length=8)
+    last_ts = models.DateTimeField(null=True, blank=True)
+    rows = models.PositiveBigIntegerField(default=0)
+    # Indicator kernel states after last_ts, to continue the computation from
+    state = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['feature_set', 'version', 'security', 'interval'], name='ml_pipelines_featureseries_uniq',
+            ),
+        ]
+        verbose_name_plural = 'Feature series'
+
+    def __str__(self):
+        return f"{self.feature_set_id}@{self.version} {self.security_id} {self.interval} to {self.last_ts}"
+
+
+# MLModel Model - a trained estimator registered for serving (ml_pipelines.inference)
+class MLModel(BaseModel):
+    model_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    version = models.PositiveIntegerField()
+    # joblib file, relative to settings.MODEL_DIR
+    artifact = models.CharField(max_length=500)
+    # Input columns, in the order the estimator expects them
+    features = models.JSONField(default=list)
+    feature_set = models.ForeignKey(
+        FeatureSet,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='models'
+    )
+    description = models.TextField(blank=True, default='')
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'version'], name='ml_pipelines_mlmodel_name_version_uniq'),
+        ]
+        verbose_name = 'ML model'
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,185 @@
+"""
+Streaming indicators updated one bar at a time.
+
+Each indicator keeps a few floats in ``__slots__`` (a fixed-size ring buffer
+for rolling windows) and does constant work per update, so a live process can
+keep indicators for thousands of symbols current at every bar close without
+revisiting history. ``update()`` returns the current value, NaN until the
+indicator has seen enough bars. Values match the batch kernels of
+ml_pipelines.indicators, which follow the pandas_ta definitions.
+"""
+import math
+from array import array
+
+NAN = math.nan
+
+
+class EMA:
+    """pandas_ta ``ema``: the SMA of the first ``length`` values, then ``ewm(span=length, adjust=False)``"""
+    __slots__ = ('length', 'alpha', 'value', 'count', 'seed')
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.value = NAN
+        self.count = 0
+        self.seed = 0.0
+
+    def update(self, value):
+        if math.isnan(value):
+            return self.value
+        self.count += 1
+        if self.count < self.length:
+            self.seed += value
+        elif self.count == self.length:
+            self.value = (self.seed + value) / self.length
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class WilderMean:
+    """
+    Wilder's moving average as pandas_ta computes it:
+    ``ewm(alpha=1 / length, min_periods=length).mean()``, whose weights are
+    normalised by their sum rather than seeded with an SMA.
+    """
+    __slots__ = ('length', 'beta', 'total', 'weight', 'count')
+
+    def __init__(self, length):
+        self.length = length
+        self.beta = 1.0 - 1.0 / length
+        self.total = 0.0
+        # beta ** count, so the sum of the weights is (1 - weight) * length
+        self.weight = 1.0
+        self.count = 0
+
+    @property
+    def value(self):
+        if self.count < self.length:
+            return NAN
+        return self.total / ((1.0 - self.weight) * self.length)
+
+    def update(self, value):
+        if not math.isnan(value):
+            self.total = value + self.beta * self.total
+            self.weight *= self.beta
+            self.count += 1
+        return self.value
+
+
+class RSI:
+    __slots__ = ('previous', 'gains', 'losses')
+
+    def __init__(self, length=14):
+        self.previous = NAN
+        self.gains = WilderMean(length)
+        self.losses = WilderMean(length)
+
+    @property
+    def value(self):
+        gains, losses = self.gains.value, self.losses.value
+        total = gains + losses
+        return 100.0 * gains / total if total else NAN
+
+    def update(self, close):
+        change = close - self.previous
+        self.previous = close
+        if not math.isnan(change):
+            self.gains.update(change if change > 0 else 0.0)
+            self.losses.update(-change if change < 0 else 0.0)
+        return self.value
+
+
+class ATR:
+    """Wilder-smoothed true range (pandas_ta ``atr``, column ATRr)"""
+    __slots__ = ('previous', 'ranges')
+
+    def __init__(self, length=14):
+        self.previous = NAN
+        self.ranges = WilderMean(length)
+
+    @property
+    def value(self):
+        return self.ranges.value
+
+    def update(self, high, low, close):
+        previous = self.previous
+        self.previous = close
+        if math.isnan(previous):
+            return NAN
+        return self.ranges.update(max(high - low, abs(high - previous), abs(low - previous)))
+
+
+class RollingStats:
+    """
+    Mean and sample variance of the last ``length`` values.
+
+    Welford's update, extended to sliding windows: a full window replaces its
+    oldest value with the new one in a single step. The window is a ring buffer
+    of doubles.
+    """
+    __slots__ = ('length', 'window', 'position', 'count', 'mean', 'm2')
+
+    def __init__(self, length):
+        if length < 2:
+            raise ValueError("A rolling variance needs a window of at least 2")
+        self.length = length
+        self.window = array('d', bytes(8 * length))
+        self.position = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @property
+    def ready(self):
+        return self.count == self.length
+
+    @property
+    def variance(self):
+        return max(self.m2, 0.0) / (self.length - 1) if self.count == self.length else NAN
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def update(self, value):
+        """Add a value; returns the window mean (NaN until the window is full)"""
+        if self.count < self.length:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        else:
+            oldest = self.window[self.position]
+            previous_mean = self.mean
+            self.mean += (value - oldest) / self.length
+            self.m2 += (value - oldest) * (value - self.mean + oldest - previous_mean)
+        self.window[self.position] = value
+        self.position = (self.position + 1) % self.length
+        return self.mean if self.count == self.length else NAN
+
+
+class VWAP:
+    """
+    Volume-weighted average of the typical price (high + low + close) / 3,
+    restarting at each new ``session`` (pandas_ta ``vwap`` anchors on the day).
+    """
+    __slots__ = ('session', 'volume', 'notional')
+
+    def __init__(self):
+        self.session = None
+        self.volume = 0.0
+        self.notional = 0.0
+
+    @property
+    def value(self):
+        return self.notional / self.volume if self.volume else NAN
+
+    def update(self, high, low, close, volume, session=None):
+        if session != self.session:
+            self.session = session
+            self.volume = self.notional = 0.0
+        self.volume += volume
+        self.notional += (high + low + close) / 3.0 * volume
+        return self.value
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+from .models import MLModel
+
+
+class MLModelSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MLModel
+        fields = ['model_id', 'name', 'version', 'features', 'feature_set', 'description', 'is_active', 'created_at']
+
+
+class PredictionRequestSerializer(serializers.Serializer):
+    """Feature vectors, or dicts keyed by feature name, to predict"""
+    instances = serializers.ListField(child=serializers.JSONField(), min_length=1, max_length=10000)
+    version = serializers.IntegerField(required=False, min_value=1)
@@ -1,3 +1,396 @@
-from django.test import TestCase
+import asyncio
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from sklearn.linear_model import LinearRegression
+
+from market_data.bars import upsert_bars
+from market_data.models import Security
+from users.models import User
+
+from .features import get_store, load_features
+from .indicators import DEFAULT_DEFINITION, compute
+from .inference import MicroBatcher, register_model, registry
+from .models import FeatureSet, FeatureSeries
+from .online import ATR, EMA, RSI, VWAP, RollingStats
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+
+def random_bars(periods, seed=0, start='2023-06-01'):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, periods)))
+    return pd.DataFrame({
+        'open': close * np.exp(rng.normal(0, 0.005, periods)),
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'close': close,
+        'volume': rng.integers(1000, 5000, periods),
+    }, index=pd.bdate_range(start, periods=periods, tz='UTC', name='ts'))
+
+
+def wilder(values, length):
+    return values.ewm(alpha=1 / length, min_periods=length).mean()
+
+
+def seeded_ema(values, length):
+    """pandas_ta ema: SMA of the first ``length`` values, then a recursive EMA"""
+    values = values.loc[values.first_valid_index():].copy()
+    seed = values.iloc[:length].mean()
+    values.iloc[:length - 1] = np.nan
+    values.iloc[length - 1] = seed
+    return values.ewm(span=length, adjust=False).mean()
+
+
+class PandasTA:
+    """
+    The pandas_ta 0.3.14b0 indicators the kernels follow, transcribed line for
+    line with their default arguments (talib=False). That release cannot be
+    imported next to numpy 2, where ``numpy.NaN`` no longer exists.
+    """
+
+    @staticmethod
+    def rma(close, length):
+        return close.ewm(alpha=1 / length, min_periods=length).mean()
+
+    @staticmethod
+    def ema(close, length):
+        close = close.copy()
+        sma_nth = close[0:length].mean()
+        close[:length - 1] = np.nan
+        close.iloc[length - 1] = sma_nth
+        return close.ewm(span=length, adjust=False).mean()
+
+    @staticmethod
+    def rsi(close, length, scalar=100, drift=1):
+        negative = close.diff(drift)
+        positive = negative.copy()
+        positive[positive < 0] = 0
+        negative[negative > 0] = 0
+        positive_avg = PandasTA.rma(positive, length)
+        negative_avg = PandasTA.rma(negative, length)
+        return scalar * positive_avg / (positive_avg + negative_avg.abs())
+
+    @staticmethod
+    def true_range(high, low, close, drift=1):
+        high_low_range = high - low
+        if high_low_range.eq(0).any():
+            high_low_range += sys.float_info.epsilon
+        prev_close = close.shift(drift)
+        ranges = [high_low_range, high - prev_close, prev_close - low]
+        true_range = pd.concat(ranges, axis=1).abs().max(axis=1)
+        true_range.iloc[:drift] = np.nan
+        return true_range
+
+    @staticmethod
+    def atr(high, low, close, length):
+        return PandasTA.rma(PandasTA.true_range(high, low, close), length)
+
+    @staticmethod
+    def vwap(high, low, close, volume, anchor='D'):
+        wp = (high + low + close) / 3 * volume
+        periods = close.index.tz_localize(None).to_period(anchor)
+        return wp.groupby(periods).cumsum() / volume.groupby(periods).cumsum()
+
+
+class IndicatorTests(SimpleTestCase):
+    """Kernels follow the pandas_ta definitions and resume exactly from their state"""
+
+    def setUp(self):
+        self.bars = random_bars(300)
+
+    def test_matches_reference_definitions(self):
+        features, _ = compute(DEFAULT_DEFINITION, self.bars)
+        close, high, low = self.bars['close'], self.bars['high'], self.bars['low']
+
+        change = close.diff()
+        gains, losses = wilder(change.clip(lower=0), 14), wilder(change.clip(upper=0), 14)
+        macd = seeded_ema(close, 12) - seeded_ema(close, 26)
+        previous = close.shift()
+        ranges = pd.concat([high - low, (high - previous).abs(), (low - previous).abs()], axis=1).max(axis=1)
+        ranges.iloc[0] = np.nan
+        expected = pd.DataFrame({
+            'RSI_14': 100 * gains / (gains + losses.abs()),
+            'MACD_12_26_9': macd,
+            'MACDs_12_26_9': seeded_ema(macd, 9).reindex(close.index),
+            'ATRr_14': wilder(ranges, 14),
+            'VOL_20': np.log(close).diff().rolling(20).std(),
+        })
+        pd.testing.assert_frame_equal(features[expected.columns], expected, check_freq=False, rtol=1e-9)
+        pd.testing.assert_series_equal(
+            features['MACDh_12_26_9'], expected['MACD_12_26_9'] - expected['MACDs_12_26_9'],
+            check_names=False, check_freq=False,
+        )
+
+    def test_chunked_computation_matches_one_pass(self):
+        expected, _ = compute(DEFAULT_DEFINITION, self.bars)
+        chunks, state = [], None
+        for lo, hi in [(0, 1), (1, 10), (10, 33), (33, 34), (34, 300)]:
+            features, state = compute(DEFAULT_DEFINITION, self.bars.iloc[lo:hi], state)
+            chunks.append(features)
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected, check_freq=False, rtol=1e-12)
+
+
+class OnlineIndicatorTests(SimpleTestCase):
+    """Per-bar updates reproduce the batch definitions"""
+
+    def setUp(self):
+        self.bars = random_bars(500, seed=4)
+        self.bars.index = pd.date_range('2024-01-02 14:30', periods=500, freq='30min', tz='UTC', name='ts')
+
+    def stream(self, indicator, *fields):
+        columns = [self.bars[field].tolist() for field in fields]
+        return pd.Series([indicator.update(*values) for values in zip(*columns)], index=self.bars.index)
+
+    def assertClose(self, actual, expected):
+        pd.testing.assert_series_equal(actual, expected, check_names=False, check_freq=False, rtol=1e-9, atol=1e-9)
+
+    def test_ema_rsi_atr(self):
+        close, high, low = self.bars['close'], self.bars['high'], self.bars['low']
+        self.assertClose(self.stream(EMA(20), 'close'), seeded_ema(close, 20))
+
+        change = close.diff()
+        gains, losses = wilder(change.clip(lower=0), 14), wilder(change.clip(upper=0), 14)
+        self.assertClose(self.stream(RSI(14), 'close'), 100 * gains / (gains + losses.abs()))
+
+        previous = close.shift()
+        ranges = pd.concat([high - low, (high - previous).abs(), (low - previous).abs()], axis=1).max(axis=1)
+        ranges.iloc[0] = np.nan
+        self.assertClose(self.stream(ATR(14), 'high', 'low', 'close'), wilder(ranges, 14))
+
+    def test_rolling_stats_and_vwap(self):
+        close = self.bars['close']
+        stats = RollingStats(50)
+        means, variances = [], []
+        for value in close:
+            means.append(stats.update(value))
+            variances.append(stats.variance)
+        self.assertClose(pd.Series(means, index=close.index), close.rolling(50).mean())
+        self.assertClose(pd.Series(variances, index=close.index), close.rolling(50).var())
+
+        sessions = self.bars.index.date
+        vwap = VWAP()
+        values = [
+            vwap.update(row.high, row.low, row.close, row.volume, session)
+            for row, session in zip(self.bars.itertuples(), sessions)
+        ]
+        notional = (self.bars['high'] + self.bars['low'] + self.bars['close']) / 3 * self.bars['volume']
+        expected = notional.groupby(sessions).cumsum() / self.bars['volume'].groupby(sessions).cumsum()
+        self.assertClose(pd.Series(values, index=self.bars.index), expected)
+
+    def test_matches_pandas_ta(self):
+        # Frozen 30min bars over several sessions, with one bar whose range is zero
+        self.bars = pd.read_csv(FIXTURES / 'ohlcv_30min.csv', index_col='ts', parse_dates=['ts'])
+        close, high, low, volume = (self.bars[field] for field in ('close', 'high', 'low', 'volume'))
+        self.assertClose(self.stream(EMA(20), 'close'), PandasTA.ema(close, 20))
+        self.assertClose(self.stream(RSI(14), 'close'), PandasTA.rsi(close, 14))
+        self.assertClose(self.stream(ATR(14), 'high', 'low', 'close'), PandasTA.atr(high, low, close, 14))
+        vwap = VWAP()
+        values = [vwap.update(*row, session) for *row, session in
+                  zip(high, low, close, volume, self.bars.index.date)]
+        self.assertClose(pd.Series(values, index=self.bars.index), PandasTA.vwap(high, low, close, volume))
+
+
+class FeatureStoreTests(TestCase):
+    """Features are persisted per version and extended only by new bars"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(BAR_CACHE_DIR=f'{self.tmp.name}/bars', FEATURE_STORE_DIR=f'{self.tmp.name}/features')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.security = Security.objects.create(symbol='IBM')
+        self.feature_set = FeatureSet.objects.create(name='default', definition=DEFAULT_DEFINITION)
+        # Spans a year boundary so appends touch more than one partition
+        self.bars = random_bars(200)
+
+    def store_bars(self, bars):
+        frame = bars.reset_index().assign(security_id=self.security.pk, interval='1d')
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(frame)
+
+    def test_update_appends_only_new_bars(self):
+        store = get_store()
+        self.store_bars(self.bars.iloc[:150])
+        self.assertEqual(store.update(self.feature_set, self.security.pk, '1d'), 150)
+        self.assertEqual(store.update(self.feature_set, self.security.pk, '1d'), 0)
+
+        self.store_bars(self.bars.iloc[150:])
+        self.assertEqual(store.update(self.feature_set, self.security.pk, '1d'), 50)
+        series = FeatureSeries.objects.get(feature_set=self.feature_set)
+        self.assertEqual((series.rows, series.last_ts), (200, self.bars.index[-1]))
+
+        expected, _ = compute(DEFAULT_DEFINITION, self.bars)
+        stored = store.read(self.feature_set, self.security.pk, '1d')
+        pd.testing.assert_frame_equal(stored, expected, check_freq=False, check_index_type=False, rtol=1e-12)
+        self.assertTrue(store.path(self.feature_set.version, '1d', self.security.pk, 2024).exists())
+
+        window = store.read(self.feature_set, self.security.pk, '1d', '2024-01-01', '2024-02-01')
+        self.assertEqual(len(window), len(self.bars.loc['2024-01-01':'2024-01-31']))
+
+    def test_forming_bar_is_computed_once_it_closes(self):
+        store = get_store()
+        bars = random_bars(30)
+        self.store_bars(bars)
+        forming = bars.index[-1] + pd.Timedelta(hours=12)
+        with mock.patch('ml_pipelines.features.timezone.now', return_value=forming.to_pydatetime()):
+            self.assertEqual(store.update(self.feature_set, self.security.pk, '1d'), 29)
+
+        # A later run re-sends the bar with its final values
+        final = bars.iloc[-1:].copy()
+        final[['open', 'high', 'low', 'close']] *= 1.05
+        self.store_bars(final)
+        closed = bars.index[-1] + pd.Timedelta(days=1)
+        with mock.patch('ml_pipelines.features.timezone.now', return_value=closed.to_pydatetime()):
+            self.assertEqual(store.update(self.feature_set, self.security.pk, '1d'), 1)
+
+        expected, _ = compute(DEFAULT_DEFINITION, pd.concat([bars.iloc[:-1], final]))
+        stored = store.read(self.feature_set, self.security.pk, '1d')
+        pd.testing.assert_frame_equal(stored, expected, check_freq=False, check_index_type=False, rtol=1e-12)
+
+    def test_definition_change_starts_a_new_version(self):
+        self.store_bars(self.bars)
+        features = load_features(self.feature_set, [self.security.pk], '1d')
+        self.assertEqual(features.index.names, ['security_id', 'ts'])
+        self.assertIn('RSI_14', features.columns)
+
+        old_version = self.feature_set.version
+        self.feature_set.definition = [{'kind': 'rsi', 'length': 7}]
+        self.feature_set.save()
+        self.assertNotEqual(self.feature_set.version, old_version)
+        features = load_features(self.feature_set, [self.security.pk], '1d')
+        self.assertEqual(features.columns.tolist(), ['RSI_7'])
+        self.assertEqual(FeatureSeries.objects.filter(feature_set=self.feature_set).count(), 2)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    """Concurrent requests share predict() calls and get their own rows back"""
+
+    def test_concurrent_requests_are_batched(self):
+        calls = []
+        release = threading.Event()
+
+        def predict(rows):
+            calls.append(len(rows))
+            release.wait(5)
+            return rows.sum(axis=1)
+
+        batcher = MicroBatcher(predict, max_batch_size=4, max_wait=0.5)
+        self.addCleanup(batcher.close)
+        # The first request occupies predict() while the next ten queue up
+        futures = [batcher.submit([[1.0, 0.0]])]
+        while not calls:
+            threading.Event().wait(0.001)
+        futures += [batcher.submit([[float(i), 1.0]]) for i in range(10)]
+        release.set()
+
+        self.assertEqual([future.result(5).tolist() for future in futures], [[1.0]] + [[i + 1.0] for i in range(10)])
+        self.assertEqual(calls, [1, 4, 4, 2])
+        self.assertEqual((batcher.batches, batcher.rows), (4, 11))
+
+    def test_errors_reach_every_request_of_the_batch(self):
+        def predict(rows):
+            raise ValueError("bad input")
+
+        batcher = MicroBatcher(predict, max_batch_size=8, max_wait=0.01)
+        self.addCleanup(batcher.close)
+        futures = [batcher.submit([[1.0]]) for _ in range(3)]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(5)
+
+
+class InferenceAPITests(APITestCase):
+    """Registered models are loaded once per process and served over the API"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MODEL_DIR=self.tmp.name, INFERENCE_MAX_WAIT=0.001)
+        override.enable()
+        self.addCleanup(override.disable)
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+        x = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [2.0, 1.0]])
+        register_model('linear', LinearRegression().fit(x, x @ [2.0, 3.0] + 1), ['momentum', 'rsi'])
+        self.user = User.objects.create_user(username='quant', password='pw-not-used-1')
+        self.client.force_authenticate(self.user)
+
+    def test_predict_with_vectors_or_named_features(self):
+        response = self.client.post('/ml/models/linear/predict/', {'instances': [[1, 1], [0, 0]]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['model'], response.json()['version']), ('linear', 1))
+        np.testing.assert_allclose(response.json()['predictions'], [6.0, 1.0])
+
+        response = self.client.post(
+            '/ml/models/linear/predict/', {'instances': [{'rsi': 2, 'momentum': 1}]}, format='json',
+        )
+        np.testing.assert_allclose(response.json()['predictions'], [9.0])
+
+        response = self.client.post('/ml/models/linear/predict/', {'instances': [[1, 2, 3]]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/ml/models/linear/predict/', {'instances': [{'momentum': 1, 'rsi': 2}, {'momentum': 1}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rsi', response.json()['instances'][0])
+        response = self.client.post('/ml/models/missing/predict/', {'instances': [[1, 2]]}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_models_are_loaded_once_and_new_versions_served(self):
+        with mock.patch('ml_pipelines.inference.joblib.load', wraps=joblib.load) as load:
+            for _ in range(3):
+                self.client.post('/ml/models/linear/predict/', {'instances': [[1, 1]]}, format='json')
+        self.assertEqual(load.call_count, 1)
+
+        register_model('linear', LinearRegression().fit([[0, 0], [1, 1], [2, 0]], [0, 0, 0]), ['momentum', 'rsi'])
+        response = self.client.post(
+            '/ml/models/linear/predict/', {'instances': [[1, 1]], 'version': 2}, format='json',
+        )
+        self.assertEqual(response.json()['version'], 2)
+        np.testing.assert_allclose(response.json()['predictions'], [0.0], atol=1e-9)
+        self.assertEqual(self.client.get('/ml/models/linear/').data['version'], 2)
+
+    def test_predict_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post('/ml/models/linear/predict/', {'instances': [[1, 1]]}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(INFERENCE_MAX_WAIT=0.5)
+    async def test_concurrent_requests_share_a_batch(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        responses = await asyncio.gather(*(
+            self.async_client.post(
+                '/ml/models/linear/predict/', {'instances': [[i, 1]]},
+                content_type='application/json', headers=headers,
+            )
+            for i in range(8)
+        ))
+        self.assertEqual([response.status_code for response in responses], [200] * 8)
+        np.testing.assert_allclose(
+            [response.json()['predictions'] for response in responses], [[2 * i + 4] for i in range(8)],
+        )
+        loaded = await sync_to_async(registry.get)('linear')
+        self.assertEqual(loaded.batcher.rows, 8)
+        self.assertLess(loaded.batcher.batches, 8)
+
+    def test_rejected_registration_leaves_artifacts_alone(self):
+        before = sorted(path.name for path in Path(self.tmp.name, 'linear').iterdir())
+        with mock.patch('ml_pipelines.inference.MLModel.objects.create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                register_model('linear', LinearRegression(), ['momentum', 'rsi'])
+        self.assertEqual(sorted(path.name for path in Path(self.tmp.name, 'linear').iterdir()), before)
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import MLModelViewSet, predict
+
+router = DefaultRouter()
+router.register(r'models', MLModelViewSet, basename='ml_model')
+
+urlpatterns = [
+    path('models/<str:name>/predict/', predict, name='ml_model-predict'),
+    path('', include(router.urls)),
+]
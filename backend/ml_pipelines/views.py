@@ -1,3 +1,81 @@
-from django.shortcuts import render
+import asyncio
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import viewsets
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .inference import registry
+from .models import MLModel
+from .serializers import MLModelSerializer, PredictionRequestSerializer
+
+PREDICTION_TIMEOUT = 10
+
+
+class MLModelViewSet(viewsets.ReadOnlyModelViewSet):
+    """Registered models; ``POST .../<name>/predict/`` (see predict()) serves the latest active version"""
+    queryset = MLModel.objects.all()
+    serializer_class = MLModelSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'name'
+    lookup_value_regex = '[^/]+'
+
+    def get_object(self):
+        model = self.queryset.filter(name=self.kwargs['name'], is_active=True).order_by('-version').first()
+        if model is None:
+            raise Http404
+        return model
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+@csrf_exempt
+@require_POST
+async def predict(request, name):
+    """
+    Predictions from the latest active version of ``name`` (or ``version``).
+
+    An async view rather than a DRF action: under ASGI, sync views run one at a
+    time on Django's thread-sensitive executor, so concurrent requests would
+    never meet in the same micro-batch. Here every request awaits its batcher
+    future on the event loop and concurrent requests share predict() calls.
+    """
+    drf_request = Request(
+        request, parsers=[JSONParser()],
+        authenticators=[authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        user = await sync_to_async(lambda: drf_request.user)()
+        if not user.is_authenticated:
+            raise NotAuthenticated
+        query = PredictionRequestSerializer(data=drf_request.data)
+        query.is_valid(raise_exception=True)
+    except APIException as exc:
+        detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+        return _json(detail, status=exc.status_code)
+
+    try:
+        loaded = await sync_to_async(registry.get)(name, query.validated_data.get('version'))
+    except MLModel.DoesNotExist:
+        return _json({'detail': "Not found."}, status=404)
+    try:
+        future = loaded.batcher.submit(loaded.rows(query.validated_data['instances']))
+        predictions = await asyncio.wait_for(asyncio.wrap_future(future), PREDICTION_TIMEOUT)
+    except (TypeError, ValueError) as exc:
+        return _json({'instances': [str(exc)]}, status=400)
+    except asyncio.TimeoutError:
+        return _json({'detail': "Prediction timed out."}, status=503)
+    return _json({
+        'model': loaded.model.name,
+        'version': loaded.model.version,
+        'predictions': predictions.tolist(),
+    })
@@ -1,3 +1,38 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Fill, Order, Portfolio, Position, Sweep, SweepResult
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'account', 'security', 'side', 'order_type', 'quantity', 'filled_quantity', 'status')
+    list_filter = ('status', 'side', 'order_type')
+    search_fields = ('security__symbol',)
+
+
+@admin.register(Fill)
+class FillAdmin(admin.ModelAdmin):
+    list_display = ('fill_id', 'order', 'quantity', 'price', 'is_maker', 'executed_at')
+
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ('account', 'security', 'quantity', 'average_cost', 'market_value', 'realized_pnl')
+    search_fields = ('security__symbol',)
+
+
+@admin.register(Portfolio)
+class PortfolioAdmin(admin.ModelAdmin):
+    list_display = ('account', 'open_positions', 'cost_basis', 'market_value', 'realized_pnl', 'marked_at')
+
+
+@admin.register(Sweep)
+class SweepAdmin(admin.ModelAdmin):
+    list_display = ('sweep_id', 'name', 'strategy', 'mode', 'interval', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'mode', 'strategy')
+
+
+@admin.register(SweepResult)
+class SweepResultAdmin(admin.ModelAdmin):
+    list_display = ('sweep', 'phase', 'fold', 'security', 'parameters', 'total_return', 'sharpe', 'max_drawdown')
+    list_filter = ('phase',)
@@ -0,0 +1,217 @@
+"""
+Backtesting over price matrices loaded from the bar store.
+
+Prices are (time x security) matrices: load_bars() reads them through
+market_data.derived.get_bars (Parquet cache, optional resampling and
+adjustment) and aligns them on a common index.
+
+run_vectorized() takes target positions, in shares, decided at each bar's
+close and filled at the next bar's open, and derives trades, fees, cash and
+equity for the whole matrix with NumPy array operations. run_events() is the
+event-driven fallback for path-dependent strategies: a Strategy sees every bar
+and its current positions before choosing its targets, under the same
+execution and fee model, so both engines agree on strategies both can express.
+"""
+from collections import namedtuple
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CASH = 1_000_000.0
+PERIODS_PER_YEAR = {'1min': 252 * 390, '5min': 252 * 78, '15min': 252 * 26, '30min': 252 * 13,
+                    '60min': 252 * 7, '1d': 252, '1wk': 52, '1mo': 12}
+
+Bars = namedtuple('Bars', ['open', 'high', 'low', 'close', 'volume'])
+
+
+def load_bars(security_ids, interval, start, end, base=None, adjusted=False):
+    """Bars of several securities as one (ts x security_id) DataFrame per field"""
+    # Imported here so the engine stays importable in sweep worker processes,
+    # which never set Django up (see trades.sweep_worker)
+    from market_data.derived import get_bars
+
+    frames = {
+        security_id: get_bars(security_id, interval, start, end, base=base, adjusted=adjusted)
+        for security_id in security_ids
+    }
+    panel = pd.concat(frames, axis=1, names=['security_id', 'field']).sort_index()
+    return Bars(*(
+        panel.xs(field, axis=1, level='field').reindex(columns=list(security_ids))
+        for field in Bars._fields
+    ))
+
+
+@dataclass
+class BacktestResult:
+    positions: pd.DataFrame   # shares held over each bar, after that bar's opening fill
+    trades: pd.DataFrame      # shares traded at each bar's open
+    fees: pd.DataFrame
+    pnl: pd.DataFrame         # mark-to-market P&L per security and bar, net of fees
+    equity: pd.Series
+    initial_cash: float
+
+    def stats(self, periods_per_year=PERIODS_PER_YEAR['1d']):
+        returns = self.equity.pct_change().fillna(0.0).to_numpy()
+        equity = self.equity.to_numpy()
+        volatility = returns.std()
+        drawdown = 1 - equity / np.maximum.accumulate(equity)
+        return {
+            'total_return': equity[-1] / self.initial_cash - 1 if len(equity) else 0.0,
+            'sharpe': returns.mean() / volatility * np.sqrt(periods_per_year) if volatility else 0.0,
+            'max_drawdown': drawdown.max() if len(equity) else 0.0,
+            'trades': int(np.count_nonzero(self.trades.to_numpy())),
+            'fees': float(self.fees.to_numpy().sum()),
+        }
+
+
+def _matrix(frame):
+    return frame.to_numpy(dtype=float, na_value=np.nan)
+
+
+def _ffill(values):
+    """Forward-fill NaNs down each column"""
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    index = np.where(missing, 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return values[index, np.arange(values.shape[1])]
+
+
+def _zero_nan(values):
+    """Replace NaNs by zeros in place; arrays without NaNs (maybe read-only views) are left alone"""
+    missing = np.isnan(values)
+    if missing.any():
+        values[missing] = 0.0
+    return values
+
+
+def _result(bars, positions, trades, fees, cash_flows, initial_cash):
+    close = _zero_nan(_ffill(_matrix(bars.close)))
+    # P&L of a bar: change in holdings value plus the cash spent or received
+    value = positions * close
+    pnl = np.diff(value, axis=0, prepend=0) + cash_flows
+    index, columns = bars.close.index, bars.close.columns
+    frame = lambda values: pd.DataFrame(values, index=index, columns=columns)
+    return BacktestResult(
+        positions=frame(positions), trades=frame(trades), fees=frame(fees), pnl=frame(pnl),
+        equity=pd.Series(initial_cash + pnl.sum(axis=1).cumsum(), index=index, name='equity'),
+        initial_cash=initial_cash,
+    )
+
+
+def _fill_prices(bars):
+    """Opening prices, NaN where a security has no bar to trade on"""
+    return _matrix(bars.open)
+
+
+def run_vectorized(bars, targets, fee_rate=0.0, fee_per_share=0.0, initial_cash=DEFAULT_CASH):
+    """
+    Backtest target positions (a DataFrame or array shaped like ``bars.close``).
+
+    The target set at bar ``t`` is filled at the open of bar ``t + 1``; NaN
+    targets keep the previous one. A security without a bar to trade on keeps
+    its position until it has one.
+    """
+    targets = np.array(targets, dtype=float)
+    opens = _fill_prices(bars)
+    # Wanted position over bar t is the latest target set before t. Targets are
+    # carried forward before masking bars without a price, so one that cannot
+    # fill yet stays pending (as in run_events) instead of being dropped
+    wanted = np.full_like(targets, np.nan)
+    wanted[1:] = targets[:-1]
+    wanted[0] = 0.0
+    wanted = _ffill(wanted)
+    # Position held over bar t is the wanted one as of the latest bar with a price
+    positions = np.where(np.isnan(opens), np.nan, wanted)
+    positions = _zero_nan(_ffill(positions))
+
+    trades = np.diff(positions, axis=0, prepend=0)
+    prices = np.where(np.isnan(opens), 0.0, opens)
+    traded = np.abs(trades)
+    fees = traded * prices * fee_rate + traded * fee_per_share
+    cash_flows = -trades * prices - fees
+    return _result(bars, positions, trades, fees, cash_flows, initial_cash)
+
+
+class Strategy:
+    """
+    Event-driven strategy: on_bar() sees each bar after it closes and returns
+    target positions (an array over the securities, NaN or None to keep).
+    """
+
+    def start(self, columns):
+        pass
+
+    def on_bar(self, index, bar, positions):
+        raise NotImplementedError
+
+
+def run_events(bars, strategy, fee_rate=0.0, fee_per_share=0.0, initial_cash=DEFAULT_CASH):
+    """Bar-by-bar fallback of run_vectorized() for path-dependent strategies"""
+    opens = _fill_prices(bars)
+    fields = [_matrix(getattr(bars, field)) for field in Bars._fields]
+    rows, columns = opens.shape
+    positions = np.zeros((rows, columns))
+    trades = np.zeros((rows, columns))
+    fees = np.zeros((rows, columns))
+    cash_flows = np.zeros((rows, columns))
+
+    strategy.start(list(bars.close.columns))
+    held = np.zeros(columns)
+    pending = None
+    for i in range(rows):
+        if pending is not None:
+            fillable = ~np.isnan(pending) & ~np.isnan(opens[i])
+            order = np.where(fillable, pending - held, 0.0)
+            price = np.nan_to_num(opens[i])
+            trades[i] = order
+            fees[i] = np.abs(order) * price * fee_rate + np.abs(order) * fee_per_share
+            cash_flows[i] = -order * price - fees[i]
+            held = held + order
+            pending = np.where(fillable, np.nan, pending)
+        positions[i] = held
+        target = strategy.on_bar(i, Bars(*(field[i] for field in fields)), held.copy())
+        if target is not None:
+            target = np.asarray(target, dtype=float)
+            pending = target if pending is None else np.where(np.isnan(target), pending, target)
+    return _result(bars, positions, trades, fees, cash_flows, initial_cash)
+
+
+def rolling_mean(values, window):
+    """Trailing mean down each column from cumulative sums; NaN until ``window`` valid values"""
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    return np.where(counts == window, sums / window, np.nan)
+
+
+def sma_crossover_targets(close, fast, slow, size):
+    """Hold ``size`` shares while the fast SMA of closes is above the slow one"""
+    above = rolling_mean(close, fast) > rolling_mean(close, slow)
+    return pd.DataFrame(above * float(size), index=close.index, columns=close.columns)
+
+
+class SmaCrossover(Strategy):
+    """Event-driven sma_crossover_targets() over a ring buffer of the last ``slow`` closes"""
+
+    def __init__(self, fast, slow, size):
+        self.fast, self.slow, self.size = fast, slow, size
+
+    def start(self, columns):
+        self.window = np.zeros((self.slow, len(columns)))
+        self.count = 0
+
+    def on_bar(self, index, bar, positions):
+        self.window[index % self.slow] = bar.close
+        self.count += 1
+        if self.count < self.slow:
+            return np.zeros_like(positions)
+        recent = [(index - k) % self.slow for k in range(self.fast)]
+        fast_sma = self.window[recent].mean(axis=0)
+        slow_sma = self.window.mean(axis=0)
+        return np.where(fast_sma > slow_sma, float(self.size), 0.0)
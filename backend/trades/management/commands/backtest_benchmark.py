@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trades.backtest import (
+    Bars, SmaCrossover, load_bars, run_events, run_vectorized, sma_crossover_targets
+)
+
+
+def synthetic_bars(securities, periods, seed=0):
+    """Random-walk daily bars for ``securities`` columns"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2000-01-03', periods=periods, tz='UTC', name='ts')
+    columns = list(range(1, securities + 1))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (periods, securities)), axis=0))
+    opens = close * np.exp(rng.normal(0, 0.003, close.shape))
+    high = np.maximum(opens, close) * 1.002
+    low = np.minimum(opens, close) * 0.998
+    volume = rng.integers(1000, 100000, close.shape)
+    frame = lambda values: pd.DataFrame(values, index=index, columns=columns)
+    return Bars(frame(opens), frame(high), frame(low), frame(close), frame(volume))
+
+
+def run_backtrader(bars, fast, slow, size, fee_rate, cash):
+    import backtrader as bt
+
+    class SmaCross(bt.Strategy):
+        def __init__(self):
+            self.above = [
+                bt.indicators.SMA(data.close, period=fast) > bt.indicators.SMA(data.close, period=slow)
+                for data in self.datas
+            ]
+
+        def next(self):
+            for data, above in zip(self.datas, self.above):
+                self.order_target_size(data, size if above[0] else 0)
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.broker.setcash(cash)
+    cerebro.broker.setcommission(commission=fee_rate)
+    cerebro.broker.set_checksubmit(False)
+    for column in bars.close.columns:
+        frame = pd.DataFrame({field: getattr(bars, field)[column] for field in Bars._fields})
+        cerebro.adddata(bt.feeds.PandasData(dataname=frame.tz_localize(None), openinterest=None), name=str(column))
+    cerebro.addstrategy(SmaCross)
+    cerebro.run()
+    return cerebro.broker.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Compare the vectorised and event-driven backtesters with backtrader on an SMA crossover"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--securities', type=int, default=50, help="Synthetic securities")
+        parser.add_argument('--periods', type=int, default=2500, help="Synthetic daily bars")
+        parser.add_argument('--security', type=int, action='append', dest='security_ids',
+                            help="Use stored daily bars of this security instead (repeatable)")
+        parser.add_argument('--start', default='2000-01-01')
+        parser.add_argument('--fast', type=int, default=10)
+        parser.add_argument('--slow', type=int, default=30)
+        parser.add_argument('--size', type=int, default=100)
+        parser.add_argument('--fee-rate', type=float, default=0.0005)
+        parser.add_argument('--skip-backtrader', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['security_ids']:
+            bars = load_bars(options['security_ids'], '1d', options['start'], timezone.now())
+        else:
+            bars = synthetic_bars(options['securities'], options['periods'])
+        fast, slow, size, fee_rate = options['fast'], options['slow'], options['size'], options['fee_rate']
+        cash = 1_000_000.0
+        self.stdout.write(f"{bars.close.shape[1]} securities x {bars.close.shape[0]} bars")
+
+        started = time.perf_counter()
+        result = run_vectorized(bars, sma_crossover_targets(bars.close, fast, slow, size), fee_rate=fee_rate,
+                                initial_cash=cash)
+        self.report('vectorised', started, result.equity.iloc[-1])
+
+        started = time.perf_counter()
+        result = run_events(bars, SmaCrossover(fast, slow, size), fee_rate=fee_rate, initial_cash=cash)
+        self.report('event-driven', started, result.equity.iloc[-1])
+
+        if not options['skip_backtrader']:
+            started = time.perf_counter()
+            self.report('backtrader', started, run_backtrader(bars, fast, slow, size, fee_rate, cash))
+
+    def report(self, engine, started, final_equity):
+        self.stdout.write(f"{engine:>14}: {time.perf_counter() - started:8.3f}s  final equity {final_equity:,.2f}")
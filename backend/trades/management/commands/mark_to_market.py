@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from market_data.models import Bar
+from trades.positions import mark_to_market
+
+
+class Command(BaseCommand):
+    help = "Revalue open positions at the latest stored bar close"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', default='1d', choices=[choice for choice, _ in Bar.INTERVALS])
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help="Only this account (repeatable)")
+
+    def handle(self, *args, **options):
+        marked = mark_to_market(options['interval'], options['accounts'])
+        self.stdout.write(self.style.SUCCESS(f"Revalued {marked} positions"))
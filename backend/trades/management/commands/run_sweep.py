@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from trades.models import Sweep
+from trades.sweeps import run_sweep
+
+
+def parse_values(text):
+    """``fast=5,10,20`` -> ('fast', [5, 10, 20])"""
+    name, _, values = text.partition('=')
+    if not name or not values:
+        raise CommandError(f"Expected name=value[,value...], got {text!r}")
+    parsed = []
+    for value in values.split(','):
+        try:
+            parsed.append(int(value))
+        except ValueError:
+            parsed.append(float(value))
+    return name, parsed
+
+
+class Command(BaseCommand):
+    help = "Run a grid or walk-forward parameter sweep of a backtest strategy, or resume one"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resume', type=int, metavar='SWEEP_ID', help="Resume an interrupted sweep")
+        parser.add_argument('--name', default='')
+        parser.add_argument('--strategy', default='sma_crossover')
+        parser.add_argument('--security', type=int, action='append', dest='security_ids', default=[],
+                            help="Security to backtest (repeatable)")
+        parser.add_argument('--param', action='append', dest='params', default=[],
+                            help="Parameter values, e.g. fast=5,10,20 (repeatable)")
+        parser.add_argument('--interval', default='1d')
+        parser.add_argument('--start', default='2000-01-01')
+        parser.add_argument('--end')
+        parser.add_argument('--fee-rate', type=float, default=0.0005)
+        parser.add_argument('--walk-forward', nargs=2, type=int, metavar=('TRAIN', 'TEST'),
+                            help="Walk-forward train and test windows, in bars")
+        parser.add_argument('--jobs', type=int, default=-1, help="Worker processes (-1 for all cores)")
+        parser.add_argument('--top', type=int, default=10, help="Best results to print")
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                sweep = Sweep.objects.get(pk=options['resume'])
+            except Sweep.DoesNotExist:
+                raise CommandError(f"Sweep {options['resume']} does not exist")
+        else:
+            if not options['security_ids'] or not options['params']:
+                raise CommandError("A new sweep needs --security and --param")
+            train, test = options['walk_forward'] or (None, None)
+            sweep = Sweep.objects.create(
+                name=options['name'], strategy=options['strategy'],
+                mode='walk_forward' if options['walk_forward'] else 'grid',
+                parameters=dict(parse_values(text) for text in options['params']),
+                securities=options['security_ids'], interval=options['interval'],
+                start=options['start'], end=options['end'] or timezone.now(), fee_rate=options['fee_rate'],
+                train_periods=train, test_periods=test,
+            )
+
+        try:
+            evaluated = run_sweep(sweep, n_jobs=options['jobs'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Sweep {sweep.pk}: evaluated {evaluated} tasks"))
+
+        phase = 'test' if sweep.mode == 'walk_forward' else 'full'
+        best = sweep.results.filter(phase=phase, security__isnull=True).order_by('-sharpe')[:options['top']]
+        for result in best:
+            self.stdout.write(
+                f"  fold {result.fold:>3}  {result.parameters}  return {result.total_return:8.2%}  "
+                f"sharpe {result.sharpe:6.2f}  max drawdown {result.max_drawdown:7.2%}"
+            )
@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from trades.matching import ExecutionSimulator
+
+
+class Command(BaseCommand):
+    help = "Benchmark the execution simulator with a random order flow"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500000)
+        parser.add_argument('--instruments', type=int, default=100)
+        parser.add_argument('--market-share', type=float, default=0.1, help="Fraction of market orders")
+        parser.add_argument('--spread', type=float, default=0.5, help="Std. dev. of limit prices around 100")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        count = options['orders']
+        instruments = [f'SYM{i:04d}' for i in range(options['instruments'])]
+        flow = list(zip(
+            [instruments[i] for i in rng.integers(0, len(instruments), count)],
+            rng.choice(['buy', 'sell'], count).tolist(),
+            rng.integers(1, 500, count).tolist(),
+            np.where(rng.random(count) < options['market_share'], 'market', 'limit').tolist(),
+            np.round(100 + rng.normal(0, options['spread'], count), 2).tolist(),
+        ))
+
+        simulator = ExecutionSimulator()
+        submit = simulator.submit
+        started = time.perf_counter()
+        for instrument, side, quantity, order_type, price in flow:
+            submit(instrument, side, quantity, order_type, price if order_type == 'limit' else None)
+        elapsed = time.perf_counter() - started
+        fills = simulator.drain_fills()
+        self.stdout.write(
+            f"{count} orders in {elapsed:.2f}s ({count / elapsed:,.0f} orders/s), "
+            f"{len(fills) // 2} matches, {len(simulator.drain_cancels())} cancelled"
+        )
@@ -0,0 +1,326 @@
+"""
+In-memory order matching and execution simulator.
+
+ExecutionSimulator keeps one price-time priority book per instrument and
+matches market, limit, stop and stop-limit orders without touching the
+database. Orders are rows in a set of typed ``array.array`` columns indexed by
+order id, prices are integer ticks of ``1 / PRICE_SCALE`` and each side of a
+book is a sorted list of price keys plus a FIFO of order ids per level, so
+submitting, matching and cancelling are a bisect and a few appends.
+
+Matches are logged as they happen; drain_fills() and drain_cancels()
+hand them over as DataFrames, which trades.settlement persists in batches.
+"""
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Prices carry 4 decimal places, like ledger amounts
+PRICE_SCALE = 10000
+
+BUY, SELL = 1, -1
+MARKET, LIMIT, STOP, STOP_LIMIT = 0, 1, 2, 3
+NEW, PARTIALLY_FILLED, FILLED, CANCELLED = 0, 1, 2, 3
+
+SIDES = {'buy': BUY, 'sell': SELL}
+ORDER_TYPES = {'market': MARKET, 'limit': LIMIT, 'stop': STOP, 'stop_limit': STOP_LIMIT}
+# Status code -> trades.Order status
+STATUSES = ['new', 'partially_filled', 'filled', 'cancelled']
+
+FILL_COLUMNS = ['order_id', 'contra_order_id', 'instrument', 'side', 'price', 'quantity', 'is_maker',
+                'account', 'ref', 'time']
+
+
+def to_ticks(price):
+    return round(price * PRICE_SCALE)
+
+
+class _BookSide:
+    """Price levels best first; bid keys are negated ticks so both sides sort ascending"""
+    __slots__ = ('keys', 'levels', 'volume')
+
+    def __init__(self):
+        self.keys = []
+        self.levels = {}
+        self.volume = {}
+
+    def add(self, key, order_id, quantity):
+        queue = self.levels.get(key)
+        if queue is None:
+            insort(self.keys, key)
+            queue = self.levels[key] = deque()
+            self.volume[key] = 0
+        queue.append(order_id)
+        self.volume[key] += quantity
+
+    def reduce(self, key, quantity):
+        volume = self.volume[key] - quantity
+        if volume:
+            self.volume[key] = volume
+            return
+        del self.keys[bisect_left(self.keys, key)]
+        del self.levels[key], self.volume[key]
+
+
+class _Book:
+    __slots__ = ('index', 'bids', 'asks', 'buy_stops', 'sell_stops', 'last', 'triggering')
+
+    def __init__(self, index):
+        self.index = index
+        self.bids = _BookSide()
+        self.asks = _BookSide()
+        # (stop tick, order id) ascending; sell stops negated so the next to trigger is first
+        self.buy_stops = []
+        self.sell_stops = []
+        self.last = None
+        self.triggering = False
+
+
+class ExecutionSimulator:
+    def __init__(self):
+        self.instruments = []
+        self._books = {}
+
+        # Order columns, indexed by order id
+        self.side = array('b')
+        self.kind = array('b')
+        self.status = array('b')
+        self.book = array('i')
+        self.price = array('q')
+        self.quantity = array('q')
+        self.remaining = array('q')
+        self.account = array('q')
+        self.ref = array('q')
+
+        # (taker, maker, tick, quantity, time) per match; a list of tuples is far
+        # cheaper to append to on the hot path than one array per column
+        self._matches = []
+        # (order id, filled quantity) per cancellation
+        self._cancels = []
+
+        # Caller-defined clock stamped on fills (e.g. epoch nanoseconds of the bar being replayed)
+        self.time = 0
+
+    def _get_book(self, instrument):
+        book = self._books.get(instrument)
+        if book is None:
+            book = self._books[instrument] = _Book(len(self.instruments))
+            self.instruments.append(instrument)
+        return book
+
+    def submit(self, instrument, side, quantity, order_type='limit', price=None, stop_price=None, account=0, ref=0):
+        """
+        Submit an order and match it immediately; returns its order id.
+
+        Market orders and triggered stops take whatever liquidity is available
+        and cancel their remainder. ``ref`` links the order to a persisted
+        trades.Order (its primary key) for settlement.
+        """
+        side = SIDES.get(side, side)
+        kind = ORDER_TYPES.get(order_type, order_type)
+        if quantity <= 0:
+            raise ValueError("Order quantity must be positive")
+        if kind != MARKET:
+            if kind != STOP and price is None:
+                raise ValueError("Limit orders need a price")
+            if kind >= STOP and stop_price is None:
+                raise ValueError("Stop orders need a stop price")
+        tick = to_ticks(price) if price is not None else 0
+
+        book = self._books.get(instrument) or self._get_book(instrument)
+        order_id = len(self.side)
+        self.side.append(side)
+        self.kind.append(kind)
+        self.status.append(NEW)
+        self.book.append(book.index)
+        self.price.append(tick)
+        self.quantity.append(quantity)
+        self.remaining.append(quantity)
+        self.account.append(account)
+        self.ref.append(ref)
+
+        if kind < STOP:
+            self._execute(book, order_id, side, quantity, tick if kind == LIMIT else None)
+            return order_id
+        if side == BUY:
+            insort(book.buy_stops, (to_ticks(stop_price), order_id))
+        else:
+            insort(book.sell_stops, (-to_ticks(stop_price), order_id))
+        if book.last is not None:
+            self._trigger(book)
+        return order_id
+
+    def _execute(self, book, order_id, side, remaining, limit):
+        """Match an order against the opposite side; ``limit`` is None for market orders"""
+        opposite = book.asks if side == BUY else book.bids
+        keys = opposite.keys
+        if keys and (limit is None or (keys[0] <= limit if side == BUY else -keys[0] >= limit)):
+            levels, statuses, left = opposite.levels, self.status, self.remaining
+            record, time = self._matches.append, self.time
+            while remaining and keys:
+                key = keys[0]
+                tick = key if side == BUY else -key
+                if limit is not None and (tick > limit if side == BUY else tick < limit):
+                    break
+                queue = levels[key]
+                matched = 0
+                while remaining and queue:
+                    maker = queue[0]
+                    available = left[maker]
+                    if not available:
+                        # Cancelled while resting
+                        queue.popleft()
+                        continue
+                    quantity = remaining if remaining < available else available
+                    record((order_id, maker, tick, quantity, time))
+                    remaining -= quantity
+                    available -= quantity
+                    matched += quantity
+                    left[maker] = available
+                    if available:
+                        statuses[maker] = PARTIALLY_FILLED
+                    else:
+                        statuses[maker] = FILLED
+                        queue.popleft()
+                opposite.reduce(key, matched)
+                book.last = tick
+            left[order_id] = remaining
+            statuses[order_id] = PARTIALLY_FILLED if remaining else FILLED
+            traded = True
+        else:
+            traded = False
+
+        if not remaining:
+            pass
+        elif limit is None:
+            # Market orders do not rest: the remainder is cancelled
+            self._cancel(order_id)
+        elif side == BUY:
+            book.bids.add(-limit, order_id, remaining)
+        else:
+            book.asks.add(limit, order_id, remaining)
+        if traded and (book.buy_stops or book.sell_stops):
+            self._trigger(book)
+
+    def _trigger(self, book):
+        """
+        Activate stops crossed by the last trade price, in stop price then time order.
+
+        Triggered stops become market orders (stop-limits become limit orders)
+        and may move the price further; the cascade runs in this loop rather
+        than recursively.
+        """
+        if book.triggering:
+            return
+        book.triggering = True
+        try:
+            while True:
+                last = book.last
+                if book.buy_stops and book.buy_stops[0][0] <= last:
+                    _, order_id = book.buy_stops.pop(0)
+                elif book.sell_stops and -book.sell_stops[0][0] >= last:
+                    _, order_id = book.sell_stops.pop(0)
+                else:
+                    return
+                if self.status[order_id] == CANCELLED:
+                    continue
+                kind = LIMIT if self.kind[order_id] == STOP_LIMIT else MARKET
+                self.kind[order_id] = kind
+                self._execute(
+                    book, order_id, self.side[order_id], self.remaining[order_id],
+                    self.price[order_id] if kind == LIMIT else None,
+                )
+        finally:
+            book.triggering = False
+
+    def cancel(self, order_id):
+        """Cancel an open order; False when it is already filled or cancelled"""
+        if self.status[order_id] in (FILLED, CANCELLED):
+            return False
+        if self.kind[order_id] == LIMIT:
+            book = self._books[self.instruments[self.book[order_id]]]
+            if self.side[order_id] == BUY:
+                book.bids.reduce(-self.price[order_id], self.remaining[order_id])
+            else:
+                book.asks.reduce(self.price[order_id], self.remaining[order_id])
+        # Queue entries and untriggered stops are skipped lazily
+        self._cancel(order_id)
+        return True
+
+    def _cancel(self, order_id):
+        self._cancels.append((order_id, self.quantity[order_id] - self.remaining[order_id]))
+        self.remaining[order_id] = 0
+        self.status[order_id] = CANCELLED
+
+    def best_bid(self, instrument):
+        keys = self._get_book(instrument).bids.keys
+        return -keys[0] / PRICE_SCALE if keys else None
+
+    def best_ask(self, instrument):
+        keys = self._get_book(instrument).asks.keys
+        return keys[0] / PRICE_SCALE if keys else None
+
+    def last_price(self, instrument):
+        last = self._get_book(instrument).last
+        return last / PRICE_SCALE if last is not None else None
+
+    def depth(self, instrument, levels=5):
+        """``{'bids': [(price, quantity)], 'asks': [...]}``, best first"""
+        book = self._get_book(instrument)
+        return {
+            'bids': [(-key / PRICE_SCALE, book.bids.volume[key]) for key in book.bids.keys[:levels]],
+            'asks': [(key / PRICE_SCALE, book.asks.volume[key]) for key in book.asks.keys[:levels]],
+        }
+
+    def order_status(self, order_id):
+        return STATUSES[self.status[order_id]]
+
+    @staticmethod
+    def _column(values, dtype, index=None):
+        """Copy of a column, or of its ``index`` rows, as a NumPy array"""
+        if not len(values):
+            return np.empty(0, dtype=dtype)
+        view = np.frombuffer(values, dtype=dtype)
+        # Never hand out the view itself: an exported buffer cannot grow
+        return view.copy() if index is None else view[index]
+
+    def drain_fills(self):
+        """
+        Fills since the last drain as a DataFrame of FILL_COLUMNS.
+
+        Every match yields a row for the taker followed by one for the maker.
+        """
+        matches = np.array(self._matches, dtype=np.int64).reshape(-1, 5)
+        self._matches = []
+        order_ids = matches[:, :2].ravel()
+        contra_ids = matches[:, 1::-1].ravel()
+        instruments = np.array(self.instruments, dtype=object)
+        books = self._column(self.book, np.int32, order_ids)
+        sides = self._column(self.side, np.int8, order_ids)
+        return pd.DataFrame({
+            'order_id': order_ids,
+            'contra_order_id': contra_ids,
+            'instrument': instruments[books] if len(instruments) else np.empty(0, dtype=object),
+            'side': np.where(sides == BUY, 'buy', 'sell'),
+            'price': np.repeat(matches[:, 2], 2) / PRICE_SCALE,
+            'quantity': np.repeat(matches[:, 3], 2),
+            'is_maker': np.tile([False, True], len(matches)),
+            'account': self._column(self.account, np.int64, order_ids),
+            'ref': self._column(self.ref, np.int64, order_ids),
+            'time': np.repeat(matches[:, 4], 2),
+        }, columns=FILL_COLUMNS)
+
+    def drain_cancels(self):
+        """Orders cancelled since the last drain: DataFrame of order_id, filled, account, ref"""
+        cancels = np.array(self._cancels, dtype=np.int64).reshape(-1, 2)
+        self._cancels = []
+        order_ids = cancels[:, 0]
+        return pd.DataFrame({
+            'order_id': order_ids,
+            'filled': cancels[:, 1],
+            'account': self._column(self.account, np.int64, order_ids),
+            'ref': self._column(self.ref, np.int64, order_ids),
+        })
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('market_data', '0003_corporateaction'),
+        ('users', '0005_alter_transaction_transaction_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('side', models.CharField(choices=[('buy', 'Buy'), ('sell', 'Sell')], max_length=4)),
+                ('order_type', models.CharField(choices=[('market', 'Market'), ('limit', 'Limit'), ('stop', 'Stop'), ('stop_limit', 'Stop Limit')], default='limit', max_length=20)),
+                ('quantity', models.PositiveBigIntegerField()),
+                ('limit_price', models.DecimalField(blank=True, decimal_places=4, max_digits=19, null=True)),
+                ('stop_price', models.DecimalField(blank=True, decimal_places=4, max_digits=19, null=True)),
+                ('filled_quantity', models.PositiveBigIntegerField(default=0)),
+                ('average_price', models.DecimalField(blank=True, decimal_places=4, max_digits=19, null=True)),
+                ('status', models.CharField(choices=[('new', 'New'), ('partially_filled', 'Partially Filled'), ('filled', 'Filled'), ('cancelled', 'Cancelled'), ('rejected', 'Rejected')], default='new', max_length=20)),
+                ('submitted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='users.account')),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='market_data.security')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Fill',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('fill_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveBigIntegerField()),
+                ('price', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('is_maker', models.BooleanField(default=False)),
+                ('executed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fill', to='users.transaction')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fills', to='trades.order')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('position_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('average_cost', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('realized_pnl', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='users.account')),
+                ('security', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='positions', to='market_data.security')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['account', 'status'], name='trades_orde_account_193c0a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['security', 'status'], name='trades_orde_securit_af9037_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fill',
+            index=models.Index(fields=['order', 'executed_at'], name='trades_fill_order_i_16ac11_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='position',
+            constraint=models.UniqueConstraint(fields=('account', 'security'), name='trades_position_account_security_uniq'),
+        ),
+    ]
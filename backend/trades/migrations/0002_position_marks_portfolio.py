@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0001_initial'),
+        ('users', '0005_alter_transaction_transaction_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='position',
+            name='marked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='market_price',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=19, null=True),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='market_value',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=19),
+        ),
+        migrations.CreateModel(
+            name='Portfolio',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('portfolio_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('open_positions', models.IntegerField(default=0)),
+                ('cost_basis', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('market_value', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('realized_pnl', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('marked_at', models.DateTimeField(blank=True, null=True)),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio', to='users.account')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
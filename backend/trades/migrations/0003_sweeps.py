@@ -0,0 +1,65 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_data', '0003_corporateaction'),
+        ('trades', '0002_position_marks_portfolio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sweep',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sweep_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('strategy', models.CharField(max_length=50)),
+                ('mode', models.CharField(choices=[('grid', 'Grid'), ('walk_forward', 'Walk Forward')], default='grid', max_length=20)),
+                ('parameters', models.JSONField(default=dict)),
+                ('securities', models.JSONField(default=list)),
+                ('interval', models.CharField(default='1d', max_length=10)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('fee_rate', models.FloatField(default=0)),
+                ('initial_cash', models.FloatField(default=1000000)),
+                ('train_periods', models.PositiveIntegerField(blank=True, null=True)),
+                ('test_periods', models.PositiveIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SweepResult',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('result_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('run_key', models.CharField(max_length=40)),
+                ('phase', models.CharField(choices=[('full', 'Full Period'), ('train', 'In Sample'), ('test', 'Out of Sample')], default='full', max_length=10)),
+                ('fold', models.PositiveIntegerField(default=0)),
+                ('parameters', models.JSONField(default=dict)),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField()),
+                ('total_return', models.FloatField()),
+                ('sharpe', models.FloatField()),
+                ('max_drawdown', models.FloatField()),
+                ('trades', models.IntegerField()),
+                ('fees', models.FloatField()),
+                ('security', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sweep_results', to='market_data.security')),
+                ('sweep', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='trades.sweep')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sweep', 'phase', 'fold', '-sharpe'], name='trades_swee_sweep_i_1fbf81_idx')],
+                'constraints': [models.UniqueConstraint(fields=('sweep', 'run_key', 'security'), name='trades_sweepresult_run_uniq', nulls_distinct=False)],
+            },
+        ),
+    ]
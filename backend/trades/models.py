@@ -1,3 +1,247 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+# Base model for common fields
+class BaseModel(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+# Order Model
+class Order(BaseModel):
+    SIDES = [
+        ('buy', 'Buy'),
+        ('sell', 'Sell'),
+    ]
+
+    ORDER_TYPES = [
+        ('market', 'Market'),
+        ('limit', 'Limit'),
+        ('stop', 'Stop'),
+        ('stop_limit', 'Stop Limit'),
+    ]
+
+    ORDER_STATUSES = [
+        ('new', 'New'),
+        ('partially_filled', 'Partially Filled'),
+        ('filled', 'Filled'),
+        ('cancelled', 'Cancelled'),
+        ('rejected', 'Rejected'),
+    ]
+
+    order_id = models.BigAutoField(primary_key=True)
+    account = models.ForeignKey(
+        'users.Account',
+        on_delete=models.PROTECT,
+        related_name='orders'
+    )
+    security = models.ForeignKey(
+        'market_data.Security',
+        on_delete=models.PROTECT,
+        related_name='orders'
+    )
+    side = models.CharField(max_length=4, choices=SIDES)
+    order_type = models.CharField(max_length=20, choices=ORDER_TYPES, default='limit')
+    quantity = models.PositiveBigIntegerField()
+    limit_price = models.DecimalField(max_digits=19, decimal_places=4, null=True, blank=True)
+    stop_price = models.DecimalField(max_digits=19, decimal_places=4, null=True, blank=True)
+    filled_quantity = models.PositiveBigIntegerField(default=0)
+    average_price = models.DecimalField(max_digits=19, decimal_places=4, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=ORDER_STATUSES, default='new')
+    submitted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'status']),
+            models.Index(fields=['security', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.side} {self.quantity} {self.security_id} {self.order_type} ({self.status})"
+
+
+# Fill Model
+class Fill(BaseModel):
+    fill_id = models.BigAutoField(primary_key=True)
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='fills'
+    )
+    quantity = models.PositiveBigIntegerField()
+    price = models.DecimalField(max_digits=19, decimal_places=4)
+    is_maker = models.BooleanField(default=False)
+    executed_at = models.DateTimeField(default=timezone.now)
+    # Cash leg posted to the order's account
+    transaction = models.OneToOneField(
+        'users.Transaction',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='fill'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'executed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}: {self.quantity} @ {self.price}"
+
+
+# Position Model
+class Position(BaseModel):
+    position_id = models.BigAutoField(primary_key=True)
+    account = models.ForeignKey(
+        'users.Account',
+        on_delete=models.CASCADE,
+        related_name='positions'
+    )
+    security = models.ForeignKey(
+        'market_data.Security',
+        on_delete=models.PROTECT,
+        related_name='positions'
+    )
+    # Signed: negative quantities are short positions
+    quantity = models.BigIntegerField(default=0)
+    average_cost = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    realized_pnl = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    # Last mark: the latest fill or bar close, whichever is newer
+    market_price = models.DecimalField(max_digits=19, decimal_places=4, null=True, blank=True)
+    market_value = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    marked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'security'], name='trades_position_account_security_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.security_id}: {self.quantity} @ {self.average_cost}"
+
+    @property
+    def cost_basis(self):
+        return self.quantity * self.average_cost
+
+    @property
+    def unrealized_pnl(self):
+        return self.market_value - self.cost_basis
+
+
+# Portfolio Model
+class Portfolio(BaseModel):
+    """
+    Totals over an account's positions, maintained with every fill and mark.
+
+    Reading a portfolio is a single row lookup however many positions or fills
+    the account has.
+    """
+    portfolio_id = models.BigAutoField(primary_key=True)
+    account = models.OneToOneField(
+        'users.Account',
+        on_delete=models.CASCADE,
+        related_name='portfolio'
+    )
+    open_positions = models.IntegerField(default=0)
+    cost_basis = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    market_value = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    realized_pnl = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+    marked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.account_id}: {self.market_value} ({self.open_positions} positions)"
+
+    @property
+    def unrealized_pnl(self):
+        return self.market_value - self.cost_basis
+
+
+# Sweep Model
+class Sweep(BaseModel):
+    """A grid or walk-forward parameter sweep of a backtest strategy (trades.sweeps)"""
+    MODES = [
+        ('grid', 'Grid'),
+        ('walk_forward', 'Walk Forward'),
+    ]
+
+    SWEEP_STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    sweep_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=255, blank=True, default='')
+    strategy = models.CharField(max_length=50)
+    mode = models.CharField(max_length=20, choices=MODES, default='grid')
+    # Parameter name -> list of values; the grid is their cartesian product
+    parameters = models.JSONField(default=dict)
+    securities = models.JSONField(default=list)
+    interval = models.CharField(max_length=10, default='1d')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    fee_rate = models.FloatField(default=0)
+    initial_cash = models.FloatField(default=1_000_000)
+    # Walk-forward windows, in bars
+    train_periods = models.PositiveIntegerField(null=True, blank=True)
+    test_periods = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=SWEEP_STATUSES, default='pending')
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name or self.strategy} ({self.mode}, {self.status})"
+
+
+# SweepResult Model
+class SweepResult(BaseModel):
+    """Statistics of one parameter set over one window; ``security`` is null for the whole portfolio"""
+    PHASES = [
+        ('full', 'Full Period'),
+        ('train', 'In Sample'),
+        ('test', 'Out of Sample'),
+    ]
+
+    result_id = models.BigAutoField(primary_key=True)
+    sweep = models.ForeignKey(
+        Sweep,
+        on_delete=models.CASCADE,
+        related_name='results'
+    )
+    run_key = models.CharField(max_length=40)
+    phase = models.CharField(max_length=10, choices=PHASES, default='full')
+    fold = models.PositiveIntegerField(default=0)
+    security = models.ForeignKey(
+        'market_data.Security',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='sweep_results'
+    )
+    parameters = models.JSONField(default=dict)
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    total_return = models.FloatField()
+    sharpe = models.FloatField()
+    max_drawdown = models.FloatField()
+    trades = models.IntegerField()
+    fees = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sweep', 'run_key', 'security'], nulls_distinct=False,
+                name='trades_sweepresult_run_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['sweep', 'phase', 'fold', '-sharpe']),
+        ]
+
+    def __str__(self):
+        return f"{self.sweep_id} {self.parameters}: {self.sharpe:.2f}"
@@ -0,0 +1,210 @@
+"""
+Incrementally maintained positions and mark-to-market P&L.
+
+apply_fills() folds a batch of fills into the affected Position rows (average
+cost, realized P&L, mark at the fill price) and moves the account Portfolio
+totals by the resulting deltas, so neither positions nor portfolios are ever
+rebuilt from fill history. mark_to_market() revalues every open position
+against the latest stored bar of its security in one UPDATE and refreshes the
+portfolio totals of the accounts it touched.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction as db_transaction
+from django.db.models import Q
+
+from market_data.models import Bar
+
+from .models import Portfolio, Position
+
+CENT = Decimal('0.0001')
+ZERO = Decimal('0')
+
+_PORTFOLIO_DELTAS_SQL = """
+INSERT INTO {portfolio_table}
+       (account_id, open_positions, cost_basis, market_value, realized_pnl, marked_at, created_at, updated_at)
+SELECT d.account_id, d.open_positions, d.cost_basis, d.market_value, d.realized_pnl, d.marked_at, now(), now()
+  FROM unnest(%s::bigint[], %s::int[], %s::numeric[], %s::numeric[], %s::numeric[], %s::timestamptz[])
+       AS d(account_id, open_positions, cost_basis, market_value, realized_pnl, marked_at)
+    ON CONFLICT (account_id) DO UPDATE
+   SET open_positions = {portfolio_table}.open_positions + EXCLUDED.open_positions,
+       cost_basis = {portfolio_table}.cost_basis + EXCLUDED.cost_basis,
+       market_value = {portfolio_table}.market_value + EXCLUDED.market_value,
+       realized_pnl = {portfolio_table}.realized_pnl + EXCLUDED.realized_pnl,
+       marked_at = GREATEST({portfolio_table}.marked_at, EXCLUDED.marked_at),
+       updated_at = now()
+"""
+
+# Latest bar per security with an open position, applied unless the position
+# was marked more recently (by a fill); returns the accounts revalued
+_MARK_SQL = """
+WITH latest AS (
+    SELECT s.security_id, b.close, b.ts
+      FROM (SELECT DISTINCT security_id FROM {position_table} WHERE quantity <> 0 {account_filter}) s
+      JOIN LATERAL (
+            SELECT close, ts
+              FROM {bar_table}
+             WHERE security_id = s.security_id AND "interval" = %s
+          ORDER BY ts DESC
+             LIMIT 1
+           ) b ON TRUE
+)
+UPDATE {position_table} p
+   SET market_price = ROUND(l.close::numeric, 4),
+       market_value = p.quantity * ROUND(l.close::numeric, 4),
+       marked_at = l.ts,
+       updated_at = now()
+  FROM latest l
+ WHERE p.security_id = l.security_id
+   AND p.quantity <> 0 {account_filter}
+   AND (p.marked_at IS NULL OR p.marked_at < l.ts)
+RETURNING p.account_id
+"""
+
+_PORTFOLIO_TOTALS_SQL = """
+INSERT INTO {portfolio_table}
+       (account_id, open_positions, cost_basis, market_value, realized_pnl, marked_at, created_at, updated_at)
+SELECT p.account_id,
+       COUNT(*) FILTER (WHERE p.quantity <> 0),
+       SUM(p.quantity * p.average_cost),
+       SUM(p.market_value),
+       SUM(p.realized_pnl),
+       MAX(p.marked_at),
+       now(), now()
+  FROM {position_table} p
+ WHERE p.account_id = ANY(%s)
+ GROUP BY p.account_id
+    ON CONFLICT (account_id) DO UPDATE
+   SET open_positions = EXCLUDED.open_positions,
+       cost_basis = EXCLUDED.cost_basis,
+       market_value = EXCLUDED.market_value,
+       realized_pnl = EXCLUDED.realized_pnl,
+       marked_at = EXCLUDED.marked_at,
+       updated_at = now()
+"""
+
+
+def apply_fill(position, quantity, price):
+    """
+    Apply one fill of signed ``quantity`` (negative for sells) at ``price`` to
+    a Position in place; returns the P&L it realized.
+    """
+    held, cost = position.quantity, position.average_cost
+    realized = ZERO
+    if held == 0 or (held > 0) == (quantity > 0):
+        position.average_cost = ((abs(held) * cost + abs(quantity) * price) / (abs(held) + abs(quantity))).quantize(CENT)
+    else:
+        closed = min(abs(quantity), abs(held))
+        realized = (closed * (price - cost) * (1 if held > 0 else -1)).quantize(CENT)
+        if abs(quantity) > abs(held):
+            # Flipped from long to short or back: the remainder opens at the fill price
+            position.average_cost = price
+        elif abs(quantity) == abs(held):
+            position.average_cost = ZERO
+    position.quantity = held + quantity
+    position.realized_pnl += realized
+    return realized
+
+
+def _state(position):
+    return (
+        1 if position.quantity else 0,
+        position.quantity * position.average_cost,
+        position.market_value,
+        position.realized_pnl,
+    )
+
+
+def apply_fills(fills):
+    """
+    Fold fills into positions and portfolio totals; call inside the transaction
+    that records them.
+
+    ``fills`` is a sequence of (account_id, security_id, signed quantity,
+    price, executed_at) in execution order, with Decimal prices. Positions are
+    locked in key order, updated in memory and written back with a single
+    upsert; portfolios move by the per-account deltas.
+    """
+    if not fills:
+        return 0
+    keys = {(account_id, security_id) for account_id, security_id, *_ in fills}
+    condition = Q()
+    for account_id, security_id in keys:
+        condition |= Q(account_id=account_id, security_id=security_id)
+
+    with db_transaction.atomic():
+        positions = {
+            (position.account_id, position.security_id): position
+            for position in Position.objects.select_for_update().filter(condition).order_by('pk')
+        }
+        before = {key: _state(position) for key, position in positions.items()}
+        for account_id, security_id, quantity, price, executed_at in fills:
+            position = positions.get((account_id, security_id))
+            if position is None:
+                position = positions[(account_id, security_id)] = Position(
+                    account_id=account_id, security_id=security_id, realized_pnl=ZERO,
+                )
+            apply_fill(position, quantity, price)
+            position.market_price = price
+            position.market_value = position.quantity * price
+            position.marked_at = executed_at
+
+        Position.objects.bulk_create(
+            positions.values(),
+            update_conflicts=True,
+            unique_fields=['account', 'security'],
+            update_fields=['quantity', 'average_cost', 'realized_pnl', 'market_price', 'market_value',
+                           'marked_at', 'updated_at'],
+        )
+
+        deltas = {}
+        for key, position in positions.items():
+            after = _state(position)
+            previous = before.get(key, (0, ZERO, ZERO, ZERO))
+            total = deltas.setdefault(key[0], [0, ZERO, ZERO, ZERO, position.marked_at])
+            for i in range(4):
+                total[i] += after[i] - previous[i]
+            total[4] = max(total[4], position.marked_at)
+        account_ids = sorted(deltas)
+        columns = list(zip(*(deltas[account_id] for account_id in account_ids)))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _PORTFOLIO_DELTAS_SQL.format(portfolio_table=Portfolio._meta.db_table),
+                [account_ids, *[list(column) for column in columns]],
+            )
+    return len(positions)
+
+
+def refresh_portfolios(account_ids):
+    """Recompute portfolio totals of the given accounts from their positions"""
+    account_ids = sorted(set(account_ids))
+    if not account_ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _PORTFOLIO_TOTALS_SQL.format(
+                portfolio_table=Portfolio._meta.db_table, position_table=Position._meta.db_table,
+            ),
+            [account_ids],
+        )
+        return cursor.rowcount
+
+
+def mark_to_market(interval='1d', account_ids=None):
+    """
+    Revalue open positions at the close of the latest ``interval`` bar of
+    their security, for all accounts or the given ones.
+
+    Returns the number of positions revalued.
+    """
+    account_filter = 'AND account_id = ANY(%s)' if account_ids is not None else ''
+    params = [list(account_ids)] if account_ids is not None else []
+    sql = _MARK_SQL.format(
+        position_table=Position._meta.db_table, bar_table=Bar._meta.db_table,
+        account_filter=account_filter,
+    )
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [*params, interval, *params])
+        marked = [account_id for account_id, in cursor.fetchall()]
+        refresh_portfolios(marked)
+    return len(marked)
@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+from .models import Portfolio, Position
+
+
+class PositionSerializer(serializers.ModelSerializer):
+    symbol = serializers.CharField(source='security.symbol', read_only=True)
+    cost_basis = serializers.DecimalField(max_digits=19, decimal_places=4, read_only=True)
+    unrealized_pnl = serializers.DecimalField(max_digits=19, decimal_places=4, read_only=True)
+
+    class Meta:
+        model = Position
+        fields = [
+            'position_id', 'account', 'security', 'symbol', 'quantity', 'average_cost', 'cost_basis',
+            'market_price', 'market_value', 'unrealized_pnl', 'realized_pnl', 'marked_at',
+        ]
+
+
+class PortfolioSerializer(serializers.ModelSerializer):
+    unrealized_pnl = serializers.DecimalField(max_digits=19, decimal_places=4, read_only=True)
+
+    class Meta:
+        model = Portfolio
+        fields = [
+            'account', 'open_positions', 'cost_basis', 'market_value', 'unrealized_pnl', 'realized_pnl',
+            'marked_at', 'updated_at',
+        ]
@@ -0,0 +1,109 @@
+"""
+Persistence of execution simulator results for paper trading.
+
+Orders are submitted to a trades.matching.ExecutionSimulator with their primary
+key as ``ref``; settle() drains the simulator and writes fills in batches: one
+bulk INSERT of cash transactions (posted to account balances and daily
+snapshots through users.ledger), one of Fill rows and one UPDATE of the
+affected orders per batch, and folds the fills into positions
+(trades.positions). Simulator orders without a ref (backtests, seeded
+liquidity) are never written.
+"""
+from decimal import Decimal
+
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from users.ledger import post_completed
+from users.models import Transaction
+
+from .matching import PRICE_SCALE
+from .models import Fill, Order
+from .positions import apply_fills
+
+DEFAULT_BATCH_SIZE = 5000
+
+_UPDATE_ORDERS_SQL = """
+UPDATE {order_table} o
+   SET filled_quantity = o.filled_quantity + u.quantity,
+       average_price = ROUND(
+           (COALESCE(o.average_price, 0) * o.filled_quantity + u.notional) / (o.filled_quantity + u.quantity), 4
+       ),
+       status = CASE WHEN o.filled_quantity + u.quantity >= o.quantity THEN 'filled' ELSE 'partially_filled' END,
+       updated_at = now()
+  FROM unnest(%s::bigint[], %s::bigint[], %s::numeric[]) AS u(order_id, quantity, notional)
+ WHERE o.order_id = u.order_id
+"""
+
+
+def submit_orders(simulator, orders):
+    """Submit the open part of trades.Order rows to the simulator; returns simulator order ids"""
+    return [
+        simulator.submit(
+            order.security_id, order.side, order.quantity - order.filled_quantity, order.order_type,
+            price=order.limit_price, stop_price=order.stop_price, account=order.account_id, ref=order.pk,
+        )
+        for order in orders
+    ]
+
+
+def _settle_batch(fills, executed_at):
+    ticks = (fills['price'] * PRICE_SCALE).round().astype('int64')
+    notional = [Decimal(int(value)).scaleb(-4) for value in ticks * fills['quantity']]
+    prices = [Decimal(int(value)).scaleb(-4) for value in ticks]
+    rows = list(zip(fills['ref'].tolist(), fills['account'].tolist(), fills['side'].tolist(),
+                    fills['quantity'].tolist(), fills['is_maker'].tolist(), prices, notional))
+    # Paper trading books are keyed on security_id (see submit_orders)
+    securities = fills['instrument'].tolist()
+
+    transactions = Transaction.objects.bulk_create([
+        Transaction(
+            account_id=account_id, transaction_type=side, transaction_amount=amount,
+            transaction_status='completed', reference=f'order {order_id}',
+        )
+        for order_id, account_id, side, _, _, _, amount in rows
+    ])
+    post_completed(transactions)
+    Fill.objects.bulk_create([
+        Fill(order_id=order_id, quantity=quantity, price=price, is_maker=is_maker,
+             executed_at=executed_at, transaction=txn)
+        for (order_id, _, _, quantity, is_maker, price, _), txn in zip(rows, transactions)
+    ])
+
+    apply_fills([
+        (account_id, security_id, quantity if side == 'buy' else -quantity, price, executed_at)
+        for (_, account_id, side, quantity, _, price, _), security_id in zip(rows, securities)
+    ])
+
+    totals = {}
+    for order_id, _, _, quantity, _, _, amount in rows:
+        filled, value = totals.get(order_id, (0, Decimal('0')))
+        totals[order_id] = (filled + quantity, value + amount)
+    order_ids = sorted(totals)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _UPDATE_ORDERS_SQL.format(order_table=Order._meta.db_table),
+            [order_ids, [totals[o][0] for o in order_ids], [totals[o][1] for o in order_ids]],
+        )
+
+
+def settle(simulator, executed_at=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Persist the simulator's fills and cancellations since the last call.
+
+    Returns ``{'fills': n, 'cancelled': n}``.
+    """
+    executed_at = executed_at or timezone.now()
+    fills = simulator.drain_fills()
+    fills = fills[fills['ref'] > 0]
+    cancels = simulator.drain_cancels()
+    cancelled = cancels.loc[cancels['ref'] > 0, 'ref'].tolist()
+
+    for start in range(0, len(fills), batch_size):
+        with db_transaction.atomic():
+            _settle_batch(fills.iloc[start:start + batch_size], executed_at)
+    if cancelled:
+        Order.objects.filter(pk__in=cancelled).exclude(status='filled').update(
+            status='cancelled', updated_at=timezone.now()
+        )
+    return {'fills': len(fills), 'cancelled': len(cancelled)}
@@ -0,0 +1,93 @@
+"""
+Worker side of parameter sweeps (trades.sweeps).
+
+This module runs in joblib worker processes and must not need Django.
+share_bars() writes a sweep's price matrices once as ``.npy`` files; workers
+open them with ``np.load(mmap_mode='r')``, so every process reads the same
+pages through the OS page cache instead of receiving a pickled copy of the
+bars with each task, and keep them mapped for the rest of the sweep.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .backtest import Bars, run_vectorized, sma_crossover_targets
+
+# Strategy name -> function(close, **parameters) returning target positions like close
+STRATEGIES = {
+    'sma_crossover': sma_crossover_targets,
+}
+
+# Fields a vectorised backtest reads: fills at the open, marks at the close
+SHARED_FIELDS = ('open', 'close')
+
+_mapped = {}
+
+
+def share_bars(bars, directory):
+    """Write the shared fields of ``bars`` plus their index and columns under ``directory``"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for field in SHARED_FIELDS:
+        np.save(directory / f'{field}.npy', getattr(bars, field).to_numpy(dtype=float, na_value=np.nan))
+    np.save(directory / 'index.npy', bars.close.index.asi8)
+    np.save(directory / 'columns.npy', np.asarray(bars.close.columns, dtype=np.int64))
+    return directory
+
+
+def open_bars(directory):
+    """Memory-mapped Bars of a shared directory, cached for the life of the process"""
+    directory = str(directory)
+    bars = _mapped.get(directory)
+    if bars is None:
+        # Workers outlive a sweep: drop the maps of the previous one
+        _mapped.clear()
+        path = Path(directory)
+        index = pd.DatetimeIndex(np.load(path / 'index.npy'), tz='UTC', name='ts')
+        columns = pd.Index(np.load(path / 'columns.npy'), name='security_id')
+        frames = {
+            field: pd.DataFrame(np.load(path / f'{field}.npy', mmap_mode='r'), index=index, columns=columns,
+                                copy=False)
+            for field in SHARED_FIELDS
+        }
+        bars = _mapped[directory] = Bars(**{field: frames.get(field) for field in Bars._fields})
+    return bars
+
+
+def _slice(bars, lo, hi):
+    return Bars(*(None if frame is None else frame.iloc[lo:hi] for frame in bars))
+
+
+def column_stats(pnl, trades, fees, initial_cash, periods_per_year):
+    """Per-security statistics of a backtest, as if each security had been traded alone on ``initial_cash``"""
+    equity = initial_cash + np.cumsum(pnl, axis=0)
+    returns = np.zeros_like(pnl)
+    returns[1:] = pnl[1:] / equity[:-1]
+    mean, volatility = returns.mean(axis=0), returns.std(axis=0)
+    sharpe = np.divide(mean, volatility, out=np.zeros_like(mean), where=volatility > 0) * np.sqrt(periods_per_year)
+    drawdown = 1 - equity / np.maximum.accumulate(equity, axis=0)
+    return {
+        'total_return': equity[-1] / initial_cash - 1,
+        'sharpe': sharpe,
+        'max_drawdown': drawdown.max(axis=0),
+        'trades': np.count_nonzero(trades, axis=0),
+        'fees': fees.sum(axis=0),
+    }
+
+
+def evaluate(directory, run_key, strategy, parameters, lo, hi, fee_rate, initial_cash, periods_per_year):
+    """
+    Backtest one parameter set over rows ``lo:hi`` of the shared bars.
+
+    Targets are computed on every row before ``hi`` so indicators are warmed up
+    by the time the window starts. Returns ``(run_key, portfolio stats,
+    per-security stats)``, the latter as arrays over the shared columns.
+    """
+    bars = open_bars(directory)
+    targets = STRATEGIES[strategy](bars.close.iloc[:hi], **parameters).to_numpy()[lo:]
+    result = run_vectorized(_slice(bars, lo, hi), targets, fee_rate=fee_rate, initial_cash=initial_cash)
+    per_security = column_stats(
+        result.pnl.to_numpy(), result.trades.to_numpy(), result.fees.to_numpy(), initial_cash, periods_per_year,
+    )
+    return run_key, result.stats(periods_per_year), per_security
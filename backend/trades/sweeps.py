@@ -0,0 +1,156 @@
+"""
+Grid and walk-forward parameter sweeps of vectorised backtests.
+
+run_sweep() loads a Sweep's bars once, shares them with a joblib process pool
+as memory-mapped arrays (trades.sweep_worker) and fans out one task per
+parameter set and window. Results are written to SweepResult as workers
+complete them, a portfolio row plus one row per security, keyed on a hash of
+the task so that running an interrupted sweep again only evaluates the tasks
+it has no results for.
+
+Walk-forward sweeps roll ``train_periods`` in-sample bars followed by
+``test_periods`` out-of-sample bars over the data; each fold's best in-sample
+parameters by Sharpe ratio are then evaluated on its test window.
+"""
+import hashlib
+import json
+import shutil
+from itertools import product
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from joblib import Parallel, delayed
+
+from .backtest import PERIODS_PER_YEAR, load_bars
+from .models import SweepResult
+from .sweep_worker import STRATEGIES, evaluate, share_bars
+
+# Completed tasks written per INSERT while a sweep runs
+DEFAULT_FLUSH_SIZE = 50
+
+
+def parameter_grid(parameters):
+    """Cartesian product of ``{name: [values]}`` as a list of ``{name: value}``"""
+    names = sorted(parameters)
+    return [dict(zip(names, values)) for values in product(*(parameters[name] for name in names))]
+
+
+def walk_forward_windows(rows, train_periods, test_periods):
+    """(train start, test start, test end) row bounds of rolling walk-forward folds"""
+    if train_periods < 1 or test_periods < 1:
+        raise ValueError("Walk-forward windows need positive train and test periods")
+    return [
+        (start, start + train_periods, start + train_periods + test_periods)
+        for start in range(0, rows - train_periods - test_periods + 1, test_periods)
+    ]
+
+
+def task_key(phase, fold, parameters):
+    payload = json.dumps([phase, fold, parameters], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _rows(sweep, task, stats, per_security, index, columns):
+    key, phase, fold, parameters, lo, hi = task
+    common = dict(
+        sweep=sweep, run_key=key, phase=phase, fold=fold, parameters=parameters,
+        window_start=index[lo], window_end=index[hi - 1],
+    )
+    rows = [SweepResult(security=None, **common, **{name: float(value) for name, value in stats.items()})]
+    for i, security_id in enumerate(columns):
+        rows.append(SweepResult(
+            security_id=int(security_id), **common,
+            **{name: float(values[i]) for name, values in per_security.items()},
+        ))
+    return rows
+
+
+def _run_tasks(sweep, bars, directory, tasks, done, n_jobs, flush_size):
+    """Evaluate the tasks not ``done`` on the pool and write their results in completion order"""
+    tasks = [task for task in tasks if task[0] not in done]
+    if not tasks:
+        return 0
+    by_key = {task[0]: task for task in tasks}
+    options = (sweep.fee_rate, sweep.initial_cash, PERIODS_PER_YEAR.get(sweep.interval, PERIODS_PER_YEAR['1d']))
+    index, columns = bars.close.index, list(bars.close.columns)
+    results = Parallel(n_jobs=n_jobs, return_as='generator_unordered')(
+        delayed(evaluate)(str(directory), key, sweep.strategy, parameters, lo, hi, *options)
+        for key, _, _, parameters, lo, hi in tasks
+    )
+    pending = []
+    for finished, (key, stats, per_security) in enumerate(results, 1):
+        pending.extend(_rows(sweep, by_key[key], stats, per_security, index, columns))
+        if finished % flush_size == 0:
+            _flush(pending)
+            pending = []
+    _flush(pending)
+    return len(tasks)
+
+
+def _flush(rows):
+    if rows:
+        with db_transaction.atomic():
+            SweepResult.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def _best_parameters(sweep, fold):
+    return (
+        SweepResult.objects
+        .filter(sweep=sweep, phase='train', fold=fold, security__isnull=True)
+        .order_by('-sharpe', 'run_key')
+        .values_list('parameters', flat=True)
+        .first()
+    )
+
+
+def run_sweep(sweep, n_jobs=-1, flush_size=DEFAULT_FLUSH_SIZE):
+    """
+    Run, or resume, a Sweep; returns the number of tasks evaluated.
+
+    The sweep is marked failed if a task raises or the run is interrupted,
+    and can be resumed by calling run_sweep() on it again.
+    """
+    if sweep.strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {sweep.strategy!r}")
+    sweep.status = 'running'
+    sweep.finished_at = None
+    sweep.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    directory = settings.SWEEP_DATA_DIR / str(sweep.pk)
+    try:
+        bars = load_bars(sweep.securities, sweep.interval, sweep.start, sweep.end)
+        share_bars(bars, directory)
+        done = set(
+            SweepResult.objects.filter(sweep=sweep, security__isnull=True).values_list('run_key', flat=True)
+        )
+        grid = parameter_grid(sweep.parameters)
+        rows = len(bars.close)
+
+        if sweep.mode == 'grid':
+            tasks = [(task_key('full', 0, parameters), 'full', 0, parameters, 0, rows) for parameters in grid]
+            evaluated = _run_tasks(sweep, bars, directory, tasks, done, n_jobs, flush_size)
+        else:
+            folds = walk_forward_windows(rows, sweep.train_periods or 0, sweep.test_periods or 0)
+            tasks = [
+                (task_key('train', fold, parameters), 'train', fold, parameters, lo, mid)
+                for fold, (lo, mid, _) in enumerate(folds)
+                for parameters in grid
+            ]
+            evaluated = _run_tasks(sweep, bars, directory, tasks, done, n_jobs, flush_size)
+            tasks = []
+            for fold, (_, mid, hi) in enumerate(folds):
+                parameters = _best_parameters(sweep, fold)
+                tasks.append((task_key('test', fold, parameters), 'test', fold, parameters, mid, hi))
+            evaluated += _run_tasks(sweep, bars, directory, tasks, done, n_jobs, flush_size)
+    except BaseException:
+        sweep.status = 'failed'
+        sweep.save(update_fields=['status', 'updated_at'])
+        raise
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    sweep.status = 'completed'
+    sweep.finished_at = timezone.now()
+    sweep.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return evaluated
@@ -1,3 +1,340 @@
-from django.test import TestCase
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from market_data.bars import upsert_bars
+from market_data.models import Security
+from users.models import Account, AccountDailySnapshot, User
+
+from .backtest import Bars, SmaCrossover, Strategy, load_bars, run_events, run_vectorized, sma_crossover_targets
+from .matching import ExecutionSimulator
+from .models import Fill, Order, Portfolio, Position, Sweep
+from .positions import apply_fill, mark_to_market
+from .settlement import settle, submit_orders
+from .sweeps import run_sweep, task_key, walk_forward_windows
+
+
+class ExecutionSimulatorTests(SimpleTestCase):
+    """Price-time priority matching of market, limit and stop orders"""
+
+    def setUp(self):
+        self.sim = ExecutionSimulator()
+
+    def test_price_then_time_priority(self):
+        early = self.sim.submit('IBM', 'sell', 100, price=10.0)
+        late = self.sim.submit('IBM', 'sell', 100, price=10.0)
+        better = self.sim.submit('IBM', 'sell', 50, price=9.99)
+        taker = self.sim.submit('IBM', 'buy', 120, price=10.0)
+
+        fills = self.sim.drain_fills()
+        makers = fills[fills['is_maker']]
+        self.assertEqual(makers['order_id'].tolist(), [better, early])
+        self.assertEqual(makers['quantity'].tolist(), [50, 70])
+        self.assertEqual(makers['price'].tolist(), [9.99, 10.0])
+        self.assertEqual(fills.loc[~fills['is_maker'], 'order_id'].unique().tolist(), [taker])
+        self.assertEqual(self.sim.order_status(taker), 'filled')
+        self.assertEqual(self.sim.order_status(early), 'partially_filled')
+        self.assertEqual(self.sim.order_status(late), 'new')
+        self.assertEqual(self.sim.depth('IBM'), {'bids': [], 'asks': [(10.0, 130)]})
+
+    def test_limit_remainder_rests_and_market_remainder_is_cancelled(self):
+        self.sim.submit('IBM', 'sell', 100, price=10.0)
+        buy = self.sim.submit('IBM', 'buy', 150, price=10.5)
+        self.assertEqual(self.sim.best_bid('IBM'), 10.5)
+        self.assertIsNone(self.sim.best_ask('IBM'))
+
+        market = self.sim.submit('IBM', 'sell', 80, 'market')
+        self.assertEqual(self.sim.order_status(buy), 'filled')
+        self.assertEqual(self.sim.order_status(market), 'cancelled')
+        cancels = self.sim.drain_cancels()
+        self.assertEqual(cancels[['order_id', 'filled']].values.tolist(), [[market, 50]])
+
+    def test_cancel_and_stops(self):
+        resting = self.sim.submit('IBM', 'buy', 100, price=9.0)
+        self.assertTrue(self.sim.cancel(resting))
+        self.assertFalse(self.sim.cancel(resting))
+        self.assertIsNone(self.sim.best_bid('IBM'))
+
+        self.sim.submit('IBM', 'buy', 100, price=9.5)
+        self.sim.submit('IBM', 'buy', 100, price=9.0)
+        stop = self.sim.submit('IBM', 'sell', 100, 'stop', stop_price=9.6)
+        self.assertEqual(self.sim.order_status(stop), 'new')
+
+        # A trade at 9.5 crosses the sell stop, which then sweeps the next bid
+        self.sim.submit('IBM', 'sell', 100, 'market')
+        self.assertEqual(self.sim.order_status(stop), 'filled')
+        self.assertEqual(self.sim.last_price('IBM'), 9.0)
+        fills = self.sim.drain_fills()
+        self.assertEqual(fills.loc[fills['order_id'] == stop, 'price'].tolist(), [9.0])
+
+    def test_invalid_orders(self):
+        with self.assertRaises(ValueError):
+            self.sim.submit('IBM', 'buy', 0, price=10.0)
+        with self.assertRaises(ValueError):
+            self.sim.submit('IBM', 'buy', 10)
+        with self.assertRaises(ValueError):
+            self.sim.submit('IBM', 'buy', 10, 'stop')
+
+
+class SettlementTests(TestCase):
+    """Simulator fills settle into Fill rows, orders and cash transactions"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        self.buyer = Account.objects.create(
+            user=user, account_nickname='Buyer', account_type='investment', currency='USD', balance=Decimal('10000'),
+        )
+        self.seller = Account.objects.create(
+            user=user, account_nickname='Seller', account_type='investment', currency='USD',
+        )
+        self.security = Security.objects.create(symbol='IBM')
+
+    def order(self, account, side, quantity, price=None, order_type='limit'):
+        return Order.objects.create(
+            account=account, security=self.security, side=side, quantity=quantity,
+            order_type=order_type, limit_price=price,
+        )
+
+    def test_fills_are_settled_in_batches(self):
+        sim = ExecutionSimulator()
+        orders = [
+            self.order(self.seller, 'sell', 30, Decimal('10.00')),
+            self.order(self.seller, 'sell', 30, Decimal('10.50')),
+            self.order(self.buyer, 'buy', 50, order_type='market'),
+        ]
+        submit_orders(sim, orders)
+        # Unpersisted liquidity is matched but never written
+        sim.submit(self.security.pk, 'buy', 5, price=10.5)
+
+        self.assertEqual(settle(sim, batch_size=2), {'fills': 5, 'cancelled': 0})
+
+        for order in orders:
+            order.refresh_from_db()
+        self.assertEqual([o.status for o in orders], ['filled', 'partially_filled', 'filled'])
+        self.assertEqual(orders[1].filled_quantity, 25)
+        self.assertEqual(orders[2].average_price, Decimal('10.2000'))
+        self.assertEqual(Fill.objects.filter(order=orders[2]).count(), 2)
+
+        self.buyer.refresh_from_db()
+        self.seller.refresh_from_db()
+        self.assertEqual(self.buyer.balance, Decimal('10000') - Decimal('510'))
+        self.assertEqual(self.seller.balance, Decimal('510') + Decimal('52.5'))
+        self.assertEqual(
+            AccountDailySnapshot.objects.get(account=self.buyer).balance, Decimal('-510')
+        )
+
+        # Cancelling persists the order state
+        sim.cancel(1)
+        self.assertEqual(settle(sim), {'fills': 0, 'cancelled': 1})
+        orders[1].refresh_from_db()
+        self.assertEqual(orders[1].status, 'cancelled')
+
+
+class PositionTests(APITestCase):
+    """Positions and portfolios follow fills and marks without replaying history"""
+
+    def test_average_cost_and_realized_pnl(self):
+        position = Position(quantity=0, realized_pnl=Decimal('0'))
+        apply_fill(position, 100, Decimal('10'))
+        apply_fill(position, 100, Decimal('12'))
+        self.assertEqual((position.quantity, position.average_cost), (200, Decimal('11')))
+        self.assertEqual(apply_fill(position, -150, Decimal('13')), Decimal('300'))
+        self.assertEqual((position.quantity, position.average_cost), (50, Decimal('11')))
+        # Selling through zero realizes the long and opens a short at the fill price
+        self.assertEqual(apply_fill(position, -100, Decimal('10')), Decimal('-50'))
+        self.assertEqual((position.quantity, position.average_cost), (-50, Decimal('10')))
+        self.assertEqual(position.realized_pnl, Decimal('250'))
+
+    def test_fills_and_marks_update_portfolios(self):
+        user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        buyer = Account.objects.create(user=user, account_nickname='Buyer', account_type='investment', currency='USD')
+        seller = Account.objects.create(user=user, account_nickname='Seller', account_type='investment', currency='USD')
+        security = Security.objects.create(symbol='IBM')
+        sim = ExecutionSimulator()
+        submit_orders(sim, [
+            Order.objects.create(account=seller, security=security, side='sell', quantity=30, limit_price=10),
+            Order.objects.create(account=seller, security=security, side='sell', quantity=30, limit_price=11),
+            Order.objects.create(account=buyer, security=security, side='buy', quantity=50, order_type='market'),
+        ])
+        settle(sim, executed_at=datetime(2024, 5, 1, 15, tzinfo=timezone.utc))
+
+        position = Position.objects.get(account=buyer)
+        self.assertEqual((position.quantity, position.average_cost, position.market_value),
+                         (50, Decimal('10.4000'), Decimal('550.0000')))
+        self.assertEqual(Position.objects.get(account=seller).quantity, -50)
+        portfolio = Portfolio.objects.get(account=buyer)
+        self.assertEqual((portfolio.open_positions, portfolio.cost_basis, portfolio.unrealized_pnl),
+                         (1, Decimal('520.0000'), Decimal('30.0000')))
+
+        # Closing half realizes P&L against the average cost
+        sim.submit(security.pk, 'buy', 25, price=10.5)
+        submit_orders(sim, [Order.objects.create(account=buyer, security=security, side='sell', quantity=25,
+                                                 order_type='market')])
+        settle(sim, executed_at=datetime(2024, 5, 1, 16, tzinfo=timezone.utc))
+        portfolio.refresh_from_db()
+        self.assertEqual((portfolio.realized_pnl, portfolio.cost_basis, portfolio.market_value),
+                         (Decimal('2.5000'), Decimal('260.0000'), Decimal('262.5000')))
+
+        # Only bars newer than the last fill move the mark
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(pd.DataFrame({
+                'security_id': security.pk, 'interval': '1d',
+                'ts': pd.to_datetime(['2024-04-30', '2024-05-02'], utc=True),
+                'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': [9.0, 9.5], 'volume': 10,
+            }))
+        # One statement revalues positions, one refreshes portfolio totals (plus a savepoint pair)
+        with self.assertNumQueries(4):
+            self.assertEqual(mark_to_market('1d'), 2)
+        portfolio.refresh_from_db()
+        self.assertEqual((portfolio.market_value, portfolio.unrealized_pnl), (Decimal('237.5000'), Decimal('-22.5000')))
+        self.assertEqual(Portfolio.objects.get(account=seller).market_value, Decimal('-475.0000'))
+
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/trades/portfolios/{buyer.pk}/')
+        self.assertEqual(response.json()['unrealized_pnl'], '-22.5000')
+        response = self.client.get('/trades/positions/', {'account': buyer.pk, 'open': 'true'})
+        self.assertEqual([row['symbol'] for row in response.json()['results']], ['IBM'])
+
+
+class BacktestTests(TestCase):
+    """Vectorised and event-driven backtests share one execution model"""
+
+    def bars(self, closes, opens=None):
+        close = pd.DataFrame(closes, dtype=float)
+        close.index = pd.date_range('2024-01-01', periods=len(close), tz='UTC')
+        open_ = close if opens is None else pd.DataFrame(opens, index=close.index, columns=close.columns, dtype=float)
+        return Bars(open_, close, close, close, close * 0 + 100)
+
+    def test_targets_fill_at_next_open_with_fees(self):
+        bars = self.bars({1: [10, 11, 12, 13]}, opens={1: [10, 10.5, 11.5, 12.5]})
+        result = run_vectorized(bars, [[100], [100], [0], [0]], fee_rate=0.001, initial_cash=10000)
+        self.assertEqual(result.positions[1].tolist(), [0, 100, 100, 0])
+        self.assertEqual(result.trades[1].tolist(), [0, 100, 0, -100])
+        # Bought at 10.50, sold at 12.50, fees 1.05 + 1.25
+        self.assertAlmostEqual(result.equity.iloc[-1], 10000 + 200 - 2.30)
+        self.assertEqual(result.stats()['trades'], 2)
+
+    def test_engines_agree(self):
+        rng = np.random.default_rng(7)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (300, 4)), axis=0))
+        opens = closes * np.exp(rng.normal(0, 0.005, closes.shape))
+        # The last security only starts trading a third of the way in
+        closes[:100, 3] = opens[:100, 3] = np.nan
+        bars = self.bars(dict(enumerate(closes.T)), opens=dict(enumerate(opens.T)))
+
+        vectorised = run_vectorized(bars, sma_crossover_targets(bars.close, 5, 20, 10), fee_rate=0.0005,
+                                    fee_per_share=0.01)
+        events = run_events(bars, SmaCrossover(5, 20, 10), fee_rate=0.0005, fee_per_share=0.01)
+        np.testing.assert_allclose(events.positions, vectorised.positions)
+        np.testing.assert_allclose(events.equity, vectorised.equity)
+        self.assertGreater(vectorised.stats()['trades'], 10)
+        self.assertEqual(vectorised.positions[3].iloc[:101].abs().sum(), 0)
+
+    def test_target_waits_for_a_bar_with_an_open(self):
+        targets = [[5], [np.nan], [np.nan], [0], [np.nan]]
+
+        class Replay(Strategy):
+            def on_bar(self, index, bar, positions):
+                return targets[index]
+
+        bars = self.bars({1: [10, 11, 12, 13, 14]}, opens={1: [10, np.nan, 12, 13, np.nan]})
+        vectorised = run_vectorized(bars, targets)
+        events = run_events(bars, Replay())
+        # Filled at the first open after the missing one; the exit set at bar 3 has no open yet
+        self.assertEqual(vectorised.positions[1].tolist(), [0, 0, 5, 5, 5])
+        self.assertEqual(vectorised.trades[1].tolist(), [0, 0, 5, 0, 0])
+        np.testing.assert_allclose(events.positions, vectorised.positions)
+        np.testing.assert_allclose(events.equity, vectorised.equity)
+
+    def test_load_bars_aligns_securities(self):
+        ibm = Security.objects.create(symbol='IBM')
+        msft = Security.objects.create(symbol='MSFT')
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(pd.DataFrame({
+                'security_id': [ibm.pk, ibm.pk, msft.pk], 'interval': '1d',
+                'ts': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-03'], utc=True),
+                'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': [1.0, 2.0, 3.0], 'volume': 10,
+            }))
+        bars = load_bars([ibm.pk, msft.pk], '1d', '2024-01-01', '2024-02-01')
+        self.assertEqual(bars.close.columns.tolist(), [ibm.pk, msft.pk])
+        self.assertEqual(bars.close.fillna(0).values.tolist(), [[1.0, 0.0], [2.0, 3.0]])
+
+
+class SweepTests(TestCase):
+    """Parameter sweeps run on a process pool and resume from their stored results"""
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        settings = override_settings(SWEEP_DATA_DIR=Path(self.data_dir.name))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        rng = np.random.default_rng(3)
+        self.securities = [Security.objects.create(symbol=symbol).pk for symbol in ('IBM', 'MSFT')]
+        ts = pd.bdate_range('2024-01-01', periods=120, tz='UTC')
+        frames = []
+        for security_id in self.securities:
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(ts))))
+            frames.append(pd.DataFrame({
+                'security_id': security_id, 'interval': '1d', 'ts': ts,
+                'open': close * 0.999, 'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1000,
+            }))
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_bars(pd.concat(frames, ignore_index=True))
+
+    def sweep(self, **fields):
+        return Sweep.objects.create(
+            strategy='sma_crossover', parameters={'fast': [3, 5], 'slow': [10, 20], 'size': [10]},
+            securities=self.securities, start=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            end=datetime(2024, 12, 31, tzinfo=timezone.utc), fee_rate=0.001, **fields,
+        )
+
+    def test_grid_sweep_matches_direct_backtest(self):
+        sweep = self.sweep()
+        self.assertEqual(run_sweep(sweep, n_jobs=2), 4)
+        sweep.refresh_from_db()
+        self.assertEqual(sweep.status, 'completed')
+        self.assertEqual(sweep.results.count(), 4 * 3)
+        self.assertFalse(any(Path(self.data_dir.name).iterdir()))
+
+        bars = load_bars(self.securities, '1d', sweep.start, sweep.end)
+        expected = run_vectorized(bars, sma_crossover_targets(bars.close, 5, 20, 10), fee_rate=0.001).stats()
+        result = sweep.results.get(run_key=task_key('full', 0, {'fast': 5, 'size': 10, 'slow': 20}),
+                                   security__isnull=True)
+        self.assertAlmostEqual(result.total_return, expected['total_return'])
+        self.assertAlmostEqual(result.sharpe, expected['sharpe'])
+        self.assertEqual(result.trades, expected['trades'])
+        per_security = sweep.results.filter(run_key=result.run_key, security__isnull=False)
+        self.assertAlmostEqual(sum(row.fees for row in per_security), expected['fees'])
+
+    def test_resume_only_runs_missing_tasks(self):
+        sweep = self.sweep()
+        run_sweep(sweep, n_jobs=1)
+        # An interrupted run leaves some tasks without results
+        sweep.results.filter(parameters__fast=3, parameters__slow=10).delete()
+        sweep.status = 'failed'
+        sweep.save()
+
+        self.assertEqual(run_sweep(sweep, n_jobs=1), 1)
+        self.assertEqual(sweep.results.count(), 4 * 3)
+        self.assertEqual(run_sweep(sweep, n_jobs=1), 0)
+
+    def test_walk_forward_tests_best_training_parameters(self):
+        self.assertEqual(walk_forward_windows(120, 40, 20), [(0, 40, 60), (20, 60, 80), (40, 80, 100), (60, 100, 120)])
+        sweep = self.sweep(mode='walk_forward', train_periods=40, test_periods=20)
+        self.assertEqual(run_sweep(sweep, n_jobs=2), 4 * 4 + 4)
+
+        tests = sweep.results.filter(phase='test', security__isnull=True).order_by('fold')
+        self.assertEqual([row.fold for row in tests], [0, 1, 2, 3])
+        for row in tests:
+            best = sweep.results.filter(phase='train', fold=row.fold, security__isnull=True).order_by('-sharpe')[0]
+            self.assertEqual(row.parameters, best.parameters)
+            self.assertEqual(row.window_start, best.window_end + pd.offsets.BDay(1))
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import PortfolioViewSet, PositionViewSet
+
+router = DefaultRouter()
+router.register(r'positions', PositionViewSet, basename='position')
+router.register(r'portfolios', PortfolioViewSet, basename='portfolio')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -1,3 +1,32 @@
-from django.shortcuts import render
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
 
-# Create your views here.
+from .models import Portfolio, Position
+from .serializers import PortfolioSerializer, PositionSerializer
+
+
+class PositionViewSet(viewsets.ReadOnlyModelViewSet):
+    """Positions of the authenticated user's accounts; ``?account=`` and ``?open=true`` filter"""
+    queryset = Position.objects.all()
+    serializer_class = PositionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = self.queryset.filter(account__user=self.request.user).select_related('security')
+        account = self.request.query_params.get('account')
+        if account:
+            queryset = queryset.filter(account_id=account)
+        if self.request.query_params.get('open') == 'true':
+            queryset = queryset.exclude(quantity=0)
+        return queryset
+
+
+class PortfolioViewSet(viewsets.ReadOnlyModelViewSet):
+    """Position totals per account, looked up by account id"""
+    queryset = Portfolio.objects.all()
+    serializer_class = PortfolioSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'account'
+
+    def get_queryset(self):
+        return self.queryset.filter(account__user=self.request.user)
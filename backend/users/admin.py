@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Transaction, TransactionSource, TaxResidencyDetails, Account, AddressDetails, BankingDetails
+from .models import User, Transaction, TransactionSource, TaxResidencyDetails, Account, AddressDetails, BankingDetails, AccountDailySnapshot
 
 # Register your models here.
-admin.site.register([User, Transaction, TransactionSource, TaxResidencyDetails, Account, AddressDetails, BankingDetails])
\ No newline at end of file
+admin.site.register([User, Transaction, TransactionSource, TaxResidencyDetails, Account, AddressDetails, BankingDetails, AccountDailySnapshot])
\ No newline at end of file
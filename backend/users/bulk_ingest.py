@@ -0,0 +1,394 @@
+"""
+Bulk transaction ingestion for broker statements.
+
+Statements are parsed into a DataFrame, validated column-wise, streamed into a
+temporary staging table with PostgreSQL COPY and merged into users_transaction
+with a single INSERT ... SELECT that also posts completed rows to their account
+balances. Invalid rows are reported back with their row number and never abort
+the rest of the batch.
+"""
+import io
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+import msgpack
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction as db_transaction
+
+from . import snapshots
+from .ledger import balance_delta_sql
+from .models import Account, Transaction, TransactionSource
+
+FORMATS = ('csv', 'ndjson', 'msgpack')
+
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+}
+
+REQUIRED_COLUMNS = ['account', 'transaction_type', 'transaction_amount', 'transaction_status']
+OPTIONAL_COLUMNS = ['reference', 'transaction_source', 'transaction_date']
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Transaction amounts carry 4 decimal places
+LEDGER_SCALE = 10000
+
+STAGING_TABLE = 'users_transaction_staging'
+
+_AMOUNT_FIELD = Transaction._meta.get_field('transaction_amount')
+_REFERENCE_FIELD = Transaction._meta.get_field('reference')
+
+
+@dataclass
+class IngestResult:
+    created: int = 0
+    posted_accounts: int = 0
+    rejects: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'posted_accounts': self.posted_accounts,
+            'rejected': len(self.rejects),
+            'rejects': self.rejects,
+        }
+
+
+def detect_format(content_type=None, filename=None):
+    """Resolve the payload format from a content type or file extension."""
+    if content_type:
+        fmt = CONTENT_TYPES.get(content_type.split(';')[0].strip().lower())
+        if fmt:
+            return fmt
+    if filename:
+        ext = filename.rsplit('.', 1)[-1].lower()
+        if ext in ('jsonl', 'ndjson'):
+            return 'ndjson'
+        if ext in ('msgpack', 'mpk'):
+            return 'msgpack'
+        if ext == 'csv':
+            return 'csv'
+    raise ValueError("Unsupported payload format; send CSV, NDJSON or msgpack.")
+
+
+def _records_frame(records):
+    """DataFrame from decoded NDJSON/msgpack records, which must all be objects."""
+    for position, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {position} is not an object.")
+    return pd.DataFrame.from_records(records)
+
+
+def parse_payload(data, fmt):
+    """Parse raw statement bytes into a DataFrame of string-typed columns."""
+    if fmt == 'csv':
+        frame = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+    elif fmt == 'ndjson':
+        records = [json.loads(line) for line in data.splitlines() if line.strip()]
+        frame = _records_frame(records)
+    elif fmt == 'msgpack':
+        records = msgpack.unpackb(data, raw=False)
+        if isinstance(records, dict):
+            records = [records]
+        elif not isinstance(records, list):
+            raise ValueError("Expected a map or an array of maps.")
+        frame = _records_frame(records)
+    else:
+        raise ValueError(f"Unsupported payload format: {fmt}")
+
+    for column in OPTIONAL_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = None
+    frame = frame.replace({'': None, np.nan: None})
+    # Row numbers are 1-based positions in the submitted statement
+    frame.insert(0, 'row', np.arange(1, len(frame) + 1))
+    return frame
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def _precision(value):
+    """(total digits, decimal places) of a finite Decimal, counted the way DRF's DecimalField does."""
+    if value is None or not value.is_finite():
+        return 0, 0
+    _, digits, exponent = value.as_tuple()
+    if exponent >= 0:
+        return len(digits) + exponent, 0
+    return max(len(digits), -exponent), -exponent
+
+
+def missing_columns(frame):
+    return [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+
+
+def validate_frame(frame, accounts, source_ids):
+    """
+    Validate a parsed statement column by column.
+
+    The frame must contain every column in REQUIRED_COLUMNS.
+
+    ``accounts`` maps account_id -> current balance for the accounts the caller
+    may post to; ``source_ids`` is the set of known transaction source ids.
+    Returns the valid rows and a list of ``{'row': n, 'errors': {...}}`` rejects.
+    """
+    errors = pd.DataFrame(index=frame.index)
+
+    account_ids = pd.to_numeric(frame['account'], errors='coerce')
+    errors['account'] = np.where(
+        ~account_ids.isin(list(accounts)), "Unknown account.", None
+    )
+    errors['transaction_type'] = np.where(
+        ~frame['transaction_type'].isin([c for c, _ in Transaction.TRANSACTION_TYPES]),
+        "Invalid transaction type.", None,
+    )
+    errors['transaction_status'] = np.where(
+        ~frame['transaction_status'].isin([c for c, _ in Transaction.TRANSACTION_STATUSES]),
+        "Invalid transaction status.", None,
+    )
+
+    # Same checks and messages as TransactionCreateSerializer, so that nothing
+    # reaching the staging table can fail its numeric(19, 4) column
+    amounts = frame['transaction_amount'].map(_to_decimal)
+    numeric = pd.to_numeric(frame['transaction_amount'], errors='coerce')
+    finite = amounts.map(lambda a: a is not None and a.is_finite()).astype(bool)
+    precision = pd.DataFrame(
+        [_precision(a) for a in amounts], index=frame.index, columns=['digits', 'places']
+    )
+    max_digits, max_places = _AMOUNT_FIELD.max_digits, _AMOUNT_FIELD.decimal_places
+    errors['transaction_amount'] = np.select(
+        [
+            ~finite,
+            precision['digits'] > max_digits,
+            precision['places'] > max_places,
+            precision['digits'] - precision['places'] > max_digits - max_places,
+            ~(numeric > 0),
+        ],
+        [
+            "A valid number is required.",
+            f"Ensure that there are no more than {max_digits} digits in total.",
+            f"Ensure that there are no more than {max_places} decimal places.",
+            f"Ensure that there are no more than {max_digits - max_places} digits before the decimal point.",
+            "Transaction amount must be positive.",
+        ],
+        None,
+    )
+
+    max_length = _REFERENCE_FIELD.max_length
+    errors['reference'] = np.where(
+        frame['reference'].astype('string').str.len().fillna(0) > max_length,
+        f"Ensure this field has no more than {max_length} characters.", None,
+    )
+
+    source_col = pd.to_numeric(frame['transaction_source'], errors='coerce')
+    errors['transaction_source'] = np.where(
+        frame['transaction_source'].notna() & ~source_col.isin(list(source_ids)),
+        "Unknown transaction source.", None,
+    )
+
+    dates = pd.to_datetime(frame['transaction_date'], errors='coerce', utc=True, format='ISO8601')
+    errors['transaction_date'] = np.where(
+        frame['transaction_date'].notna() & dates.isna(), "Invalid date.", None
+    )
+
+    # Withdrawals must be covered by the running balance of the account, taking
+    # the completed rows earlier in the same statement into account. Amounts are
+    # compared in exact integer units of the ledger's 4 decimal places. Each pass
+    # rejects the first uncovered withdrawal per account and drops it from the
+    # running balance, which reproduces row-by-row semantics in a handful of
+    # vectorised passes.
+    clean = errors.isna().all(axis=1)
+    completed = (frame['transaction_status'] == 'completed').to_numpy()
+    withdrawal = clean & (frame['transaction_type'] == 'withdrawal')
+    sign = np.select(
+        [frame['transaction_type'].isin(Transaction.CREDIT_TYPES),
+         frame['transaction_type'].isin(Transaction.DEBIT_TYPES)],
+        [1, -1], 0,
+    )
+    units = (
+        numeric.where(errors['transaction_amount'].isna(), 0) * LEDGER_SCALE
+    ).round().astype('int64').to_numpy()
+    opening = account_ids.map(
+        lambda a: int(accounts[a] * LEDGER_SCALE) if a in accounts else 0
+    ).astype('int64')
+    # Pending withdrawals do not move the balance but still need to be covered
+    shortfall = np.where(completed, 0, units)
+
+    accepted = clean.copy()
+    while True:
+        deltas = pd.Series(np.where(completed & accepted, sign * units, 0), index=frame.index)
+        running = opening + deltas.groupby(account_ids).cumsum()
+        failing = accepted & withdrawal & ((running - shortfall) < 0)
+        if not failing.any():
+            break
+        first = failing[failing].groupby(account_ids[failing]).head(1).index
+        accepted[first] = False
+
+    insufficient = clean & ~accepted
+    errors['transaction_amount'] = errors['transaction_amount'].where(
+        ~insufficient, "Insufficient funds in account."
+    )
+
+    bad = errors.notna().any(axis=1)
+    rejects = [
+        {'row': int(frame.at[i, 'row']), 'errors': {k: v for k, v in errors.loc[i].items() if v is not None}}
+        for i in frame.index[bad]
+    ]
+
+    valid = frame.loc[~bad].copy()
+    valid['account'] = account_ids[~bad].astype('int64')
+    valid['transaction_amount'] = amounts[~bad]
+    valid['transaction_source'] = source_col[~bad].astype('Int64')
+    valid['transaction_date'] = dates[~bad]
+    return valid, rejects
+
+
+_CREATE_STAGING_SQL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS {staging} (
+    row_number integer NOT NULL,
+    account_id bigint NOT NULL,
+    transaction_type varchar(50) NOT NULL,
+    transaction_amount numeric(19, 4) NOT NULL,
+    reference varchar(255),
+    transaction_source_id bigint,
+    transaction_status varchar(50) NOT NULL,
+    transaction_date timestamptz
+) ON COMMIT DELETE ROWS
+"""
+
+_STAGING_COLUMNS = (
+    'row_number', 'account_id', 'transaction_type', 'transaction_amount',
+    'reference', 'transaction_source_id', 'transaction_status', 'transaction_date',
+)
+
+# Inserts every staged row and posts the completed ones per account in one
+# statement, mirroring users.ledger's batch posting. The completed ids are
+# returned so the daily snapshots can be updated for the same rows.
+_MERGE_SQL = """
+WITH inserted AS (
+    INSERT INTO {transaction_table} (
+        account_id, transaction_type, transaction_amount, reference,
+        transaction_source_id, transaction_status, transaction_date,
+        created_at, updated_at
+    )
+    SELECT s.account_id, s.transaction_type, s.transaction_amount, s.reference,
+           s.transaction_source_id, s.transaction_status,
+           COALESCE(s.transaction_date, now()), now(), now()
+      FROM {staging} s
+  ORDER BY s.row_number
+ RETURNING transaction_id, account_id, transaction_type, transaction_amount, transaction_status
+), deltas AS (
+    SELECT i.account_id, SUM({delta}) AS delta
+      FROM inserted i
+     WHERE i.transaction_status = 'completed'
+  GROUP BY i.account_id
+), locked AS (
+    SELECT a.account_id
+      FROM {account_table} a
+     WHERE a.account_id IN (SELECT account_id FROM deltas)
+  ORDER BY a.account_id
+       FOR NO KEY UPDATE
+), posted AS (
+    UPDATE {account_table} a
+       SET balance = a.balance + d.delta, updated_at = now()
+      FROM deltas d, locked l
+     WHERE a.account_id = d.account_id
+       AND l.account_id = d.account_id
+       AND d.delta <> 0
+ RETURNING a.account_id
+)
+SELECT (SELECT COUNT(*) FROM inserted),
+       (SELECT COUNT(*) FROM posted),
+       (SELECT array_agg(transaction_id) FROM inserted WHERE transaction_status = 'completed')
+"""
+
+
+def _nullable(series):
+    """Column values as Python objects with missing values as None."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [None if pd.isna(v) else v.to_pydatetime() for v in series]
+    return [None if pd.isna(v) else v for v in series.astype(object)]
+
+
+def _copy_to_staging(cursor, frame):
+    with cursor.copy(f"COPY {STAGING_TABLE} ({', '.join(_STAGING_COLUMNS)}) FROM STDIN") as copy:
+        for row in zip(
+            frame['row'].tolist(),
+            frame['account'].tolist(),
+            frame['transaction_type'].tolist(),
+            frame['transaction_amount'].tolist(),
+            _nullable(frame['reference']),
+            _nullable(frame['transaction_source']),
+            frame['transaction_status'].tolist(),
+            _nullable(frame['transaction_date']),
+        ):
+            copy.write_row(row)
+
+
+def load_frame(frame):
+    """COPY validated rows into staging and merge them into users_transaction."""
+    if frame.empty:
+        return 0, 0
+    merge_sql = _MERGE_SQL.format(
+        transaction_table=Transaction._meta.db_table,
+        account_table=Account._meta.db_table,
+        staging=STAGING_TABLE,
+        delta=balance_delta_sql('i'),
+    )
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(_CREATE_STAGING_SQL.format(staging=STAGING_TABLE))
+        _copy_to_staging(cursor, frame)
+        cursor.execute(merge_sql, [list(Transaction.CREDIT_TYPES), list(Transaction.DEBIT_TYPES)])
+        created, posted_accounts, completed_ids = cursor.fetchone()
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        snapshots.apply_transactions(completed_ids or [])
+    return created, posted_accounts
+
+
+def ingest(data, fmt, accounts=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Validate and load a statement payload.
+
+    ``accounts`` is the queryset of accounts rows may be posted to (all accounts
+    by default). Each chunk is loaded in its own database transaction.
+    """
+    frame = parse_payload(data, fmt)
+    if accounts is None:
+        accounts = Account.objects.all()
+
+    result = IngestResult()
+    missing = missing_columns(frame)
+    if missing:
+        result.rejects = [
+            {'row': int(row), 'errors': {c: "This field is required." for c in missing}}
+            for row in frame['row']
+        ]
+        return result
+
+    for start in range(0, len(frame), chunk_size):
+        chunk = frame.iloc[start:start + chunk_size]
+        account_ids = pd.to_numeric(chunk['account'], errors='coerce').dropna().unique().tolist()
+        source_ids = pd.to_numeric(chunk['transaction_source'], errors='coerce').dropna().unique().tolist()
+        balances = dict(
+            accounts.filter(account_id__in=account_ids, is_open=True).values_list('account_id', 'balance')
+        )
+        known_sources = set(
+            TransactionSource.objects.filter(transaction_source_id__in=source_ids)
+            .values_list('transaction_source_id', flat=True)
+        )
+        valid, rejects = validate_frame(chunk, balances, known_sources)
+        created, posted_accounts = load_frame(valid)
+        result.created += created
+        result.posted_accounts += posted_accounts
+        result.rejects.extend(rejects)
+    return result
@@ -0,0 +1,237 @@
+"""
+Read-only serializers that work from ``.values()`` rows.
+
+ModelSerializer builds model instances, walks every declared field and calls
+its ``to_representation`` for each row, which dominates CPU time on large list
+responses. The serializers here are compiled once per request into a list of
+(output name, lookup, converter) triples: rows are fetched with ``.values()``
+including only the requested fields and turned into dicts with one converter
+call per non-trivial column. Output is identical to the corresponding
+ModelSerializer (see users.tests).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DateTimeField, DecimalField
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .models import Account, Transaction
+from .serializers import INCLUDE_TRANSACTIONS, is_expanded
+
+FIELDS_QUERY_PARAM = 'fields'
+
+
+def _decimal_converter(field):
+    quantum = Decimal('.1') ** field.decimal_places
+    if not api_settings.COERCE_DECIMAL_TO_STRING:
+        return lambda value: None if value is None else value.quantize(quantum)
+    return lambda value: '' if value is None else '{:f}'.format(Decimal(value).quantize(quantum))
+
+
+def _datetime_converter(field):
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def convert(value):
+        if not value:
+            return None
+        if tz is not None and timezone.is_aware(value):
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def resolve_field(model, lookup):
+    """
+    Model field behind ``lookup`` and whether the path crosses a nullable relation.
+
+    DRF omits a dotted-source field entirely when an intermediate relation is
+    None, so such columns are dropped from the output when their value is None.
+    """
+    opts = model._meta
+    *path, name = lookup.split('__')
+    through_nullable = False
+    for step in path:
+        relation = opts.get_field(step)
+        through_nullable = through_nullable or relation.null
+        opts = relation.related_model._meta
+    return opts.get_field(name), through_nullable
+
+
+def converter_for(field):
+    """Converter matching DRF's representation of ``field``"""
+    if isinstance(field, DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, DateTimeField):
+        return _datetime_converter(field)
+    return None
+
+
+class ValuesSerializer:
+    """
+    Compiled ``.values()`` serializer.
+
+    Subclasses set ``model`` and ``fields`` as ``(output name, lookup)`` pairs in
+    output order. ``?fields=a,b`` restricts the output to the named fields.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self, request=None, fields=None):
+        self.request = request
+        if fields is None and request is not None and request.query_params.get(FIELDS_QUERY_PARAM):
+            fields = request.query_params[FIELDS_QUERY_PARAM].split(',')
+        requested = set(fields) if fields else None
+        self.columns = []
+        self.omit_if_none = []
+        for name, lookup in self.fields:
+            if requested is not None and name not in requested:
+                continue
+            field, through_nullable = resolve_field(self.model, lookup)
+            self.columns.append((name, lookup, converter_for(field)))
+            if through_nullable:
+                self.omit_if_none.append(name)
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup, _ in self.columns]
+
+    def values(self, queryset, extra=()):
+        """Values queryset for the compiled columns plus any ``extra`` lookups (e.g. ordering keys)"""
+        lookups = list(dict.fromkeys([*self.lookups, *extra]))
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def to_representation(self, row):
+        return self.represent([row])[0]
+
+    def represent(self, rows):
+        columns = self.columns
+        data = [
+            {
+                name: converter(row[lookup]) if converter else row[lookup]
+                for name, lookup, converter in columns
+            }
+            for row in rows
+        ]
+        for name in self.omit_if_none:
+            for item in data:
+                if item[name] is None:
+                    del item[name]
+        return data
+
+
+class TransactionValuesSerializer(ValuesSerializer):
+    """Read-only equivalent of TransactionSerializer"""
+    model = Transaction
+    fields = (
+        ('transaction_id', 'transaction_id'),
+        ('account', 'account_id'),
+        ('account_nickname', 'account__account_nickname'),
+        ('transaction_type', 'transaction_type'),
+        ('transaction_date', 'transaction_date'),
+        ('transaction_amount', 'transaction_amount'),
+        ('currency', 'account__currency'),
+        ('reference', 'reference'),
+        ('transaction_source', 'transaction_source_id'),
+        ('transaction_source_name', 'transaction_source__source_name'),
+        ('transaction_status', 'transaction_status'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+
+class AccountSummaryValuesSerializer(ValuesSerializer):
+    """Read-only equivalent of AccountSummarySerializer"""
+    model = Account
+    fields = (
+        ('account_id', 'account_id'),
+        ('account_nickname', 'account_nickname'),
+        ('account_type', 'account_type'),
+        ('balance', 'balance'),
+        ('currency', 'currency'),
+        ('is_open', 'is_open'),
+    )
+
+
+class AccountValuesSerializer(ValuesSerializer):
+    """
+    Read-only equivalent of AccountSerializer.
+
+    Nested transactions are only fetched with ``include_transactions=true``,
+    in one query for the whole page of accounts.
+    """
+    model = Account
+    fields = (
+        ('account_id', 'account_id'),
+        ('user', 'user_id'),
+        ('account_nickname', 'account_nickname'),
+        ('account_type', 'account_type'),
+        ('balance', 'balance'),
+        ('currency', 'currency'),
+        ('is_open', 'is_open'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+    def __init__(self, request=None, fields=None):
+        super().__init__(request, fields)
+        self.include_transactions = request is not None and is_expanded(request, INCLUDE_TRANSACTIONS)
+
+    def values(self, queryset, extra=()):
+        if self.include_transactions:
+            extra = [*extra, 'account_id']
+        return super().values(queryset, extra)
+
+    def represent(self, rows):
+        rows = list(rows)
+        data = super().represent(rows)
+        if self.include_transactions:
+            transactions = TransactionValuesSerializer()
+            grouped = {row['account_id']: [] for row in rows}
+            queryset = transactions.values(
+                Transaction.objects.filter(account_id__in=list(grouped)).order_by('transaction_id'),
+                extra=['account_id'],
+            )
+            for txn in queryset:
+                grouped[txn['account_id']].append(txn)
+            for item, row in zip(data, rows):
+                item['transactions'] = transactions.represent(grouped[row['account_id']])
+        return data
+
+
+class ValuesListMixin:
+    """
+    Serve ``list`` through a ValuesSerializer instead of the ModelSerializer.
+
+    Works with KeysetPagination (ordering keys are fetched alongside the
+    requested columns) and with StreamingListMixin's NDJSON mode.
+    """
+    values_serializer_class = None
+
+    def get_values_serializer(self):
+        return self.values_serializer_class(self.request)
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+
+        ordering = ()
+        if self.paginator is not None and hasattr(self.paginator, 'get_ordering'):
+            ordering = self.paginator.get_ordering(self)
+            queryset = queryset.order_by(*ordering)
+        rows = serializer.values(queryset, extra=[field.lstrip('-') for field in ordering])
+
+        if self.wants_stream(request):
+            return self.streaming_response(
+                serializer.represent(chunk) for chunk in self.iter_chunks(rows)
+            )
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.represent(page))
+        return Response(serializer.represent(rows))
+
@@ -0,0 +1,183 @@
+"""
+Set-based ledger posting for users.Transaction.
+
+Transaction.save() posts a single transaction with one conditional UPDATE on
+the account row. The functions here cover the bulk paths (broker reconciliation,
+statement imports) where thousands of transactions are posted at once: every
+batch is claimed, aggregated per account and applied to users_account in a
+single statement, so each account row is written once per batch instead of
+once per transaction.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import connection, transaction as db_transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .models import Account, Transaction
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+@dataclass
+class PostingResult:
+    # account_id -> number of transactions posted to it
+    posted: dict = field(default_factory=dict)
+    # Requested ids that were not pending (already completed, failed,
+    # cancelled or missing) and were left untouched
+    skipped: list = field(default_factory=list)
+
+    @property
+    def posted_count(self):
+        return sum(self.posted.values())
+
+
+def balance_delta_expression(prefix=''):
+    """ORM expression for the signed balance effect of a transaction row."""
+    amount = F(f'{prefix}transaction_amount')
+    return Case(
+        When(**{f'{prefix}transaction_type__in': Transaction.CREDIT_TYPES}, then=amount),
+        When(**{f'{prefix}transaction_type__in': Transaction.DEBIT_TYPES}, then=-amount),
+        default=Value(Decimal('0')),
+        output_field=DecimalField(max_digits=19, decimal_places=4),
+    )
+
+
+def balance_delta_sql(alias):
+    """SQL CASE for the signed balance effect, parameterised on the type lists."""
+    return (
+        f"CASE WHEN {alias}.transaction_type = ANY(%s) THEN {alias}.transaction_amount "
+        f"WHEN {alias}.transaction_type = ANY(%s) THEN -{alias}.transaction_amount "
+        f"ELSE 0 END"
+    )
+
+
+# Claims pending rows, aggregates the claimed rows per account and applies the
+# deltas in one statement, returning the claimed rows. Account rows are locked in
+# primary key order first so concurrent batches touching overlapping accounts
+# cannot deadlock.
+_POST_BATCH_SQL = """
+WITH posted AS (
+    UPDATE {transaction_table} t
+       SET transaction_status = 'completed', updated_at = now()
+     WHERE t.transaction_id = ANY(%s)
+       AND t.transaction_status = 'pending'
+ RETURNING t.transaction_id, t.account_id, t.transaction_type, t.transaction_amount
+), deltas AS (
+    SELECT p.account_id, SUM({delta}) AS delta
+      FROM posted p
+  GROUP BY p.account_id
+), locked AS (
+    SELECT a.account_id
+      FROM {account_table} a
+     WHERE a.account_id IN (SELECT account_id FROM deltas)
+  ORDER BY a.account_id
+       FOR NO KEY UPDATE
+), applied AS (
+    UPDATE {account_table} a
+       SET balance = a.balance + d.delta, updated_at = now()
+      FROM deltas d, locked l
+     WHERE a.account_id = d.account_id
+       AND l.account_id = d.account_id
+)
+SELECT p.transaction_id, p.account_id FROM posted p
+"""
+
+_APPLY_DELTAS_SQL = """
+UPDATE {account_table} a
+   SET balance = a.balance + d.delta, updated_at = now()
+  FROM unnest(%s::bigint[], %s::numeric[]) AS d(account_id, delta)
+ WHERE a.account_id = d.account_id
+"""
+
+
+def _batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def post_transactions(transaction_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Mark the given pending transactions completed and post them to their
+    accounts and daily snapshots.
+
+    Only pending rows are claimed: completed rows are skipped, so re-running a
+    reconciliation never double-posts, and failed or cancelled rows are never
+    revived. Returns a PostingResult with the per-account counts and the ids
+    that were skipped.
+    """
+    from . import snapshots
+
+    transaction_ids = sorted(set(transaction_ids))
+    sql = _POST_BATCH_SQL.format(
+        transaction_table=Transaction._meta.db_table,
+        account_table=Account._meta.db_table,
+        delta=balance_delta_sql('p'),
+    )
+    result = PostingResult()
+    for batch in _batches(transaction_ids, batch_size):
+        with db_transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [batch, list(Transaction.CREDIT_TYPES), list(Transaction.DEBIT_TYPES)])
+            rows = cursor.fetchall()
+            claimed = [transaction_id for transaction_id, _ in rows]
+            snapshots.apply_transactions(claimed)
+            for _, account_id in rows:
+                result.posted[account_id] = result.posted.get(account_id, 0) + 1
+        claimed = set(claimed)
+        result.skipped.extend(transaction_id for transaction_id in batch if transaction_id not in claimed)
+    return result
+
+
+def post_pending_transactions(queryset=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Post every pending transaction in ``queryset`` (all pending transactions by default)."""
+    if queryset is None:
+        queryset = Transaction.objects.all()
+    ids = list(
+        queryset.filter(transaction_status='pending').values_list('transaction_id', flat=True)
+    )
+    return post_transactions(ids, batch_size=batch_size)
+
+
+def apply_balance_deltas(deltas):
+    """
+    Apply pre-aggregated ``{account_id: delta}`` balance changes in one UPDATE.
+
+    Used when completed transactions are inserted in bulk (bulk_create, COPY)
+    and therefore bypass Transaction.save().
+    """
+    deltas = {account_id: delta for account_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    account_ids = sorted(deltas)
+    sql = _APPLY_DELTAS_SQL.format(account_table=Account._meta.db_table)
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        # Lock in key order before updating so concurrent callers cannot deadlock
+        cursor.execute(
+            f"SELECT account_id FROM {Account._meta.db_table} "
+            f"WHERE account_id = ANY(%s) ORDER BY account_id FOR NO KEY UPDATE",
+            [account_ids],
+        )
+        cursor.execute(sql, [account_ids, [deltas[a] for a in account_ids]])
+        return cursor.rowcount
+
+
+def post_completed(transactions):
+    """
+    Post already-completed, freshly inserted transactions grouped per account.
+
+    ``transactions`` is an iterable of Transaction instances (e.g. the result of
+    bulk_create) whose balance effect has not been applied yet.
+    """
+    from . import snapshots
+
+    deltas = {}
+    posted_ids = []
+    for txn in transactions:
+        if txn.transaction_status != 'completed':
+            continue
+        deltas[txn.account_id] = deltas.get(txn.account_id, Decimal('0')) + txn.balance_delta
+        posted_ids.append(txn.pk)
+    with db_transaction.atomic():
+        updated = apply_balance_deltas(deltas)
+        snapshots.apply_transactions(posted_ids)
+    return updated
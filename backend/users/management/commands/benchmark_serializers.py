@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+
+from users.fast_serializers import AccountSummaryValuesSerializer, TransactionValuesSerializer
+from users.models import Account, Transaction, TransactionSource, User
+from users.serializers import AccountSummarySerializer, TransactionSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare rows/second of the ModelSerializers and the compiled values serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Synthetic transactions to serialize")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        # Figures from other backends say nothing about production, which runs on PostgreSQL
+        if connection.vendor != 'postgresql':
+            raise CommandError(f"Benchmarks must run against PostgreSQL, not {connection.vendor}")
+
+        # Seed synthetic data inside a transaction that is always rolled back
+        try:
+            with db_transaction.atomic():
+                self.seed(options['rows'])
+                self.run(options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, rows):
+        user = User.objects.create_user(username='benchmark-serializers')
+        source = TransactionSource.objects.create(source_name='Benchmark', source_type='broker')
+        accounts = Account.objects.bulk_create(
+            Account(user=user, account_nickname=f'bench-{i}', account_type='investment', currency='USD')
+            for i in range(max(1, rows // 100))
+        )
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    account=accounts[i % len(accounts)], transaction_type='deposit',
+                    transaction_amount=i % 1000 + 1, transaction_source=source,
+                    transaction_status='completed',
+                )
+                for i in range(rows)
+            ),
+            batch_size=5000,
+        )
+        self.user = user
+
+    def measure(self, label, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = len(func())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(f"{label:<40} {count:>8} rows  {count / best:>12,.0f} rows/s")
+        return count / best
+
+    def run(self, repeat):
+        transactions = Transaction.objects.filter(account__user=self.user)
+        accounts = Account.objects.filter(user=self.user)
+        fast_transactions = TransactionValuesSerializer()
+        fast_summary = AccountSummaryValuesSerializer()
+
+        slow = self.measure(
+            "TransactionSerializer",
+            lambda: TransactionSerializer(
+                transactions.select_related('account', 'transaction_source'), many=True
+            ).data,
+            repeat,
+        )
+        fast = self.measure(
+            "TransactionValuesSerializer",
+            lambda: fast_transactions.represent(fast_transactions.values(transactions)),
+            repeat,
+        )
+        self.stdout.write(self.style.SUCCESS(f"transactions speedup: {fast / slow:.1f}x"))
+
+        slow = self.measure(
+            "AccountSummarySerializer", lambda: AccountSummarySerializer(accounts, many=True).data, repeat
+        )
+        fast = self.measure(
+            "AccountSummaryValuesSerializer",
+            lambda: fast_summary.represent(fast_summary.values(accounts)),
+            repeat,
+        )
+        self.stdout.write(self.style.SUCCESS(f"account summary speedup: {fast / slow:.1f}x"))
@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk_ingest import DEFAULT_CHUNK_SIZE, FORMATS, detect_format, ingest
+from users.models import Account
+
+
+class Command(BaseCommand):
+    help = "Bulk load a broker statement (CSV, NDJSON or msgpack) into users_transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Statement file to load")
+        parser.add_argument('--format', choices=FORMATS, help="Payload format (default: from file extension)")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--rejects', help="Write rejected rows as JSON to this file")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist")
+        try:
+            fmt = options['format'] or detect_format(filename=path.name)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        result = ingest(path.read_bytes(), fmt, accounts=Account.objects.all(), chunk_size=options['chunk_size'])
+
+        if options['rejects'] and result.rejects:
+            Path(options['rejects']).write_text(json.dumps(result.rejects, indent=2))
+        for reject in result.rejects[:20]:
+            self.stderr.write(f"row {reject['row']}: {reject['errors']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created} transactions, posted {result.posted_accounts} accounts, "
+            f"rejected {len(result.rejects)} rows"
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+
+from users.ledger import DEFAULT_BATCH_SIZE, post_pending_transactions
+from users.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Post pending transactions to their account balances in set-based batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help="Only post transactions for this account id (repeatable)")
+        parser.add_argument('--before', help="Only post transactions dated before this ISO timestamp")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = Transaction.objects.all()
+        if options['accounts']:
+            queryset = queryset.filter(account_id__in=options['accounts'])
+        if options['before']:
+            queryset = queryset.filter(transaction_date__lt=parse_datetime(options['before']))
+
+        result = post_pending_transactions(queryset, batch_size=options['batch_size'])
+        if result.skipped:
+            self.stderr.write(
+                f"Skipped {len(result.skipped)} transactions that were no longer pending"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Posted {result.posted_count} transactions across {len(result.posted)} accounts"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.snapshots import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild account daily balance and cash-flow snapshots from the transaction ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help="Only rebuild this account id (repeatable)")
+
+    def handle(self, *args, **options):
+        created = rebuild(options['accounts'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} daily snapshots"))
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-16 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'transaction_date', 'transaction_id'], name='users_trans_account_ffc3e6_idx'),
+        ),
+    ]
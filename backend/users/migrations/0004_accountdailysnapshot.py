@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_account_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDailySnapshot',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('snapshot_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('deposits', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('withdrawals', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('fees', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('dividends', models.DecimalField(decimal_places=4, default=0, max_digits=19)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_snapshots', to='users.account')),
+            ],
+            options={
+                'verbose_name_plural': 'Account Daily Snapshots',
+                'constraints': [models.UniqueConstraint(fields=('account', 'date'), name='users_snapshot_account_date_uniq')],
+            },
+        ),
+    ]
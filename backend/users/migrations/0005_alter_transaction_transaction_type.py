@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_accountdailysnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('dividend', 'Dividend'), ('transfer', 'Transfer'), ('fee', 'Fee'), ('buy', 'Buy'), ('sell', 'Sell')], max_length=50),
+        ),
+    ]
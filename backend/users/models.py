@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction as db_transaction
+from django.db.models import F
+from django.db.models.functions import Now
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.utils.translation import gettext_lazy as _
 from django.db.models import DecimalField
 from django.conf import settings
+from django.utils import timezone
 
 # Base model for common fields
 class BaseModel(models.Model):
@@ -71,7 +74,7 @@ class BankingDetails(BaseModel):
         # Consider django-encrypted-fields or similar package
         super().save(*args, **kwargs)
 
-# Account Model - Breaking circular dependency by defining User model first
+# Account Model
 class Account(BaseModel):
     CURRENCY_CHOICES = [
         ('USD', 'US Dollar'),
@@ -91,6 +94,12 @@ class Account(BaseModel):
     ]
     
     account_id = models.BigAutoField(primary_key=True)
+    # Lazy reference to User (defined below) avoids the circular dependency
+    user = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE,
+        related_name='accounts'
+    )
     account_nickname = models.CharField(max_length=255)
     account_type = models.CharField(max_length=100, choices=ACCOUNT_TYPES)
     balance = DecimalField(max_digits=19, decimal_places=4, default=0)  # Increased precision
@@ -177,13 +186,6 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.username})"
 
-# Now update Account to reference User (no circular dependency)
-Account.user = models.ForeignKey(
-    User, 
-    on_delete=models.CASCADE, 
-    related_name='accounts'
-)
-
 # TransactionSource Model
 class TransactionSource(BaseModel):
     transaction_source_id = models.BigAutoField(primary_key=True)
@@ -207,6 +209,8 @@ class Transaction(BaseModel):
         ('dividend', 'Dividend'),
         ('transfer', 'Transfer'),
         ('fee', 'Fee'),
+        ('buy', 'Buy'),
+        ('sell', 'Sell'),
         # Add more types as needed
     ]
     
@@ -217,6 +221,10 @@ class Transaction(BaseModel):
         ('cancelled', 'Cancelled'),
         # Add more statuses as needed
     ]
+
+    # Transaction types that credit or debit the account balance when completed
+    CREDIT_TYPES = ('deposit', 'dividend', 'sell')
+    DEBIT_TYPES = ('withdrawal', 'fee', 'buy')
     
     transaction_id = models.BigAutoField(primary_key=True)
     account = models.ForeignKey(
@@ -241,41 +249,142 @@ class Transaction(BaseModel):
             models.Index(fields=['transaction_date']),
             models.Index(fields=['transaction_status']),
             models.Index(fields=['transaction_type']),
+            # Keyset pagination seeks on (transaction_date, transaction_id) per account
+            models.Index(fields=['account', 'transaction_date', 'transaction_id']),
         ]
 
     def __str__(self):
         return f"{self.transaction_type} - {self.transaction_amount} ({self.transaction_status})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted status so save() can detect a completion without re-fetching the row
+        instance._loaded_status = instance.__dict__.get('transaction_status')
+        return instance
+
     def save(self, *args, **kwargs):
         # Update account balance when transaction is completed
-        is_new = self.pk is None
-        old_status = None
-        
-        # Get the old status if this is an existing transaction
-        if not is_new:
-            old_instance = Transaction.objects.get(pk=self.pk)
-            old_status = old_instance.transaction_status
-        
-        # Save the transaction first
-        super().save(*args, **kwargs)
-        
-        # Update the account balance if transaction is newly completed
-        if (is_new and self.transaction_status == 'completed') or \
-           (not is_new and old_status != 'completed' and self.transaction_status == 'completed'):
-            self._update_account_balance()
-    
+        is_new = self._state.adding
+        newly_completed = self.transaction_status == 'completed' and (
+            is_new or getattr(self, '_loaded_status', None) != 'completed'
+        )
+
+        with db_transaction.atomic():
+            if newly_completed and not is_new:
+                # Claim the transition with a conditional UPDATE so two workers
+                # completing the same transaction cannot both post it
+                newly_completed = bool(
+                    Transaction.objects.filter(pk=self.pk)
+                    .exclude(transaction_status='completed')
+                    .update(transaction_status='completed')
+                )
+
+            # Save the transaction first
+            super().save(*args, **kwargs)
+
+            if newly_completed:
+                self._update_account_balance()
+                AccountDailySnapshot.record_transaction(self)
+
+        self._loaded_status = self.transaction_status
+
+    @property
+    def balance_delta(self):
+        """Signed amount this transaction adds to the account balance."""
+        amount = self._meta.get_field('transaction_amount').to_python(self.transaction_amount)
+        if self.transaction_type in self.CREDIT_TYPES:
+            return amount
+        if self.transaction_type in self.DEBIT_TYPES:
+            return -amount
+        # For transfers, you might need more complex logic
+        return 0
+
     def _update_account_balance(self):
         """Update the related account balance based on transaction type."""
         if self.transaction_status != 'completed':
             return
-            
-        account = self.account
-        
-        # Adjust balance based on transaction type
-        if self.transaction_type in ['deposit', 'dividend']:
-            account.balance += self.transaction_amount
-        elif self.transaction_type in ['withdrawal', 'fee']:
-            account.balance -= self.transaction_amount
-        # For transfers, you might need more complex logic
-            
-        account.save()
\ No newline at end of file
+
+        delta = self.balance_delta
+        if not delta:
+            return
+
+        # Single UPDATE ... SET balance = balance + delta, no read-modify-write
+        Account.objects.filter(pk=self.account_id).update(
+            balance=F('balance') + delta, updated_at=Now()
+        )
+
+        # Keep a cached account instance consistent with the database
+        if Transaction.account.is_cached(self):
+            self.account.balance += delta
+
+
+# AccountDailySnapshot Model
+class AccountDailySnapshot(BaseModel):
+    """
+    End-of-day balance and cash flows per account, maintained on every posting.
+
+    Days without activity have no row; their balance is that of the latest
+    earlier snapshot, so a balance history is a single range scan over
+    (account, date).
+    """
+    # Flow column each transaction type accumulates into
+    FLOW_FIELDS = {
+        'deposit': 'deposits',
+        'withdrawal': 'withdrawals',
+        'fee': 'fees',
+        'dividend': 'dividends',
+    }
+
+    snapshot_id = models.BigAutoField(primary_key=True)
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='daily_snapshots'
+    )
+    date = models.DateField()
+    balance = DecimalField(max_digits=19, decimal_places=4, default=0)
+    deposits = DecimalField(max_digits=19, decimal_places=4, default=0)
+    withdrawals = DecimalField(max_digits=19, decimal_places=4, default=0)
+    fees = DecimalField(max_digits=19, decimal_places=4, default=0)
+    dividends = DecimalField(max_digits=19, decimal_places=4, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'date'], name='users_snapshot_account_date_uniq'),
+        ]
+        verbose_name_plural = 'Account Daily Snapshots'
+
+    def __str__(self):
+        return f"{self.account_id} @ {self.date}: {self.balance}"
+
+    @classmethod
+    def record_transaction(cls, transaction):
+        """Apply one newly completed transaction to its day and every later day."""
+        delta = transaction.balance_delta
+        flow_field = cls.FLOW_FIELDS.get(transaction.transaction_type)
+        if not delta and flow_field is None:
+            return
+
+        day = timezone.localdate(transaction.transaction_date) if transaction.transaction_date else timezone.localdate()
+        amount = abs(delta)
+        flows = {flow_field: F(flow_field) + amount} if flow_field else {}
+
+        snapshots = cls.objects.filter(account_id=transaction.account_id)
+        with db_transaction.atomic():
+            updated = snapshots.filter(date=day).update(balance=F('balance') + delta, updated_at=Now(), **flows)
+            if not updated:
+                previous = snapshots.filter(date__lt=day).order_by('-date').values_list('balance', flat=True).first()
+                try:
+                    with db_transaction.atomic():
+                        cls.objects.create(
+                            account_id=transaction.account_id,
+                            date=day,
+                            balance=(previous or 0) + delta,
+                            **({flow_field: amount} if flow_field else {}),
+                        )
+                except IntegrityError:
+                    # A concurrent posting created the day first
+                    snapshots.filter(date=day).update(balance=F('balance') + delta, updated_at=Now(), **flows)
+            if delta:
+                snapshots.filter(date__gt=day).update(balance=F('balance') + delta, updated_at=Now())
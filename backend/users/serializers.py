@@ -1,4 +1,7 @@
+from datetime import timedelta
+
 from rest_framework import serializers
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from .models import (
@@ -7,11 +10,21 @@ from .models import (
     BankingDetails,
     Account,
     Transaction,
-    TransactionSource
+    TransactionSource,
+    AccountDailySnapshot
 )
 
 User = get_user_model()
 
+# Query parameters that expand nested relations in responses
+INCLUDE_ACCOUNTS = 'include_accounts'
+INCLUDE_TRANSACTIONS = 'include_transactions'
+
+
+def is_expanded(request, flag):
+    """Whether the request asked for the nested relation behind ``flag``"""
+    return request.query_params.get(flag) == 'true'
+
 class AddressDetailsSerializer(serializers.ModelSerializer):
     class Meta:
         model = AddressDetails
@@ -90,20 +103,20 @@ class AccountSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['account_id', 'balance', 'created_at', 'updated_at']
 
-    def to_representation(self, instance):
-        """Customize to control the depth of nested transactions"""
-        ret = super().to_representation(instance)
+    def get_fields(self):
+        """Drop nested transactions unless requested, so they are never loaded"""
+        fields = super().get_fields()
         request = self.context.get('request')
-        if request and request.query_params.get('include_transactions') != 'true':
-            ret.pop('transactions', None)
-        return ret
+        if request and not is_expanded(request, INCLUDE_TRANSACTIONS):
+            fields.pop('transactions', None)
+        return fields
 
 
 class UserSerializer(serializers.ModelSerializer):
     # Nested serializers for readable outputs but still accept IDs for input
     address_details = AddressDetailsSerializer(source='address', read_only=True)
     tax_residency_details = TaxResidencyDetailsSerializer(source='tax_residency', read_only=True)
-    banking_details = BankingDetailsSerializer(source='banking_details', read_only=True)
+    banking_details = BankingDetailsSerializer(read_only=True)
     accounts = AccountSerializer(many=True, read_only=True)
     
     class Meta:
@@ -121,13 +134,13 @@ class UserSerializer(serializers.ModelSerializer):
             'banking_details': {'write_only': True},
         }
 
-    def to_representation(self, instance):
-        """Customize to control the depth of nested accounts"""
-        ret = super().to_representation(instance)
+    def get_fields(self):
+        """Drop nested accounts unless requested, so they are never loaded"""
+        fields = super().get_fields()
         request = self.context.get('request')
-        if request and request.query_params.get('include_accounts') != 'true':
-            ret.pop('accounts', None)
-        return ret
+        if request and not is_expanded(request, INCLUDE_ACCOUNTS):
+            fields.pop('accounts', None)
+        return fields
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -204,4 +217,29 @@ class AccountSummarySerializer(serializers.ModelSerializer):
         fields = [
             'account_id', 'account_nickname', 'account_type',
             'balance', 'currency', 'is_open'
-        ]
\ No newline at end of file
+        ]
+
+
+class AccountDailySnapshotSerializer(serializers.ModelSerializer):
+    """End-of-day balance and flows; also renders carried-forward days from users.snapshots"""
+    class Meta:
+        model = AccountDailySnapshot
+        fields = ['date', 'balance', 'deposits', 'withdrawals', 'fees', 'dividends']
+        read_only_fields = fields
+
+
+class BalanceHistoryQuerySerializer(serializers.Serializer):
+    """Query parameters for an account's balance history"""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    MAX_DAYS = 3660
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.localdate()
+        start = attrs.get('start') or end - timedelta(days=30)
+        if start > end:
+            raise serializers.ValidationError({"start": "Start date must not be after end date."})
+        if (end - start).days > self.MAX_DAYS:
+            raise serializers.ValidationError({"start": f"Range must not exceed {self.MAX_DAYS} days."})
+        return {'start': start, 'end': end}
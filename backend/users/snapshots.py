@@ -0,0 +1,192 @@
+"""
+Set-based maintenance and queries for AccountDailySnapshot.
+
+Transaction.save() updates snapshots one posting at a time through the ORM.
+The bulk posting paths (users.ledger, users.bulk_ingest) call
+apply_transactions() instead, which aggregates a whole batch per (account, day)
+and applies it in three statements. rebuild() recomputes snapshots from the
+full ledger with a window function.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Subquery, Max, Q
+
+from .ledger import balance_delta_sql
+from .models import AccountDailySnapshot, Transaction
+
+FLOW_COLUMNS = ('deposits', 'withdrawals', 'fees', 'dividends')
+
+
+def _flow_sums(alias):
+    """SUM(...) per flow column, in FLOW_COLUMNS order."""
+    by_column = {column: t for t, column in AccountDailySnapshot.FLOW_FIELDS.items()}
+    return ',\n           '.join(
+        f"SUM(CASE WHEN {alias}.transaction_type = '{by_column[column]}' "
+        f"THEN {alias}.transaction_amount ELSE 0 END) AS {column}"
+        for column in FLOW_COLUMNS
+    )
+
+
+_FLOWS_SQL = """
+    SELECT t.account_id,
+           (t.transaction_date AT TIME ZONE %s)::date AS day,
+           SUM({delta}) AS delta,
+           {flows}
+      FROM {transaction_table} t
+     WHERE {where}
+       AND t.transaction_status = 'completed'
+  GROUP BY 1, 2
+"""
+
+# New (account, day) rows start from the latest earlier snapshot's balance
+_SEED_SQL = """
+INSERT INTO {snapshot_table} (account_id, date, balance, deposits, withdrawals, fees, dividends, created_at, updated_at)
+SELECT f.account_id, f.day,
+       COALESCE((
+           SELECT s.balance FROM {snapshot_table} s
+            WHERE s.account_id = f.account_id AND s.date < f.day
+         ORDER BY s.date DESC LIMIT 1
+       ), 0),
+       0, 0, 0, 0, now(), now()
+  FROM unnest(%s::bigint[], %s::date[]) AS f(account_id, day)
+    ON CONFLICT (account_id, date) DO NOTHING
+"""
+
+# Each snapshot on or after a posted day moves by the cumulative delta of the
+# batch days up to it; flows are only added on the matching day
+_APPLY_SQL = """
+WITH f AS (
+    SELECT * FROM unnest(
+        %s::bigint[], %s::date[], %s::numeric[], %s::numeric[], %s::numeric[], %s::numeric[], %s::numeric[]
+    ) AS f(account_id, day, delta, deposits, withdrawals, fees, dividends)
+), changes AS (
+    SELECT s.snapshot_id,
+           SUM(f.delta) AS delta,
+           COALESCE(SUM(f.deposits) FILTER (WHERE f.day = s.date), 0) AS deposits,
+           COALESCE(SUM(f.withdrawals) FILTER (WHERE f.day = s.date), 0) AS withdrawals,
+           COALESCE(SUM(f.fees) FILTER (WHERE f.day = s.date), 0) AS fees,
+           COALESCE(SUM(f.dividends) FILTER (WHERE f.day = s.date), 0) AS dividends
+      FROM {snapshot_table} s
+      JOIN f ON f.account_id = s.account_id AND f.day <= s.date
+  GROUP BY s.snapshot_id
+)
+UPDATE {snapshot_table} s
+   SET balance = s.balance + c.delta,
+       deposits = s.deposits + c.deposits,
+       withdrawals = s.withdrawals + c.withdrawals,
+       fees = s.fees + c.fees,
+       dividends = s.dividends + c.dividends,
+       updated_at = now()
+  FROM changes c
+ WHERE s.snapshot_id = c.snapshot_id
+"""
+
+_REBUILD_SQL = """
+INSERT INTO {snapshot_table} (account_id, date, balance, deposits, withdrawals, fees, dividends, created_at, updated_at)
+SELECT d.account_id, d.day,
+       SUM(d.delta) OVER (PARTITION BY d.account_id ORDER BY d.day),
+       d.deposits, d.withdrawals, d.fees, d.dividends, now(), now()
+  FROM ({flows_sql}) d
+"""
+
+
+def _params_for_types():
+    return [list(Transaction.CREDIT_TYPES), list(Transaction.DEBIT_TYPES)]
+
+
+def _flows_sql(where):
+    return _FLOWS_SQL.format(
+        delta=balance_delta_sql('t'),
+        flows=_flow_sums('t'),
+        transaction_table=Transaction._meta.db_table,
+        where=where,
+    )
+
+
+def apply_transactions(transaction_ids):
+    """
+    Fold newly posted, completed transactions into the daily snapshots.
+
+    Must be called exactly once per posting, in the same database transaction
+    as the balance update.
+    """
+    transaction_ids = list(transaction_ids)
+    if not transaction_ids:
+        return 0
+    table = AccountDailySnapshot._meta.db_table
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            _flows_sql('t.transaction_id = ANY(%s)'),
+            [settings.TIME_ZONE, *_params_for_types(), transaction_ids],
+        )
+        flows = cursor.fetchall()
+        if not flows:
+            return 0
+        columns = list(zip(*flows))
+        cursor.execute(_SEED_SQL.format(snapshot_table=table), [list(columns[0]), list(columns[1])])
+        cursor.execute(_APPLY_SQL.format(snapshot_table=table), [list(c) for c in columns])
+        return cursor.rowcount
+
+
+def rebuild(account_ids=None):
+    """Recompute snapshots from the full ledger, for all accounts or the given ones."""
+    table = AccountDailySnapshot._meta.db_table
+    where = 'TRUE'
+    params = [settings.TIME_ZONE, *_params_for_types()]
+    if account_ids is not None:
+        where = 't.account_id = ANY(%s)'
+        params.append(list(account_ids))
+
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        snapshots = AccountDailySnapshot.objects.all()
+        if account_ids is not None:
+            snapshots = snapshots.filter(account_id__in=account_ids)
+        snapshots.delete()
+        cursor.execute(
+            _REBUILD_SQL.format(snapshot_table=table, flows_sql=_flows_sql(where)),
+            params,
+        )
+        return cursor.rowcount
+
+
+def balance_history(account_id, start, end):
+    """
+    Daily balances and flows for ``start``..``end`` inclusive.
+
+    Reads the snapshots inside the range plus the last one before it in a
+    single range scan and carries balances forward over days without activity.
+    """
+    opening_date = (
+        AccountDailySnapshot.objects.filter(account_id=account_id, date__lt=start)
+        .values('account_id').annotate(last=Max('date')).values('last')
+    )
+    rows = (
+        AccountDailySnapshot.objects
+        .filter(account_id=account_id, date__lte=end)
+        .filter(Q(date__gte=start) | Q(date=Subquery(opening_date)))
+        .order_by('date')
+        .values_list('date', 'balance', *FLOW_COLUMNS)
+    )
+
+    zero = Decimal('0')
+    balance = zero
+    by_date = {}
+    for date, row_balance, *flows in rows:
+        if date < start:
+            balance = row_balance
+        else:
+            by_date[date] = (row_balance, flows)
+
+    history = []
+    day = start
+    while day <= end:
+        if day in by_date:
+            balance, flows = by_date[day]
+        else:
+            flows = [zero] * len(FLOW_COLUMNS)
+        history.append({'date': day, 'balance': balance, **dict(zip(FLOW_COLUMNS, flows))})
+        day += timedelta(days=1)
+    return history
@@ -1,3 +1,502 @@
-from django.test import TestCase
+import base64
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+import msgpack
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+from rest_framework.utils.encoders import JSONEncoder
+
+from .bulk_ingest import ingest, parse_payload
+from .fast_serializers import AccountSummaryValuesSerializer, TransactionValuesSerializer
+from .ledger import post_pending_transactions, post_transactions
+from .models import Account, Transaction, TransactionSource, User
+from .serializers import AccountSerializer, AccountSummarySerializer, TransactionSerializer
+from .snapshots import balance_history
+
+
+class ListQueryCountTests(APITestCase):
+    """List endpoints must issue a constant number of queries regardless of result size"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        self.source = TransactionSource.objects.create(source_name='Broker', source_type='broker')
+        self.client.force_authenticate(self.user)
+
+    def add_accounts(self, count, transactions_per_account=3):
+        for i in range(count):
+            account = Account.objects.create(
+                user=self.user, account_nickname=f'acc-{i}',
+                account_type='investment', currency='USD',
+            )
+            for _ in range(transactions_per_account):
+                Transaction.objects.create(
+                    account=account, transaction_type='deposit', transaction_amount=10,
+                    transaction_source=self.source, transaction_status='completed',
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.add_accounts(1)
+        small = self.count_queries(url)
+        self.add_accounts(5)
+        large = self.count_queries(url)
+        self.assertEqual(small, large, f"{url} issues a query per row ({small} -> {large})")
+
+    def test_transaction_list(self):
+        self.assertConstantQueries('/users/transactions/')
+
+    def test_account_list(self):
+        self.assertConstantQueries('/users/accounts/')
+
+    def test_account_list_with_transactions(self):
+        self.assertConstantQueries('/users/accounts/?include_transactions=true')
+
+    def test_user_list_with_accounts_and_transactions(self):
+        self.assertConstantQueries('/users/users/?include_accounts=true&include_transactions=true')
+
+    def test_me_with_accounts_and_transactions(self):
+        self.assertConstantQueries('/users/users/me/?include_accounts=true&include_transactions=true')
+
+    def test_transaction_stream(self):
+        self.assertConstantQueries('/users/transactions/?stream=ndjson')
+
+    def test_nested_relations_are_omitted_by_default(self):
+        self.add_accounts(1)
+        response = self.client.get('/users/users/me/')
+        self.assertNotIn('accounts', response.data)
+        response = self.client.get('/users/accounts/')
+        self.assertNotIn('transactions', response.data['results'][0])
+
+
+class LedgerPostingTests(APITestCase):
+    """Balances move exactly once per completed transaction"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        self.account = self.add_account('main')
+
+    def add_account(self, nickname):
+        return Account.objects.create(
+            user=self.user, account_nickname=nickname, account_type='investment', currency='USD',
+        )
+
+    def add(self, transaction_type, amount, status='pending', account=None):
+        return Transaction.objects.create(
+            account=account or self.account, transaction_type=transaction_type,
+            transaction_amount=Decimal(amount), transaction_status=status,
+        )
+
+    def balance(self, account=None):
+        account = account or self.account
+        account.refresh_from_db()
+        return account.balance
+
+    def test_saving_completed_transaction_twice_posts_once(self):
+        txn = self.add('deposit', '50', status='completed')
+        txn.reference = 'edited'
+        txn.save()
+        self.assertEqual(self.balance(), Decimal('50'))
+
+    def test_stale_instances_cannot_both_complete(self):
+        txn = self.add('deposit', '50')
+        first, second = Transaction.objects.get(pk=txn.pk), Transaction.objects.get(pk=txn.pk)
+        for instance in (first, second):
+            instance.transaction_status = 'completed'
+            instance.save()
+        self.assertEqual(self.balance(), Decimal('50'))
+
+    def test_rerunning_post_transactions_does_not_double_post(self):
+        ids = [self.add('deposit', '100').pk, self.add('fee', '2').pk]
+        first = post_transactions(ids)
+        second = post_transactions(ids)
+        self.assertEqual(first.posted, {self.account.pk: 2})
+        self.assertEqual(second.posted, {})
+        self.assertEqual(sorted(second.skipped), sorted(ids))
+        self.assertEqual(self.balance(), Decimal('98'))
+
+    def test_batches_aggregate_per_account(self):
+        other = self.add_account('other')
+        ids = [
+            self.add('deposit', '100').pk,
+            self.add('withdrawal', '30').pk,
+            self.add('dividend', '5', account=other).pk,
+            self.add('deposit', '1', account=other).pk,
+        ]
+        result = post_transactions(ids, batch_size=3)
+        self.assertEqual(result.posted, {self.account.pk: 2, other.pk: 2})
+        self.assertEqual(result.skipped, [])
+        self.assertEqual(self.balance(), Decimal('70'))
+        self.assertEqual(self.balance(other), Decimal('6'))
+        self.assertEqual(
+            set(Transaction.objects.filter(pk__in=ids).values_list('transaction_status', flat=True)),
+            {'completed'},
+        )
+
+    def test_failed_and_cancelled_transactions_are_not_posted(self):
+        failed = self.add('deposit', '10', status='failed')
+        cancelled = self.add('deposit', '20', status='cancelled')
+        pending = self.add('deposit', '40')
+        result = post_transactions([failed.pk, cancelled.pk, pending.pk])
+        self.assertEqual(result.posted, {self.account.pk: 1})
+        self.assertEqual(sorted(result.skipped), sorted([failed.pk, cancelled.pk]))
+        self.assertEqual(self.balance(), Decimal('40'))
+        failed.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual((failed.transaction_status, cancelled.transaction_status), ('failed', 'cancelled'))
+
+    def test_post_pending_transactions_only_claims_pending(self):
+        self.add('deposit', '10', status='completed')
+        self.add('deposit', '20', status='failed')
+        self.add('deposit', '5')
+        result = post_pending_transactions()
+        self.assertEqual(result.posted_count, 1)
+        self.assertEqual(self.balance(), Decimal('15'))
+
+
+class BulkIngestTests(APITestCase):
+    """Statement imports validate row by row, COPY the survivors and post them once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        self.source = TransactionSource.objects.create(source_name='Broker', source_type='broker')
+        self.account = Account.objects.create(
+            user=self.user, account_nickname='main', account_type='investment', currency='USD',
+        )
+
+    def row(self, transaction_type, amount, status='completed', **extra):
+        return {
+            'account': self.account.pk, 'transaction_type': transaction_type,
+            'transaction_amount': amount, 'transaction_status': status, **extra,
+        }
+
+    def as_csv(self, rows):
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        lines = [','.join(columns)] + [','.join(str(row.get(c, '')) for c in columns) for row in rows]
+        return '\n'.join(lines).encode()
+
+    def as_ndjson(self, rows):
+        return '\n'.join(json.dumps(row) for row in rows).encode()
+
+    def as_msgpack(self, rows):
+        return msgpack.packb(rows)
+
+    def balance(self):
+        self.account.refresh_from_db()
+        return self.account.balance
+
+    def test_rejects_report_row_numbers_and_errors(self):
+        rows = [
+            self.row('deposit', '10'),
+            self.row('deposit', '10', account=999999),
+            self.row('bonus', '10'),
+            self.row('deposit', '-5'),
+            self.row('deposit', '10', status='settled'),
+            self.row('deposit', '10', transaction_source=999999),
+            self.row('deposit', '10', transaction_date='not-a-date'),
+            self.row('deposit', '10', transaction_source=self.source.pk),
+        ]
+        result = ingest(self.as_csv(rows), 'csv')
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            {reject['row']: set(reject['errors']) for reject in result.rejects},
+            {2: {'account'}, 3: {'transaction_type'}, 4: {'transaction_amount'},
+             5: {'transaction_status'}, 6: {'transaction_source'}, 7: {'transaction_date'}},
+        )
+        self.assertEqual(self.balance(), Decimal('20'))
+
+    def test_rows_the_column_types_cannot_hold_are_rejected(self):
+        rows = [
+            self.row('deposit', 'inf'),
+            self.row('deposit', 'NaN'),
+            self.row('deposit', '1' * 20),
+            self.row('deposit', '1' * 16),
+            self.row('deposit', '1.00001'),
+            self.row('deposit', '10', reference='x' * 256),
+            self.row('deposit', '12345.6789', reference='x' * 255),
+        ]
+        result = ingest(self.as_ndjson(rows), 'ndjson')
+        self.assertEqual(
+            {reject['row']: reject['errors'] for reject in result.rejects},
+            {
+                1: {'transaction_amount': "A valid number is required."},
+                2: {'transaction_amount': "A valid number is required."},
+                3: {'transaction_amount': "Ensure that there are no more than 19 digits in total."},
+                4: {'transaction_amount': "Ensure that there are no more than 15 digits before the decimal point."},
+                5: {'transaction_amount': "Ensure that there are no more than 4 decimal places."},
+                6: {'reference': "Ensure this field has no more than 255 characters."},
+            },
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(self.balance(), Decimal('12345.6789'))
+
+    def test_missing_columns_reject_every_row(self):
+        result = ingest(b'account,transaction_type\n1,deposit\n1,fee\n', 'csv')
+        self.assertEqual(result.created, 0)
+        self.assertEqual([reject['row'] for reject in result.rejects], [1, 2])
+        self.assertEqual(set(result.rejects[0]['errors']), {'transaction_amount', 'transaction_status'})
+
+    def test_withdrawals_are_covered_by_the_running_balance(self):
+        rows = [
+            self.row('deposit', '100'),
+            self.row('withdrawal', '150'),
+            self.row('withdrawal', '80'),
+            self.row('deposit', '50', status='pending'),
+            self.row('withdrawal', '30'),
+            self.row('withdrawal', '20'),
+            self.row('withdrawal', '1', status='pending'),
+        ]
+        result = ingest(self.as_ndjson(rows), 'ndjson')
+        self.assertEqual([reject['row'] for reject in result.rejects], [2, 5, 7])
+        self.assertEqual(
+            {reject['errors']['transaction_amount'] for reject in result.rejects},
+            {"Insufficient funds in account."},
+        )
+        self.assertEqual(result.created, 4)
+        self.assertEqual(self.balance(), Decimal('0'))
+
+    def test_merge_inserts_rows_and_posts_completed_ones(self):
+        rows = [
+            self.row('deposit', '100.1234', reference='stmt-1', transaction_source=self.source.pk,
+                     transaction_date='2024-03-01T10:00:00+00:00'),
+            self.row('fee', '0.1234'),
+            self.row('deposit', '999', status='pending'),
+        ]
+        result = ingest(self.as_msgpack(rows), 'msgpack', chunk_size=2)
+        self.assertEqual((result.created, result.rejects), (3, []))
+        # The second chunk holds only the pending row, so only one chunk posts
+        self.assertEqual(result.posted_accounts, 1)
+        first = Transaction.objects.get(reference='stmt-1')
+        self.assertEqual(first.transaction_amount, Decimal('100.1234'))
+        self.assertEqual(first.transaction_source_id, self.source.pk)
+        self.assertEqual(first.transaction_date, datetime(2024, 3, 1, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            Transaction.objects.filter(account=self.account, transaction_status='pending').count(), 1
+        )
+        self.assertEqual(self.balance(), Decimal('100'))
+
+    def test_completed_rows_update_daily_snapshots(self):
+        today = timezone.localdate()
+        ingest(self.as_csv([self.row('deposit', '40'), self.row('withdrawal', '15')]), 'csv')
+        history = balance_history(self.account.pk, today, today)
+        self.assertEqual(
+            {k: history[0][k] for k in ('balance', 'deposits', 'withdrawals')},
+            {'balance': Decimal('25'), 'deposits': Decimal('40'), 'withdrawals': Decimal('15')},
+        )
+
+    def test_records_must_be_objects(self):
+        for data, fmt in ((b'5\n', 'ndjson'), (b'{"account": 1}\n[1, 2]\n', 'ndjson'),
+                          (msgpack.packb(5), 'msgpack'), (msgpack.packb([1, 2]), 'msgpack')):
+            with self.subTest(data=data, fmt=fmt), self.assertRaises(ValueError):
+                parse_payload(data, fmt)
+
+    def test_endpoint_accepts_each_format(self):
+        self.client.force_authenticate(self.user)
+        for fmt, content_type in (('csv', 'text/csv'), ('ndjson', 'application/x-ndjson'),
+                                  ('msgpack', 'application/msgpack')):
+            with self.subTest(fmt=fmt):
+                body = getattr(self, f'as_{fmt}')([self.row('deposit', '10'), self.row('bonus', '1')])
+                response = self.client.post(
+                    '/users/transactions/bulk/', data=body, content_type=content_type
+                )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(response.json()['created'], 1)
+                self.assertEqual(response.json()['rejects'], [{'row': 2, 'errors': {
+                    'transaction_type': "Invalid transaction type."}}])
+        self.assertEqual(self.balance(), Decimal('30'))
+
+    def test_endpoint_accepts_multipart_upload(self):
+        self.client.force_authenticate(self.user)
+        upload = io.BytesIO(self.as_csv([self.row('deposit', '5')]))
+        upload.name = 'statement.csv'
+        response = self.client.post('/users/transactions/bulk/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.balance(), Decimal('5'))
+
+    def test_endpoint_only_posts_to_own_accounts(self):
+        other_user = User.objects.create_user(username='other', password='pw-not-used-2')
+        self.client.force_authenticate(other_user)
+        response = self.client.post(
+            '/users/transactions/bulk/', data=self.as_csv([self.row('deposit', '10')]),
+            content_type='text/csv',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['rejects'][0]['errors'], {'account': "Unknown account."})
+        self.assertEqual(self.balance(), Decimal('0'))
+
+    def test_endpoint_rejects_bad_payloads(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/users/transactions/bulk/', data=b'5\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/users/transactions/bulk/', data=b'<xml/>', content_type='application/xml')
+        self.assertEqual(response.status_code, 415)
+
+
+class KeysetPaginationTests(APITestCase):
+    """Cursors walk the newest-first ordering without skipping or repeating rows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        self.client.force_authenticate(self.user)
+        account = Account.objects.create(
+            user=self.user, account_nickname='main', account_type='investment', currency='USD',
+        )
+        base = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        # Runs of identical timestamps straddle the page boundaries below
+        offsets = [0, 1, 1, 1, 2, 3, 3, 4, 4, 4, 4]
+        for offset in offsets:
+            txn = Transaction.objects.create(
+                account=account, transaction_type='deposit', transaction_amount=1,
+                transaction_status='pending',
+            )
+            Transaction.objects.filter(pk=txn.pk).update(transaction_date=base + timedelta(hours=offset))
+        self.expected = list(
+            Transaction.objects.order_by('-transaction_date', '-transaction_id')
+            .values_list('transaction_id', flat=True)
+        )
+
+    def walk(self, page_size):
+        ids, pages = [], 0
+        url = f'/users/transactions/?page_size={page_size}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['transaction_id'] for item in response.json()['results'])
+            url = response.json()['next']
+            pages += 1
+        return ids, pages
+
+    def test_cursors_cover_every_row_once_across_ties(self):
+        for page_size in (1, 2, 3, 4, 100):
+            with self.subTest(page_size=page_size):
+                ids, pages = self.walk(page_size)
+                self.assertEqual(ids, self.expected)
+                self.assertEqual(pages, -(-len(self.expected) // page_size))
+
+    def test_ordering_is_newest_first_then_highest_id(self):
+        rows = list(Transaction.objects.values_list('transaction_date', 'transaction_id'))
+        ordered = sorted(rows, reverse=True)
+        self.assertEqual(self.expected, [transaction_id for _, transaction_id in ordered])
+        response = self.client.get('/users/transactions/?page_size=100')
+        self.assertEqual([item['transaction_id'] for item in response.json()['results']], self.expected)
+        self.assertIsNone(response.json()['next'])
+
+    def test_malformed_cursor_is_not_found(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(payload.encode()).decode()
+
+        for cursor in ('not base64!', encode('not json'), encode('5'), encode('[1]'),
+                       encode('{"a": 1, "b": 2}'), encode('["yesterday", 1]'),
+                       encode('[null, null]'), encode('["2024-01-01T00:00:00Z", [1]]'),
+                       encode('["2024-01-01T00:00:00Z", 99999999999999999999]')):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/users/transactions/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class ValuesSerializerTests(APITestCase):
+    """The compiled values serializers must match the ModelSerializers they replace"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        source = TransactionSource.objects.create(source_name='Broker', source_type='broker')
+        self.account = Account.objects.create(
+            user=self.user, account_nickname='main', account_type='investment', currency='USD',
+        )
+        Transaction.objects.create(
+            account=self.account, transaction_type='deposit', transaction_amount='12.5',
+            transaction_source=source, transaction_status='completed',
+        )
+        Transaction.objects.create(
+            account=self.account, transaction_type='fee', transaction_amount='0.0001',
+            transaction_status='pending',
+        )
+
+    def test_transactions_match_model_serializer(self):
+        queryset = Transaction.objects.order_by('transaction_id')
+        fast = TransactionValuesSerializer()
+        self.assertEqual(
+            fast.represent(fast.values(queryset)),
+            [dict(item) for item in TransactionSerializer(queryset, many=True).data],
+        )
+
+    def test_account_summary_matches_model_serializer(self):
+        fast = AccountSummaryValuesSerializer()
+        row = fast.values(Account.objects.filter(pk=self.account.pk)).get()
+        self.assertEqual(fast.to_representation(row), dict(AccountSummarySerializer(self.account).data))
+
+    def test_account_list_with_transactions_matches_model_serializer(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/users/accounts/?include_transactions=true')
+        expected = AccountSerializer(
+            Account.objects.filter(pk=self.account.pk), many=True,
+            context={'request': Request(response.wsgi_request)},
+        ).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected, cls=JSONEncoder)))
+
+    def test_fields_param_limits_output(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/users/transactions/?fields=transaction_id,transaction_amount')
+        self.assertEqual(
+            [set(item) for item in response.json()['results']],
+            [{'transaction_id', 'transaction_amount'}] * 2,
+        )
+
+
+class DailySnapshotTests(APITestCase):
+    """Postings keep the per-day snapshot in step with the account balance"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw-not-used-1')
+        self.account = Account.objects.create(
+            user=self.user, account_nickname='main', account_type='investment', currency='USD',
+        )
+
+    def post(self, transaction_type, amount, status='completed'):
+        return Transaction.objects.create(
+            account=self.account, transaction_type=transaction_type,
+            transaction_amount=Decimal(amount), transaction_status=status,
+        )
+
+    def test_postings_update_todays_snapshot(self):
+        self.post('deposit', '100')
+        self.post('fee', '1.5')
+        self.post('dividend', '4')
+        pending = self.post('withdrawal', '20', status='pending')
+        pending.transaction_status = 'completed'
+        pending.save()
+
+        today = timezone.localdate()
+        history = balance_history(self.account.pk, today - timedelta(days=1), today)
+        self.assertEqual(history[0]['balance'], 0)
+        self.assertEqual(
+            {k: history[1][k] for k in ('balance', 'deposits', 'withdrawals', 'fees', 'dividends')},
+            {'balance': Decimal('82.5'), 'deposits': Decimal('100'), 'withdrawals': Decimal('20'),
+             'fees': Decimal('1.5'), 'dividends': Decimal('4')},
+        )
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, history[1]['balance'])
+
+    def test_balance_history_endpoint_carries_balance_forward(self):
+        self.post('deposit', '10')
+        self.client.force_authenticate(self.user)
+        today = timezone.localdate()
+        response = self.client.get(
+            f'/users/accounts/{self.account.pk}/balance-history/',
+            {'start': today.isoformat(), 'end': (today + timedelta(days=2)).isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([day['balance'] for day in response.json()], ['10.0000'] * 3)
+        self.assertEqual([day['deposits'] for day in response.json()], ['10.0000', '0.0000', '0.0000'])
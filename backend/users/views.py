@@ -3,24 +3,49 @@ from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.views import APIView
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status
 
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.hashers import check_password
+from django.db.models import Prefetch
 from .models import (
     AddressDetails, TaxResidencyDetails, BankingDetails,
     Account, Transaction, TransactionSource
 )
+from .bulk_ingest import detect_format, ingest
+from .fast_serializers import (
+    AccountSummaryValuesSerializer, AccountValuesSerializer,
+    TransactionValuesSerializer, ValuesListMixin
+)
+from .pagination import StreamingListMixin, TransactionKeysetPagination
+from .snapshots import balance_history
 from .serializers import (
     AddressDetailsSerializer, TaxResidencyDetailsSerializer, BankingDetailsSerializer,
     AccountSerializer, TransactionSerializer, TransactionSourceSerializer,
     UserSerializer, UserCreateSerializer, PasswordChangeSerializer,
-    TransactionCreateSerializer, AccountSummarySerializer
+    TransactionCreateSerializer, AccountDailySnapshotSerializer, BalanceHistoryQuerySerializer,
+    INCLUDE_ACCOUNTS, INCLUDE_TRANSACTIONS, is_expanded
 )
 
 User = get_user_model()
 
+
+def nested_transactions_prefetch(lookup='transactions'):
+    """Prefetch for nested transactions; the parent account is already cached on each row"""
+    return Prefetch(lookup, queryset=Transaction.objects.select_related('transaction_source'))
+
+
+def prefetch_user_expansions(queryset, request):
+    """Prefetch the nested accounts (and their transactions) a user response will render"""
+    if is_expanded(request, INCLUDE_ACCOUNTS):
+        queryset = queryset.prefetch_related('accounts')
+        if is_expanded(request, INCLUDE_TRANSACTIONS):
+            queryset = queryset.prefetch_related(nested_transactions_prefetch('accounts__transactions'))
+    return queryset
+
+
 class LoginView(APIView):
     permission_classes = [AllowAny]
 
@@ -35,70 +60,113 @@ class LoginView(APIView):
         
         return Response({"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST)
 
-class AddressDetailsViewSet(viewsets.ModelViewSet):
+class AddressDetailsViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = AddressDetails.objects.all()
     serializer_class = AddressDetailsSerializer
     permission_classes = [IsAuthenticated]
 
 
-class TaxResidencyDetailsViewSet(viewsets.ModelViewSet):
+class TaxResidencyDetailsViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = TaxResidencyDetails.objects.all()
     serializer_class = TaxResidencyDetailsSerializer
     permission_classes = [IsAuthenticated]
 
 
-class BankingDetailsViewSet(viewsets.ModelViewSet):
+class BankingDetailsViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = BankingDetails.objects.all()
     serializer_class = BankingDetailsSerializer
     permission_classes = [IsAuthenticated]
 
 
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ValuesListMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Account.objects.all()
     serializer_class = AccountSerializer
+    values_serializer_class = AccountValuesSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         """Return only accounts owned by the authenticated user"""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if is_expanded(self.request, INCLUDE_TRANSACTIONS):
+            queryset = queryset.prefetch_related(nested_transactions_prefetch())
+        return queryset
     
     @action(detail=True, methods=['get'])
     def summary(self, request, pk=None):
         """Returns a simplified summary of an account"""
-        account = self.get_object()
-        serializer = AccountSummarySerializer(account)
-        return Response(serializer.data)
+        serializer = AccountSummaryValuesSerializer(request)
+        row = get_object_or_404(serializer.values(self.get_queryset()), pk=pk)
+        return Response(serializer.to_representation(row))
+
+    @action(detail=True, methods=['get'], url_path='balance-history')
+    def balance_history(self, request, pk=None):
+        """Daily closing balances and cash flows from the account's snapshots"""
+        query = BalanceHistoryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        account = get_object_or_404(self.get_queryset().only('account_id'), pk=pk)
+        history = balance_history(account.pk, query.validated_data['start'], query.validated_data['end'])
+        return Response(AccountDailySnapshotSerializer(history, many=True).data)
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ValuesListMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    values_serializer_class = TransactionValuesSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TransactionKeysetPagination
     
     def get_queryset(self):
         """Filter transactions based on the authenticated user's accounts"""
-        return self.queryset.filter(account__user=self.request.user)
+        return self.queryset.filter(account__user=self.request.user).select_related(
+            'account', 'transaction_source'
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """Ingest a broker statement (CSV, NDJSON or msgpack) in one request"""
+        upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+        try:
+            if upload is not None:
+                fmt = detect_format(upload.content_type, upload.name)
+                data = upload.read()
+            else:
+                fmt = detect_format(request.content_type)
+                data = request.body
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        try:
+            result = ingest(data, fmt, accounts=Account.objects.filter(user=request.user))
+        except ValueError as exc:
+            return Response({"error": f"Could not parse payload: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if result.rejects and not result.created:
+            return Response(result.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
     
 
-class TransactionSourceViewSet(viewsets.ModelViewSet):
+class TransactionSourceViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = TransactionSource.objects.all()
     serializer_class = TransactionSourceSerializer
     permission_classes = [IsAuthenticated]
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         """Restrict users to self-view only"""
-        return self.queryset.filter(id=self.request.user.id)
+        queryset = self.queryset.filter(id=self.request.user.id).select_related(
+            'address', 'tax_residency', 'banking_details'
+        )
+        return prefetch_user_expansions(queryset, self.request)
     
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Retrieve the authenticated user's profile"""
-        serializer = self.get_serializer(request.user)
+        serializer = self.get_serializer(self.get_queryset().get())
         return Response(serializer.data)
 
 